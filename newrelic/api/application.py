@@ -150,6 +150,10 @@ class Application(object):
         if self.active and metrics:
             self._agent.record_dimensional_metrics(self._name, metrics)
 
+    def record_dimensional_distribution(self, name, value, tags=None):
+        if self.active:
+            self._agent.record_dimensional_distribution(self._name, name, value, tags)
+
     def record_custom_event(self, event_type, params):
         if self.active:
             self._agent.record_custom_event(self._name, event_type, params)
@@ -19,6 +19,8 @@ from newrelic.common.async_wrapper import async_wrapper as get_async_wrapper
 from newrelic.common.object_names import callable_name
 from newrelic.common.object_wrapper import FunctionWrapper, wrap_object
 from newrelic.core.function_node import FunctionNode
+from newrelic.core.stats_engine import TimeStats
+from newrelic.packages import six
 
 
 class FunctionTrace(TimeTrace):
@@ -88,6 +90,27 @@ class FunctionTrace(TimeTrace):
             user_attributes=self.user_attributes,
         )
 
+    def aggregate_time_metrics(self, transaction):
+        # Only a function trace with no child nodes can be aggregated, as
+        # child nodes must remain attached to a node for their parent.
+
+        if self.children:
+            return False
+
+        rollup = self.rollup
+        if rollup is not None and not isinstance(rollup, six.string_types):
+            rollup = tuple(rollup)
+
+        key = (self.group, self.name, rollup)
+
+        stats = transaction._function_stats.get(key)
+        if stats is None:
+            stats = transaction._function_stats[key] = TimeStats()
+
+        stats.merge_raw_time_metric(self.duration, self.exclusive)
+
+        return True
+
 
 def FunctionTraceWrapper(wrapped, name=None, group=None, label=None, params=None, terminal=False, rollup=None, async_wrapper=None):
     def dynamic_wrapper(wrapped, instance, args, kwargs):
@@ -14,6 +14,7 @@
 
 import logging
 import sys
+import time
 
 from newrelic.packages import six
 
@@ -26,6 +27,17 @@ except ImportError:
 
 _import_hooks = {}
 
+# The names of modules for which import hooks have been registered but
+# have not yet fired. The import hook finder only needs to be present in
+# sys.meta_path while this is not empty.
+
+_pending_import_hooks = set()
+
+# The time taken to fire the import hooks for each module, recorded as a
+# list of (name, duration) tuples until collected by a harvest.
+
+_import_hook_timings = []
+
 _ok_modules = (
     # These modules are imported by the newrelic package and/or do not do
     # nested imports, so they're ok to import before newrelic.
@@ -108,15 +120,21 @@ def register_import_hook(name, callable):  # pylint: disable=redefined-builtin
 
                 _import_hooks[name] = None
 
-                callable(module)
+                _fire_import_hooks(name, module, [callable])
 
             else:
 
                 # No hook has been registered so far so create list
-                # and add current hook.
+                # and add current hook. The import hook finder must
+                # be installed so the hook fires when the module is
+                # imported.
 
                 _import_hooks[name] = [callable]
 
+                _pending_import_hooks.add(name)
+
+                install_import_hook_finder()
+
         else:
 
             # Hook has already been registered, so append current
@@ -140,9 +158,41 @@ def _notify_import_hooks(name, module):
     if hooks is not None:
         _import_hooks[name] = None
 
+        _pending_import_hooks.discard(name)
+
+        _fire_import_hooks(name, module, hooks)
+
+        # Once the hooks for all registered modules have fired there is
+        # no further need to intercept imports.
+
+        if not _pending_import_hooks:
+            remove_import_hook_finder()
+
+
+def _fire_import_hooks(name, module, hooks):
+    start = time.time()
+
+    try:
         for hook in hooks:
             hook(module)
 
+    finally:
+        _import_hook_timings.append((name, time.time() - start))
+
+
+def import_hook_timings():
+    """Returns a list of (name, duration) tuples giving the time taken to
+    fire the import hooks for each module since the last call to this
+    function.
+
+    """
+
+    global _import_hook_timings
+
+    timings, _import_hook_timings = _import_hook_timings, []
+
+    return timings
+
 
 class _ImportHookLoader:
     def load_module(self, fullname):
@@ -179,7 +229,7 @@ class _ImportHookChainedLoader:
 
 class ImportHookFinder:
     def __init__(self):
-        self._skip = {}
+        self._skip = set()
 
     def find_module(self, fullname, path=None):
         """
@@ -190,9 +240,10 @@ class ImportHookFinder:
         https://docs.python.org/3/library/importlib.html#importlib.abc.MetaPathFinder.find_module
         """
 
-        # If not something we are interested in we can return.
+        # If not something we are interested in, or the hooks for it
+        # have already fired, we can return.
 
-        if fullname not in _import_hooks:
+        if _import_hooks.get(fullname) is None:
             return None
 
         # Check whether this is being called on the second time
@@ -206,7 +257,7 @@ class ImportHookFinder:
         # above drops out on subsequent pass and we don't go
         # into an infinite loop.
 
-        self._skip[fullname] = True
+        self._skip.add(fullname)
 
         try:
             # For Python 3 we need to use find_spec() from the importlib
@@ -230,7 +281,7 @@ class ImportHookFinder:
                 return _ImportHookLoader()
 
         finally:
-            del self._skip[fullname]
+            self._skip.discard(fullname)
 
     def find_spec(self, fullname, path=None, target=None):
         """
@@ -241,9 +292,10 @@ class ImportHookFinder:
         https://docs.python.org/3/library/importlib.html#importlib.abc.MetaPathFinder.find_spec
         """
 
-        # If not something we are interested in we can return.
+        # If not something we are interested in, or the hooks for it
+        # have already fired, we can return.
 
-        if fullname not in _import_hooks:
+        if _import_hooks.get(fullname) is None:
             return None
 
         # Check whether this is being called on the second time
@@ -257,7 +309,7 @@ class ImportHookFinder:
         # above drops out on subsequent pass and we don't go
         # into an infinite loop.
 
-        self._skip[fullname] = True
+        self._skip.add(fullname)
 
         try:
             # For Python 3 we need to use find_spec() from the importlib
@@ -277,7 +329,34 @@ class ImportHookFinder:
                 return None
 
         finally:
-            del self._skip[fullname]
+            self._skip.discard(fullname)
+
+
+_import_hook_finder = ImportHookFinder()
+
+
+def install_import_hook_finder():
+    """Installs the import hook finder at the front of sys.meta_path if it
+    is not already present.
+
+    """
+
+    # A new list is bound to sys.meta_path rather than modifying it in
+    # place, so an import in progress in another thread which is iterating
+    # over the existing list is not affected.
+
+    if _import_hook_finder not in sys.meta_path:
+        sys.meta_path = [_import_hook_finder] + sys.meta_path
+
+
+def remove_import_hook_finder():
+    """Removes the import hook finder from sys.meta_path. It is installed
+    again if further import hooks are registered.
+
+    """
+
+    if _import_hook_finder in sys.meta_path:
+        sys.meta_path = [finder for finder in sys.meta_path if finder is not _import_hook_finder]
 
 
 def import_hook(name):
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
 import logging
 import platform
 import random
@@ -22,7 +23,11 @@ import warnings
 
 from newrelic.api.settings import STRIP_EXCEPTION_MESSAGE
 from newrelic.common.object_names import parse_exc_info
-from newrelic.core.attribute import MAX_NUM_USER_ATTRIBUTES, process_user_attribute
+from newrelic.core.attribute import (
+    MAX_NUM_USER_ATTRIBUTES,
+    DeferredAttributes,
+    process_user_attribute,
+)
 from newrelic.core.code_level_metrics import (
     extract_code_from_callable,
     extract_code_from_traceback,
@@ -35,12 +40,24 @@ from newrelic.packages import six
 _logger = logging.getLogger(__name__)
 
 
+def _add_code_level_metrics(source, add_attr_function):
+    try:
+        node = extract_code_from_callable(source)
+        node.add_attrs(add_attr_function)
+    except Exception as exc:
+        _logger.debug(
+            "Failed to extract source code context from callable %s. Report this issue to newrelic support. Exception: %s"
+            % (source, exc)
+        )
+
+
 class TimeTrace(object):
     def __init__(self, parent=None, source=None):
         self.parent = parent
         self.root = None
         self.child_count = 0
         self.children = []
+        self.aggregated_child_count = 0
         self.start_time = 0.0
         self.end_time = 0.0
         self.duration = 0.0
@@ -70,7 +87,12 @@ class TimeTrace(object):
         return transaction and transaction.settings
 
     def _is_leaf(self):
-        return self.child_count == len(self.children)
+        return self.child_count == self._completed_child_count()
+
+    def _completed_child_count(self):
+        # Children whose time metrics were aggregated in place of creating
+        # a node are not held in the list of children.
+        return len(self.children) + self.aggregated_child_count
 
     def __repr__(self):
         return "<%s object at 0x%x %s>" % (self.__class__.__name__, id(self), dict(name=getattr(self, "name", None)))
@@ -122,7 +144,7 @@ class TimeTrace(object):
 
         # Extract source code context
         if self._source is not None:
-            self.add_code_level_metrics(self._source)
+            self._defer_code_level_metrics(self._source)
 
         return self
 
@@ -211,14 +233,20 @@ class TimeTrace(object):
         # Some derived classes do not have self.settings immediately
         settings = self.settings or self.transaction.settings
         if source and settings and settings.code_level_metrics and settings.code_level_metrics.enabled:
-            try:
-                node = extract_code_from_callable(source)
-                node.add_attrs(self._add_agent_attribute)
-            except Exception as exc:
-                _logger.debug(
-                    "Failed to extract source code context from callable %s. Report this issue to newrelic support. Exception: %s"
-                    % (source, exc)
-                )
+            _add_code_level_metrics(source, self._add_agent_attribute)
+
+    def _defer_code_level_metrics(self, source):
+        # The source code context is only reported as attributes on span
+        # events and transaction trace segments, so extracting it is put
+        # off until the attributes are resolved for one of those. For the
+        # majority of transactions which aren't sampled, it never is.
+
+        settings = self.settings or self.transaction.settings
+        if source and settings and settings.code_level_metrics and settings.code_level_metrics.enabled:
+            agent_attributes = self.agent_attributes
+            if not isinstance(agent_attributes, DeferredAttributes):
+                agent_attributes = self.agent_attributes = DeferredAttributes(agent_attributes)
+            agent_attributes.defer(functools.partial(_add_code_level_metrics, source))
 
     def _observe_exception(self, exc_info=None, ignore=None, expected=None, status_code=None):
         # Bail out if the transaction is not active or
@@ -466,7 +494,7 @@ class TimeTrace(object):
         self.agent_attributes[key] = value
 
     def has_outstanding_children(self):
-        return len(self.children) != self.child_count
+        return self._completed_child_count() != self.child_count
 
     def _ready_to_complete(self):
         # we shouldn't continue if we're still running
@@ -535,16 +563,24 @@ class TimeTrace(object):
         self.finalize_data(transaction, *exc_data)
         exc_data = None
 
-        # Give chance for derived class to create a standin node
-        # object to be used in the transaction trace. If we get
-        # one then give chance for transaction object to do
-        # something with it, as well as our parent node.
+        # Where the transaction will not be sampled for span events or
+        # be a candidate for a transaction trace, give chance for derived
+        # class to aggregate its time metrics into the transaction rather
+        # than create a node. Otherwise, give chance for derived class to
+        # create a standin node object to be used in the transaction
+        # trace. If we get one then give chance for transaction object
+        # to do something with it, as well as our parent node.
+
+        if transaction._aggregate_trace(self) and self.aggregate_time_metrics(transaction):
+            transaction.total_time += self.exclusive
+            parent.process_aggregated_child(self, self.is_async)
 
-        node = self.create_node()
+        else:
+            node = self.create_node()
 
-        if node:
-            transaction._process_node(node)
-            parent.process_child(node, self.is_async)
+            if node:
+                transaction._process_node(node)
+                parent.process_child(node, self.is_async)
 
         # ----------------------------------------------------------------------
         # SYNC  | The parent will not have exited yet, so no node will be
@@ -562,6 +598,9 @@ class TimeTrace(object):
     def create_node(self):
         return self
 
+    def aggregate_time_metrics(self, transaction):
+        return False
+
     def terminal_node(self):
         return False
 
@@ -594,13 +633,20 @@ class TimeTrace(object):
 
     def process_child(self, node, is_async):
         self.children.append(node)
+        self._update_exclusive_time(node, is_async)
+
+    def process_aggregated_child(self, trace, is_async):
+        self.aggregated_child_count += 1
+        self._update_exclusive_time(trace, is_async)
+
+    def _update_exclusive_time(self, node, is_async):
         if is_async:
 
             # record the lowest start time
             self.min_child_start_time = min(self.min_child_start_time, node.start_time)
 
             # if there are no children running, finalize exclusive time
-            if self.child_count == len(self.children):
+            if self.child_count == self._completed_child_count():
 
                 exclusive_duration = node.end_time - self.min_child_start_time
 
@@ -616,7 +662,7 @@ class TimeTrace(object):
 
         # if there's more than 1 child node outstanding
         # then the children are async w.r.t each other
-        if (self.child_count - len(self.children)) > 1:
+        if (self.child_count - self._completed_child_count()) > 1:
             self.has_async_children = True
         # else, the current trace that's being scheduled is not going to be
         # async. note that this implies that all previous traces have
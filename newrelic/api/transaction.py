@@ -30,7 +30,7 @@ import newrelic.core.error_node
 import newrelic.core.root_node
 import newrelic.core.transaction_node
 from newrelic.api.application import application_instance
-from newrelic.api.time_trace import TimeTrace, get_linking_metadata
+from newrelic.api.time_trace import TimeTrace
 from newrelic.common.encoding_utils import (
     DistributedTracePayload,
     NrTraceState,
@@ -47,7 +47,6 @@ from newrelic.common.encoding_utils import (
 )
 from newrelic.core.attribute import (
     MAX_ATTRIBUTE_LENGTH,
-    MAX_LOG_MESSAGE_LENGTH,
     MAX_NUM_USER_ATTRIBUTES,
     create_agent_attributes,
     create_attributes,
@@ -66,9 +65,13 @@ from newrelic.core.config import (
     ML_EVENT_RESERVOIR_SIZE,
 )
 from newrelic.core.custom_event import create_custom_event
-from newrelic.core.log_event_node import LogEventNode
 from newrelic.core.stack_trace import exception_stack
-from newrelic.core.stats_engine import CustomMetrics, DimensionalMetrics, SampledDataSet
+from newrelic.core.stats_engine import (
+    CustomMetrics,
+    DimensionalMetrics,
+    SampledDataSet,
+    create_log_event,
+)
 from newrelic.core.thread_utilization import utilization_tracker
 from newrelic.core.trace_cache import (
     TraceCacheActiveTraceError,
@@ -211,6 +214,16 @@ class Transaction(object):
 
         self._trace_node_count = 0
 
+        # Time metrics of function traces aggregated in place of nodes
+        # when sampling only tracing is enabled. The deadline is computed
+        # when the first trace completes. Traces ending after it create
+        # nodes, unless some were already aggregated, as the transaction
+        # may still be reported as a transaction trace.
+
+        self._function_stats = {}
+        self._aggregation_deadline = None
+        self._aggregation_requires_unsampled = False
+
         self._errors = []
         self._slow_sql = []
 
@@ -309,7 +322,6 @@ class Transaction(object):
         self.synthetics_header = None
 
         self._custom_metrics = CustomMetrics()
-        self._dimensional_metrics = DimensionalMetrics()
 
         global_settings = application.global_settings
 
@@ -329,6 +341,8 @@ class Transaction(object):
                 if self._settings:
                     self.enabled = True
 
+        self._dimensional_metrics = DimensionalMetrics(self._settings)
+
         if self._settings:
             self._custom_events = SampledDataSet(
                 capacity=self._settings.event_harvest_config.harvest_limits.custom_event_data
@@ -625,6 +639,7 @@ class Transaction(object):
             trace_id=self.trace_id,
             loop_time=self._loop_time,
             root=root_node,
+            function_stats=self._function_stats,
         )
 
         # Clear settings as we are all done and don't need it
@@ -1503,31 +1518,15 @@ class Transaction(object):
         self._name = name
 
     def record_log_event(self, message, level=None, timestamp=None, priority=None):
-        settings = self.settings
-        if not (
-            settings
-            and settings.application_logging
-            and settings.application_logging.enabled
-            and settings.application_logging.forwarding
-            and settings.application_logging.forwarding.enabled
-        ):
-            return
+        event = create_log_event(self.settings, message, level, timestamp)
 
-        timestamp = timestamp if timestamp is not None else time.time()
-        level = str(level) if level is not None else "UNKNOWN"
+        if event is not None:
+            self._log_events.add(event, priority=priority)
 
-        if not message or message.isspace():
-            _logger.debug("record_log_event called where message was missing. No log event will be sent.")
-            return
-
-        message = truncate(message, MAX_LOG_MESSAGE_LENGTH)
-
-        event = LogEventNode(
-            timestamp=timestamp,
-            level=level,
-            message=message,
-            attributes=get_linking_metadata(),
-        )
+    def _record_log_event_node(self, event, priority=None):
+        # Records a log event already created with create_log_event(), as
+        # done by the logging instrumentation which looks up the linking
+        # metadata for a log record only once.
 
         self._log_events.add(event, priority=priority)
 
@@ -1626,6 +1625,9 @@ class Transaction(object):
 
             self._dimensional_metrics.record_dimensional_metric(name, value, tags)
 
+    def record_dimensional_distribution(self, name, value, tags=None):
+        self._dimensional_metrics.record_dimensional_distribution(name, value, tags)
+
     def record_custom_event(self, event_type, params):
         settings = self._settings
 
@@ -1655,6 +1657,75 @@ class Transaction(object):
     def _intern_string(self, value):
         return self._string_cache.setdefault(value, value)
 
+    def _aggregate_trace(self, trace):
+        """Returns whether the time metrics of a completed trace can be
+        aggregated in place of creating a node for it. Nodes are only
+        required where the transaction is sampled for span events or may
+        be reported as a transaction trace.
+
+        """
+
+        # Once a trace has been aggregated the transaction can no longer
+        # be reported as a transaction trace, and was found not to be
+        # sampled for span events, so no further nodes are required.
+
+        if self._function_stats:
+            return True
+
+        deadline = self._aggregation_deadline
+        if deadline is None:
+            deadline = self._aggregation_deadline = self._compute_aggregation_deadline()
+
+        if trace.end_time >= deadline:
+            return False
+
+        if self._aggregation_requires_unsampled:
+            if self._sampled is None:
+                # Whether the transaction is sampled may still be set by
+                # accepting an inbound distributed trace, so nodes must
+                # be created until that is no longer possible.
+
+                if not self._distributed_trace_state:
+                    return False
+
+                self._compute_sampled_and_priority()
+
+            return not self._sampled
+
+        return True
+
+    def _compute_aggregation_deadline(self):
+        settings = self._settings
+
+        if not settings or not settings.sampling_only_tracing.enabled:
+            return 0.0
+
+        # Synthetics and CAT transactions requesting a trace are always
+        # reported as a transaction trace.
+
+        if self.record_tt or self.synthetics_resource_id:
+            return 0.0
+
+        if settings.distributed_tracing.enabled and settings.span_events.enabled and settings.collect_span_events:
+            # Infinite tracing sends span events for all transactions.
+            if settings.infinite_tracing.enabled:
+                return 0.0
+
+            self._aggregation_requires_unsampled = True
+
+        if settings.collect_traces and settings.transaction_tracer.enabled:
+            threshold = settings.transaction_tracer.transaction_threshold
+
+            # The apdex of the transaction is not known until its name is
+            # frozen, so the smallest that could apply is used.
+
+            if threshold is None:
+                threshold = min([settings.apdex_t] + list(settings.web_transactions_apdex.values())) * 4
+
+            return self.start_time + threshold
+
+        return float("inf")
+
     def _process_node(self, node):
         self._trace_node_count += 1
         node.node_count = self._trace_node_count
@@ -1965,6 +2036,33 @@ def record_dimensional_metric(name, value, tags=None, application=None):
         application.record_dimensional_metric(name, value, tags)
 
 
+def record_dimensional_distribution(name, value, tags=None, application=None):
+    """Records a value, or an iterable of values, into a distribution metric.
+    The distribution is kept as an exponential histogram and reported as an
+    OTLP exponential histogram, allowing quantiles such as p50 and p99 to be
+    derived across all of the values recorded in a harvest. A metric name
+    and tags recorded as a distribution should not also be recorded with
+    record_dimensional_metric().
+    """
+    if application is None:
+        transaction = current_transaction()
+        if transaction:
+            transaction.record_dimensional_distribution(name, value, tags)
+        else:
+            _logger.debug(
+                "record_dimensional_distribution has been called but no "
+                "transaction was running. As a result, the following metric "
+                "has not been recorded. Name: %r Value: %r Tags: %r. To correct this "
+                "problem, supply an application object as a parameter to this "
+                "record_dimensional_distribution call.",
+                name,
+                value,
+                tags,
+            )
+    elif application.enabled:
+        application.record_dimensional_distribution(name, value, tags)
+
+
 def record_dimensional_metrics(metrics, application=None):
     if application is None:
         transaction = current_transaction()
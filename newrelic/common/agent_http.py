@@ -16,6 +16,7 @@ from __future__ import print_function
 
 import os
 import sys
+import threading
 import time
 import zlib
 from pprint import pprint
@@ -93,6 +94,7 @@ class BaseClient(object):
         max_payload_size_in_bytes=1000000,
         audit_log_fp=None,
         default_content_encoding_header="Identity",
+        max_connections=1,
     ):
         self._audit_log_fp = audit_log_fp
 
@@ -109,12 +111,14 @@ class BaseClient(object):
         pass
 
     @staticmethod
-    def _supportability_request(params, payload, body, compression_time):
+    def _supportability_request(params, payload, body, compression_time, payload_size=None):
         pass
 
     @classmethod
-    def log_request(cls, fp, method, url, params, payload, headers, body=None, compression_time=None):
-        cls._supportability_request(params, payload, body, compression_time)
+    def log_request(
+        cls, fp, method, url, params, payload, headers, body=None, compression_time=None, payload_size=None
+    ):
+        cls._supportability_request(params, payload, body, compression_time, payload_size)
 
         if not fp:
             return
@@ -216,6 +220,7 @@ class BaseClient(object):
 
 class HttpClient(BaseClient):
     CONNECTION_CLS = urllib3.HTTPSConnectionPool
+    STREAM_CHUNK_SIZE = 64 * 1024
     PREFIX_SCHEME = "https://"
     BASE_HEADERS = urllib3.make_headers(keep_alive=True, accept_encoding=True, user_agent=USER_AGENT)
 
@@ -237,6 +242,7 @@ class HttpClient(BaseClient):
         max_payload_size_in_bytes=1000000,
         audit_log_fp=None,
         default_content_encoding_header="Identity",
+        max_connections=1,
     ):
         self._host = host
         port = self._port = port
@@ -252,6 +258,7 @@ class HttpClient(BaseClient):
         self._headers = dict(self.BASE_HEADERS)
         self._connection_kwargs = connection_kwargs = {
             "timeout": timeout,
+            "maxsize": max_connections,
         }
         self._urlopen_kwargs = urlopen_kwargs = {}
 
@@ -299,6 +306,7 @@ class HttpClient(BaseClient):
         self._proxy = proxy
 
         self._connection_attr = None
+        self._connection_lock = threading.Lock()
 
     @staticmethod
     def _parse_proxy(scheme, host, port, username, password):
@@ -341,10 +349,16 @@ class HttpClient(BaseClient):
         if self._connection_attr:
             return self._connection_attr
 
-        retries = urllib3.Retry(total=False, connect=None, read=None, redirect=0, status=None)
-        self._connection_attr = self.CONNECTION_CLS(
-            self._host, self._port, strict=True, retries=retries, **self._connection_kwargs
-        )
+        # The harvest sender may send requests from several threads, so
+        # the connection pool must only be created once.
+        with self._connection_lock:
+            if self._connection_attr:
+                return self._connection_attr
+
+            retries = urllib3.Retry(total=False, connect=None, read=None, redirect=0, status=None)
+            self._connection_attr = self.CONNECTION_CLS(
+                self._host, self._port, strict=True, retries=retries, **self._connection_kwargs
+            )
         return self._connection_attr
 
     def close_connection(self):
@@ -362,11 +376,14 @@ class HttpClient(BaseClient):
         headers,
         body=None,
         compression_time=None,
+        payload_size=None,
     ):
         if not self._prefix:
             url = self.CONNECTION_CLS.scheme + "://" + self._host + url
 
-        return super(HttpClient, self).log_request(fp, method, url, params, payload, headers, body, compression_time)
+        return super(HttpClient, self).log_request(
+            fp, method, url, params, payload, headers, body, compression_time, payload_size
+        )
 
     @staticmethod
     def _compress(data, method="gzip", level=None):
@@ -382,6 +399,71 @@ class HttpClient(BaseClient):
 
         return data, compression_time
 
+    def _compress_chunks(self, chunks):
+        # Consumes an iterable of encoded payload chunks, feeding them to
+        # the compressor in batches once the compression threshold has
+        # been crossed. Encoding stops as soon as the body is known to
+        # exceed the maximum payload size, in which case the partial body
+        # is returned so the size check in send_request() rejects it. The
+        # uncompressed payload is only retained when audit logging.
+        threshold = self._compression_threshold
+        max_size = self._max_payload_size_in_bytes
+        audit_chunks = [] if self._audit_log_fp else None
+
+        compressor = None
+        compression_time = None
+        payload_size = 0
+        pending = []
+        pending_size = 0
+        body = []
+        body_size = 0
+
+        for chunk in chunks:
+            payload_size += len(chunk)
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if audit_chunks is not None:
+                audit_chunks.append(chunk)
+
+            if compressor is None:
+                if payload_size > threshold:
+                    level = self._compression_level or zlib.Z_DEFAULT_COMPRESSION
+                    wbits = 31 if self._compression_method == "gzip" else 15
+                    compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+                    compression_time = 0.0
+                elif payload_size > max_size:
+                    body = pending
+                    break
+                else:
+                    continue
+
+            if pending_size < self.STREAM_CHUNK_SIZE:
+                continue
+
+            compression_start = time.time()
+            data = compressor.compress(b"".join(pending))
+            compression_time += max(time.time(), compression_start) - compression_start
+            pending = []
+            pending_size = 0
+
+            if data:
+                body.append(data)
+                body_size += len(data)
+                if body_size > max_size:
+                    break
+        else:
+            if compressor is not None:
+                compression_start = time.time()
+                body.append(compressor.compress(b"".join(pending)))
+                body.append(compressor.flush())
+                compression_time += max(time.time(), compression_start) - compression_start
+            else:
+                body = pending
+
+        payload = b"".join(audit_chunks) if audit_chunks is not None else None
+
+        return payload, b"".join(body), payload_size, compression_time
+
     def send_request(
         self,
         method="POST",
@@ -402,13 +484,18 @@ class HttpClient(BaseClient):
         path = self._prefix + path
         body = payload
         compression_time = None
+        payload_size = None
         if payload is not None:
-            if len(payload) > self._compression_threshold:
+            if not isinstance(payload, bytes):
+                payload, body, payload_size, compression_time = self._compress_chunks(payload)
+            elif len(payload) > self._compression_threshold:
                 body, compression_time = self._compress(
                     payload,
                     method=self._compression_method,
                     level=self._compression_level,
                 )
+
+            if compression_time is not None:
                 merged_headers["Content-Encoding"] = self._compression_method
             elif self._default_content_encoding_header:
                 merged_headers["Content-Encoding"] = self._default_content_encoding_header
@@ -422,6 +509,7 @@ class HttpClient(BaseClient):
             merged_headers,
             body,
             compression_time,
+            payload_size,
         )
 
         if body and len(body) > self._max_payload_size_in_bytes:
@@ -478,6 +566,7 @@ class InsecureHttpClient(HttpClient):
         max_payload_size_in_bytes=1000000,
         audit_log_fp=None,
         default_content_encoding_header="Identity",
+        max_connections=1,
     ):
         proxy = self._parse_proxy(proxy_scheme, proxy_host, None, None, None)
         if proxy and proxy.scheme == "https":
@@ -505,21 +594,25 @@ class InsecureHttpClient(HttpClient):
             max_payload_size_in_bytes,
             audit_log_fp,
             default_content_encoding_header,
+            max_connections,
         )
 
 
 class SupportabilityMixin(object):
     @staticmethod
-    def _supportability_request(params, payload, body, compression_time):
+    def _supportability_request(params, payload, body, compression_time, payload_size=None):
         # *********
         # Used only for supportability metrics. Do not use to drive business
         # logic!
         # payload: uncompressed
         # body: compressed
+        # payload_size: uncompressed size when the payload was streamed
         agent_method = params and params.get("method")
+        if payload_size is None:
+            payload_size = len(payload) if payload else 0
         # *********
 
-        if agent_method and payload:
+        if agent_method and payload_size:
             # Compression was applied
             if compression_time is not None:
                 internal_metric(
@@ -533,10 +626,10 @@ class SupportabilityMixin(object):
                 )
             internal_metric(
                 "Supportability/Python/Collector/%s/Output/Bytes" % agent_method,
-                len(payload),
+                payload_size,
             )
             # Top level metric to aggregate overall bytes being sent
-            internal_metric("Supportability/Python/Collector/Output/Bytes", len(payload))
+            internal_metric("Supportability/Python/Collector/Output/Bytes", payload_size)
 
     @staticmethod
     def _supportability_response(status, exc, connection="direct"):
@@ -608,6 +701,9 @@ class DeveloperModeClient(SupportabilityMixin, BaseClient):
         headers=None,
         payload=None,
     ):
+        if payload is not None and not isinstance(payload, bytes):
+            payload = b"".join(payload)
+
         request_id = self.log_request(
             self._audit_log_fp,
             "POST",
@@ -649,13 +745,19 @@ class ServerlessModeClient(DeveloperModeClient):
         headers=None,
         payload=None,
     ):
+        if payload is not None and not isinstance(payload, bytes):
+            payload = b"".join(payload)
+
         result = super(ServerlessModeClient, self).send_request(
             method=method, path=path, params=params, headers=headers, payload=payload
         )
 
         if result[0] == 200:
+            # The payload is kept as the encoded JSON so that it can be
+            # spliced into the final serverless envelope without being
+            # decoded and encoded again.
             agent_method = params["method"]
-            self.payload[agent_method] = json_decode(payload.decode("utf-8"))
+            self.payload[agent_method] = payload
 
         return result
 
@@ -105,6 +105,45 @@ def json_encode(obj, **kwargs):
     return json.dumps(obj, **_kwargs)
 
 
+def json_encode_chunks(obj, depth=2, batch_size=100, **kwargs):
+    # Incremental variant of json_encode(). Lists, tuples and generators
+    # down to the given nesting depth are expanded one element at a time,
+    # with elements below that depth encoded by json_encode() in batches
+    # of batch_size, so that only a small part of a large payload is ever
+    # held as a string. Joining the yielded chunks gives the same output
+    # as json_encode() for the same object.
+
+    if depth <= 0 or not isinstance(obj, (list, tuple, types.GeneratorType)):
+        yield json_encode(obj, **kwargs)
+        return
+
+    separator = '['
+
+    if depth == 1:
+        batch = []
+        for item in obj:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield separator + json_encode(batch, **kwargs)[1:-1]
+                separator = ','
+                batch = []
+        if batch:
+            yield separator + json_encode(batch, **kwargs)[1:-1]
+            separator = ','
+    else:
+        for item in obj:
+            chunks = json_encode_chunks(item, depth - 1, batch_size, **kwargs)
+            yield separator + next(chunks)
+            for chunk in chunks:
+                yield chunk
+            separator = ','
+
+    if separator == '[':
+        yield '[]'
+    else:
+        yield ']'
+
+
 def json_decode(s, **kwargs):
     # Nothing special to do here at this point but use a wrapper to be
     # consistent with encoding and allow for changes later.
@@ -355,6 +394,24 @@ def serverless_payload_encode(payload):
     return encoded_data
 
 
+def serverless_payload_encode_chunks(chunks):
+    """This method takes an iterable of string or UTF-8 chunks which
+    together make up a valid JSON document. The chunks are gzip compressed
+    as they are consumed, so the complete document is never assembled in
+    memory, and the compressed data is then base64 encoded.
+
+    """
+    compressed_data = io.BytesIO()
+
+    with gzip.GzipFile(fileobj=compressed_data, mode='wb') as f:
+        for chunk in chunks:
+            if not isinstance(chunk, bytes):
+                chunk = chunk.encode('utf-8')
+            f.write(chunk)
+
+    return base64.b64encode(compressed_data.getvalue())
+
+
 def ensure_str(s):
     if not isinstance(s, six.string_types):
         try:
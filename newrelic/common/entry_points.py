@@ -0,0 +1,261 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module implements discovery of the entry points used to extend the
+agent. Entry points are read using importlib.metadata where available,
+falling back to pkg_resources, and can optionally be cached on disk so that
+later processes started against the same set of installed packages can skip
+scanning the installed distributions altogether.
+
+"""
+
+import hashlib
+import json
+import logging
+import os
+import stat
+import sys
+import tempfile
+
+_logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUPS = ("newrelic.hooks", "newrelic.extension")
+
+_CACHE_FORMAT = 1
+
+_entry_points = None
+
+
+def _parse_entry_point_value(value):
+    # Entry point values are of the form "module:attr.attr [extras]", with
+    # the attribute path and extras being optional.
+
+    module, _, attrs = value.partition(":")
+    attrs = attrs.split("[", 1)[0].strip()
+
+    return module.strip(), attrs
+
+
+def _discover_with_importlib(groups):
+    from importlib import metadata
+
+    all_entry_points = metadata.entry_points()
+
+    result = {}
+
+    for group in groups:
+        if hasattr(all_entry_points, "select"):
+            selected = all_entry_points.select(group=group)
+        else:
+            selected = all_entry_points.get(group, ())
+
+        result[group] = [(entrypoint.name,) + _parse_entry_point_value(entrypoint.value) for entrypoint in selected]
+
+    return result
+
+
+def _discover_with_pkg_resources(groups):
+    import pkg_resources
+
+    result = {}
+
+    for group in groups:
+        result[group] = [
+            (entrypoint.name, entrypoint.module_name, ".".join(entrypoint.attrs))
+            for entrypoint in pkg_resources.iter_entry_points(group=group)
+        ]
+
+    return result
+
+
+def _discover(groups):
+    try:
+        return _discover_with_importlib(groups)
+    except ImportError:
+        pass
+
+    try:
+        return _discover_with_pkg_resources(groups)
+    except ImportError:
+        pass
+
+    return dict((group, []) for group in groups)
+
+
+def sys_path_key(path=None, exclude=None):
+    """Returns a key identifying the set of installed distributions visible
+    on sys.path. The key is derived from each sys.path entry together with
+    its modification time, which changes whenever a distribution is added
+    to or removed from that directory. The modification time of the
+    exclude directory, usually where the cache itself is written, is
+    ignored so writing the cache does not invalidate it.
+
+    """
+
+    if exclude is not None:
+        exclude = os.path.realpath(exclude)
+
+    entries = []
+
+    for entry in sys.path if path is None else path:
+        try:
+            if exclude is not None and os.path.realpath(entry or os.curdir) == exclude:
+                mtime = None
+            else:
+                mtime = os.stat(entry or os.curdir).st_mtime
+        except (OSError, TypeError, ValueError):
+            mtime = None
+
+        entries.append((entry, mtime))
+
+    key = repr((_CACHE_FORMAT, sys.executable, sys.version, entries))
+
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()  # nosec
+
+
+def _is_trusted(status):
+    # Cache files list modules which are imported and called, so only files
+    # and directories owned by the current user and not writable by anyone
+    # else are trusted. Platforms without user ids have no such checks.
+
+    if not hasattr(os, "getuid"):
+        return True
+
+    return status.st_uid == os.getuid() and not status.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def _default_cache_directory():
+    """Returns a directory private to the current user within the system
+    temporary directory, creating it if necessary, or None if it is not
+    owned by the current user or can be written to by other users.
+
+    """
+
+    user = os.getuid() if hasattr(os, "getuid") else "user"
+    directory = os.path.join(tempfile.gettempdir(), "newrelic-entry-points-%s" % user)
+
+    try:
+        os.mkdir(directory, 0o700)
+    except OSError:
+        pass
+
+    try:
+        status = os.lstat(directory)
+    except OSError:
+        return None
+
+    if not stat.S_ISDIR(status.st_mode) or not _is_trusted(status):
+        _logger.debug("Ignoring entry points cache directory %r as it is not private to the current user.", directory)
+        return None
+
+    return directory
+
+
+def _cache_file(directory, key):
+    return os.path.join(directory, "newrelic-entry-points-%s.json" % key)
+
+
+def _read_cache(filename, groups):
+    try:
+        with open(filename) as cache:
+            if not _is_trusted(os.fstat(cache.fileno())):
+                _logger.debug(
+                    "Ignoring entry points cache file %r as it is not owned by the current user or is writable "
+                    "by other users.",
+                    filename,
+                )
+                return None
+
+            data = json.load(cache)
+
+    except (IOError, OSError, ValueError):
+        return None
+
+    if not isinstance(data, dict) or data.get("format") != _CACHE_FORMAT:
+        return None
+
+    entry_points = data.get("entry_points")
+
+    if not isinstance(entry_points, dict) or any(group not in entry_points for group in groups):
+        return None
+
+    return dict((group, [tuple(item) for item in entry_points[group]]) for group in groups)
+
+
+def _write_cache(filename, entry_points):
+    # The cache is written to a temporary file first and then moved into
+    # place so concurrently starting processes never see a partial file.
+
+    data = {"format": _CACHE_FORMAT, "entry_points": entry_points}
+
+    try:
+        fd, temporary = tempfile.mkstemp(prefix=".newrelic-entry-points-", dir=os.path.dirname(filename))
+
+        try:
+            with os.fdopen(fd, "w") as cache:
+                json.dump(data, cache)
+
+            os.rename(temporary, filename)
+
+        except Exception:
+            os.unlink(temporary)
+            raise
+
+    except Exception:
+        _logger.debug("Unable to write entry points cache file %r.", filename, exc_info=True)
+
+
+def entry_points(group, cache_enabled=False, cache_directory=None):
+    """Returns a list of (name, module, attrs) tuples for the entry points
+    registered under the given group. All agent entry point groups are
+    discovered together the first time this is called and the result is
+    reused for the life of the process.
+
+    When cache_enabled is true the result of discovery is also stored in a
+    file within cache_directory, keyed on the current sys.path. Later
+    processes with an identical sys.path read that file instead of scanning
+    distributions. The directory defaults to one private to the current
+    user within the system temporary directory. Cache files not owned by
+    the current user, or writable by other users, are ignored.
+
+    """
+
+    global _entry_points
+
+    if _entry_points is None:
+        groups = ENTRY_POINT_GROUPS
+        filename = None
+        discovered = None
+
+        if cache_enabled:
+            directory = cache_directory or _default_cache_directory()
+
+            if directory is not None:
+                filename = _cache_file(directory, sys_path_key(exclude=directory))
+                discovered = _read_cache(filename, groups)
+
+        if discovered is None:
+            discovered = _discover(groups)
+
+            if filename is not None:
+                _write_cache(filename, discovered)
+
+        _entry_points = discovered
+
+    return _entry_points.get(group, [])
+
+
+def _reset_entry_points():
+    global _entry_points
+    _entry_points = None
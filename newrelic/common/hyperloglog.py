@@ -0,0 +1,82 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module implements a HyperLogLog estimator for approximately
+counting the number of distinct values seen, using a fixed amount of
+memory regardless of how many values are added.
+
+"""
+
+import math
+
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+
+
+def _hash64(value):
+    # The builtin hash is mixed with the splitmix64 finalizer so that
+    # values with poorly distributed hashes, such as small integers, are
+    # still spread evenly over the registers. As the builtin hash of
+    # strings is randomized per process, estimators can only be merged
+    # with others from the same process.
+
+    z = (hash(value) + 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+
+class HyperLogLog(object):
+    """Estimates the number of distinct hashable values added to it. With
+    the default precision the estimator uses 1024 single byte registers
+    and has a standard error of about 3%.
+
+    """
+
+    def __init__(self, precision=10):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        x = _hash64(value)
+        bits = 64 - self.precision
+        index = x >> bits
+        rank = bits - (x & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """Merge in the values seen by another estimator of the same
+        precision.
+
+        """
+
+        registers = self.registers
+        for index, rank in enumerate(other.registers):
+            if rank > registers[index]:
+                registers[index] = rank
+
+    def estimate(self):
+        registers = self.registers
+        m = len(registers)
+        alpha = 0.7213 / (1.0 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0**-rank for rank in registers)
+
+        # Small cardinalities are estimated using linear counting of the
+        # registers which are still empty.
+
+        zeros = registers.count(0)
+        if zeros and estimate <= 2.5 * m:
+            estimate = m * math.log(float(m) / zeros)
+
+        return int(round(estimate))
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import collections
+import heapq
 import logging
 import threading
 
@@ -25,15 +26,45 @@ except:
 _logger = logging.getLogger(__name__)
 
 
+# When the stream buffer is full, the drop policy decides which spans are
+# lost. The oldest policy discards the spans which have been waiting the
+# longest, the newest policy refuses new spans and the priority policy
+# discards the spans of the transactions with the lowest priority.
+
+DROP_POLICIES = ("oldest", "newest", "priority")
+
+
 class StreamBuffer(object):
-    def __init__(self, maxlen, batching=False):
-        self._queue = collections.deque(maxlen=maxlen)
+    def __init__(self, maxlen, batching=False, drop_policy="oldest"):
+        if drop_policy not in DROP_POLICIES:
+            _logger.warning(
+                "Unknown infinite tracing span queue drop policy %r. The oldest spans will be dropped instead.",
+                drop_policy,
+            )
+            drop_policy = "oldest"
+
+        self.maxlen = maxlen
+        self.drop_policy = drop_policy
+
+        self._queue = collections.deque(maxlen=maxlen if drop_policy == "oldest" else None)
         self._notify = self.condition()
         self._shutdown = False
         self._seen = 0
         self._dropped = 0
         self._settings = None
 
+        # Only used by the priority drop policy. Each transaction's spans
+        # are kept as a group of [priority, position, spans], where the
+        # position is the count of spans queued before the group. Spans
+        # which are dropped remain in the queue but are skipped when the
+        # queue is consumed.
+
+        self._groups = []
+        self._pending_groups = collections.deque()
+        self._evicted = set()
+        self._head = 0
+        self._tail = 0
+
         self.batching = batching
 
     @staticmethod
@@ -45,23 +76,165 @@ class StreamBuffer(object):
             self._shutdown = True
             self._notify.notify_all()
 
-    def put(self, item):
+    def put(self, item, priority=None):
+        if self.drop_policy == "priority":
+            return self.put_many((item,), priority)
+
         with self._notify:
             if self._shutdown:
                 return
 
             self._seen += 1
 
+            # The consumer only waits when the queue is empty, so it only
+            # needs to be woken when this is the first item added.
+            empty = not self._queue
+
             # NOTE: dropped can be over-counted as the queue approaches
             # capacity while data is still being transmitted.
             #
             # This is because the length of the queue can be changing as it's
             # being measured.
-            if len(self._queue) >= self._queue.maxlen:
+            if len(self._queue) >= self.maxlen:
                 self._dropped += 1
+                if self.drop_policy == "newest":
+                    return
 
             self._queue.append(item)
-            self._notify.notify_all()
+
+            if empty:
+                self._notify.notify_all()
+
+    def put_many(self, items, priority=None):
+        # Build the list of items before acquiring the lock, as the items
+        # may be generated as they are iterated over.
+
+        items = list(items)
+
+        if not items:
+            return
+
+        with self._notify:
+            if self._shutdown:
+                return
+
+            self._seen += len(items)
+
+            empty = not self
+
+            if self.drop_policy == "oldest":
+                overflow = len(self._queue) + len(items) - self.maxlen
+                if overflow > 0:
+                    self._dropped += overflow
+
+                self._queue.extend(items)
+
+            elif self.drop_policy == "newest":
+                space = max(self.maxlen - len(self._queue), 0)
+                if len(items) > space:
+                    self._dropped += len(items) - space
+                    items = items[:space]
+
+                self._queue.extend(items)
+
+            else:
+                self._put_by_priority(items, priority or 0.0)
+
+            if empty and self:
+                self._notify.notify_all()
+
+    def _put_by_priority(self, items, priority):
+        if len(items) > self.maxlen:
+            self._dropped += len(items) - self.maxlen
+            items = items[: self.maxlen]
+
+        self._release_sent_groups()
+
+        # Make room by dropping the most recent spans of the queued
+        # transactions with a lower priority, lowest priority first. If
+        # there still isn't enough room, the spans which don't fit are
+        # dropped.
+
+        groups = self._groups
+        needed = len(self) + len(items) - self.maxlen
+
+        while needed > 0 and groups:
+            group = groups[0]
+            queued = len(group[2]) - max(self._head - group[1], 0)
+
+            if queued <= 0:
+                heapq.heappop(groups)
+                continue
+
+            if group[0] >= priority:
+                break
+
+            count = min(queued, needed)
+            spans = group[2]
+            for span in spans[len(spans) - count :]:
+                self._evicted.add(id(span))
+
+            group[2] = spans[: len(spans) - count]
+            if count == queued:
+                heapq.heappop(groups)
+
+            self._dropped += count
+            needed -= count
+
+        if needed > 0:
+            self._dropped += needed
+            items = items[: len(items) - needed]
+
+        if items:
+            group = [priority, self._tail, items]
+            heapq.heappush(groups, group)
+            self._pending_groups.append(group)
+
+            self._tail += len(items)
+            self._queue.extend(items)
+
+    def _release_sent_groups(self):
+        # Forget the groups of spans which have since been sent, so that
+        # the spans are not kept alive by the heap of groups.
+
+        pending = self._pending_groups
+        while pending and pending[0][1] + len(pending[0][2]) <= self._head:
+            pending.popleft()[2] = ()
+
+        if len(self._groups) > 2 * len(pending):
+            self._groups = [group for group in self._groups if group[2]]
+            heapq.heapify(self._groups)
+
+    def _popleft(self):
+        # Raises IndexError when the queue is empty.
+
+        while True:
+            item = self._queue.popleft()
+            self._head += 1
+
+            if not self._evicted or id(item) not in self._evicted:
+                return item
+
+            self._evicted.discard(id(item))
+
+    def _popmany(self, limit):
+        if not self._evicted and len(self._queue) <= limit:
+            # For small batches empty the queue into a list and clear it.
+            # This is only safe to do under lock which prevents items
+            # being added to the queue.
+            items = list(self._queue)
+            self._queue.clear()
+            self._head += len(items)
+            return items
+
+        items = []
+        try:
+            while len(items) < limit:
+                items.append(self._popleft())
+        except IndexError:
+            pass
+
+        return items
 
     def stats(self):
         with self._notify:
@@ -71,10 +244,10 @@ class StreamBuffer(object):
         return seen, dropped
 
     def __bool__(self):
-        return bool(self._queue)
+        return len(self._queue) > len(self._evicted)
 
     def __len__(self):
-        return len(self._queue)
+        return len(self._queue) - len(self._evicted)
 
     def __iter__(self):
         return StreamBufferIterator(self)
@@ -114,24 +287,17 @@ class StreamBufferIterator(object):
                     raise StopIteration
 
                 if self.batching:
-                    stream_buffer_len = len(self.stream_buffer)
-                    if stream_buffer_len > self.MAX_BATCH_SIZE:
-                        # Ensure batch size is never more than 100 to prevent issues with serializing large numbers
-                        # of spans causing their age to exceed 10 seconds. That would cause them to be rejected
-                        # by the trace observer.
-                        batch = [self.stream_buffer._queue.popleft() for _ in range(self.MAX_BATCH_SIZE)]
-                        return SpanBatch(spans=batch)
-                    elif stream_buffer_len:
-                        # For small span batches empty stream buffer into list and clear queue.
-                        # This is only safe to do under lock which prevents items being added to the queue.
-                        batch = list(self.stream_buffer._queue)
-                        self.stream_buffer._queue.clear()
+                    # Ensure batch size is never more than 100 to prevent issues with serializing large numbers
+                    # of spans causing their age to exceed 10 seconds. That would cause them to be rejected
+                    # by the trace observer.
+                    batch = self.stream_buffer._popmany(self.MAX_BATCH_SIZE)
+                    if batch:
                         return SpanBatch(spans=batch)
 
                 else:
                     # Send items from stream buffer one at a time.
                     try:
-                        return self.stream_buffer._queue.popleft()
+                        return self.stream_buffer._popleft()
                     except IndexError:
                         pass
 
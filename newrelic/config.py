@@ -42,6 +42,7 @@ import newrelic.api.wsgi_application
 import newrelic.console
 import newrelic.core.agent
 import newrelic.core.config
+from newrelic.common.entry_points import entry_points
 from newrelic.common.log_file import initialize_logging
 from newrelic.common.object_names import expand_builtin_exception_name
 from newrelic.core import trace_cache
@@ -59,9 +60,11 @@ _logger = logging.getLogger(__name__)
 
 # Register our importer which implements post import hooks for
 # triggering of callbacks to monkey patch modules before import
-# returns them to caller.
+# returns them to caller. The importer removes itself from
+# sys.meta_path once all registered import hooks have fired and is
+# installed again when further import hooks are registered.
 
-sys.meta_path.insert(0, newrelic.api.import_hook.ImportHookFinder())
+newrelic.api.import_hook.install_import_hook_finder()
 
 # The set of valid feature flags that the agent currently uses.
 # This will be used to validate what is provided and issue warnings
@@ -355,6 +358,9 @@ def _process_configuration(section):
     _process_setting(section, "transaction_name.naming_scheme", "get", None)
     _process_setting(section, "gc_runtime_metrics.enabled", "getboolean", None)
     _process_setting(section, "gc_runtime_metrics.top_object_count_limit", "getint", None)
+    _process_setting(section, "gc_runtime_metrics.census_mode", "get", None)
+    _process_setting(section, "gc_runtime_metrics.census_time_budget", "getfloat", None)
+    _process_setting(section, "gc_runtime_metrics.census_sample_rate", "getfloat", None)
     _process_setting(section, "thread_profiler.enabled", "getboolean", None)
     _process_setting(section, "transaction_tracer.enabled", "getboolean", None)
     _process_setting(
@@ -482,6 +488,9 @@ def _process_configuration(section):
     _process_setting(section, "agent_limits.synthetics_transactions", "getint", None)
     _process_setting(section, "agent_limits.data_compression_threshold", "getint", None)
     _process_setting(section, "agent_limits.data_compression_level", "getint", None)
+    _process_setting(section, "agent_limits.rules_engine_cache_size", "getint", None)
+    _process_setting(section, "agent_limits.attribute_filter_cache_size", "getint", None)
+    _process_setting(section, "agent_limits.sql_statement_cache_size", "getint", None)
     _process_setting(section, "console.listener_socket", "get", _map_console_listener_socket)
     _process_setting(section, "console.allow_interpreter_cmd", "getboolean", None)
     _process_setting(section, "debug.disable_api_supportability_metrics", "getboolean", None)
@@ -528,6 +537,28 @@ def _process_configuration(section):
     _process_setting(section, "heroku.use_dyno_names", "getboolean", None)
     _process_setting(section, "heroku.dyno_name_prefixes_to_shorten", "get", _map_split_strings)
     _process_setting(section, "serverless_mode.enabled", "getboolean", None)
+    _process_setting(section, "sampling_only_tracing.enabled", "getboolean", None)
+    _process_setting(section, "sharded_stats.enabled", "getboolean", None)
+    _process_setting(section, "thread_local_metrics.enabled", "getboolean", None)
+    _process_setting(section, "compact_stats.enabled", "getboolean", None)
+    _process_setting(section, "streaming_payloads.enabled", "getboolean", None)
+    _process_setting(section, "harvest_sender.enabled", "getboolean", None)
+    _process_setting(section, "harvest_sender.max_workers", "getint", None)
+    _process_setting(section, "harvest_sender.max_queue_size", "getint", None)
+    _process_setting(section, "harvest_sender.max_retries", "getint", None)
+    _process_setting(section, "harvest_sender.retry_backoff", "getfloat", None)
+    _process_setting(section, "transaction_recorder.enabled", "getboolean", None)
+    _process_setting(section, "transaction_recorder.max_queue_size", "getint", None)
+    _process_setting(section, "explain_plan_executor.enabled", "getboolean", None)
+    _process_setting(section, "explain_plan_executor.time_budget", "getfloat", None)
+    _process_setting(section, "explain_plan_executor.plan_cache_size", "getint", None)
+    _process_setting(section, "explain_plan_executor.plan_cache_ttl", "getfloat", None)
+    _process_setting(section, "entry_points_cache.enabled", "getboolean", None)
+    _process_setting(section, "entry_points_cache.directory", "get", None)
+    _process_setting(section, "dimensional_metrics.max_series_per_metric", "getint", None)
+    _process_setting(section, "dimensional_metrics.max_series", "getint", None)
+    _process_setting(section, "sql_obfuscation.engine", "get", None)
+    _process_setting(section, "trace_cache.backend", "get", None)
     _process_setting(section, "apdex_t", "getfloat", None)
     _process_setting(section, "event_loop_visibility.enabled", "getboolean", None)
     _process_setting(section, "event_loop_visibility.blocking_threshold", "getfloat", None)
@@ -547,16 +578,19 @@ def _process_configuration(section):
     _process_setting(section, "infinite_tracing.compression", "getboolean", None)
     _process_setting(section, "infinite_tracing.batching", "getboolean", None)
     _process_setting(section, "infinite_tracing.span_queue_size", "getint", None)
+    _process_setting(section, "infinite_tracing.span_queue_drop_policy", "get", None)
     _process_setting(section, "code_level_metrics.enabled", "getboolean", None)
 
     _process_setting(section, "application_logging.enabled", "getboolean", None)
     _process_setting(section, "application_logging.forwarding.max_samples_stored", "getint", None)
     _process_setting(section, "application_logging.forwarding.enabled", "getboolean", None)
+    _process_setting(section, "application_logging.forwarding.buffer_size", "getint", None)
     _process_setting(section, "application_logging.metrics.enabled", "getboolean", None)
     _process_setting(section, "application_logging.local_decorating.enabled", "getboolean", None)
 
     _process_setting(section, "machine_learning.enabled", "getboolean", None)
     _process_setting(section, "machine_learning.inference_events_value.enabled", "getboolean", None)
+    _process_setting(section, "machine_learning.inference_events_sample_size", "getint", None)
 
 
 # Loading of configuration from specified file and for specified
@@ -1976,44 +2010,61 @@ def _process_function_profile_configuration():
 
 
 def _process_module_definition(target, module, function="instrument"):
-    enabled = True
-    execute = None
+    _process_module_definitions(((target, module, function),))
 
-    # XXX This check makes the following checks to see if import hook
-    # was defined in agent configuration file redundant. Leave it as is
-    # for now until can clean up whole configuration system.
 
-    if target in _module_import_hook_registry:
-        return
+def _process_module_definitions(definitions):
+    # Registers import hooks for a batch of (target, module, function)
+    # definitions in one pass. The import-hook sections of the agent
+    # configuration file are collected once for the whole batch rather
+    # than probing the configuration object for every definition.
 
-    try:
-        section = "import-hook:%s" % target
-        if _config_object.has_section(section):
-            enabled = _config_object.getboolean(section, "enabled")
-    except ConfigParser.NoOptionError:
-        pass
-    except Exception:
-        _raise_configuration_error(section)
+    sections = {}
 
-    try:
-        if _config_object.has_option(section, "execute"):
-            execute = _config_object.get(section, "execute")
+    for section in _config_object.sections():
+        if section.startswith("import-hook:"):
+            sections[section.split(":", 1)[1]] = section
 
-    except Exception:
-        _raise_configuration_error(section)
+    for target, module, function in definitions:
+        enabled = True
+        execute = None
 
-    try:
-        if enabled and not execute:
-            _module_import_hook_registry[target] = (module, function)
+        # XXX This check makes the following checks to see if import hook
+        # was defined in agent configuration file redundant. Leave it as is
+        # for now until can clean up whole configuration system.
 
-            _logger.debug("register module %s", (target, module, function))
+        if target in _module_import_hook_registry:
+            continue
 
-            newrelic.api.import_hook.register_import_hook(target, _module_import_hook(target, module, function))
+        section = sections.get(target)
 
-            _module_import_hook_results.setdefault((target, module, function), None)
+        if section is not None:
+            try:
+                enabled = _config_object.getboolean(section, "enabled")
+            except ConfigParser.NoOptionError:
+                pass
+            except Exception:
+                _raise_configuration_error(section)
 
-    except Exception:
-        _raise_instrumentation_error("import-hook", locals())
+            try:
+                if _config_object.has_option(section, "execute"):
+                    execute = _config_object.get(section, "execute")
+
+            except Exception:
+                _raise_configuration_error(section)
+
+        try:
+            if enabled and not execute:
+                _module_import_hook_registry[target] = (module, function)
+
+                _logger.debug("register module %s", (target, module, function))
+
+                newrelic.api.import_hook.register_import_hook(target, _module_import_hook(target, module, function))
+
+                _module_import_hook_results.setdefault((target, module, function), None)
+
+        except Exception:
+            _raise_instrumentation_error("import-hook", locals())
 
 
 ASYNCIO_HOOK = ("asyncio", "newrelic.core.trace_cache", "asyncio_loaded")
@@ -2021,6 +2072,8 @@ GREENLET_HOOK = ("greenlet", "newrelic.core.trace_cache", "greenlet_loaded")
 
 
 def _process_trace_cache_import_hooks():
+    trace_cache.set_trace_cache_backend(_settings.trace_cache.backend)
+
     _process_module_definition(*GREENLET_HOOK)
 
     if GREENLET_HOOK not in _module_import_hook_results:
@@ -2036,1940 +2089,759 @@ def _process_trace_cache_import_hooks():
         trace_cache.trace_cache().asyncio = False
 
 
-def _process_module_builtin_defaults():
-    _process_module_definition(
-        "asyncio.base_events",
-        "newrelic.hooks.coroutines_asyncio",
-        "instrument_asyncio_base_events",
-    )
-    _process_module_definition(
-        "asyncio.events",
-        "newrelic.hooks.coroutines_asyncio",
-        "instrument_asyncio_events",
-    )
-
-    _process_module_definition("asgiref.sync", "newrelic.hooks.adapter_asgiref", "instrument_asgiref_sync")
-
-    _process_module_definition(
-        "django.core.handlers.base",
-        "newrelic.hooks.framework_django",
-        "instrument_django_core_handlers_base",
-    )
-    _process_module_definition(
-        "django.core.handlers.asgi",
-        "newrelic.hooks.framework_django",
-        "instrument_django_core_handlers_asgi",
-    )
-    _process_module_definition(
-        "django.core.handlers.wsgi",
-        "newrelic.hooks.framework_django",
-        "instrument_django_core_handlers_wsgi",
-    )
-    _process_module_definition(
-        "django.core.urlresolvers",
-        "newrelic.hooks.framework_django",
-        "instrument_django_core_urlresolvers",
-    )
-    _process_module_definition(
-        "django.template",
-        "newrelic.hooks.framework_django",
-        "instrument_django_template",
-    )
-    _process_module_definition(
-        "django.template.loader_tags",
-        "newrelic.hooks.framework_django",
-        "instrument_django_template_loader_tags",
-    )
-    _process_module_definition(
-        "django.core.servers.basehttp",
-        "newrelic.hooks.framework_django",
-        "instrument_django_core_servers_basehttp",
-    )
-    _process_module_definition(
+# Import hooks for the instrumentation bundled with the agent. Each entry
+# is a (target, module, function) tuple and is registered by a single call
+# to _process_module_definitions() when the agent is initialized.
+
+_MODULE_BUILTIN_DEFAULTS = (
+    ("asyncio.base_events", "newrelic.hooks.coroutines_asyncio", "instrument_asyncio_base_events"),
+    ("asyncio.events", "newrelic.hooks.coroutines_asyncio", "instrument_asyncio_events"),
+    ("asgiref.sync", "newrelic.hooks.adapter_asgiref", "instrument_asgiref_sync"),
+    ("django.core.handlers.base", "newrelic.hooks.framework_django", "instrument_django_core_handlers_base"),
+    ("django.core.handlers.asgi", "newrelic.hooks.framework_django", "instrument_django_core_handlers_asgi"),
+    ("django.core.handlers.wsgi", "newrelic.hooks.framework_django", "instrument_django_core_handlers_wsgi"),
+    ("django.core.urlresolvers", "newrelic.hooks.framework_django", "instrument_django_core_urlresolvers"),
+    ("django.template", "newrelic.hooks.framework_django", "instrument_django_template"),
+    ("django.template.loader_tags", "newrelic.hooks.framework_django", "instrument_django_template_loader_tags"),
+    ("django.core.servers.basehttp", "newrelic.hooks.framework_django", "instrument_django_core_servers_basehttp"),
+    (
         "django.contrib.staticfiles.views",
         "newrelic.hooks.framework_django",
         "instrument_django_contrib_staticfiles_views",
-    )
-    _process_module_definition(
+    ),
+    (
         "django.contrib.staticfiles.handlers",
         "newrelic.hooks.framework_django",
         "instrument_django_contrib_staticfiles_handlers",
-    )
-    _process_module_definition(
-        "django.views.debug",
-        "newrelic.hooks.framework_django",
-        "instrument_django_views_debug",
-    )
-    _process_module_definition(
-        "django.http.multipartparser",
-        "newrelic.hooks.framework_django",
-        "instrument_django_http_multipartparser",
-    )
-    _process_module_definition(
-        "django.core.mail",
-        "newrelic.hooks.framework_django",
-        "instrument_django_core_mail",
-    )
-    _process_module_definition(
-        "django.core.mail.message",
-        "newrelic.hooks.framework_django",
-        "instrument_django_core_mail_message",
-    )
-    _process_module_definition(
-        "django.views.generic.base",
-        "newrelic.hooks.framework_django",
-        "instrument_django_views_generic_base",
-    )
-    _process_module_definition(
-        "django.core.management.base",
-        "newrelic.hooks.framework_django",
-        "instrument_django_core_management_base",
-    )
-    _process_module_definition(
-        "django.template.base",
-        "newrelic.hooks.framework_django",
-        "instrument_django_template_base",
-    )
-    _process_module_definition(
-        "django.middleware.gzip",
-        "newrelic.hooks.framework_django",
-        "instrument_django_gzip_middleware",
-    )
-
+    ),
+    ("django.views.debug", "newrelic.hooks.framework_django", "instrument_django_views_debug"),
+    ("django.http.multipartparser", "newrelic.hooks.framework_django", "instrument_django_http_multipartparser"),
+    ("django.core.mail", "newrelic.hooks.framework_django", "instrument_django_core_mail"),
+    ("django.core.mail.message", "newrelic.hooks.framework_django", "instrument_django_core_mail_message"),
+    ("django.views.generic.base", "newrelic.hooks.framework_django", "instrument_django_views_generic_base"),
+    ("django.core.management.base", "newrelic.hooks.framework_django", "instrument_django_core_management_base"),
+    ("django.template.base", "newrelic.hooks.framework_django", "instrument_django_template_base"),
+    ("django.middleware.gzip", "newrelic.hooks.framework_django", "instrument_django_gzip_middleware"),
     # New modules in Django 1.10
-    _process_module_definition(
-        "django.urls.resolvers",
-        "newrelic.hooks.framework_django",
-        "instrument_django_core_urlresolvers",
-    )
-    _process_module_definition(
-        "django.urls.base",
-        "newrelic.hooks.framework_django",
-        "instrument_django_urls_base",
-    )
-    _process_module_definition(
-        "django.core.handlers.exception",
-        "newrelic.hooks.framework_django",
-        "instrument_django_core_handlers_exception",
-    )
-
-    _process_module_definition("falcon.api", "newrelic.hooks.framework_falcon", "instrument_falcon_api")
-    _process_module_definition("falcon.app", "newrelic.hooks.framework_falcon", "instrument_falcon_app")
-    _process_module_definition(
-        "falcon.routing.util",
-        "newrelic.hooks.framework_falcon",
-        "instrument_falcon_routing_util",
-    )
-
-    _process_module_definition(
-        "fastapi.routing",
-        "newrelic.hooks.framework_fastapi",
-        "instrument_fastapi_routing",
-    )
-
-    _process_module_definition("flask.app", "newrelic.hooks.framework_flask", "instrument_flask_app")
-    _process_module_definition(
-        "flask.templating",
-        "newrelic.hooks.framework_flask",
-        "instrument_flask_templating",
-    )
-    _process_module_definition(
-        "flask.blueprints",
-        "newrelic.hooks.framework_flask",
-        "instrument_flask_blueprints",
-    )
-    _process_module_definition("flask.views", "newrelic.hooks.framework_flask", "instrument_flask_views")
-
-    _process_module_definition(
-        "flask_compress",
-        "newrelic.hooks.middleware_flask_compress",
-        "instrument_flask_compress",
-    )
-
-    _process_module_definition("flask_restful", "newrelic.hooks.component_flask_rest", "instrument_flask_rest")
-    _process_module_definition(
-        "flask_restplus.api",
-        "newrelic.hooks.component_flask_rest",
-        "instrument_flask_rest",
-    )
-    _process_module_definition(
-        "flask_restx.api",
-        "newrelic.hooks.component_flask_rest",
-        "instrument_flask_rest",
-    )
-
-    _process_module_definition(
-        "graphql_server",
-        "newrelic.hooks.component_graphqlserver",
-        "instrument_graphqlserver",
-    )
-
-    _process_module_definition(
-        "sentry_sdk.integrations.asgi", "newrelic.hooks.component_sentry", "instrument_sentry_sdk_integrations_asgi"
-    )
-
+    ("django.urls.resolvers", "newrelic.hooks.framework_django", "instrument_django_core_urlresolvers"),
+    ("django.urls.base", "newrelic.hooks.framework_django", "instrument_django_urls_base"),
+    ("django.core.handlers.exception", "newrelic.hooks.framework_django", "instrument_django_core_handlers_exception"),
+    ("falcon.api", "newrelic.hooks.framework_falcon", "instrument_falcon_api"),
+    ("falcon.app", "newrelic.hooks.framework_falcon", "instrument_falcon_app"),
+    ("falcon.routing.util", "newrelic.hooks.framework_falcon", "instrument_falcon_routing_util"),
+    ("fastapi.routing", "newrelic.hooks.framework_fastapi", "instrument_fastapi_routing"),
+    ("flask.app", "newrelic.hooks.framework_flask", "instrument_flask_app"),
+    ("flask.templating", "newrelic.hooks.framework_flask", "instrument_flask_templating"),
+    ("flask.blueprints", "newrelic.hooks.framework_flask", "instrument_flask_blueprints"),
+    ("flask.views", "newrelic.hooks.framework_flask", "instrument_flask_views"),
+    ("flask_compress", "newrelic.hooks.middleware_flask_compress", "instrument_flask_compress"),
+    ("flask_restful", "newrelic.hooks.component_flask_rest", "instrument_flask_rest"),
+    ("flask_restplus.api", "newrelic.hooks.component_flask_rest", "instrument_flask_rest"),
+    ("flask_restx.api", "newrelic.hooks.component_flask_rest", "instrument_flask_rest"),
+    ("graphql_server", "newrelic.hooks.component_graphqlserver", "instrument_graphqlserver"),
+    ("sentry_sdk.integrations.asgi", "newrelic.hooks.component_sentry", "instrument_sentry_sdk_integrations_asgi"),
     # _process_module_definition('web.application',
     #        'newrelic.hooks.framework_webpy')
     # _process_module_definition('web.template',
     #        'newrelic.hooks.framework_webpy')
-
-    _process_module_definition(
-        "gluon.compileapp",
-        "newrelic.hooks.framework_web2py",
-        "instrument_gluon_compileapp",
-    )
-    _process_module_definition(
-        "gluon.restricted",
-        "newrelic.hooks.framework_web2py",
-        "instrument_gluon_restricted",
-    )
-    _process_module_definition("gluon.main", "newrelic.hooks.framework_web2py", "instrument_gluon_main")
-    _process_module_definition("gluon.template", "newrelic.hooks.framework_web2py", "instrument_gluon_template")
-    _process_module_definition("gluon.tools", "newrelic.hooks.framework_web2py", "instrument_gluon_tools")
-    _process_module_definition("gluon.http", "newrelic.hooks.framework_web2py", "instrument_gluon_http")
-
-    _process_module_definition("httpx._client", "newrelic.hooks.external_httpx", "instrument_httpx_client")
-
-    _process_module_definition("gluon.contrib.feedparser", "newrelic.hooks.external_feedparser")
-    _process_module_definition("gluon.contrib.memcache.memcache", "newrelic.hooks.memcache_memcache")
-
-    _process_module_definition(
-        "graphene.types.schema",
-        "newrelic.hooks.framework_graphene",
-        "instrument_graphene_types_schema",
-    )
-
-    _process_module_definition(
-        "graphql.graphql",
-        "newrelic.hooks.framework_graphql",
-        "instrument_graphql",
-    )
-    _process_module_definition(
-        "graphql.execution.execute",
-        "newrelic.hooks.framework_graphql",
-        "instrument_graphql_execute",
-    )
-    _process_module_definition(
-        "graphql.execution.executor",
-        "newrelic.hooks.framework_graphql",
-        "instrument_graphql_execute",
-    )
-    _process_module_definition(
-        "graphql.execution.middleware",
-        "newrelic.hooks.framework_graphql",
-        "instrument_graphql_execution_middleware",
-    )
-    _process_module_definition(
-        "graphql.execution.utils",
-        "newrelic.hooks.framework_graphql",
-        "instrument_graphql_execution_utils",
-    )
-    _process_module_definition(
-        "graphql.error.located_error",
-        "newrelic.hooks.framework_graphql",
-        "instrument_graphql_error_located_error",
-    )
-    _process_module_definition(
-        "graphql.language.parser",
-        "newrelic.hooks.framework_graphql",
-        "instrument_graphql_parser",
-    )
-    _process_module_definition(
-        "graphql.validation.validate",
-        "newrelic.hooks.framework_graphql",
-        "instrument_graphql_validate",
-    )
-    _process_module_definition(
-        "graphql.validation.validation",
-        "newrelic.hooks.framework_graphql",
-        "instrument_graphql_validate",
-    )
-
-    _process_module_definition(
+    ("gluon.compileapp", "newrelic.hooks.framework_web2py", "instrument_gluon_compileapp"),
+    ("gluon.restricted", "newrelic.hooks.framework_web2py", "instrument_gluon_restricted"),
+    ("gluon.main", "newrelic.hooks.framework_web2py", "instrument_gluon_main"),
+    ("gluon.template", "newrelic.hooks.framework_web2py", "instrument_gluon_template"),
+    ("gluon.tools", "newrelic.hooks.framework_web2py", "instrument_gluon_tools"),
+    ("gluon.http", "newrelic.hooks.framework_web2py", "instrument_gluon_http"),
+    ("httpx._client", "newrelic.hooks.external_httpx", "instrument_httpx_client"),
+    ("gluon.contrib.feedparser", "newrelic.hooks.external_feedparser", "instrument"),
+    ("gluon.contrib.memcache.memcache", "newrelic.hooks.memcache_memcache", "instrument"),
+    ("graphene.types.schema", "newrelic.hooks.framework_graphene", "instrument_graphene_types_schema"),
+    ("graphql.graphql", "newrelic.hooks.framework_graphql", "instrument_graphql"),
+    ("graphql.execution.execute", "newrelic.hooks.framework_graphql", "instrument_graphql_execute"),
+    ("graphql.execution.executor", "newrelic.hooks.framework_graphql", "instrument_graphql_execute"),
+    ("graphql.execution.middleware", "newrelic.hooks.framework_graphql", "instrument_graphql_execution_middleware"),
+    ("graphql.execution.utils", "newrelic.hooks.framework_graphql", "instrument_graphql_execution_utils"),
+    ("graphql.error.located_error", "newrelic.hooks.framework_graphql", "instrument_graphql_error_located_error"),
+    ("graphql.language.parser", "newrelic.hooks.framework_graphql", "instrument_graphql_parser"),
+    ("graphql.validation.validate", "newrelic.hooks.framework_graphql", "instrument_graphql_validate"),
+    ("graphql.validation.validation", "newrelic.hooks.framework_graphql", "instrument_graphql_validate"),
+    (
         "google.cloud.firestore_v1.base_client",
         "newrelic.hooks.datastore_firestore",
         "instrument_google_cloud_firestore_v1_base_client",
-    )
-    _process_module_definition(
+    ),
+    (
         "google.cloud.firestore_v1.client",
         "newrelic.hooks.datastore_firestore",
         "instrument_google_cloud_firestore_v1_client",
-    )
-    _process_module_definition(
+    ),
+    (
         "google.cloud.firestore_v1.async_client",
         "newrelic.hooks.datastore_firestore",
         "instrument_google_cloud_firestore_v1_async_client",
-    )
-    _process_module_definition(
+    ),
+    (
         "google.cloud.firestore_v1.document",
         "newrelic.hooks.datastore_firestore",
         "instrument_google_cloud_firestore_v1_document",
-    )
-    _process_module_definition(
+    ),
+    (
         "google.cloud.firestore_v1.async_document",
         "newrelic.hooks.datastore_firestore",
         "instrument_google_cloud_firestore_v1_async_document",
-    )
-    _process_module_definition(
+    ),
+    (
         "google.cloud.firestore_v1.collection",
         "newrelic.hooks.datastore_firestore",
         "instrument_google_cloud_firestore_v1_collection",
-    )
-    _process_module_definition(
+    ),
+    (
         "google.cloud.firestore_v1.async_collection",
         "newrelic.hooks.datastore_firestore",
         "instrument_google_cloud_firestore_v1_async_collection",
-    )
-    _process_module_definition(
+    ),
+    (
         "google.cloud.firestore_v1.query",
         "newrelic.hooks.datastore_firestore",
         "instrument_google_cloud_firestore_v1_query",
-    )
-    _process_module_definition(
+    ),
+    (
         "google.cloud.firestore_v1.async_query",
         "newrelic.hooks.datastore_firestore",
         "instrument_google_cloud_firestore_v1_async_query",
-    )
-    _process_module_definition(
+    ),
+    (
         "google.cloud.firestore_v1.aggregation",
         "newrelic.hooks.datastore_firestore",
         "instrument_google_cloud_firestore_v1_aggregation",
-    )
-    _process_module_definition(
+    ),
+    (
         "google.cloud.firestore_v1.async_aggregation",
         "newrelic.hooks.datastore_firestore",
         "instrument_google_cloud_firestore_v1_async_aggregation",
-    )
-    _process_module_definition(
+    ),
+    (
         "google.cloud.firestore_v1.batch",
         "newrelic.hooks.datastore_firestore",
         "instrument_google_cloud_firestore_v1_batch",
-    )
-    _process_module_definition(
+    ),
+    (
         "google.cloud.firestore_v1.async_batch",
         "newrelic.hooks.datastore_firestore",
         "instrument_google_cloud_firestore_v1_async_batch",
-    )
-    _process_module_definition(
+    ),
+    (
         "google.cloud.firestore_v1.bulk_batch",
         "newrelic.hooks.datastore_firestore",
         "instrument_google_cloud_firestore_v1_bulk_batch",
-    )
-    _process_module_definition(
+    ),
+    (
         "google.cloud.firestore_v1.transaction",
         "newrelic.hooks.datastore_firestore",
         "instrument_google_cloud_firestore_v1_transaction",
-    )
-    _process_module_definition(
+    ),
+    (
         "google.cloud.firestore_v1.async_transaction",
         "newrelic.hooks.datastore_firestore",
         "instrument_google_cloud_firestore_v1_async_transaction",
-    )
-
-    _process_module_definition(
-        "ariadne.asgi",
-        "newrelic.hooks.framework_ariadne",
-        "instrument_ariadne_asgi",
-    )
-    _process_module_definition(
-        "ariadne.graphql",
-        "newrelic.hooks.framework_ariadne",
-        "instrument_ariadne_execute",
-    )
-    _process_module_definition(
-        "ariadne.wsgi",
-        "newrelic.hooks.framework_ariadne",
-        "instrument_ariadne_wsgi",
-    )
-
-    _process_module_definition("grpc._channel", "newrelic.hooks.framework_grpc", "instrument_grpc__channel")
-    _process_module_definition("grpc._server", "newrelic.hooks.framework_grpc", "instrument_grpc_server")
-
-    _process_module_definition("pylons.wsgiapp", "newrelic.hooks.framework_pylons")
-    _process_module_definition("pylons.controllers.core", "newrelic.hooks.framework_pylons")
-    _process_module_definition("pylons.templating", "newrelic.hooks.framework_pylons")
-
-    _process_module_definition("bottle", "newrelic.hooks.framework_bottle", "instrument_bottle")
-
-    _process_module_definition(
-        "cherrypy._cpreqbody",
-        "newrelic.hooks.framework_cherrypy",
-        "instrument_cherrypy__cpreqbody",
-    )
-    _process_module_definition(
-        "cherrypy._cprequest",
-        "newrelic.hooks.framework_cherrypy",
-        "instrument_cherrypy__cprequest",
-    )
-    _process_module_definition(
-        "cherrypy._cpdispatch",
-        "newrelic.hooks.framework_cherrypy",
-        "instrument_cherrypy__cpdispatch",
-    )
-    _process_module_definition(
-        "cherrypy._cpwsgi",
-        "newrelic.hooks.framework_cherrypy",
-        "instrument_cherrypy__cpwsgi",
-    )
-    _process_module_definition(
-        "cherrypy._cptree",
-        "newrelic.hooks.framework_cherrypy",
-        "instrument_cherrypy__cptree",
-    )
-
-    _process_module_definition(
-        "confluent_kafka.cimpl",
-        "newrelic.hooks.messagebroker_confluentkafka",
-        "instrument_confluentkafka_cimpl",
-    )
-    _process_module_definition(
+    ),
+    ("ariadne.asgi", "newrelic.hooks.framework_ariadne", "instrument_ariadne_asgi"),
+    ("ariadne.graphql", "newrelic.hooks.framework_ariadne", "instrument_ariadne_execute"),
+    ("ariadne.wsgi", "newrelic.hooks.framework_ariadne", "instrument_ariadne_wsgi"),
+    ("grpc._channel", "newrelic.hooks.framework_grpc", "instrument_grpc__channel"),
+    ("grpc._server", "newrelic.hooks.framework_grpc", "instrument_grpc_server"),
+    ("pylons.wsgiapp", "newrelic.hooks.framework_pylons", "instrument"),
+    ("pylons.controllers.core", "newrelic.hooks.framework_pylons", "instrument"),
+    ("pylons.templating", "newrelic.hooks.framework_pylons", "instrument"),
+    ("bottle", "newrelic.hooks.framework_bottle", "instrument_bottle"),
+    ("cherrypy._cpreqbody", "newrelic.hooks.framework_cherrypy", "instrument_cherrypy__cpreqbody"),
+    ("cherrypy._cprequest", "newrelic.hooks.framework_cherrypy", "instrument_cherrypy__cprequest"),
+    ("cherrypy._cpdispatch", "newrelic.hooks.framework_cherrypy", "instrument_cherrypy__cpdispatch"),
+    ("cherrypy._cpwsgi", "newrelic.hooks.framework_cherrypy", "instrument_cherrypy__cpwsgi"),
+    ("cherrypy._cptree", "newrelic.hooks.framework_cherrypy", "instrument_cherrypy__cptree"),
+    ("confluent_kafka.cimpl", "newrelic.hooks.messagebroker_confluentkafka", "instrument_confluentkafka_cimpl"),
+    (
         "confluent_kafka.serializing_producer",
         "newrelic.hooks.messagebroker_confluentkafka",
         "instrument_confluentkafka_serializing_producer",
-    )
-    _process_module_definition(
+    ),
+    (
         "confluent_kafka.deserializing_consumer",
         "newrelic.hooks.messagebroker_confluentkafka",
         "instrument_confluentkafka_deserializing_consumer",
-    )
-
-    _process_module_definition(
-        "kafka.consumer.group",
-        "newrelic.hooks.messagebroker_kafkapython",
-        "instrument_kafka_consumer_group",
-    )
-    _process_module_definition(
-        "kafka.producer.kafka",
-        "newrelic.hooks.messagebroker_kafkapython",
-        "instrument_kafka_producer",
-    )
-    _process_module_definition(
-        "kafka.coordinator.heartbeat",
-        "newrelic.hooks.messagebroker_kafkapython",
-        "instrument_kafka_heartbeat",
-    )
-    _process_module_definition(
-        "kafka.consumer.group",
-        "newrelic.hooks.messagebroker_kafkapython",
-        "instrument_kafka_consumer_group",
-    )
-
-    _process_module_definition(
-        "logging",
-        "newrelic.hooks.logger_logging",
-        "instrument_logging",
-    )
-
-    _process_module_definition(
-        "loguru",
-        "newrelic.hooks.logger_loguru",
-        "instrument_loguru",
-    )
-    _process_module_definition(
-        "loguru._logger",
-        "newrelic.hooks.logger_loguru",
-        "instrument_loguru_logger",
-    )
-    _process_module_definition(
-        "structlog._base",
-        "newrelic.hooks.logger_structlog",
-        "instrument_structlog__base",
-    )
-
-    _process_module_definition(
-        "paste.httpserver",
-        "newrelic.hooks.adapter_paste",
-        "instrument_paste_httpserver",
-    )
-
-    _process_module_definition(
-        "gunicorn.app.base",
-        "newrelic.hooks.adapter_gunicorn",
-        "instrument_gunicorn_app_base",
-    )
-
-    _process_module_definition("cx_Oracle", "newrelic.hooks.database_cx_oracle", "instrument_cx_oracle")
-
-    _process_module_definition("ibm_db_dbi", "newrelic.hooks.database_ibm_db_dbi", "instrument_ibm_db_dbi")
-
-    _process_module_definition("mysql.connector", "newrelic.hooks.database_mysql", "instrument_mysql_connector")
-    _process_module_definition("MySQLdb", "newrelic.hooks.database_mysqldb", "instrument_mysqldb")
-    _process_module_definition("oursql", "newrelic.hooks.database_oursql", "instrument_oursql")
-    _process_module_definition("pymysql", "newrelic.hooks.database_pymysql", "instrument_pymysql")
-
-    _process_module_definition("pyodbc", "newrelic.hooks.database_pyodbc", "instrument_pyodbc")
-
-    _process_module_definition("pymssql", "newrelic.hooks.database_pymssql", "instrument_pymssql")
-
-    _process_module_definition("psycopg2", "newrelic.hooks.database_psycopg2", "instrument_psycopg2")
-    _process_module_definition(
-        "psycopg2._psycopg2",
-        "newrelic.hooks.database_psycopg2",
-        "instrument_psycopg2__psycopg2",
-    )
-    _process_module_definition(
-        "psycopg2.extensions",
-        "newrelic.hooks.database_psycopg2",
-        "instrument_psycopg2_extensions",
-    )
-    _process_module_definition(
-        "psycopg2._json",
-        "newrelic.hooks.database_psycopg2",
-        "instrument_psycopg2__json",
-    )
-    _process_module_definition(
-        "psycopg2._range",
-        "newrelic.hooks.database_psycopg2",
-        "instrument_psycopg2__range",
-    )
-    _process_module_definition("psycopg2.sql", "newrelic.hooks.database_psycopg2", "instrument_psycopg2_sql")
-
-    _process_module_definition("psycopg2ct", "newrelic.hooks.database_psycopg2ct", "instrument_psycopg2ct")
-    _process_module_definition(
-        "psycopg2ct.extensions",
-        "newrelic.hooks.database_psycopg2ct",
-        "instrument_psycopg2ct_extensions",
-    )
-
-    _process_module_definition(
-        "psycopg2cffi",
-        "newrelic.hooks.database_psycopg2cffi",
-        "instrument_psycopg2cffi",
-    )
-    _process_module_definition(
-        "psycopg2cffi.extensions",
-        "newrelic.hooks.database_psycopg2cffi",
-        "instrument_psycopg2cffi_extensions",
-    )
-
-    _process_module_definition(
-        "asyncpg.connect_utils",
-        "newrelic.hooks.database_asyncpg",
-        "instrument_asyncpg_connect_utils",
-    )
-    _process_module_definition(
-        "asyncpg.protocol",
-        "newrelic.hooks.database_asyncpg",
-        "instrument_asyncpg_protocol",
-    )
-
-    _process_module_definition(
-        "postgresql.driver.dbapi20",
-        "newrelic.hooks.database_postgresql",
-        "instrument_postgresql_driver_dbapi20",
-    )
-
-    _process_module_definition(
+    ),
+    ("kafka.consumer.group", "newrelic.hooks.messagebroker_kafkapython", "instrument_kafka_consumer_group"),
+    ("kafka.producer.kafka", "newrelic.hooks.messagebroker_kafkapython", "instrument_kafka_producer"),
+    ("kafka.coordinator.heartbeat", "newrelic.hooks.messagebroker_kafkapython", "instrument_kafka_heartbeat"),
+    ("kafka.consumer.group", "newrelic.hooks.messagebroker_kafkapython", "instrument_kafka_consumer_group"),
+    ("logging", "newrelic.hooks.logger_logging", "instrument_logging"),
+    ("loguru", "newrelic.hooks.logger_loguru", "instrument_loguru"),
+    ("loguru._logger", "newrelic.hooks.logger_loguru", "instrument_loguru_logger"),
+    ("structlog._base", "newrelic.hooks.logger_structlog", "instrument_structlog__base"),
+    ("paste.httpserver", "newrelic.hooks.adapter_paste", "instrument_paste_httpserver"),
+    ("gunicorn.app.base", "newrelic.hooks.adapter_gunicorn", "instrument_gunicorn_app_base"),
+    ("cx_Oracle", "newrelic.hooks.database_cx_oracle", "instrument_cx_oracle"),
+    ("ibm_db_dbi", "newrelic.hooks.database_ibm_db_dbi", "instrument_ibm_db_dbi"),
+    ("mysql.connector", "newrelic.hooks.database_mysql", "instrument_mysql_connector"),
+    ("MySQLdb", "newrelic.hooks.database_mysqldb", "instrument_mysqldb"),
+    ("oursql", "newrelic.hooks.database_oursql", "instrument_oursql"),
+    ("pymysql", "newrelic.hooks.database_pymysql", "instrument_pymysql"),
+    ("pyodbc", "newrelic.hooks.database_pyodbc", "instrument_pyodbc"),
+    ("pymssql", "newrelic.hooks.database_pymssql", "instrument_pymssql"),
+    ("psycopg2", "newrelic.hooks.database_psycopg2", "instrument_psycopg2"),
+    ("psycopg2._psycopg2", "newrelic.hooks.database_psycopg2", "instrument_psycopg2__psycopg2"),
+    ("psycopg2.extensions", "newrelic.hooks.database_psycopg2", "instrument_psycopg2_extensions"),
+    ("psycopg2._json", "newrelic.hooks.database_psycopg2", "instrument_psycopg2__json"),
+    ("psycopg2._range", "newrelic.hooks.database_psycopg2", "instrument_psycopg2__range"),
+    ("psycopg2.sql", "newrelic.hooks.database_psycopg2", "instrument_psycopg2_sql"),
+    ("psycopg2ct", "newrelic.hooks.database_psycopg2ct", "instrument_psycopg2ct"),
+    ("psycopg2ct.extensions", "newrelic.hooks.database_psycopg2ct", "instrument_psycopg2ct_extensions"),
+    ("psycopg2cffi", "newrelic.hooks.database_psycopg2cffi", "instrument_psycopg2cffi"),
+    ("psycopg2cffi.extensions", "newrelic.hooks.database_psycopg2cffi", "instrument_psycopg2cffi_extensions"),
+    ("asyncpg.connect_utils", "newrelic.hooks.database_asyncpg", "instrument_asyncpg_connect_utils"),
+    ("asyncpg.protocol", "newrelic.hooks.database_asyncpg", "instrument_asyncpg_protocol"),
+    ("postgresql.driver.dbapi20", "newrelic.hooks.database_postgresql", "instrument_postgresql_driver_dbapi20"),
+    (
         "postgresql.interface.proboscis.dbapi2",
         "newrelic.hooks.database_postgresql",
         "instrument_postgresql_interface_proboscis_dbapi2",
-    )
-
-    _process_module_definition("sqlite3", "newrelic.hooks.database_sqlite", "instrument_sqlite3")
-    _process_module_definition("sqlite3.dbapi2", "newrelic.hooks.database_sqlite", "instrument_sqlite3_dbapi2")
-
-    _process_module_definition("pysqlite2", "newrelic.hooks.database_sqlite", "instrument_sqlite3")
-    _process_module_definition(
-        "pysqlite2.dbapi2",
-        "newrelic.hooks.database_sqlite",
-        "instrument_sqlite3_dbapi2",
-    )
-
-    _process_module_definition("memcache", "newrelic.hooks.datastore_memcache", "instrument_memcache")
-    _process_module_definition("umemcache", "newrelic.hooks.datastore_umemcache", "instrument_umemcache")
-    _process_module_definition(
-        "pylibmc.client",
-        "newrelic.hooks.datastore_pylibmc",
-        "instrument_pylibmc_client",
-    )
-    _process_module_definition(
-        "bmemcached.client",
-        "newrelic.hooks.datastore_bmemcached",
-        "instrument_bmemcached_client",
-    )
-    _process_module_definition(
-        "pymemcache.client",
-        "newrelic.hooks.datastore_pymemcache",
-        "instrument_pymemcache_client",
-    )
-
-    _process_module_definition("jinja2.environment", "newrelic.hooks.template_jinja2")
-
-    _process_module_definition("mako.runtime", "newrelic.hooks.template_mako", "instrument_mako_runtime")
-    _process_module_definition("mako.template", "newrelic.hooks.template_mako", "instrument_mako_template")
-
-    _process_module_definition("genshi.template.base", "newrelic.hooks.template_genshi")
-
-    if six.PY2:
-        _process_module_definition("httplib", "newrelic.hooks.external_httplib")
-    else:
-        _process_module_definition("http.client", "newrelic.hooks.external_httplib")
-
-    _process_module_definition("httplib2", "newrelic.hooks.external_httplib2")
-
-    if six.PY2:
-        _process_module_definition("urllib", "newrelic.hooks.external_urllib")
-    else:
-        _process_module_definition("urllib.request", "newrelic.hooks.external_urllib")
-
-    if six.PY2:
-        _process_module_definition("urllib2", "newrelic.hooks.external_urllib2")
-
-    _process_module_definition(
-        "urllib3.connectionpool",
-        "newrelic.hooks.external_urllib3",
-        "instrument_urllib3_connectionpool",
-    )
-    _process_module_definition(
-        "urllib3.connection",
-        "newrelic.hooks.external_urllib3",
-        "instrument_urllib3_connection",
-    )
-    _process_module_definition(
-        "requests.packages.urllib3.connection",
-        "newrelic.hooks.external_urllib3",
-        "instrument_urllib3_connection",
-    )
+    ),
+    ("sqlite3", "newrelic.hooks.database_sqlite", "instrument_sqlite3"),
+    ("sqlite3.dbapi2", "newrelic.hooks.database_sqlite", "instrument_sqlite3_dbapi2"),
+    ("pysqlite2", "newrelic.hooks.database_sqlite", "instrument_sqlite3"),
+    ("pysqlite2.dbapi2", "newrelic.hooks.database_sqlite", "instrument_sqlite3_dbapi2"),
+    ("memcache", "newrelic.hooks.datastore_memcache", "instrument_memcache"),
+    ("umemcache", "newrelic.hooks.datastore_umemcache", "instrument_umemcache"),
+    ("pylibmc.client", "newrelic.hooks.datastore_pylibmc", "instrument_pylibmc_client"),
+    ("bmemcached.client", "newrelic.hooks.datastore_bmemcached", "instrument_bmemcached_client"),
+    ("pymemcache.client", "newrelic.hooks.datastore_pymemcache", "instrument_pymemcache_client"),
+    ("jinja2.environment", "newrelic.hooks.template_jinja2", "instrument"),
+    ("mako.runtime", "newrelic.hooks.template_mako", "instrument_mako_runtime"),
+    ("mako.template", "newrelic.hooks.template_mako", "instrument_mako_template"),
+    ("genshi.template.base", "newrelic.hooks.template_genshi", "instrument"),
+    ("httplib" if six.PY2 else "http.client", "newrelic.hooks.external_httplib", "instrument"),
+    ("httplib2", "newrelic.hooks.external_httplib2", "instrument"),
+    ("urllib" if six.PY2 else "urllib.request", "newrelic.hooks.external_urllib", "instrument"),
+)
 
-    _process_module_definition(
-        "starlette.requests",
-        "newrelic.hooks.framework_starlette",
-        "instrument_starlette_requests",
-    )
-    _process_module_definition(
-        "starlette.routing",
-        "newrelic.hooks.framework_starlette",
-        "instrument_starlette_routing",
-    )
-    _process_module_definition(
-        "starlette.applications",
-        "newrelic.hooks.framework_starlette",
-        "instrument_starlette_applications",
-    )
-    _process_module_definition(
-        "starlette.middleware.errors",
-        "newrelic.hooks.framework_starlette",
-        "instrument_starlette_middleware_errors",
-    )
-    _process_module_definition(
+if six.PY2:
+    _MODULE_BUILTIN_DEFAULTS += (("urllib2", "newrelic.hooks.external_urllib2", "instrument"),)
+
+_MODULE_BUILTIN_DEFAULTS += (
+    ("urllib3.connectionpool", "newrelic.hooks.external_urllib3", "instrument_urllib3_connectionpool"),
+    ("urllib3.connection", "newrelic.hooks.external_urllib3", "instrument_urllib3_connection"),
+    ("requests.packages.urllib3.connection", "newrelic.hooks.external_urllib3", "instrument_urllib3_connection"),
+    ("starlette.requests", "newrelic.hooks.framework_starlette", "instrument_starlette_requests"),
+    ("starlette.routing", "newrelic.hooks.framework_starlette", "instrument_starlette_routing"),
+    ("starlette.applications", "newrelic.hooks.framework_starlette", "instrument_starlette_applications"),
+    ("starlette.middleware.errors", "newrelic.hooks.framework_starlette", "instrument_starlette_middleware_errors"),
+    (
         "starlette.middleware.exceptions",
         "newrelic.hooks.framework_starlette",
         "instrument_starlette_middleware_exceptions",
-    )
-    _process_module_definition(
-        "starlette.exceptions",
-        "newrelic.hooks.framework_starlette",
-        "instrument_starlette_exceptions",
-    )
-    _process_module_definition(
-        "starlette.background",
-        "newrelic.hooks.framework_starlette",
-        "instrument_starlette_background_task",
-    )
-    _process_module_definition(
-        "starlette.concurrency",
-        "newrelic.hooks.framework_starlette",
-        "instrument_starlette_concurrency",
-    )
-
-    _process_module_definition(
-        "strawberry.asgi",
-        "newrelic.hooks.framework_strawberry",
-        "instrument_strawberry_asgi",
-    )
-
-    _process_module_definition(
-        "strawberry.schema.schema",
-        "newrelic.hooks.framework_strawberry",
-        "instrument_strawberry_schema",
-    )
-
-    _process_module_definition(
+    ),
+    ("starlette.exceptions", "newrelic.hooks.framework_starlette", "instrument_starlette_exceptions"),
+    ("starlette.background", "newrelic.hooks.framework_starlette", "instrument_starlette_background_task"),
+    ("starlette.concurrency", "newrelic.hooks.framework_starlette", "instrument_starlette_concurrency"),
+    ("strawberry.asgi", "newrelic.hooks.framework_strawberry", "instrument_strawberry_asgi"),
+    ("strawberry.schema.schema", "newrelic.hooks.framework_strawberry", "instrument_strawberry_schema"),
+    (
         "strawberry.schema.schema_converter",
         "newrelic.hooks.framework_strawberry",
         "instrument_strawberry_schema_converter",
-    )
-
-    _process_module_definition("uvicorn.config", "newrelic.hooks.adapter_uvicorn", "instrument_uvicorn_config")
-
-    _process_module_definition(
-        "hypercorn.asyncio.run", "newrelic.hooks.adapter_hypercorn", "instrument_hypercorn_asyncio_run"
-    )
-    _process_module_definition(
-        "hypercorn.trio.run", "newrelic.hooks.adapter_hypercorn", "instrument_hypercorn_trio_run"
-    )
-    _process_module_definition("hypercorn.utils", "newrelic.hooks.adapter_hypercorn", "instrument_hypercorn_utils")
-
-    _process_module_definition("daphne.server", "newrelic.hooks.adapter_daphne", "instrument_daphne_server")
-
-    _process_module_definition("sanic.app", "newrelic.hooks.framework_sanic", "instrument_sanic_app")
-    _process_module_definition("sanic.response", "newrelic.hooks.framework_sanic", "instrument_sanic_response")
-    _process_module_definition(
-        "sanic.touchup.service", "newrelic.hooks.framework_sanic", "instrument_sanic_touchup_service"
-    )
-
-    _process_module_definition("aiohttp.wsgi", "newrelic.hooks.framework_aiohttp", "instrument_aiohttp_wsgi")
-    _process_module_definition("aiohttp.web", "newrelic.hooks.framework_aiohttp", "instrument_aiohttp_web")
-    _process_module_definition(
-        "aiohttp.web_reqrep",
-        "newrelic.hooks.framework_aiohttp",
-        "instrument_aiohttp_web_response",
-    )
-    _process_module_definition(
-        "aiohttp.web_response",
-        "newrelic.hooks.framework_aiohttp",
-        "instrument_aiohttp_web_response",
-    )
-    _process_module_definition(
-        "aiohttp.web_urldispatcher",
-        "newrelic.hooks.framework_aiohttp",
-        "instrument_aiohttp_web_urldispatcher",
-    )
-    _process_module_definition(
-        "aiohttp.client",
-        "newrelic.hooks.framework_aiohttp",
-        "instrument_aiohttp_client",
-    )
-    _process_module_definition(
-        "aiohttp.client_reqrep",
-        "newrelic.hooks.framework_aiohttp",
-        "instrument_aiohttp_client_reqrep",
-    )
-    _process_module_definition(
-        "aiohttp.protocol",
-        "newrelic.hooks.framework_aiohttp",
-        "instrument_aiohttp_protocol",
-    )
-
-    _process_module_definition("requests.api", "newrelic.hooks.external_requests", "instrument_requests_api")
-    _process_module_definition(
-        "requests.sessions",
-        "newrelic.hooks.external_requests",
-        "instrument_requests_sessions",
-    )
-
-    _process_module_definition("feedparser", "newrelic.hooks.external_feedparser")
-
-    _process_module_definition("xmlrpclib", "newrelic.hooks.external_xmlrpclib")
-
-    _process_module_definition("dropbox", "newrelic.hooks.external_dropbox")
-
-    _process_module_definition("facepy.graph_api", "newrelic.hooks.external_facepy")
-
-    _process_module_definition("pysolr", "newrelic.hooks.datastore_pysolr", "instrument_pysolr")
-
-    _process_module_definition("solr", "newrelic.hooks.datastore_solrpy", "instrument_solrpy")
-
-    _process_module_definition("aredis.client", "newrelic.hooks.datastore_aredis", "instrument_aredis_client")
-
-    _process_module_definition(
-        "aredis.connection",
-        "newrelic.hooks.datastore_aredis",
-        "instrument_aredis_connection",
-    )
-
-    _process_module_definition("aioredis.client", "newrelic.hooks.datastore_aioredis", "instrument_aioredis_client")
-
-    _process_module_definition("aioredis.commands", "newrelic.hooks.datastore_aioredis", "instrument_aioredis_client")
-
-    _process_module_definition(
-        "aioredis.connection", "newrelic.hooks.datastore_aioredis", "instrument_aioredis_connection"
-    )
-
+    ),
+    ("uvicorn.config", "newrelic.hooks.adapter_uvicorn", "instrument_uvicorn_config"),
+    ("hypercorn.asyncio.run", "newrelic.hooks.adapter_hypercorn", "instrument_hypercorn_asyncio_run"),
+    ("hypercorn.trio.run", "newrelic.hooks.adapter_hypercorn", "instrument_hypercorn_trio_run"),
+    ("hypercorn.utils", "newrelic.hooks.adapter_hypercorn", "instrument_hypercorn_utils"),
+    ("daphne.server", "newrelic.hooks.adapter_daphne", "instrument_daphne_server"),
+    ("sanic.app", "newrelic.hooks.framework_sanic", "instrument_sanic_app"),
+    ("sanic.response", "newrelic.hooks.framework_sanic", "instrument_sanic_response"),
+    ("sanic.touchup.service", "newrelic.hooks.framework_sanic", "instrument_sanic_touchup_service"),
+    ("aiohttp.wsgi", "newrelic.hooks.framework_aiohttp", "instrument_aiohttp_wsgi"),
+    ("aiohttp.web", "newrelic.hooks.framework_aiohttp", "instrument_aiohttp_web"),
+    ("aiohttp.web_reqrep", "newrelic.hooks.framework_aiohttp", "instrument_aiohttp_web_response"),
+    ("aiohttp.web_response", "newrelic.hooks.framework_aiohttp", "instrument_aiohttp_web_response"),
+    ("aiohttp.web_urldispatcher", "newrelic.hooks.framework_aiohttp", "instrument_aiohttp_web_urldispatcher"),
+    ("aiohttp.client", "newrelic.hooks.framework_aiohttp", "instrument_aiohttp_client"),
+    ("aiohttp.client_reqrep", "newrelic.hooks.framework_aiohttp", "instrument_aiohttp_client_reqrep"),
+    ("aiohttp.protocol", "newrelic.hooks.framework_aiohttp", "instrument_aiohttp_protocol"),
+    ("requests.api", "newrelic.hooks.external_requests", "instrument_requests_api"),
+    ("requests.sessions", "newrelic.hooks.external_requests", "instrument_requests_sessions"),
+    ("feedparser", "newrelic.hooks.external_feedparser", "instrument"),
+    ("xmlrpclib", "newrelic.hooks.external_xmlrpclib", "instrument"),
+    ("dropbox", "newrelic.hooks.external_dropbox", "instrument"),
+    ("facepy.graph_api", "newrelic.hooks.external_facepy", "instrument"),
+    ("pysolr", "newrelic.hooks.datastore_pysolr", "instrument_pysolr"),
+    ("solr", "newrelic.hooks.datastore_solrpy", "instrument_solrpy"),
+    ("aredis.client", "newrelic.hooks.datastore_aredis", "instrument_aredis_client"),
+    ("aredis.connection", "newrelic.hooks.datastore_aredis", "instrument_aredis_connection"),
+    ("aioredis.client", "newrelic.hooks.datastore_aioredis", "instrument_aioredis_client"),
+    ("aioredis.commands", "newrelic.hooks.datastore_aioredis", "instrument_aioredis_client"),
+    ("aioredis.connection", "newrelic.hooks.datastore_aioredis", "instrument_aioredis_connection"),
     # v7 and below
-    _process_module_definition(
-        "elasticsearch.client",
-        "newrelic.hooks.datastore_elasticsearch",
-        "instrument_elasticsearch_client",
-    )
+    ("elasticsearch.client", "newrelic.hooks.datastore_elasticsearch", "instrument_elasticsearch_client"),
     # v8 and above
-    _process_module_definition(
-        "elasticsearch._sync.client",
-        "newrelic.hooks.datastore_elasticsearch",
-        "instrument_elasticsearch_client_v8",
-    )
-
+    ("elasticsearch._sync.client", "newrelic.hooks.datastore_elasticsearch", "instrument_elasticsearch_client_v8"),
     # v7 and below
-    _process_module_definition(
-        "elasticsearch.client.cat",
-        "newrelic.hooks.datastore_elasticsearch",
-        "instrument_elasticsearch_client_cat",
-    )
+    ("elasticsearch.client.cat", "newrelic.hooks.datastore_elasticsearch", "instrument_elasticsearch_client_cat"),
     # v8 and above
-    _process_module_definition(
+    (
         "elasticsearch._sync.client.cat",
         "newrelic.hooks.datastore_elasticsearch",
         "instrument_elasticsearch_client_cat_v8",
-    )
-
+    ),
     # v7 and below
-    _process_module_definition(
+    (
         "elasticsearch.client.cluster",
         "newrelic.hooks.datastore_elasticsearch",
         "instrument_elasticsearch_client_cluster",
-    )
+    ),
     # v8 and above
-    _process_module_definition(
+    (
         "elasticsearch._sync.client.cluster",
         "newrelic.hooks.datastore_elasticsearch",
         "instrument_elasticsearch_client_cluster_v8",
-    )
-
+    ),
     # v7 and below
-    _process_module_definition(
+    (
         "elasticsearch.client.indices",
         "newrelic.hooks.datastore_elasticsearch",
         "instrument_elasticsearch_client_indices",
-    )
+    ),
     # v8 and above
-    _process_module_definition(
+    (
         "elasticsearch._sync.client.indices",
         "newrelic.hooks.datastore_elasticsearch",
         "instrument_elasticsearch_client_indices_v8",
-    )
-
+    ),
     # v7 and below
-    _process_module_definition(
-        "elasticsearch.client.nodes",
-        "newrelic.hooks.datastore_elasticsearch",
-        "instrument_elasticsearch_client_nodes",
-    )
+    ("elasticsearch.client.nodes", "newrelic.hooks.datastore_elasticsearch", "instrument_elasticsearch_client_nodes"),
     # v8 and above
-    _process_module_definition(
+    (
         "elasticsearch._sync.client.nodes",
         "newrelic.hooks.datastore_elasticsearch",
         "instrument_elasticsearch_client_nodes_v8",
-    )
-
+    ),
     # v7 and below
-    _process_module_definition(
+    (
         "elasticsearch.client.snapshot",
         "newrelic.hooks.datastore_elasticsearch",
         "instrument_elasticsearch_client_snapshot",
-    )
+    ),
     # v8 and above
-    _process_module_definition(
+    (
         "elasticsearch._sync.client.snapshot",
         "newrelic.hooks.datastore_elasticsearch",
         "instrument_elasticsearch_client_snapshot_v8",
-    )
-
+    ),
     # v7 and below
-    _process_module_definition(
-        "elasticsearch.client.tasks",
-        "newrelic.hooks.datastore_elasticsearch",
-        "instrument_elasticsearch_client_tasks",
-    )
+    ("elasticsearch.client.tasks", "newrelic.hooks.datastore_elasticsearch", "instrument_elasticsearch_client_tasks"),
     # v8 and above
-    _process_module_definition(
+    (
         "elasticsearch._sync.client.tasks",
         "newrelic.hooks.datastore_elasticsearch",
         "instrument_elasticsearch_client_tasks_v8",
-    )
-
+    ),
     # v7 and below
-    _process_module_definition(
-        "elasticsearch.client.ingest",
-        "newrelic.hooks.datastore_elasticsearch",
-        "instrument_elasticsearch_client_ingest",
-    )
+    ("elasticsearch.client.ingest", "newrelic.hooks.datastore_elasticsearch", "instrument_elasticsearch_client_ingest"),
     # v8 and above
-    _process_module_definition(
+    (
         "elasticsearch._sync.client.ingest",
         "newrelic.hooks.datastore_elasticsearch",
         "instrument_elasticsearch_client_ingest_v8",
-    )
-
+    ),
     # v7 and below
-    _process_module_definition(
+    (
         "elasticsearch.connection.base",
         "newrelic.hooks.datastore_elasticsearch",
         "instrument_elasticsearch_connection_base",
-    )
+    ),
     # v8 and above
-    _process_module_definition(
+    (
         "elastic_transport._node._base",
         "newrelic.hooks.datastore_elasticsearch",
         "instrument_elastic_transport__node__base",
-    )
-
+    ),
     # v7 and below
-    _process_module_definition(
-        "elasticsearch.transport",
-        "newrelic.hooks.datastore_elasticsearch",
-        "instrument_elasticsearch_transport",
-    )
+    ("elasticsearch.transport", "newrelic.hooks.datastore_elasticsearch", "instrument_elasticsearch_transport"),
     # v8 and above
-    _process_module_definition(
+    (
         "elastic_transport._transport",
         "newrelic.hooks.datastore_elasticsearch",
         "instrument_elastic_transport__transport",
-    )
-
-    _process_module_definition("pika.adapters", "newrelic.hooks.messagebroker_pika", "instrument_pika_adapters")
-    _process_module_definition("pika.channel", "newrelic.hooks.messagebroker_pika", "instrument_pika_channel")
-    _process_module_definition("pika.spec", "newrelic.hooks.messagebroker_pika", "instrument_pika_spec")
-
-    _process_module_definition(
-        "pyelasticsearch.client",
-        "newrelic.hooks.datastore_pyelasticsearch",
-        "instrument_pyelasticsearch_client",
-    )
-
-    _process_module_definition(
-        "pymongo.connection",
-        "newrelic.hooks.datastore_pymongo",
-        "instrument_pymongo_connection",
-    )
-    _process_module_definition(
-        "pymongo.mongo_client",
-        "newrelic.hooks.datastore_pymongo",
-        "instrument_pymongo_mongo_client",
-    )
-    _process_module_definition(
-        "pymongo.collection",
-        "newrelic.hooks.datastore_pymongo",
-        "instrument_pymongo_collection",
-    )
-
+    ),
+    ("pika.adapters", "newrelic.hooks.messagebroker_pika", "instrument_pika_adapters"),
+    ("pika.channel", "newrelic.hooks.messagebroker_pika", "instrument_pika_channel"),
+    ("pika.spec", "newrelic.hooks.messagebroker_pika", "instrument_pika_spec"),
+    ("pyelasticsearch.client", "newrelic.hooks.datastore_pyelasticsearch", "instrument_pyelasticsearch_client"),
+    ("pymongo.connection", "newrelic.hooks.datastore_pymongo", "instrument_pymongo_connection"),
+    ("pymongo.mongo_client", "newrelic.hooks.datastore_pymongo", "instrument_pymongo_mongo_client"),
+    ("pymongo.collection", "newrelic.hooks.datastore_pymongo", "instrument_pymongo_collection"),
     # Redis v4.2+
-    _process_module_definition(
-        "redis.asyncio.client", "newrelic.hooks.datastore_redis", "instrument_asyncio_redis_client"
-    )
-
+    ("redis.asyncio.client", "newrelic.hooks.datastore_redis", "instrument_asyncio_redis_client"),
     # Redis v4.2+
-    _process_module_definition(
-        "redis.asyncio.commands", "newrelic.hooks.datastore_redis", "instrument_asyncio_redis_client"
-    )
-
+    ("redis.asyncio.commands", "newrelic.hooks.datastore_redis", "instrument_asyncio_redis_client"),
     # Redis v4.2+
-    _process_module_definition(
-        "redis.asyncio.connection", "newrelic.hooks.datastore_redis", "instrument_asyncio_redis_connection"
-    )
-
-    _process_module_definition(
-        "redis.connection",
-        "newrelic.hooks.datastore_redis",
-        "instrument_redis_connection",
-    )
-    _process_module_definition("redis.client", "newrelic.hooks.datastore_redis", "instrument_redis_client")
-
-    _process_module_definition(
-        "redis.commands.cluster", "newrelic.hooks.datastore_redis", "instrument_redis_commands_cluster"
-    )
-
-    _process_module_definition(
-        "redis.commands.core", "newrelic.hooks.datastore_redis", "instrument_redis_commands_core"
-    )
-
-    _process_module_definition(
-        "redis.commands.sentinel", "newrelic.hooks.datastore_redis", "instrument_redis_commands_sentinel"
-    )
-
-    _process_module_definition(
-        "redis.commands.json.commands", "newrelic.hooks.datastore_redis", "instrument_redis_commands_json_commands"
-    )
-
-    _process_module_definition(
-        "redis.commands.search.commands", "newrelic.hooks.datastore_redis", "instrument_redis_commands_search_commands"
-    )
-
-    _process_module_definition(
+    ("redis.asyncio.connection", "newrelic.hooks.datastore_redis", "instrument_asyncio_redis_connection"),
+    ("redis.connection", "newrelic.hooks.datastore_redis", "instrument_redis_connection"),
+    ("redis.client", "newrelic.hooks.datastore_redis", "instrument_redis_client"),
+    ("redis.commands.cluster", "newrelic.hooks.datastore_redis", "instrument_redis_commands_cluster"),
+    ("redis.commands.core", "newrelic.hooks.datastore_redis", "instrument_redis_commands_core"),
+    ("redis.commands.sentinel", "newrelic.hooks.datastore_redis", "instrument_redis_commands_sentinel"),
+    ("redis.commands.json.commands", "newrelic.hooks.datastore_redis", "instrument_redis_commands_json_commands"),
+    ("redis.commands.search.commands", "newrelic.hooks.datastore_redis", "instrument_redis_commands_search_commands"),
+    (
         "redis.commands.timeseries.commands",
         "newrelic.hooks.datastore_redis",
         "instrument_redis_commands_timeseries_commands",
-    )
-
-    _process_module_definition(
-        "redis.commands.bf.commands", "newrelic.hooks.datastore_redis", "instrument_redis_commands_bf_commands"
-    )
-
-    _process_module_definition(
-        "redis.commands.graph.commands", "newrelic.hooks.datastore_redis", "instrument_redis_commands_graph_commands"
-    )
-
-    _process_module_definition("motor", "newrelic.hooks.datastore_motor", "patch_motor")
-
-    _process_module_definition(
-        "piston.resource",
-        "newrelic.hooks.component_piston",
-        "instrument_piston_resource",
-    )
-    _process_module_definition("piston.doc", "newrelic.hooks.component_piston", "instrument_piston_doc")
-
-    _process_module_definition(
-        "tastypie.resources",
-        "newrelic.hooks.component_tastypie",
-        "instrument_tastypie_resources",
-    )
-    _process_module_definition("tastypie.api", "newrelic.hooks.component_tastypie", "instrument_tastypie_api")
-
-    _process_module_definition(
-        "sklearn.metrics",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_metrics",
-    )
-
-    _process_module_definition(
-        "sklearn.tree._classes",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_tree_models",
-    )
+    ),
+    ("redis.commands.bf.commands", "newrelic.hooks.datastore_redis", "instrument_redis_commands_bf_commands"),
+    ("redis.commands.graph.commands", "newrelic.hooks.datastore_redis", "instrument_redis_commands_graph_commands"),
+    ("motor", "newrelic.hooks.datastore_motor", "patch_motor"),
+    ("piston.resource", "newrelic.hooks.component_piston", "instrument_piston_resource"),
+    ("piston.doc", "newrelic.hooks.component_piston", "instrument_piston_doc"),
+    ("tastypie.resources", "newrelic.hooks.component_tastypie", "instrument_tastypie_resources"),
+    ("tastypie.api", "newrelic.hooks.component_tastypie", "instrument_tastypie_api"),
+    ("sklearn.metrics", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_metrics"),
+    ("sklearn.tree._classes", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_tree_models"),
     # In scikit-learn < 0.21 the model classes are in tree.py instead of _classes.py.
-    _process_module_definition(
-        "sklearn.tree.tree",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_tree_models",
-    )
-
-    _process_module_definition(
-        "sklearn.compose._column_transformer",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_compose_models",
-    )
-
-    _process_module_definition(
-        "sklearn.compose._target",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_compose_models",
-    )
-
-    _process_module_definition(
+    ("sklearn.tree.tree", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_tree_models"),
+    ("sklearn.compose._column_transformer", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_compose_models"),
+    ("sklearn.compose._target", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_compose_models"),
+    (
         "sklearn.covariance._empirical_covariance",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_covariance_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.covariance.empirical_covariance_",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_covariance_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.covariance.shrunk_covariance_",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_covariance_shrunk_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.covariance._shrunk_covariance",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_covariance_shrunk_models",
-    )
-
-    _process_module_definition(
-        "sklearn.covariance.robust_covariance_",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_covariance_models",
-    )
-
-    _process_module_definition(
-        "sklearn.covariance._robust_covariance",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_covariance_models",
-    )
-
-    _process_module_definition(
-        "sklearn.covariance.graph_lasso_",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_covariance_graph_models",
-    )
-
-    _process_module_definition(
-        "sklearn.covariance._graph_lasso",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_covariance_graph_models",
-    )
-
-    _process_module_definition(
-        "sklearn.covariance.elliptic_envelope",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_covariance_models",
-    )
-
-    _process_module_definition(
-        "sklearn.covariance._elliptic_envelope",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_covariance_models",
-    )
-
-    _process_module_definition(
-        "sklearn.ensemble._bagging",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_ensemble_bagging_models",
-    )
-
-    _process_module_definition(
-        "sklearn.ensemble.bagging",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_ensemble_bagging_models",
-    )
-
-    _process_module_definition(
-        "sklearn.ensemble._forest",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_ensemble_forest_models",
-    )
-
-    _process_module_definition(
-        "sklearn.ensemble.forest",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_ensemble_forest_models",
-    )
-
-    _process_module_definition(
-        "sklearn.ensemble._iforest",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_ensemble_iforest_models",
-    )
-
-    _process_module_definition(
-        "sklearn.ensemble.iforest",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_ensemble_iforest_models",
-    )
-
-    _process_module_definition(
+    ),
+    ("sklearn.covariance.robust_covariance_", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_covariance_models"),
+    ("sklearn.covariance._robust_covariance", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_covariance_models"),
+    ("sklearn.covariance.graph_lasso_", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_covariance_graph_models"),
+    ("sklearn.covariance._graph_lasso", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_covariance_graph_models"),
+    ("sklearn.covariance.elliptic_envelope", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_covariance_models"),
+    ("sklearn.covariance._elliptic_envelope", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_covariance_models"),
+    ("sklearn.ensemble._bagging", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_ensemble_bagging_models"),
+    ("sklearn.ensemble.bagging", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_ensemble_bagging_models"),
+    ("sklearn.ensemble._forest", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_ensemble_forest_models"),
+    ("sklearn.ensemble.forest", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_ensemble_forest_models"),
+    ("sklearn.ensemble._iforest", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_ensemble_iforest_models"),
+    ("sklearn.ensemble.iforest", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_ensemble_iforest_models"),
+    (
         "sklearn.ensemble._weight_boosting",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_ensemble_weight_boosting_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.ensemble.weight_boosting",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_ensemble_weight_boosting_models",
-    )
-
-    _process_module_definition(
-        "sklearn.ensemble._gb",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_ensemble_gradient_boosting_models",
-    )
-
-    _process_module_definition(
+    ),
+    ("sklearn.ensemble._gb", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_ensemble_gradient_boosting_models"),
+    (
         "sklearn.ensemble.gradient_boosting",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_ensemble_gradient_boosting_models",
-    )
-
-    _process_module_definition(
-        "sklearn.ensemble._voting",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_ensemble_voting_models",
-    )
-
-    _process_module_definition(
+    ),
+    ("sklearn.ensemble._voting", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_ensemble_voting_models"),
+    (
         "sklearn.ensemble.voting_classifier",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_ensemble_voting_models",
-    )
-
-    _process_module_definition(
-        "sklearn.ensemble._stacking",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_ensemble_stacking_models",
-    )
-
-    _process_module_definition(
+    ),
+    ("sklearn.ensemble._stacking", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_ensemble_stacking_models"),
+    (
         "sklearn.ensemble._hist_gradient_boosting.gradient_boosting",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_ensemble_hist_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model._base",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model.base",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model._bayes",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_bayes_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model.bayes",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_bayes_models",
-    )
-
-    _process_module_definition(
+    ),
+    ("sklearn.linear_model._base", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_models"),
+    ("sklearn.linear_model.base", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_models"),
+    ("sklearn.linear_model._bayes", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_bayes_models"),
+    ("sklearn.linear_model.bayes", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_bayes_models"),
+    (
         "sklearn.linear_model._least_angle",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_linear_least_angle_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.linear_model.least_angle",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_linear_least_angle_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.linear_model.coordinate_descent",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_linear_coordinate_descent_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.linear_model._coordinate_descent",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_linear_coordinate_descent_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model._glm",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_GLM_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model._huber",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model.huber",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_models",
-    )
-
-    _process_module_definition(
+    ),
+    ("sklearn.linear_model._glm", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_GLM_models"),
+    ("sklearn.linear_model._huber", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_models"),
+    ("sklearn.linear_model.huber", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_models"),
+    (
         "sklearn.linear_model._stochastic_gradient",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_linear_stochastic_gradient_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.linear_model.stochastic_gradient",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_linear_stochastic_gradient_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model._ridge",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_ridge_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model.ridge",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_ridge_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model._logistic",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_logistic_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model.logistic",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_logistic_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model._omp",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_OMP_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model.omp",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_OMP_models",
-    )
-
-    _process_module_definition(
+    ),
+    ("sklearn.linear_model._ridge", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_ridge_models"),
+    ("sklearn.linear_model.ridge", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_ridge_models"),
+    ("sklearn.linear_model._logistic", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_logistic_models"),
+    ("sklearn.linear_model.logistic", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_logistic_models"),
+    ("sklearn.linear_model._omp", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_OMP_models"),
+    ("sklearn.linear_model.omp", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_OMP_models"),
+    (
         "sklearn.linear_model._passive_aggressive",
         "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_passive_aggressive_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model.passive_aggressive",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_passive_aggressive_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model._perceptron",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model.perceptron",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model._quantile",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model._ransac",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model.ransac",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model._theil_sen",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_models",
-    )
-
-    _process_module_definition(
-        "sklearn.linear_model.theil_sen",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_linear_models",
-    )
-
-    _process_module_definition(
+        "instrument_sklearn_linear_passive_aggressive_models",
+    ),
+    (
+        "sklearn.linear_model.passive_aggressive",
+        "newrelic.hooks.mlmodel_sklearn",
+        "instrument_sklearn_linear_passive_aggressive_models",
+    ),
+    ("sklearn.linear_model._perceptron", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_models"),
+    ("sklearn.linear_model.perceptron", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_models"),
+    ("sklearn.linear_model._quantile", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_models"),
+    ("sklearn.linear_model._ransac", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_models"),
+    ("sklearn.linear_model.ransac", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_models"),
+    ("sklearn.linear_model._theil_sen", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_models"),
+    ("sklearn.linear_model.theil_sen", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_linear_models"),
+    (
         "sklearn.cross_decomposition._pls",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_cross_decomposition_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.cross_decomposition.pls_",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_cross_decomposition_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.discriminant_analysis",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_discriminant_analysis_models",
-    )
-
-    _process_module_definition(
-        "sklearn.gaussian_process._gpc",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_gaussian_process_models",
-    )
-
-    _process_module_definition(
-        "sklearn.gaussian_process.gpc",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_gaussian_process_models",
-    )
-
-    _process_module_definition(
-        "sklearn.gaussian_process._gpr",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_gaussian_process_models",
-    )
-
-    _process_module_definition(
-        "sklearn.gaussian_process.gpr",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_gaussian_process_models",
-    )
-
-    _process_module_definition(
-        "sklearn.dummy",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_dummy_models",
-    )
-
-    _process_module_definition(
+    ),
+    ("sklearn.gaussian_process._gpc", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_gaussian_process_models"),
+    ("sklearn.gaussian_process.gpc", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_gaussian_process_models"),
+    ("sklearn.gaussian_process._gpr", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_gaussian_process_models"),
+    ("sklearn.gaussian_process.gpr", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_gaussian_process_models"),
+    ("sklearn.dummy", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_dummy_models"),
+    (
         "sklearn.feature_selection._rfe",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_feature_selection_rfe_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.feature_selection.rfe",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_feature_selection_rfe_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.feature_selection._variance_threshold",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_feature_selection_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.feature_selection.variance_threshold",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_feature_selection_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.feature_selection._from_model",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_feature_selection_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.feature_selection.from_model",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_feature_selection_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.feature_selection._sequential",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_feature_selection_models",
-    )
-
-    _process_module_definition(
-        "sklearn.kernel_ridge",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_kernel_ridge_models",
-    )
-
-    _process_module_definition(
+    ),
+    ("sklearn.kernel_ridge", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_kernel_ridge_models"),
+    (
         "sklearn.neural_network._multilayer_perceptron",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_neural_network_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.neural_network.multilayer_perceptron",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_neural_network_models",
-    )
-
-    _process_module_definition(
-        "sklearn.neural_network._rbm",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_neural_network_models",
-    )
-
-    _process_module_definition(
-        "sklearn.neural_network.rbm",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_neural_network_models",
-    )
-
-    _process_module_definition(
-        "sklearn.calibration",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_calibration_models",
-    )
-
-    _process_module_definition(
-        "sklearn.cluster._affinity_propagation",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_cluster_models",
-    )
-
-    _process_module_definition(
-        "sklearn.cluster.affinity_propagation_",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_cluster_models",
-    )
-
-    _process_module_definition(
+    ),
+    ("sklearn.neural_network._rbm", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_neural_network_models"),
+    ("sklearn.neural_network.rbm", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_neural_network_models"),
+    ("sklearn.calibration", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_calibration_models"),
+    ("sklearn.cluster._affinity_propagation", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_cluster_models"),
+    ("sklearn.cluster.affinity_propagation_", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_cluster_models"),
+    (
         "sklearn.cluster._agglomerative",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_cluster_agglomerative_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.cluster.hierarchical",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_cluster_agglomerative_models",
-    )
-
-    _process_module_definition(
-        "sklearn.cluster._birch",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_cluster_models",
-    )
-
-    _process_module_definition(
-        "sklearn.cluster.birch",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_cluster_models",
-    )
-
-    _process_module_definition(
-        "sklearn.cluster._bisect_k_means",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_cluster_kmeans_models",
-    )
-
-    _process_module_definition(
-        "sklearn.cluster._dbscan",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_cluster_models",
-    )
-
-    _process_module_definition(
-        "sklearn.cluster.dbscan_",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_cluster_models",
-    )
-
-    _process_module_definition(
-        "sklearn.cluster._feature_agglomeration",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_cluster_models",
-    )
-
-    _process_module_definition(
-        "sklearn.cluster._kmeans",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_cluster_kmeans_models",
-    )
-
-    _process_module_definition(
-        "sklearn.cluster.k_means_",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_cluster_kmeans_models",
-    )
-
-    _process_module_definition(
-        "sklearn.cluster._mean_shift",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_cluster_models",
-    )
-
-    _process_module_definition(
-        "sklearn.cluster.mean_shift_",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_cluster_models",
-    )
-
-    _process_module_definition(
-        "sklearn.cluster._optics",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_cluster_models",
-    )
-
-    _process_module_definition(
-        "sklearn.cluster._spectral",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_cluster_clustering_models",
-    )
-
-    _process_module_definition(
-        "sklearn.cluster.spectral",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_cluster_clustering_models",
-    )
-
-    _process_module_definition(
-        "sklearn.cluster._bicluster",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_cluster_clustering_models",
-    )
-
-    _process_module_definition(
-        "sklearn.cluster.bicluster",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_cluster_clustering_models",
-    )
-
-    _process_module_definition(
-        "sklearn.multiclass",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_multiclass_models",
-    )
-
-    _process_module_definition(
-        "sklearn.multioutput",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_multioutput_models",
-    )
-
-    _process_module_definition(
-        "sklearn.naive_bayes",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_naive_bayes_models",
-    )
-
-    _process_module_definition(
-        "sklearn.model_selection._search",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_model_selection_models",
-    )
-
-    _process_module_definition(
-        "sklearn.mixture._bayesian_mixture",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_mixture_models",
-    )
-
-    _process_module_definition(
-        "sklearn.mixture.bayesian_mixture",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_mixture_models",
-    )
-
-    _process_module_definition(
-        "sklearn.mixture._gaussian_mixture",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_mixture_models",
-    )
-
-    _process_module_definition(
-        "sklearn.mixture.gaussian_mixture",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_mixture_models",
-    )
-
-    _process_module_definition(
-        "sklearn.pipeline",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_pipeline_models",
-    )
-
-    _process_module_definition(
+    ),
+    ("sklearn.cluster._birch", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_cluster_models"),
+    ("sklearn.cluster.birch", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_cluster_models"),
+    ("sklearn.cluster._bisect_k_means", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_cluster_kmeans_models"),
+    ("sklearn.cluster._dbscan", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_cluster_models"),
+    ("sklearn.cluster.dbscan_", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_cluster_models"),
+    ("sklearn.cluster._feature_agglomeration", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_cluster_models"),
+    ("sklearn.cluster._kmeans", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_cluster_kmeans_models"),
+    ("sklearn.cluster.k_means_", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_cluster_kmeans_models"),
+    ("sklearn.cluster._mean_shift", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_cluster_models"),
+    ("sklearn.cluster.mean_shift_", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_cluster_models"),
+    ("sklearn.cluster._optics", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_cluster_models"),
+    ("sklearn.cluster._spectral", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_cluster_clustering_models"),
+    ("sklearn.cluster.spectral", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_cluster_clustering_models"),
+    ("sklearn.cluster._bicluster", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_cluster_clustering_models"),
+    ("sklearn.cluster.bicluster", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_cluster_clustering_models"),
+    ("sklearn.multiclass", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_multiclass_models"),
+    ("sklearn.multioutput", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_multioutput_models"),
+    ("sklearn.naive_bayes", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_naive_bayes_models"),
+    ("sklearn.model_selection._search", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_model_selection_models"),
+    ("sklearn.mixture._bayesian_mixture", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_mixture_models"),
+    ("sklearn.mixture.bayesian_mixture", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_mixture_models"),
+    ("sklearn.mixture._gaussian_mixture", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_mixture_models"),
+    ("sklearn.mixture.gaussian_mixture", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_mixture_models"),
+    ("sklearn.pipeline", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_pipeline_models"),
+    (
         "sklearn.semi_supervised._label_propagation",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_semi_supervised_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.semi_supervised._self_training",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_semi_supervised_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.semi_supervised.label_propagation",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_semi_supervised_models",
-    )
-
-    _process_module_definition(
-        "sklearn.svm._classes",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_svm_models",
-    )
-
-    _process_module_definition(
-        "sklearn.svm.classes",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_svm_models",
-    )
-
-    _process_module_definition(
+    ),
+    ("sklearn.svm._classes", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_svm_models"),
+    ("sklearn.svm.classes", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_svm_models"),
+    (
         "sklearn.neighbors._classification",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_neighbors_KRadius_models",
-    )
-
-    _process_module_definition(
+    ),
+    (
         "sklearn.neighbors.classification",
         "newrelic.hooks.mlmodel_sklearn",
         "instrument_sklearn_neighbors_KRadius_models",
-    )
-
-    _process_module_definition(
-        "sklearn.neighbors._graph",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_neighbors_KRadius_models",
-    )
-
-    _process_module_definition(
-        "sklearn.neighbors._kde",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_neighbors_models",
-    )
-
-    _process_module_definition(
-        "sklearn.neighbors.kde",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_neighbors_models",
-    )
-
-    _process_module_definition(
-        "sklearn.neighbors._lof",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_neighbors_models",
-    )
-
-    _process_module_definition(
-        "sklearn.neighbors.lof",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_neighbors_models",
-    )
-
-    _process_module_definition(
-        "sklearn.neighbors._nca",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_neighbors_models",
-    )
-
-    _process_module_definition(
-        "sklearn.neighbors._nearest_centroid",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_neighbors_models",
-    )
-
-    _process_module_definition(
-        "sklearn.neighbors.nearest_centroid",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_neighbors_models",
-    )
-
-    _process_module_definition(
-        "sklearn.neighbors._regression",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_neighbors_KRadius_models",
-    )
-
-    _process_module_definition(
-        "sklearn.neighbors.regression",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_neighbors_KRadius_models",
-    )
-
-    _process_module_definition(
-        "sklearn.neighbors._unsupervised",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_neighbors_models",
-    )
-
-    _process_module_definition(
-        "sklearn.neighbors.unsupervised",
-        "newrelic.hooks.mlmodel_sklearn",
-        "instrument_sklearn_neighbors_models",
-    )
-
-    _process_module_definition(
-        "rest_framework.views",
-        "newrelic.hooks.component_djangorestframework",
-        "instrument_rest_framework_views",
-    )
-    _process_module_definition(
+    ),
+    ("sklearn.neighbors._graph", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_neighbors_KRadius_models"),
+    ("sklearn.neighbors._kde", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_neighbors_models"),
+    ("sklearn.neighbors.kde", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_neighbors_models"),
+    ("sklearn.neighbors._lof", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_neighbors_models"),
+    ("sklearn.neighbors.lof", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_neighbors_models"),
+    ("sklearn.neighbors._nca", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_neighbors_models"),
+    ("sklearn.neighbors._nearest_centroid", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_neighbors_models"),
+    ("sklearn.neighbors.nearest_centroid", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_neighbors_models"),
+    ("sklearn.neighbors._regression", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_neighbors_KRadius_models"),
+    ("sklearn.neighbors.regression", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_neighbors_KRadius_models"),
+    ("sklearn.neighbors._unsupervised", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_neighbors_models"),
+    ("sklearn.neighbors.unsupervised", "newrelic.hooks.mlmodel_sklearn", "instrument_sklearn_neighbors_models"),
+    ("rest_framework.views", "newrelic.hooks.component_djangorestframework", "instrument_rest_framework_views"),
+    (
         "rest_framework.decorators",
         "newrelic.hooks.component_djangorestframework",
         "instrument_rest_framework_decorators",
-    )
-
-    _process_module_definition(
-        "celery.task.base",
-        "newrelic.hooks.application_celery",
-        "instrument_celery_app_task",
-    )
-    _process_module_definition(
-        "celery.app.task",
-        "newrelic.hooks.application_celery",
-        "instrument_celery_app_task",
-    )
-    _process_module_definition("celery.worker", "newrelic.hooks.application_celery", "instrument_celery_worker")
-    _process_module_definition(
-        "celery.concurrency.processes",
-        "newrelic.hooks.application_celery",
-        "instrument_celery_worker",
-    )
-    _process_module_definition(
-        "celery.concurrency.prefork",
-        "newrelic.hooks.application_celery",
-        "instrument_celery_worker",
-    )
-
-    _process_module_definition(
-        "celery.execute.trace",
-        "newrelic.hooks.application_celery",
-        "instrument_celery_execute_trace",
-    )
-    _process_module_definition(
-        "celery.task.trace",
-        "newrelic.hooks.application_celery",
-        "instrument_celery_execute_trace",
-    )
-    _process_module_definition(
-        "celery.app.trace",
-        "newrelic.hooks.application_celery",
-        "instrument_celery_execute_trace",
-    )
-    _process_module_definition("billiard.pool", "newrelic.hooks.application_celery", "instrument_billiard_pool")
-
-    _process_module_definition("flup.server.cgi", "newrelic.hooks.adapter_flup", "instrument_flup_server_cgi")
-    _process_module_definition(
-        "flup.server.ajp_base",
-        "newrelic.hooks.adapter_flup",
-        "instrument_flup_server_ajp_base",
-    )
-    _process_module_definition(
-        "flup.server.fcgi_base",
-        "newrelic.hooks.adapter_flup",
-        "instrument_flup_server_fcgi_base",
-    )
-    _process_module_definition(
-        "flup.server.scgi_base",
-        "newrelic.hooks.adapter_flup",
-        "instrument_flup_server_scgi_base",
-    )
-
-    _process_module_definition("pywapi", "newrelic.hooks.external_pywapi", "instrument_pywapi")
-
-    _process_module_definition(
-        "meinheld.server",
-        "newrelic.hooks.adapter_meinheld",
-        "instrument_meinheld_server",
-    )
-
-    _process_module_definition(
-        "waitress.server",
-        "newrelic.hooks.adapter_waitress",
-        "instrument_waitress_server",
-    )
-
-    _process_module_definition("gevent.wsgi", "newrelic.hooks.adapter_gevent", "instrument_gevent_wsgi")
-    _process_module_definition("gevent.pywsgi", "newrelic.hooks.adapter_gevent", "instrument_gevent_pywsgi")
-
-    _process_module_definition(
-        "wsgiref.simple_server",
-        "newrelic.hooks.adapter_wsgiref",
-        "instrument_wsgiref_simple_server",
-    )
-
-    _process_module_definition(
-        "cherrypy.wsgiserver",
-        "newrelic.hooks.adapter_cherrypy",
-        "instrument_cherrypy_wsgiserver",
-    )
-
-    _process_module_definition(
-        "cheroot.wsgi",
-        "newrelic.hooks.adapter_cheroot",
-        "instrument_cheroot_wsgiserver",
-    )
-
-    _process_module_definition(
-        "pyramid.router",
-        "newrelic.hooks.framework_pyramid",
-        "instrument_pyramid_router",
-    )
-    _process_module_definition(
-        "pyramid.config",
-        "newrelic.hooks.framework_pyramid",
-        "instrument_pyramid_config_views",
-    )
-    _process_module_definition(
-        "pyramid.config.views",
-        "newrelic.hooks.framework_pyramid",
-        "instrument_pyramid_config_views",
-    )
-    _process_module_definition(
-        "pyramid.config.tweens",
-        "newrelic.hooks.framework_pyramid",
-        "instrument_pyramid_config_tweens",
-    )
-
-    _process_module_definition(
-        "cornice.service",
-        "newrelic.hooks.component_cornice",
-        "instrument_cornice_service",
-    )
-
-    _process_module_definition("gevent.monkey", "newrelic.hooks.coroutines_gevent", "instrument_gevent_monkey")
-
-    _process_module_definition(
-        "weberror.errormiddleware",
-        "newrelic.hooks.middleware_weberror",
-        "instrument_weberror_errormiddleware",
-    )
-    _process_module_definition(
-        "weberror.reporter",
-        "newrelic.hooks.middleware_weberror",
-        "instrument_weberror_reporter",
-    )
+    ),
+    ("celery.task.base", "newrelic.hooks.application_celery", "instrument_celery_app_task"),
+    ("celery.app.task", "newrelic.hooks.application_celery", "instrument_celery_app_task"),
+    ("celery.worker", "newrelic.hooks.application_celery", "instrument_celery_worker"),
+    ("celery.concurrency.processes", "newrelic.hooks.application_celery", "instrument_celery_worker"),
+    ("celery.concurrency.prefork", "newrelic.hooks.application_celery", "instrument_celery_worker"),
+    ("celery.execute.trace", "newrelic.hooks.application_celery", "instrument_celery_execute_trace"),
+    ("celery.task.trace", "newrelic.hooks.application_celery", "instrument_celery_execute_trace"),
+    ("celery.app.trace", "newrelic.hooks.application_celery", "instrument_celery_execute_trace"),
+    ("billiard.pool", "newrelic.hooks.application_celery", "instrument_billiard_pool"),
+    ("flup.server.cgi", "newrelic.hooks.adapter_flup", "instrument_flup_server_cgi"),
+    ("flup.server.ajp_base", "newrelic.hooks.adapter_flup", "instrument_flup_server_ajp_base"),
+    ("flup.server.fcgi_base", "newrelic.hooks.adapter_flup", "instrument_flup_server_fcgi_base"),
+    ("flup.server.scgi_base", "newrelic.hooks.adapter_flup", "instrument_flup_server_scgi_base"),
+    ("pywapi", "newrelic.hooks.external_pywapi", "instrument_pywapi"),
+    ("meinheld.server", "newrelic.hooks.adapter_meinheld", "instrument_meinheld_server"),
+    ("waitress.server", "newrelic.hooks.adapter_waitress", "instrument_waitress_server"),
+    ("gevent.wsgi", "newrelic.hooks.adapter_gevent", "instrument_gevent_wsgi"),
+    ("gevent.pywsgi", "newrelic.hooks.adapter_gevent", "instrument_gevent_pywsgi"),
+    ("wsgiref.simple_server", "newrelic.hooks.adapter_wsgiref", "instrument_wsgiref_simple_server"),
+    ("cherrypy.wsgiserver", "newrelic.hooks.adapter_cherrypy", "instrument_cherrypy_wsgiserver"),
+    ("cheroot.wsgi", "newrelic.hooks.adapter_cheroot", "instrument_cheroot_wsgiserver"),
+    ("pyramid.router", "newrelic.hooks.framework_pyramid", "instrument_pyramid_router"),
+    ("pyramid.config", "newrelic.hooks.framework_pyramid", "instrument_pyramid_config_views"),
+    ("pyramid.config.views", "newrelic.hooks.framework_pyramid", "instrument_pyramid_config_views"),
+    ("pyramid.config.tweens", "newrelic.hooks.framework_pyramid", "instrument_pyramid_config_tweens"),
+    ("cornice.service", "newrelic.hooks.component_cornice", "instrument_cornice_service"),
+    ("gevent.monkey", "newrelic.hooks.coroutines_gevent", "instrument_gevent_monkey"),
+    ("weberror.errormiddleware", "newrelic.hooks.middleware_weberror", "instrument_weberror_errormiddleware"),
+    ("weberror.reporter", "newrelic.hooks.middleware_weberror", "instrument_weberror_reporter"),
+    ("thrift.transport.TSocket", "newrelic.hooks.external_thrift", "instrument"),
+    ("gearman.client", "newrelic.hooks.application_gearman", "instrument_gearman_client"),
+    ("gearman.connection_manager", "newrelic.hooks.application_gearman", "instrument_gearman_connection_manager"),
+    ("gearman.worker", "newrelic.hooks.application_gearman", "instrument_gearman_worker"),
+    ("botocore.endpoint", "newrelic.hooks.external_botocore", "instrument_botocore_endpoint"),
+    ("botocore.client", "newrelic.hooks.external_botocore", "instrument_botocore_client"),
+    ("tornado.httpserver", "newrelic.hooks.framework_tornado", "instrument_tornado_httpserver"),
+    ("tornado.httputil", "newrelic.hooks.framework_tornado", "instrument_tornado_httputil"),
+    ("tornado.httpclient", "newrelic.hooks.framework_tornado", "instrument_tornado_httpclient"),
+    ("tornado.routing", "newrelic.hooks.framework_tornado", "instrument_tornado_routing"),
+    ("tornado.web", "newrelic.hooks.framework_tornado", "instrument_tornado_web"),
+)
 
-    _process_module_definition("thrift.transport.TSocket", "newrelic.hooks.external_thrift")
 
-    _process_module_definition(
-        "gearman.client",
-        "newrelic.hooks.application_gearman",
-        "instrument_gearman_client",
-    )
-    _process_module_definition(
-        "gearman.connection_manager",
-        "newrelic.hooks.application_gearman",
-        "instrument_gearman_connection_manager",
-    )
-    _process_module_definition(
-        "gearman.worker",
-        "newrelic.hooks.application_gearman",
-        "instrument_gearman_worker",
-    )
+def _process_module_builtin_defaults():
+    _process_module_definitions(_MODULE_BUILTIN_DEFAULTS)
 
-    _process_module_definition(
-        "botocore.endpoint",
-        "newrelic.hooks.external_botocore",
-        "instrument_botocore_endpoint",
-    )
-    _process_module_definition(
-        "botocore.client",
-        "newrelic.hooks.external_botocore",
-        "instrument_botocore_client",
-    )
 
-    _process_module_definition(
-        "tornado.httpserver",
-        "newrelic.hooks.framework_tornado",
-        "instrument_tornado_httpserver",
-    )
-    _process_module_definition(
-        "tornado.httputil",
-        "newrelic.hooks.framework_tornado",
-        "instrument_tornado_httputil",
-    )
-    _process_module_definition(
-        "tornado.httpclient",
-        "newrelic.hooks.framework_tornado",
-        "instrument_tornado_httpclient",
+def _module_entry_points(group):
+    return entry_points(
+        group,
+        cache_enabled=_settings.entry_points_cache.enabled,
+        cache_directory=_settings.entry_points_cache.directory,
     )
-    _process_module_definition(
-        "tornado.routing",
-        "newrelic.hooks.framework_tornado",
-        "instrument_tornado_routing",
-    )
-    _process_module_definition("tornado.web", "newrelic.hooks.framework_tornado", "instrument_tornado_web")
 
 
 def _process_module_entry_points():
-    try:
-        import pkg_resources
-    except ImportError:
-        return
-
-    group = "newrelic.hooks"
-
-    for entrypoint in pkg_resources.iter_entry_points(group=group):
-        target = entrypoint.name
+    definitions = []
 
+    for target, module, function in _module_entry_points("newrelic.hooks"):
         if target in _module_import_hook_registry:
             continue
 
-        module = entrypoint.module_name
-
-        if entrypoint.attrs:
-            function = ".".join(entrypoint.attrs)
-        else:
-            function = "instrument"
+        definitions.append((target, module, function or "instrument"))
 
-        _process_module_definition(target, module, function)
+    _process_module_definitions(definitions)
 
 
 _instrumentation_done = False
@@ -4013,16 +2885,9 @@ def _setup_instrumentation():
 
 
 def _setup_extensions():
-    try:
-        import pkg_resources
-    except ImportError:
-        return
-
-    group = "newrelic.extension"
-
-    for entrypoint in pkg_resources.iter_entry_points(group=group):
-        __import__(entrypoint.module_name)
-        module = sys.modules[entrypoint.module_name]
+    for _, module_name, _ in _module_entry_points("newrelic.extension"):
+        __import__(module_name)
+        module = sys.modules[module_name]
         module.initialize()
 
 
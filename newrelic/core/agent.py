@@ -551,6 +551,19 @@ class Agent(object):
 
         application.record_dimensional_metrics(metrics)
 
+    def record_dimensional_distribution(self, app_name, name, value, tags=None):
+        """Records a value, or an iterable of values, into a distribution
+        metric for the named application. If there has been no prior
+        request to activate the application, the values are discarded.
+
+        """
+
+        application = self._applications.get(app_name, None)
+        if application is None or not application.active:
+            return
+
+        application.record_dimensional_distribution(name, value, tags)
+
     def record_custom_event(self, app_name, event_type, params):
         application = self._applications.get(app_name, None)
         if application is None or not application.active:
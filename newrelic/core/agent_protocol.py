@@ -21,7 +21,8 @@ from newrelic.common.agent_http import ApplicationModeClient, ServerlessModeClie
 from newrelic.common.encoding_utils import (
     json_decode,
     json_encode,
-    serverless_payload_encode,
+    json_encode_chunks,
+    serverless_payload_encode_chunks,
 )
 from newrelic.common.utilization import (
     AWSUtilization,
@@ -178,6 +179,7 @@ class AgentProtocol(object):
             compression_method=settings.compressed_content_encoding,
             max_payload_size_in_bytes=settings.max_payload_size_in_bytes,
             audit_log_fp=audit_log_fp,
+            max_connections=self._max_connections(settings),
         )
 
         self._params = {
@@ -199,6 +201,7 @@ class AgentProtocol(object):
 
         self._headers["Content-Type"] = "application/json"
         self._run_token = settings.agent_run_id
+        self._streaming_payloads = settings.streaming_payloads.enabled
 
         # Logging
         self._proxy_host = settings.proxy_host
@@ -208,6 +211,14 @@ class AgentProtocol(object):
         # Do not access configuration anywhere inside the class
         self.configuration = settings
 
+    @staticmethod
+    def _max_connections(settings):
+        # Requests are sent concurrently by the harvest sender workers as
+        # well as by the harvest thread itself.
+        if settings.harvest_sender.enabled:
+            return settings.harvest_sender.max_workers + 1
+        return 1
+
     def __enter__(self):
         self.client.__enter__()
         return self
@@ -269,6 +280,10 @@ class AgentProtocol(object):
         params["method"] = method
         if self._run_token:
             params["run_id"] = self._run_token
+        if self._streaming_payloads:
+            # The client consumes the encoded chunks incrementally so the
+            # complete uncompressed payload is never held in memory.
+            return params, self._headers, (chunk.encode("utf-8") for chunk in json_encode_chunks(payload))
         return params, self._headers, json_encode(payload).encode("utf-8")
 
     @staticmethod
@@ -498,18 +513,34 @@ class ServerlessModeProtocol(AgentProtocol):
 
         data = self.client.finalize()
 
-        payload = {
-            "metadata": self._metadata,
-            "data": data,
-        }
+        encoded = serverless_payload_encode_chunks(self._payload_chunks(self._metadata, data))
 
-        encoded = serverless_payload_encode(payload)
-        payload = json_encode((1, "NR_LAMBDA_MONITORING", encoded))
+        # The base64 alphabet needs no escaping in a JSON string, so the
+        # encoded data is placed directly into the envelope rather than
+        # passing it through the JSON encoder again.
+        if not isinstance(encoded, str):
+            encoded = encoded.decode("ascii")
+        payload = '[1,"NR_LAMBDA_MONITORING","%s"]' % encoded
 
         print(payload)
 
         return payload
 
+    @staticmethod
+    def _payload_chunks(metadata, data):
+        # Yields the JSON for {"metadata": ..., "data": {...}} where the
+        # values in data are the already encoded JSON payloads captured
+        # by the client for each agent method.
+        yield '{"metadata":'
+        yield json_encode(metadata)
+        yield ',"data":{'
+        separator = ""
+        for method, payload in data.items():
+            yield separator + json_encode(method) + ":"
+            yield payload
+            separator = ","
+        yield "}}"
+
     @classmethod
     def connect(
         cls,
@@ -551,6 +582,7 @@ class OtlpProtocol(AgentProtocol):
             max_payload_size_in_bytes=1000000,
             audit_log_fp=audit_log_fp,
             default_content_encoding_header=None,
+            max_connections=self._max_connections(settings),
         )
 
         self._params = {}
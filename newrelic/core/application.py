@@ -25,15 +25,19 @@ import threading
 import time
 import traceback
 import warnings
+import weakref
 from functools import partial
 
+from newrelic.api.import_hook import import_hook_timings
 from newrelic.common.object_names import callable_name
 from newrelic.core.adaptive_sampler import AdaptiveSampler
 from newrelic.core.config import global_settings
 from newrelic.core.custom_event import create_custom_event
 from newrelic.core.data_collector import create_session
-from newrelic.core.database_utils import SQLConnections
+from newrelic.core.database_utils import SQLConnections, sql_statement_cache_stats
 from newrelic.core.environment import environment_settings
+from newrelic.core.explain_plan_executor import ExplainPlanExecutor
+from newrelic.core.harvest_sender import HarvestSender
 from newrelic.core.internal_metrics import (
     InternalTrace,
     InternalTraceContext,
@@ -42,7 +46,13 @@ from newrelic.core.internal_metrics import (
 )
 from newrelic.core.profile_sessions import profile_session_manager
 from newrelic.core.rules_engine import RulesEngine, SegmentCollapseEngine
-from newrelic.core.stats_engine import CustomMetrics, StatsEngine
+from newrelic.core.stats_engine import (
+    CustomMetrics,
+    DimensionalMetrics,
+    StatsEngine,
+    create_log_event,
+)
+from newrelic.core.transaction_recorder import TransactionRecorder
 from newrelic.network.exceptions import (
     DiscardDataForRequest,
     ForceAgentDisconnect,
@@ -56,6 +66,127 @@ from newrelic.samplers.data_sampler import DataSampler
 _logger = logging.getLogger(__name__)
 
 
+class _PerThreadRegistry(object):
+    """Registry of objects each owned by a single thread, into which that
+    thread records data without taking the application stats locks. The
+    registry is only locked when a thread registers its object or when a
+    harvest collects the objects. The generation is bumped whenever the
+    stats engine is reset, so stale objects are discarded by the threads
+    owning them. The factory is called with the current generation to
+    create the object for a thread.
+
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._items = []
+        self._generation = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def current(self, create=True):
+        """Returns the object for the current thread, creating and
+        registering a new one if the thread has none or its object
+        predates the last reset. Where create is false, None is returned
+        in place of creating a new object.
+
+        """
+
+        item = getattr(self._local, "item", None)
+
+        if item is None or item.generation != self._generation:
+            if not create:
+                return None
+
+            with self._lock:
+                item = self._factory(self._generation)
+                self._items.append(item)
+
+            self._local.item = item
+
+        return item
+
+    def items(self):
+        with self._lock:
+            return list(self._items)
+
+    def reset(self):
+        """Discards all registered objects along with any data they hold.
+        Threads will create fresh objects when next recording data.
+
+        """
+
+        with self._lock:
+            self._generation += 1
+            self._items = []
+
+    def discard_orphaned(self, items):
+        """Drops the objects of threads which have since exited from the
+        registry. This should only be called with the objects returned by
+        items() once their data has been collected.
+
+        """
+
+        orphaned = [item for item in items if item.orphaned]
+
+        if orphaned:
+            with self._lock:
+                self._items = [item for item in self._items if item not in orphaned]
+
+
+class _ThreadOwned(object):
+    """Base class for the objects held in a per thread registry."""
+
+    def __init__(self, generation):
+        self.lock = threading.Lock()
+        self.generation = generation
+        self.thread = weakref.ref(threading.current_thread())
+
+    @property
+    def orphaned(self):
+        thread = self.thread()
+        return thread is None or not thread.is_alive()
+
+
+class _StatsShard(_ThreadOwned):
+    """Long lived stats engine workarea owned by a single thread. Data for
+    transactions completed on that thread accumulates here without taking
+    the global application stats lock, and is folded into the main stats
+    engine at harvest time. The shard lock is only ever contended while a
+    harvest is swapping out the accumulated stats.
+
+    """
+
+    def __init__(self, stats, generation):
+        super(_StatsShard, self).__init__(generation)
+        self.stats = stats
+        self.transaction_count = 0
+        self.last_transaction = 0.0
+
+
+class _MetricsBuffer(_ThreadOwned):
+    """Custom and dimensional metrics recorded against the application,
+    outside of any transaction, by a single thread. The metrics accumulate
+    here without taking the application stats locks and are merged into
+    the stats engines at harvest time. As with a stats engine shard, the
+    buffer lock is only ever contended while a harvest is swapping out the
+    accumulated metrics. Forwarded log events recorded outside of any
+    transaction are also batched here when log event buffering is enabled.
+
+    """
+
+    def __init__(self, generation, settings=None):
+        super(_MetricsBuffer, self).__init__(generation)
+        self.settings = settings
+        self.custom_metrics = CustomMetrics()
+        self.dimensional_metrics = DimensionalMetrics(settings)
+        self.log_events = []
+        self.events_count = 0
+
+
 class Application(object):
 
     """Class which maintains recorded data for a single application."""
@@ -79,6 +210,9 @@ class Application(object):
 
         self._active_session = None
         self._harvest_enabled = False
+        self._harvest_sender = None
+        self._transaction_recorder = None
+        self._explain_plan_executor = None
 
         self._transaction_count = 0
         self._last_transaction = 0.0
@@ -106,6 +240,14 @@ class Application(object):
         self._stats_custom_lock = threading.RLock()
         self._stats_custom_engine = StatsEngine()
 
+        # Per thread stats engine shards used when sharded stats are
+        # enabled, and per thread buffers of custom and dimensional metrics
+        # recorded outside of transactions, used when thread local metrics
+        # are enabled.
+
+        self._stats_shards = _PerThreadRegistry(self._create_stats_shard)
+        self._metrics_buffers = _PerThreadRegistry(self._create_metrics_buffer)
+
         self._agent_commands_lock = threading.Lock()
         self._data_samplers_lock = threading.Lock()
         self._data_samplers_started = False
@@ -419,9 +561,11 @@ class Application(object):
                             configuration.transaction_name_rules,
                         )
 
-                    self._rules_engine["url"] = RulesEngine(configuration.url_rules)
-                    self._rules_engine["metric"] = RulesEngine(configuration.metric_name_rules)
-                    self._rules_engine["transaction"] = RulesEngine(configuration.transaction_name_rules)
+                    cache_size = configuration.agent_limits.rules_engine_cache_size
+
+                    self._rules_engine["url"] = RulesEngine(configuration.url_rules, cache_size)
+                    self._rules_engine["metric"] = RulesEngine(configuration.metric_name_rules, cache_size)
+                    self._rules_engine["transaction"] = RulesEngine(configuration.transaction_name_rules, cache_size)
                     self._rules_engine["segment"] = SegmentCollapseEngine(configuration.transaction_segment_terms)
 
                 except Exception:
@@ -513,6 +657,55 @@ class Application(object):
         with self._stats_lock:
             self._stats_engine.reset_stats(configuration)
 
+        self._stats_shards.reset()
+        self._metrics_buffers.reset()
+
+        # When the harvest sender is enabled, payloads are handed off to
+        # background threads rather than being sent from the harvest
+        # thread. Serverless mode always sends inline as the payloads
+        # are only collected to be written out when finalized.
+
+        if configuration.harvest_sender.enabled and not configuration.serverless_mode.enabled:
+            self._harvest_sender = HarvestSender(
+                max_workers=configuration.harvest_sender.max_workers,
+                max_queue_size=configuration.harvest_sender.max_queue_size,
+                max_retries=configuration.harvest_sender.max_retries,
+                retry_backoff=configuration.harvest_sender.retry_backoff,
+            )
+        else:
+            self._harvest_sender = None
+
+        # When the transaction recorder is enabled, finished transactions
+        # are recorded by a background thread rather than by the thread
+        # which ran the transaction. Serverless mode always records inline
+        # as the harvest immediately follows the transaction.
+
+        if configuration.transaction_recorder.enabled and not configuration.serverless_mode.enabled:
+            self._transaction_recorder = TransactionRecorder(
+                self._record_transaction,
+                max_queue_size=configuration.transaction_recorder.max_queue_size,
+            )
+        else:
+            self._transaction_recorder = None
+
+        # When the explain plan executor is enabled, explain plans for slow
+        # SQL are run on a background thread which holds its database
+        # connections open between harvests, and are cached so the same
+        # SQL is not explained every harvest. An executor from a prior
+        # session is kept along with its cached explain plans.
+
+        if configuration.explain_plan_executor.enabled and not configuration.serverless_mode.enabled:
+            if self._explain_plan_executor is None:
+                self._explain_plan_executor = ExplainPlanExecutor(
+                    max_connections=configuration.agent_limits.max_sql_connections,
+                    cache_size=configuration.explain_plan_executor.plan_cache_size,
+                    cache_ttl=configuration.explain_plan_executor.plan_cache_ttl,
+                    max_pending=configuration.agent_limits.sql_explain_plans_per_harvest,
+                )
+        elif self._explain_plan_executor is not None:
+            self._explain_plan_executor.shutdown(timeout=0.0)
+            self._explain_plan_executor = None
+
         # Record an initial start time for the reporting period and
         # clear record of last transaction processed.
 
@@ -831,13 +1024,25 @@ class Application(object):
         issues. It is better to record the custom metric against an
         active transaction as they will then be aggregated at the end of
         the transaction when all other metrics are aggregated and so no
-        additional locking will be required.
+        additional locking will be required. Alternatively, when thread
+        local metrics are enabled, the metric is accumulated in a buffer
+        owned by the current thread and only merged into the stats engine
+        at harvest time.
 
         """
 
         if not self._active_session:
             return
 
+        if self._active_session.configuration.thread_local_metrics.enabled:
+            buffer = self._metrics_buffers.current()
+
+            with buffer.lock:
+                buffer.events_count += 1
+                buffer.custom_metrics.record_custom_metric(name, value)
+
+            return
+
         with self._stats_custom_lock:
             self._global_events_account += 1
             self._stats_custom_engine.record_custom_metric(name, value)
@@ -851,13 +1056,26 @@ class Application(object):
         issues. It is better to record the custom metric against an
         active transaction as they will then be aggregated at the end of
         the transaction when all other metrics are aggregated and so no
-        additional locking will be required.
+        additional locking will be required. Alternatively, when thread
+        local metrics are enabled, the metric is accumulated in a buffer
+        owned by the current thread and only merged into the stats engine
+        at harvest time.
 
         """
 
         if not self._active_session:
             return
 
+        if self._active_session.configuration.thread_local_metrics.enabled:
+            buffer = self._metrics_buffers.current()
+
+            with buffer.lock:
+                for name, value in metrics:
+                    buffer.events_count += 1
+                    buffer.custom_metrics.record_custom_metric(name, value)
+
+            return
+
         with self._stats_custom_lock:
             for name, value in metrics:
                 self._global_events_account += 1
@@ -872,13 +1090,25 @@ class Application(object):
         issues. It is better to record the dimensional metric against an
         active transaction as they will then be aggregated at the end of
         the transaction when all other metrics are aggregated and so no
-        additional locking will be required.
+        additional locking will be required. Alternatively, when thread
+        local metrics are enabled, the metric is accumulated in a buffer
+        owned by the current thread and only merged into the stats engine
+        at harvest time.
 
         """
 
         if not self._active_session:
             return
 
+        if self._active_session.configuration.thread_local_metrics.enabled:
+            buffer = self._metrics_buffers.current()
+
+            with buffer.lock:
+                buffer.events_count += 1
+                buffer.dimensional_metrics.record_dimensional_metric(name, value, tags)
+
+            return
+
         with self._stats_lock:
             self._global_events_account += 1
             self._stats_engine.record_dimensional_metric(name, value, tags)
@@ -892,13 +1122,29 @@ class Application(object):
         issues. It is better to record the dimensional metric against an
         active transaction as they will then be aggregated at the end of
         the transaction when all other metrics are aggregated and so no
-        additional locking will be required.
+        additional locking will be required. Alternatively, when thread
+        local metrics are enabled, the metric is accumulated in a buffer
+        owned by the current thread and only merged into the stats engine
+        at harvest time.
 
         """
 
         if not self._active_session:
             return
 
+        if self._active_session.configuration.thread_local_metrics.enabled:
+            buffer = self._metrics_buffers.current()
+
+            with buffer.lock:
+                for metric in metrics:
+                    name, value = metric[:2]
+                    tags = metric[2] if len(metric) >= 3 else None
+
+                    buffer.events_count += 1
+                    buffer.dimensional_metrics.record_dimensional_metric(name, value, tags)
+
+            return
+
         with self._stats_lock:
             for metric in metrics:
                 name, value = metric[:2]
@@ -907,6 +1153,30 @@ class Application(object):
                 self._global_events_account += 1
                 self._stats_engine.record_dimensional_metric(name, value, tags)
 
+    def record_dimensional_distribution(self, name, value, tags=None):
+        """Record a value, or an iterable of values, into a distribution
+        metric against the application independent of a specific
+        transaction. The same locking considerations apply as for
+        record_dimensional_metric().
+
+        """
+
+        if not self._active_session:
+            return
+
+        if self._active_session.configuration.thread_local_metrics.enabled:
+            buffer = self._metrics_buffers.current()
+
+            with buffer.lock:
+                buffer.events_count += 1
+                buffer.dimensional_metrics.record_dimensional_distribution(name, value, tags)
+
+            return
+
+        with self._stats_lock:
+            self._global_events_account += 1
+            self._stats_engine.record_dimensional_distribution(name, value, tags)
+
     def record_custom_event(self, event_type, params):
         if not self._active_session:
             return
@@ -940,9 +1210,42 @@ class Application(object):
                 self._stats_engine.record_ml_event(event)
 
     def record_log_event(self, message, level=None, timestamp=None, priority=None):
+        """Record a log event against the application independent of a
+        specific transaction. When a log event buffer size is configured,
+        the event is added to a buffer owned by the current thread and the
+        buffered events are added to the stats engine together, under a
+        single acquisition of the stats lock, once the buffer is full or
+        at harvest time.
+
+        """
+
         if not self._active_session:
             return
 
+        buffer_size = self._active_session.configuration.application_logging.forwarding.buffer_size
+
+        if message and buffer_size:
+            event = create_log_event(self._active_session.configuration, message, level, timestamp)
+
+            if event is None:
+                return
+
+            buffer = self._metrics_buffers.current()
+
+            with buffer.lock:
+                buffer.log_events.append((event, priority))
+
+                if len(buffer.log_events) < buffer_size:
+                    return
+
+                events, buffer.log_events = buffer.log_events, []
+
+            with self._stats_custom_lock:
+                self._stats_engine.record_log_events(events)
+                self._global_events_account += len(events)
+
+            return
+
         if message:
             with self._stats_custom_lock:
                 event = self._stats_engine.record_log_event(message, level, timestamp, priority=priority)
@@ -952,6 +1255,18 @@ class Application(object):
     def record_transaction(self, data):
         """Record a single transaction against this application."""
 
+        if not self._active_session:
+            return
+
+        recorder = self._transaction_recorder
+
+        if recorder is not None:
+            recorder.submit(data)
+            return
+
+        self._record_transaction(data)
+
+    def _record_transaction(self, data):
         if not self._active_session:
             return
 
@@ -981,6 +1296,9 @@ class Application(object):
 
         self.validate_process()
 
+        if settings.sharded_stats.enabled:
+            return self._record_transaction_sharded(data, settings)
+
         internal_metrics = CustomMetrics()
 
         with InternalTraceContext(internal_metrics):
@@ -1033,6 +1351,120 @@ class Application(object):
                     if settings.debug.record_transaction_failure:
                         raise
 
+    def _record_transaction_sharded(self, data, settings):
+        """Record a single transaction directly into the stats engine shard
+        owned by the current thread rather than via a workarea merged
+        into the main stats engine under the global stats lock.
+
+        """
+
+        shard = self._stats_shards.current()
+
+        internal_metrics = CustomMetrics()
+
+        with shard.lock:
+            with InternalTraceContext(internal_metrics):
+                with InternalTrace("Supportability/Python/RecordTransaction/Calls/record"):
+                    try:
+                        shard.stats.record_transaction(data)
+
+                    except Exception:
+                        _logger.exception(
+                            "The generation of transaction data has "
+                            "failed. This would indicate some sort of internal "
+                            "implementation issue with the agent. Please report "
+                            "this problem to New Relic support for further "
+                            "investigation."
+                        )
+
+                        if settings.debug.record_transaction_failure:
+                            raise
+
+            shard.transaction_count += 1
+            shard.last_transaction = data.end_time
+
+            shard.stats.merge_custom_metrics(internal_metrics.metrics())
+
+    def _create_stats_shard(self, generation):
+        return _StatsShard(self._stats_engine.create_workarea(), generation)
+
+    def _merge_stats_shards(self):
+        """Swaps out the stats accumulated in each stats engine shard and
+        merges them into the main stats engine. Shards owned by threads
+        which have since exited are dropped from the registry once their
+        data has been collected.
+
+        """
+
+        shards = self._stats_shards.items()
+
+        collected = []
+
+        for shard in shards:
+            with shard.lock:
+                collected.append((shard.stats, shard.transaction_count, shard.last_transaction))
+
+                shard.stats = self._stats_engine.create_workarea()
+                shard.transaction_count = 0
+                shard.last_transaction = 0.0
+
+        with self._stats_lock:
+            for stats, transaction_count, last_transaction in collected:
+                try:
+                    self._transaction_count += transaction_count
+                    self._last_transaction = max(self._last_transaction, last_transaction)
+
+                    self._stats_engine.merge_shard(stats)
+
+                except Exception:
+                    _logger.exception(
+                        "The merging of sharded transaction data has "
+                        "failed. This would indicate some sort of "
+                        "internal implementation issue with the agent. "
+                        "Please report this problem to New Relic support "
+                        "for further investigation."
+                    )
+
+        self._stats_shards.discard_orphaned(shards)
+
+    def _create_metrics_buffer(self, generation):
+        return _MetricsBuffer(generation, self.configuration)
+
+    def _merge_metrics_buffers(self):
+        """Swaps out the metrics accumulated in each metrics buffer and
+        merges them into the stats engines. Buffers owned by threads which
+        have since exited are dropped from the registry once their metrics
+        have been collected.
+
+        """
+
+        buffers = self._metrics_buffers.items()
+
+        collected = []
+
+        for buffer in buffers:
+            with buffer.lock:
+                collected.append(
+                    (buffer.custom_metrics, buffer.dimensional_metrics, buffer.log_events, buffer.events_count)
+                )
+
+                buffer.custom_metrics = CustomMetrics()
+                buffer.dimensional_metrics = DimensionalMetrics(buffer.settings)
+                buffer.log_events = []
+                buffer.events_count = 0
+
+        with self._stats_custom_lock:
+            for custom_metrics, _, log_events, events_count in collected:
+                self._global_events_account += events_count + len(log_events)
+                self._stats_custom_engine.merge_custom_metrics(custom_metrics.metrics())
+                self._stats_engine.record_log_events(log_events)
+
+        with self._stats_lock:
+            for _, dimensional_metrics, _, _ in collected:
+                self._stats_engine.merge_dimensional_metrics(dimensional_metrics)
+
+        self._metrics_buffers.discard_orphaned(buffers)
+
     def cmd_start_profiler(self, command_id=0, **kwargs):
         """Triggered by the start_profiler agent command to start a
         thread profiling session.
@@ -1155,6 +1587,12 @@ class Application(object):
 
             return
 
+        # Include the transactions which finished before the final harvest
+        # but are yet to be recorded by the transaction recorder.
+
+        if shutdown and self._transaction_recorder is not None:
+            self._transaction_recorder.flush(timeout=self._active_session.configuration.shutdown_timeout)
+
         internal_metrics = CustomMetrics()
 
         call_metric = "flexible" if flexible else "default"
@@ -1174,6 +1612,12 @@ class Application(object):
 
                 _logger.debug("Snapshotting for harvest[%s] of %r.", call_metric, self._app_name)
 
+                if self._stats_shards:
+                    self._merge_stats_shards()
+
+                if self._metrics_buffers:
+                    self._merge_metrics_buffers()
+
                 configuration = self._active_session.configuration
                 transaction_count = self._transaction_count
 
@@ -1250,6 +1694,28 @@ class Application(object):
 
                     stats.record_custom_metric("Instance/Reporting", 0)
 
+                    # Report the effectiveness of the caches of results
+                    # from applying the normalization rules.
+
+                    for rule_type in ("url", "metric", "transaction"):
+                        hits, misses = self._rules_engine[rule_type].cache_stats()
+                        if hits or misses:
+                            internal_count_metric("Supportability/Python/RulesEngine/%s/Cache/Hits" % rule_type, hits)
+                            internal_count_metric(
+                                "Supportability/Python/RulesEngine/%s/Cache/Misses" % rule_type, misses
+                            )
+
+                    hits, misses, evictions = configuration.attribute_filter.cache_stats()
+                    if hits or misses:
+                        internal_count_metric("Supportability/Python/AttributeFilter/Cache/Hits", hits)
+                        internal_count_metric("Supportability/Python/AttributeFilter/Cache/Misses", misses)
+                        internal_count_metric("Supportability/Python/AttributeFilter/Cache/Evictions", evictions)
+
+                    hits, misses = sql_statement_cache_stats()
+                    if hits or misses:
+                        internal_count_metric("Supportability/Python/DatabaseUtils/StatementCache/Hits", hits)
+                        internal_count_metric("Supportability/Python/DatabaseUtils/StatementCache/Misses", misses)
+
                     # If an import order issue was detected, send a metric for
                     # each uninstrumented module
 
@@ -1258,6 +1724,28 @@ class Application(object):
                             internal_count_metric("Supportability/Python/Uninstrumented", 1)
                             internal_count_metric("Supportability/Uninstrumented/%s" % uninstrumented, 1)
 
+                    # Report the time taken to fire the import hooks for
+                    # each instrumented module imported since the last
+                    # harvest.
+
+                    for name, duration in import_hook_timings():
+                        internal_metric("Supportability/Python/ImportHook/%s" % name, duration)
+
+                    # Report the estimated number of distinct sets of tags
+                    # folded into the overflow series of each dimensional
+                    # metric as the limits on the number of series were
+                    # reached since the last harvest.
+
+                    dropped_series = 0
+
+                    for name, overflow in stats.dimensional_stats_table.overflow():
+                        estimate = overflow.estimate()
+                        dropped_series += estimate
+                        internal_metric("Supportability/Python/DimensionalMetrics/DroppedSeries/%s" % name, estimate)
+
+                    if dropped_series:
+                        internal_metric("Supportability/Python/DimensionalMetrics/DroppedSeries", dropped_series)
+
                 # Create our time stamp as to when this reporting period
                 # ends and start reporting the data.
 
@@ -1280,6 +1768,12 @@ class Application(object):
                         period_end = self._period_start + 1.001
 
                 try:
+                    # Raise any restart or disconnect request received
+                    # while sending the payloads of a prior harvest.
+
+                    if self._harvest_sender is not None:
+                        self._harvest_sender.raise_deferred_exception()
+
                     # Send the transaction and custom metric data.
 
                     # Send data set for analytics, which is Synthetic analytic
@@ -1291,8 +1785,11 @@ class Application(object):
                         if synthetics_events.num_samples:
                             _logger.debug("Sending synthetics event data for harvest of %r.", self._app_name)
 
-                            self._active_session.send_transaction_events(
-                                synthetics_events.sampling_info, synthetics_events
+                            self._harvest_send(
+                                "analytic_event_data",
+                                self._active_session.send_transaction_events,
+                                synthetics_events.sampling_info,
+                                synthetics_events,
                             )
 
                         stats.reset_synthetics_events()
@@ -1312,8 +1809,11 @@ class Application(object):
                             if transaction_events.num_samples:
                                 _logger.debug("Sending analytics event data for harvest of %r.", self._app_name)
 
-                                self._active_session.send_transaction_events(
-                                    transaction_events.sampling_info, transaction_events
+                                self._harvest_send(
+                                    "analytic_event_data",
+                                    self._active_session.send_transaction_events,
+                                    transaction_events.sampling_info,
+                                    transaction_events,
                                 )
 
                             stats.reset_transaction_events()
@@ -1342,7 +1842,12 @@ class Application(object):
 
                                     _logger.debug("Sending span event data for harvest of %r.", self._app_name)
 
-                                    self._active_session.send_span_events(spans.sampling_info, span_samples)
+                                    self._harvest_send(
+                                        "span_event_data",
+                                        self._active_session.send_span_events,
+                                        spans.sampling_info,
+                                        span_samples,
+                                    )
                                     span_samples = None
 
                                 # As per spec
@@ -1369,7 +1874,12 @@ class Application(object):
                                 _logger.debug("Sending error event data for harvest of %r.", self._app_name)
 
                                 samp_info = error_events.sampling_info
-                                self._active_session.send_error_events(samp_info, error_event_samples)
+                                self._harvest_send(
+                                    "error_event_data",
+                                    self._active_session.send_error_events,
+                                    samp_info,
+                                    error_event_samples,
+                                )
                                 error_event_samples = None
 
                             # As per spec
@@ -1389,7 +1899,12 @@ class Application(object):
 
                                 _logger.debug("Sending custom event data for harvest of %r.", self._app_name)
 
-                                self._active_session.send_custom_events(customs.sampling_info, custom_samples)
+                                self._harvest_send(
+                                    "custom_event_data",
+                                    self._active_session.send_custom_events,
+                                    customs.sampling_info,
+                                    custom_samples,
+                                )
                                 custom_samples = None
 
                             # As per spec
@@ -1409,7 +1924,12 @@ class Application(object):
 
                                 _logger.debug("Sending machine learning event data for harvest of %r.", self._app_name)
 
-                                self._active_session.send_ml_events(ml_events.sampling_info, ml_event_samples)
+                                self._harvest_send(
+                                    "ml_event_data",
+                                    self._active_session.send_ml_events,
+                                    ml_events.sampling_info,
+                                    ml_event_samples,
+                                )
                                 ml_event_samples = None
 
                             # As per spec
@@ -1435,7 +1955,12 @@ class Application(object):
 
                                 _logger.debug("Sending log event data for harvest of %r.", self._app_name)
 
-                                self._active_session.send_log_events(logs.sampling_info, log_samples)
+                                self._harvest_send(
+                                    "log_event_data",
+                                    self._active_session.send_log_events,
+                                    logs.sampling_info,
+                                    log_samples,
+                                )
                                 log_samples = None
 
                             # As per spec
@@ -1453,11 +1978,16 @@ class Application(object):
                         if error_data:
                             _logger.debug("Sending error data for harvest of %r.", self._app_name)
 
-                            self._active_session.send_errors(error_data)
+                            self._harvest_send("error_data", self._active_session.send_errors, error_data)
 
                     if not flexible:
                         if configuration.collect_traces:
-                            connections = SQLConnections(configuration.agent_limits.max_sql_connections)
+                            if self._explain_plan_executor is not None:
+                                connections = self._explain_plan_executor.session(
+                                    configuration.explain_plan_executor.time_budget
+                                )
+                            else:
+                                connections = SQLConnections(configuration.agent_limits.max_sql_connections)
 
                             with connections:
                                 if configuration.slow_sql.enabled:
@@ -1468,14 +1998,20 @@ class Application(object):
                                     if slow_sql_data:
                                         _logger.debug("Sending slow SQL data for harvest of %r.", self._app_name)
 
-                                        self._active_session.send_sql_traces(slow_sql_data)
+                                        self._harvest_send(
+                                            "sql_trace_data", self._active_session.send_sql_traces, slow_sql_data
+                                        )
 
                                 slow_transaction_data = stats.transaction_trace_data(connections)
 
                                 if slow_transaction_data:
                                     _logger.debug("Sending slow transaction data for harvest of %r.", self._app_name)
 
-                                    self._active_session.send_transaction_traces(slow_transaction_data)
+                                    self._harvest_send(
+                                        "transaction_sample_data",
+                                        self._active_session.send_transaction_traces,
+                                        slow_transaction_data,
+                                    )
 
                         # Create a metric_normalizer based on normalize_name
                         # If metric rename rules are empty, set normalizer
@@ -1487,7 +2023,25 @@ class Application(object):
                         else:
                             metric_normalizer = None
 
-                        # Merge all ready internal metrics
+                        # Merge all ready internal metrics, including
+                        # those recorded by the harvest sender threads.
+                        if self._harvest_sender is not None:
+                            internal_metric(
+                                "Supportability/Python/Harvest/Sender/Pending", self._harvest_sender.pending
+                            )
+                            for sender_metrics in self._harvest_sender.harvest_metrics():
+                                stats.merge_custom_metrics(sender_metrics.metrics())
+
+                        if self._transaction_recorder is not None:
+                            internal_metric(
+                                "Supportability/Python/RecordTransaction/Recorder/Pending",
+                                self._transaction_recorder.pending,
+                            )
+                            internal_count_metric(
+                                "Supportability/Python/RecordTransaction/Recorder/Dropped",
+                                self._transaction_recorder.dropped(),
+                            )
+
                         stats.merge_custom_metrics(internal_metrics.metrics())
 
                         # Clear sent internal metrics
@@ -1631,9 +2185,13 @@ class Application(object):
                 # Force close the socket connection which has been
                 # created for this harvest if session still exists.
                 # New connection will be create automatically on the
-                # next harvest.
+                # next harvest. If payloads are still being sent by the
+                # harvest sender, the connection is left open and is
+                # instead closed by a later harvest once the sender is
+                # idle. It is only ever closed from the harvest thread,
+                # as it is used by requests sent from this thread.
 
-                if self._active_session:
+                if self._active_session and (self._harvest_sender is None or self._harvest_sender.idle()):
                     self._active_session.close_connection()
 
         # Merge back in statistics recorded about the last harvest
@@ -1651,6 +2209,17 @@ class Application(object):
                 _logger.debug("Reporting thread profiling session data for %r.", self._app_name)
                 self._active_session.send_profile_data(profile_data)
 
+    def _harvest_send(self, endpoint, send, *args):
+        """Sends a harvest payload to the data collector, or queues it on
+        the harvest sender if enabled.
+
+        """
+
+        if self._harvest_sender is not None:
+            self._harvest_sender.submit(endpoint, send, *args)
+        else:
+            send(*args)
+
     def internal_agent_shutdown(self, restart=False):
         """Terminates the active agent session for this application and
         optionally triggers activation of a new session.
@@ -1676,6 +2245,24 @@ class Application(object):
 
         self.stop_data_samplers()
 
+        # Give any payloads still queued for sending a chance to be
+        # delivered. These would be rejected for a restarted session.
+
+        if self._transaction_recorder is not None:
+            self._transaction_recorder.shutdown(timeout=0.0)
+            self._transaction_recorder = None
+
+        if self._explain_plan_executor is not None:
+            self._explain_plan_executor.shutdown(timeout=0.0)
+            self._explain_plan_executor = None
+
+        if self._harvest_sender is not None:
+            if restart:
+                self._harvest_sender.shutdown(timeout=0.0)
+            else:
+                self._harvest_sender.shutdown(timeout=self._active_session.configuration.shutdown_timeout)
+            self._harvest_sender = None
+
         # Now shutdown the actual agent session.
 
         try:
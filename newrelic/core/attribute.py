@@ -109,6 +109,32 @@ class CastingFailureException(Exception):
     pass
 
 
+class DeferredAttributes(dict):
+    """A dict of attributes where some of the attributes are only added
+    when the attributes are resolved. This avoids the cost of working out
+    attributes for a trace segment which are only reported with span
+    events and transaction traces, when neither may ever be generated.
+
+    Each function passed to defer() is called with a function taking the
+    name and value of an attribute to add. An attribute added directly in
+    the meantime takes precedence over a deferred attribute of the same
+    name, as it would have replaced it had it been added straight away.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(DeferredAttributes, self).__init__(*args, **kwargs)
+        self.deferred = []
+
+    def defer(self, function):
+        self.deferred.append(function)
+
+    def resolve(self):
+        deferred, self.deferred = self.deferred, []
+        for function in deferred:
+            function(self.setdefault)
+
+
 class Attribute(_Attribute):
     def __repr__(self):
         return "Attribute(name=%r, value=%r, destinations=%r)" % (self.name, self.value, bin(self.destinations))
@@ -157,6 +183,9 @@ def resolve_user_attributes(attr_dict, attribute_filter, target_destination, att
 
 
 def resolve_agent_attributes(attr_dict, attribute_filter, target_destination, attr_class=dict):
+    if isinstance(attr_dict, DeferredAttributes):
+        attr_dict.resolve()
+
     a_attrs = attr_class()
 
     for attr_name, attr_value in attr_dict.items():
@@ -12,6 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+try:
+    from functools import lru_cache
+except ImportError:
+    lru_cache = None
+
 # Attribute "destinations" represented as bitfields.
 
 DST_NONE = 0x0
@@ -57,12 +62,35 @@ class AttributeFilter(object):
     #      the bitfield.
     #
     #   4. Return the resulting bitfield after all rules have been applied.
+    #
+    # Rather than testing every rule against each attribute name, the rules
+    # are compiled into a radix trie of the rule names. Walking the trie
+    # along the attribute name visits the matching rules in the same order
+    # as the sorted rules, as the names of all rules matching an attribute
+    # are prefixes of the attribute name. Results are then memoised in a
+    # cache bounded by the setting agent_limits.attribute_filter_cache_size.
+
+    DEFAULT_CACHE_SIZE = 1000
 
     def __init__(self, flattened_settings):
 
         self.enabled_destinations = self._set_enabled_destinations(flattened_settings)
         self.rules = self._build_rules(flattened_settings)
-        self.cache = {}
+        self.trie = self._build_trie(self.rules)
+
+        cache_size = flattened_settings.get('agent_limits.attribute_filter_cache_size', None)
+        if cache_size is None:
+            cache_size = self.DEFAULT_CACHE_SIZE
+
+        self.cache_size = cache_size
+        self._reported = (0, 0, 0)
+
+        if lru_cache is not None:
+            self._cached_apply = lru_cache(maxsize=cache_size)(self._apply)
+        else:
+            self._cached_apply = self._bounded_dict_apply
+            self._cache = {}
+            self._cache_stats = [0, 0, 0]
 
     def __repr__(self):
         return "<AttributeFilter: destinations: %s, rules: %s>" % (
@@ -135,27 +163,140 @@ class AttributeFilter(object):
 
         return tuple(rules)
 
+    def _build_trie(self, rules):
+
+        # Build a trie keyed by the characters of the rule names, with each
+        # node holding the wildcard and exact match rules for the rule name
+        # ending at that node. The rules are added in sorted order, so the
+        # rules held by each node remain sorted.
+
+        root = [{}, [], []]
+
+        for rule in rules:
+            node = root
+            for character in rule.name:
+                node = node[0].setdefault(character, [{}, [], []])
+
+            if rule.is_wildcard:
+                node[1].append(rule)
+            else:
+                node[2].append(rule)
+
+        return self._compress_node(root)
+
+    def _compress_node(self, node):
+
+        # Converts a node of the character trie into a node of a radix
+        # trie, where chains of nodes without rules are collapsed into a
+        # single edge labelled with the characters of the chain. Each edge
+        # is keyed by its first character. The rules of a node are reduced
+        # to a pair of the destinations they set and the destinations they
+        # clear, applied as (destinations & ~clear) | set.
+
+        children = {}
+
+        for character, child in node[0].items():
+            label = character
+            while len(child[0]) == 1 and not child[1] and not child[2]:
+                (next_character, child), = child[0].items()
+                label += next_character
+            children[character] = (label, self._compress_node(child))
+
+        return (children, self._reduce_rules(node[1]), self._reduce_rules(node[2]))
+
+    def _reduce_rules(self, rules):
+        if not rules:
+            return None
+
+        set_destinations = DST_NONE
+        clear_destinations = DST_NONE
+
+        for rule in rules:
+            if rule.is_include:
+                include = rule.destinations & self.enabled_destinations
+                set_destinations |= include
+                clear_destinations &= ~include
+            else:
+                set_destinations &= ~rule.destinations
+                clear_destinations |= rule.destinations
+
+        return (set_destinations, clear_destinations)
+
+    def _apply(self, name, default_destinations):
+
+        # Walks the trie along the name, applying the wildcard rules for
+        # each prefix of the name from the shortest prefix, and then the
+        # exact match rules for the full name, in the same order as the
+        # sorted rules would be applied.
+
+        destinations = self.enabled_destinations & default_destinations
+
+        children, wildcard, exact = self.trie
+        position = 0
+        length = len(name)
+
+        while True:
+            if wildcard is not None:
+                destinations = (destinations & ~wildcard[1]) | wildcard[0]
+
+            if position == length:
+                if exact is not None:
+                    destinations = (destinations & ~exact[1]) | exact[0]
+                break
+
+            edge = children.get(name[position])
+            if edge is None or not name.startswith(edge[0], position):
+                break
+
+            position += len(edge[0])
+            children, wildcard, exact = edge[1]
+
+        return destinations
+
+    def _bounded_dict_apply(self, name, default_destinations):
+
+        # Fallback for when functools.lru_cache is not available. The
+        # cache is cleared when full rather than evicting the least
+        # recently used entry.
+
+        cache_index = (name, default_destinations)
+
+        try:
+            destinations = self._cache[cache_index]
+            self._cache_stats[0] += 1
+            return destinations
+        except KeyError:
+            pass
+
+        self._cache_stats[1] += 1
+
+        if len(self._cache) >= self.cache_size:
+            self._cache_stats[2] += len(self._cache)
+            self._cache = {}
+
+        destinations = self._cache[cache_index] = self._apply(name, default_destinations)
+        return destinations
+
     def apply(self, name, default_destinations):
         if self.enabled_destinations == DST_NONE:
             return DST_NONE
 
-        cache_index = (name, default_destinations)
+        return self._cached_apply(name, default_destinations)
 
-        if cache_index in self.cache:
-            return self.cache[cache_index]
+    def cache_stats(self):
 
-        destinations = self.enabled_destinations & default_destinations
+        # Returns the number of cache hits, misses and evictions since the
+        # last call to this method.
 
-        for rule in self.rules:
-            if rule.name_match(name):
-                if rule.is_include:
-                    inc_dest = rule.destinations & self.enabled_destinations
-                    destinations |= inc_dest
-                else:
-                    destinations &= ~rule.destinations
+        if lru_cache is not None:
+            info = self._cached_apply.cache_info()
+            totals = (info.hits, info.misses, max(0, info.misses - info.currsize))
+        else:
+            totals = tuple(self._cache_stats)
 
-        self.cache[cache_index] = destinations
-        return destinations
+        reported, self._reported = self._reported, totals
+
+        return tuple(total - previous for total, previous in zip(totals, reported))
 
 class AttributeFilterRule(object):
 
@@ -147,6 +147,30 @@ class CodeLevelMetricsSettings(Settings):
     pass
 
 
+class CompactStatsSettings(Settings):
+    pass
+
+
+class StreamingPayloadsSettings(Settings):
+    pass
+
+
+class HarvestSenderSettings(Settings):
+    pass
+
+
+class TransactionRecorderSettings(Settings):
+    pass
+
+
+class ExplainPlanExecutorSettings(Settings):
+    pass
+
+
+class EntryPointsCacheSettings(Settings):
+    pass
+
+
 class ThreadProfilerSettings(Settings):
     pass
 
@@ -193,6 +217,14 @@ class SlowSqlSettings(Settings):
     pass
 
 
+class SqlObfuscationSettings(Settings):
+    pass
+
+
+class TraceCacheSettings(Settings):
+    pass
+
+
 class AgentLimitsSettings(Settings):
     pass
 
@@ -273,10 +305,26 @@ class DistributedTracingSettings(Settings):
     pass
 
 
+class DimensionalMetricsSettings(Settings):
+    pass
+
+
 class ServerlessModeSettings(Settings):
     pass
 
 
+class SamplingOnlyTracingSettings(Settings):
+    pass
+
+
+class ShardedStatsSettings(Settings):
+    pass
+
+
+class ThreadLocalMetricsSettings(Settings):
+    pass
+
+
 class TransactionSegmentSettings(Settings):
     pass
 
@@ -402,6 +450,7 @@ _settings.attributes = AttributesSettings()
 _settings.browser_monitoring = BrowserMonitorSettings()
 _settings.browser_monitoring.attributes = BrowserMonitorAttributesSettings()
 _settings.code_level_metrics = CodeLevelMetricsSettings()
+_settings.compact_stats = CompactStatsSettings()
 _settings.console = ConsoleSettings()
 _settings.cross_application_tracer = CrossApplicationTracerSettings()
 _settings.custom_insights_events = CustomInsightsEventsSettings()
@@ -410,13 +459,17 @@ _settings.datastore_tracer = DatastoreTracerSettings()
 _settings.datastore_tracer.database_name_reporting = DatastoreTracerDatabaseNameReportingSettings()
 _settings.datastore_tracer.instance_reporting = DatastoreTracerInstanceReportingSettings()
 _settings.debug = DebugSettings()
+_settings.dimensional_metrics = DimensionalMetricsSettings()
 _settings.distributed_tracing = DistributedTracingSettings()
+_settings.entry_points_cache = EntryPointsCacheSettings()
 _settings.error_collector = ErrorCollectorSettings()
 _settings.error_collector.attributes = ErrorCollectorAttributesSettings()
 _settings.event_harvest_config = EventHarvestConfigSettings()
 _settings.event_harvest_config.harvest_limits = EventHarvestConfigHarvestLimitSettings()
 _settings.event_loop_visibility = EventLoopVisibilitySettings()
+_settings.explain_plan_executor = ExplainPlanExecutorSettings()
 _settings.gc_runtime_metrics = GCRuntimeMetricsSettings()
+_settings.harvest_sender = HarvestSenderSettings()
 _settings.heroku = HerokuSettings()
 _settings.infinite_tracing = InfiniteTracingSettings()
 _settings.instrumentation = InstrumentationSettings()
@@ -424,17 +477,24 @@ _settings.instrumentation.graphql = InstrumentationGraphQLSettings()
 _settings.message_tracer = MessageTracerSettings()
 _settings.process_host = ProcessHostSettings()
 _settings.rum = RumSettings()
+_settings.sampling_only_tracing = SamplingOnlyTracingSettings()
 _settings.serverless_mode = ServerlessModeSettings()
+_settings.sharded_stats = ShardedStatsSettings()
 _settings.slow_sql = SlowSqlSettings()
 _settings.span_events = SpanEventSettings()
 _settings.span_events.attributes = SpanEventAttributesSettings()
+_settings.sql_obfuscation = SqlObfuscationSettings()
+_settings.streaming_payloads = StreamingPayloadsSettings()
 _settings.strip_exception_messages = StripExceptionMessageSettings()
 _settings.synthetics = SyntheticsSettings()
+_settings.thread_local_metrics = ThreadLocalMetricsSettings()
 _settings.thread_profiler = ThreadProfilerSettings()
+_settings.trace_cache = TraceCacheSettings()
 _settings.transaction_events = TransactionEventsSettings()
 _settings.transaction_events.attributes = TransactionEventsAttributesSettings()
 _settings.transaction_metrics = TransactionMetricsSettings()
 _settings.transaction_name = TransactionNameSettings()
+_settings.transaction_recorder = TransactionRecorderSettings()
 _settings.transaction_segments = TransactionSegmentSettings()
 _settings.transaction_segments.attributes = TransactionSegmentAttributesSettings()
 _settings.transaction_tracer = TransactionTracerSettings()
@@ -710,6 +770,9 @@ _settings.cross_application_tracer.enabled = False
 
 _settings.gc_runtime_metrics.enabled = False
 _settings.gc_runtime_metrics.top_object_count_limit = 5
+_settings.gc_runtime_metrics.census_mode = os.environ.get("NEW_RELIC_GC_RUNTIME_METRICS_CENSUS_MODE", "full")
+_settings.gc_runtime_metrics.census_time_budget = 0.05
+_settings.gc_runtime_metrics.census_sample_rate = 0.01
 
 _settings.transaction_events.enabled = True
 _settings.transaction_events.attributes.enabled = True
@@ -790,6 +853,9 @@ _settings.agent_limits.synthetics_events = 200
 _settings.agent_limits.synthetics_transactions = 20
 _settings.agent_limits.data_compression_threshold = 64 * 1024
 _settings.agent_limits.data_compression_level = None
+_settings.agent_limits.rules_engine_cache_size = 1000
+_settings.agent_limits.attribute_filter_cache_size = 1000
+_settings.agent_limits.sql_statement_cache_size = 1000
 
 _settings.infinite_tracing.trace_observer_host = os.environ.get("NEW_RELIC_INFINITE_TRACING_TRACE_OBSERVER_HOST", None)
 _settings.infinite_tracing.trace_observer_port = _environ_as_int("NEW_RELIC_INFINITE_TRACING_TRACE_OBSERVER_PORT", 443)
@@ -797,6 +863,9 @@ _settings.infinite_tracing.compression = _environ_as_bool("NEW_RELIC_INFINITE_TR
 _settings.infinite_tracing.batching = _environ_as_bool("NEW_RELIC_INFINITE_TRACING_BATCHING", default=True)
 _settings.infinite_tracing.ssl = True
 _settings.infinite_tracing.span_queue_size = _environ_as_int("NEW_RELIC_INFINITE_TRACING_SPAN_QUEUE_SIZE", 10000)
+_settings.infinite_tracing.span_queue_drop_policy = os.environ.get(
+    "NEW_RELIC_INFINITE_TRACING_SPAN_QUEUE_DROP_POLICY", "oldest"
+)
 
 _settings.instrumentation.graphql.capture_introspection_queries = os.environ.get(
     "NEW_RELIC_INSTRUMENTATION_GRAPHQL_CAPTURE_INTROSPECTION_QUERIES", False
@@ -880,6 +949,38 @@ _settings.heroku.dyno_name_prefixes_to_shorten = list(
 _settings.serverless_mode.enabled = _environ_as_bool("NEW_RELIC_SERVERLESS_MODE_ENABLED", default=False)
 _settings.aws_lambda_metadata = {}
 
+_settings.sampling_only_tracing.enabled = _environ_as_bool("NEW_RELIC_SAMPLING_ONLY_TRACING_ENABLED", default=False)
+_settings.sharded_stats.enabled = _environ_as_bool("NEW_RELIC_SHARDED_STATS_ENABLED", default=False)
+_settings.thread_local_metrics.enabled = _environ_as_bool("NEW_RELIC_THREAD_LOCAL_METRICS_ENABLED", default=False)
+_settings.compact_stats.enabled = _environ_as_bool("NEW_RELIC_COMPACT_STATS_ENABLED", default=False)
+_settings.streaming_payloads.enabled = _environ_as_bool("NEW_RELIC_STREAMING_PAYLOADS_ENABLED", default=False)
+
+_settings.harvest_sender.enabled = _environ_as_bool("NEW_RELIC_HARVEST_SENDER_ENABLED", default=False)
+_settings.harvest_sender.max_workers = 4
+_settings.harvest_sender.max_queue_size = 32
+_settings.harvest_sender.max_retries = 2
+_settings.harvest_sender.retry_backoff = 1.0
+
+_settings.transaction_recorder.enabled = _environ_as_bool("NEW_RELIC_TRANSACTION_RECORDER_ENABLED", default=False)
+_settings.transaction_recorder.max_queue_size = 1000
+
+_settings.explain_plan_executor.enabled = _environ_as_bool("NEW_RELIC_EXPLAIN_PLAN_EXECUTOR_ENABLED", default=False)
+_settings.explain_plan_executor.time_budget = 1.0
+_settings.explain_plan_executor.plan_cache_size = 100
+_settings.explain_plan_executor.plan_cache_ttl = 3600.0
+
+_settings.entry_points_cache.enabled = _environ_as_bool("NEW_RELIC_ENTRY_POINTS_CACHE_ENABLED", default=False)
+_settings.entry_points_cache.directory = os.environ.get("NEW_RELIC_ENTRY_POINTS_CACHE_DIRECTORY", None)
+
+_settings.dimensional_metrics.max_series_per_metric = int(
+    os.environ.get("NEW_RELIC_DIMENSIONAL_METRICS_MAX_SERIES_PER_METRIC", "2000")
+)
+_settings.dimensional_metrics.max_series = int(os.environ.get("NEW_RELIC_DIMENSIONAL_METRICS_MAX_SERIES", "20000"))
+
+_settings.sql_obfuscation.engine = os.environ.get("NEW_RELIC_SQL_OBFUSCATION_ENGINE", "regex")
+
+_settings.trace_cache.backend = os.environ.get("NEW_RELIC_TRACE_CACHE_BACKEND", "registry")
+
 _settings.event_loop_visibility.enabled = True
 _settings.event_loop_visibility.blocking_threshold = 0.1
 _settings.code_level_metrics.enabled = True
@@ -888,6 +989,9 @@ _settings.application_logging.enabled = _environ_as_bool("NEW_RELIC_APPLICATION_
 _settings.application_logging.forwarding.enabled = _environ_as_bool(
     "NEW_RELIC_APPLICATION_LOGGING_FORWARDING_ENABLED", default=True
 )
+_settings.application_logging.forwarding.buffer_size = int(
+    os.environ.get("NEW_RELIC_APPLICATION_LOGGING_FORWARDING_BUFFER_SIZE", "0")
+)
 _settings.application_logging.metrics.enabled = _environ_as_bool(
     "NEW_RELIC_APPLICATION_LOGGING_METRICS_ENABLED", default=True
 )
@@ -898,6 +1002,9 @@ _settings.machine_learning.enabled = _environ_as_bool("NEW_RELIC_MACHINE_LEARNIN
 _settings.machine_learning.inference_events_value.enabled = _environ_as_bool(
     "NEW_RELIC_MACHINE_LEARNING_INFERENCE_EVENT_VALUE_ENABLED", default=False
 )
+_settings.machine_learning.inference_events_sample_size = int(
+    os.environ.get("NEW_RELIC_MACHINE_LEARNING_INFERENCE_EVENTS_SAMPLE_SIZE", "0")
+)
 
 
 def global_settings():
@@ -21,6 +21,13 @@ import logging
 import re
 import weakref
 
+from collections import OrderedDict, namedtuple
+
+try:
+    from functools import lru_cache
+except ImportError:
+    lru_cache = None
+
 import newrelic.packages.six as six
 
 from newrelic.core.internal_metrics import internal_metric
@@ -97,8 +104,8 @@ _quotes_table = {
 }
 
 
-def _obfuscate_sql(sql, database):
-    quotes_re, quotes_cleanup_re = _quotes_table.get(database.quoting_style,
+def _obfuscate_sql(sql, quoting_style):
+    quotes_re, quotes_cleanup_re = _quotes_table.get(quoting_style,
             (_single_quotes_re, _single_quotes_cleanup_re))
 
     # Substitute quoted strings first.
@@ -117,6 +124,94 @@ def _obfuscate_sql(sql, database):
 
     return sql
 
+
+def _obfuscate_sql_regex(sql, quoting_style):
+    return _uncomment_sql(_obfuscate_sql(sql, quoting_style))
+
+# The tokenizer engine performs the obfuscation in a single pass over the
+# SQL. The patterns for comments, quoted strings for the quoting style of
+# the database and literals are joined into one regular expression, with
+# comments being dropped and quoted strings and literals replaced with a
+# '?' as each token is matched. The text leading up to each token is
+# matched as part of the same match, skipping whole words at a time, so
+# that there is only one substitution per token and the patterns aren't
+# attempted at every position within an identifier.
+#
+# Because comments are recognised in the same pass as quoted strings, a
+# comment delimiter within a string or a quote within a comment is never
+# mistaken for the start of the other. Literals and quoted strings are
+# also only recognised at the start of a word. These are the cases where
+# the result can differ from the regex engine, which for instance treats
+# a stray quote in a comment as a malformed statement.
+#
+# The literal patterns spell out upper and lower case rather than using
+# IGNORECASE, which slows down matching of all the text in between.
+
+
+_uncomment_sql_tokenizer_p = (r'(?:#|--).*?(?=\r|\n|$)|'
+        r'\/\*(?:[^\/]|\/[^*])*?(?:\*\/|\/\*[\s\S]*)')
+_dollar_quotes_tokenizer_p = (r'(?P<dollar_tag>\$(?!\d)[^$]*?\$).*?'
+        r'(?:(?P=dollar_tag)|$)')
+
+_uuid_tokenizer_p = r'\{?(?:[0-9a-fA-F]\-?){32}\}?'
+_int_tokenizer_p = r'(?<!:)-?\b(?:[0-9]+\.)?[0-9]+(?:[eE][+-]?[0-9]+)?'
+_hex_tokenizer_p = r'0[xX][0-9a-fA-F]+'
+_bool_tokenizer_p = (r'\b(?:[tT][rR][uU][eE]|[fF][aA][lL][sS][eE]|'
+        r'[nN][uU][lL][lL])\b')
+_text_tokenizer_p = r'(?:[a-zA-Z_]\w*|[\s\S])*?'
+
+_literals_tokenizer_p = '|'.join([_uuid_tokenizer_p, _hex_tokenizer_p,
+        _int_tokenizer_p, _bool_tokenizer_p])
+
+_quotes_tokenizer_table = {
+    'single': _single_quotes_p,
+    'single+double': _any_quotes_p,
+    'single+dollar': _single_quotes_p + '|' + _dollar_quotes_tokenizer_p,
+    'single+oracle': _single_oracle_p,
+}
+
+_tokenizer_table = {}
+
+for _quoting_style, _quotes_p in _quotes_tokenizer_table.items():
+    _tokenizer_table[_quoting_style] = (re.compile(
+            r'(?P<text>%s)(?:(?P<comment>%s)|(?P<token>%s|%s)|\Z)' % (
+            _text_tokenizer_p, _uncomment_sql_tokenizer_p, _quotes_p,
+            _literals_tokenizer_p)), _quotes_table[_quoting_style][1])
+
+del _quoting_style, _quotes_p
+
+
+def _tokenizer_replacement(match):
+    if match.group('token') is not None:
+        return match.group('text') + '?'
+    return match.group('text')
+
+
+def _obfuscate_sql_tokenizer(sql, quoting_style):
+    tokenizer_re, quotes_cleanup_re = _tokenizer_table.get(quoting_style,
+            _tokenizer_table['single'])
+
+    sql = tokenizer_re.sub(_tokenizer_replacement, sql)
+
+    # As with the regex engine, any quote character left behind means
+    # the statement was malformed.
+
+    if quotes_cleanup_re.search(sql):
+        sql = '?'
+
+    return sql
+
+
+_sql_obfuscators = {
+    'regex': _obfuscate_sql_regex,
+    'tokenizer': _obfuscate_sql_tokenizer,
+}
+
+
+def _obfuscate(sql, quoting_style, engine):
+    obfuscator = _sql_obfuscators.get(engine, _obfuscate_sql_regex)
+    return obfuscator(sql, quoting_style)
+
 # Normalization of the SQL is done so that when we can produce a hash
 # value for a slow SQL such that it generates the same value for two SQL
 # statements where only difference is values that may have been used.
@@ -562,10 +657,27 @@ class SQLConnection(object):
         self.connection.close()
 
 
+def sql_connection_key(database, args, kwargs):
+    """Returns a hashable key identifying the database connection which
+    would be created with the given connect parameters. Where any of the
+    parameters are not hashable, their representation is used instead.
+
+    """
+
+    key = (database.client, args, tuple(sorted(kwargs.items())))
+
+    try:
+        hash(key)
+    except TypeError:
+        key = (database.client, repr(args), repr(sorted(kwargs.items())))
+
+    return key
+
+
 class SQLConnections(object):
 
     def __init__(self, maximum=4):
-        self.connections = []
+        self.connections = OrderedDict()
         self.maximum = maximum
 
         settings = global_settings()
@@ -574,31 +686,22 @@ class SQLConnections(object):
             _logger.debug('Creating SQL connections cache %r.', self)
 
     def connection(self, database, args, kwargs):
-        key = (database.client, args, kwargs)
-
-        connection = None
+        key = sql_connection_key(database, args, kwargs)
 
         settings = global_settings()
 
-        for i, item in enumerate(self.connections):
-            if item[0] == key:
-                connection = item[1]
+        # Move to the back of the ordered dict so we know which is
+        # the most recently used all the time.
 
-                # Move to back of list so we know which is the
-                # most recently used all the time.
-
-                item = self.connections.pop(i)
-                self.connections.append(item)
-
-                break
+        connection = self.connections.pop(key, None)
 
         if connection is None:
             # If we are at the maximum number of connections to
             # keep hold of, pop the one which has been used the
             # longest amount of time.
 
-            if len(self.connections) == self.maximum:
-                connection = self.connections.pop(0)[1]
+            if len(self.connections) >= self.maximum:
+                connection = self.connections.popitem(last=False)[1]
 
                 internal_metric('Supportability/Python/DatabaseUtils/Counts/'
                                 'drop_database_connection', 1)
@@ -613,24 +716,30 @@ class SQLConnections(object):
             connection = SQLConnection(database,
                     database.connect(*args, **kwargs))
 
-            self.connections.append((key, connection))
-
             if settings.debug.log_explain_plan_queries:
                 _logger.debug('Created database connection for %r.',
                         database.client)
 
+        self.connections[key] = connection
+
         return connection
 
+    def explain(self, sql_statement, connect_params, cursor_params,
+            sql_parameters, execute_params):
+        return _explain_plan(self, sql_statement.sql,
+                sql_statement.database, connect_params, cursor_params,
+                sql_parameters, execute_params)
+
     def cleanup(self):
         settings = global_settings()
 
         if settings.debug.log_explain_plan_queries:
             _logger.debug('Cleaning up SQL connections cache %r.', self)
 
-        for key, connection in self.connections:
+        for connection in self.connections.values():
             connection.cleanup()
 
-        self.connections = []
+        self.connections = OrderedDict()
 
     def __enter__(self):
         return self
@@ -757,8 +866,12 @@ def explain_plan(connections, sql_statement, connect_params, cursor_params,
     if sql_statement.operation not in database.explain_stmts:
         return
 
-    details = _explain_plan(connections, sql_statement.sql, database,
-            connect_params, cursor_params, sql_parameters, execute_params)
+    # The connections may be a SQLConnections cache, in which case the
+    # explain plan is run immediately, or a session of the background
+    # explain plan executor, which may return a cached explain plan.
+
+    details = connections.explain(sql_statement, connect_params,
+            cursor_params, sql_parameters, execute_params)
 
     if details is not None and sql_format != 'raw':
         return _obfuscate_explain_plan(database, *details)
@@ -812,6 +925,104 @@ class SQLDatabase(object):
         return result
 
 
+# The results of parsing and obfuscating a SQL statement are held in
+# bounded LRU caches. This saves the work being redone every time an
+# application issues the same parameterised query, as is the norm with
+# ORMs. The operation and target, which are all that is needed for the
+# datastore metrics, are cached separately from the obfuscated details,
+# which depend on the quoting style of the database and the obfuscation
+# engine, so that statements are only obfuscated when the obfuscated
+# form is actually required. Very long statements are usually those with
+# inlined values, so are unlikely to be repeated and are not cached.
+
+_ParsedSQL = namedtuple('_ParsedSQL', ['operation', 'target'])
+
+_ObfuscatedSQL = namedtuple('_ObfuscatedSQL',
+        ['obfuscated', 'normalized', 'identifier'])
+
+_MAXIMUM_CACHED_SQL_LENGTH = 4096
+
+
+def _parse_sql(sql):
+    uncommented = _uncomment_sql(sql)
+    operation = _parse_operation(uncommented)
+    target = _parse_target(uncommented, operation)
+
+    return _ParsedSQL(operation, target)
+
+
+def _obfuscate_and_normalize_sql(sql, quoting_style, engine):
+    obfuscated = _obfuscate(sql, quoting_style, engine)
+    normalized = _normalize_sql(obfuscated)
+
+    return _ObfuscatedSQL(obfuscated, normalized, hash(normalized))
+
+
+class SQLStatementCache(object):
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._cached_parsed = lru_cache(maxsize=maxsize)(_parse_sql)
+        self._cached_obfuscated = lru_cache(maxsize=maxsize)(
+                _obfuscate_and_normalize_sql)
+        self._reported = (0, 0)
+
+    def parsed(self, sql):
+        if len(sql) > _MAXIMUM_CACHED_SQL_LENGTH:
+            return None
+        return self._cached_parsed(sql)
+
+    def obfuscated(self, sql, quoting_style, engine):
+        if len(sql) > _MAXIMUM_CACHED_SQL_LENGTH:
+            return None
+        return self._cached_obfuscated(sql, quoting_style, engine)
+
+    def cache_stats(self):
+
+        # Returns the number of cache hits and misses since the last call
+        # to this method.
+
+        parsed = self._cached_parsed.cache_info()
+        obfuscated = self._cached_obfuscated.cache_info()
+        totals = (parsed.hits + obfuscated.hits,
+                parsed.misses + obfuscated.misses)
+
+        reported, self._reported = self._reported, totals
+
+        return tuple(total - previous
+                for total, previous in zip(totals, reported))
+
+
+_sql_statement_cache = None
+
+
+def sql_statement_cache(maxsize):
+    """Returns the SQL statement cache, replacing it if the maximum size
+    has changed. Returns None if the cache is disabled or the cache is not
+    available, as is the case on Python 2.
+
+    """
+
+    global _sql_statement_cache
+
+    if not maxsize or lru_cache is None:
+        return None
+
+    cache = _sql_statement_cache
+
+    if cache is None or cache.maxsize != maxsize:
+        cache = _sql_statement_cache = SQLStatementCache(maxsize)
+
+    return cache
+
+
+def sql_statement_cache_stats():
+    cache = _sql_statement_cache
+    if cache is None:
+        return 0, 0
+    return cache.cache_stats()
+
+
 class SQLStatement(object):
 
     def __init__(self, sql, database=None):
@@ -821,6 +1032,8 @@ class SQLStatement(object):
         self._obfuscated = None
         self._normalized = None
         self._identifier = None
+        self._cached_parsed = None
+        self._cached_obfuscated = None
 
         if isinstance(sql, six.binary_type):
             try:
@@ -836,18 +1049,68 @@ class SQLStatement(object):
                 self._uncommented = ''
                 self._obfuscated = ''
                 self._normalized = ''
+                self._cached_parsed = False
+                self._cached_obfuscated = False
 
         self.sql = sql
         self.database = database
 
+    @property
+    def quoting_style(self):
+        return self.database and self.database.quoting_style or None
+
+    def _statement_cache(self):
+        settings = global_settings()
+        return sql_statement_cache(
+                settings.agent_limits.sql_statement_cache_size)
+
+    def _load_parsed(self):
+        # Fills in the operation and target of the statement at once from
+        # the statement cache. If the cache is disabled, these are instead
+        # worked out as each is required.
+
+        if self._cached_parsed is not None:
+            return
+
+        cache = self._statement_cache()
+        parsed = cache and cache.parsed(self.sql)
+
+        if parsed:
+            self._operation, self._target = parsed
+
+        self._cached_parsed = parsed or False
+
+    def _load_obfuscated(self):
+        # Fills in the obfuscated and normalized forms of the statement
+        # and its identifier at once from the statement cache. This is
+        # only done when one of these is required.
+
+        if self._cached_obfuscated is not None:
+            return
+
+        settings = global_settings()
+        cache = self._statement_cache()
+        obfuscated = cache and cache.obfuscated(self.sql,
+                self.quoting_style, settings.sql_obfuscation.engine)
+
+        if obfuscated:
+            (self._obfuscated, self._normalized,
+                    self._identifier) = obfuscated
+
+        self._cached_obfuscated = obfuscated or False
+
     @property
     def operation(self):
+        if self._operation is None:
+            self._load_parsed()
         if self._operation is None:
             self._operation = _parse_operation(self.uncommented)
         return self._operation
 
     @property
     def target(self):
+        if self._target is None:
+            self._load_parsed()
         if self._target is None:
             self._target = _parse_target(self.uncommented, self.operation)
         return self._target
@@ -861,18 +1124,25 @@ class SQLStatement(object):
     @property
     def obfuscated(self):
         if self._obfuscated is None:
-            self._obfuscated = _uncomment_sql(_obfuscate_sql(self.sql,
-                self.database))
+            self._load_obfuscated()
+        if self._obfuscated is None:
+            settings = global_settings()
+            self._obfuscated = _obfuscate(self.sql, self.quoting_style,
+                    settings.sql_obfuscation.engine)
         return self._obfuscated
 
     @property
     def normalized(self):
+        if self._normalized is None:
+            self._load_obfuscated()
         if self._normalized is None:
             self._normalized = _normalize_sql(self.obfuscated)
         return self._normalized
 
     @property
     def identifier(self):
+        if self._identifier is None:
+            self._load_obfuscated()
         if self._identifier is None:
             self._identifier = hash(self.normalized)
         return self._identifier
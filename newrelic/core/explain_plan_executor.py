@@ -0,0 +1,239 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module implements the running of explain plans for slow SQL on a
+background thread. The harvest waits on the explain plans only for as long
+as its time budget allows, with any not completed in time still cached for
+the following harvest. Explain plans are cached by the normalized SQL of
+the statement, so the same slow statement is not explained every harvest.
+
+"""
+
+import collections
+import logging
+import threading
+import time
+
+from newrelic.core.database_utils import SQLConnections, _explain_plan, sql_connection_key
+from newrelic.core.internal_metrics import internal_count_metric
+
+_logger = logging.getLogger(__name__)
+
+
+class _ExplainPlanRequest(object):
+    def __init__(self, key, sql_statement, connect_params, cursor_params, sql_parameters, execute_params):
+        self.key = key
+        self.sql_statement = sql_statement
+        self.connect_params = connect_params
+        self.cursor_params = cursor_params
+        self.sql_parameters = sql_parameters
+        self.execute_params = execute_params
+
+        self.event = threading.Event()
+        self.details = None
+
+
+class ExplainPlanExecutor(object):
+    """Runs explain plans on a single background thread, which is the only
+    thread to use the database connections held open between harvests.
+    Explain plans, including those which failed, are cached for the time
+    to live by the database connection and the normalized SQL.
+
+    """
+
+    def __init__(self, max_connections=4, cache_size=100, cache_ttl=3600.0, max_pending=60):
+        self._connections = SQLConnections(max_connections)
+
+        self._cache_size = cache_size
+        self._cache_ttl = cache_ttl
+        self._max_pending = max_pending
+
+        self._cache = collections.OrderedDict()
+        self._pending = {}
+
+        self._queue = collections.deque()
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+        self._thread = None
+        self._shutdown = False
+
+    def session(self, time_budget):
+        """Returns a session to be used in place of a SQLConnections cache
+        when generating the slow SQL and transaction trace data for a
+        harvest, limiting the time spent waiting on explain plans.
+
+        """
+
+        return ExplainPlanSession(self, time_budget)
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def _start_thread(self):
+        if self._thread is None and not self._shutdown:
+            thread = threading.Thread(target=self._run, name="NR-Explain-Plan-Executor")
+            thread.daemon = True
+            thread.start()
+            self._thread = thread
+
+    def explain(self, sql_statement, connect_params, cursor_params, sql_parameters, execute_params, timeout=None):
+        """Returns the explain plan for the SQL statement, either from the
+        cache or by running it on the background thread. Returns None if
+        the explain plan is not available before the timeout expires.
+
+        """
+
+        args, kwargs = connect_params
+        key = (sql_connection_key(sql_statement.database, args, kwargs), sql_statement.identifier)
+
+        now = time.time()
+
+        with self._lock:
+            entry = self._cache.pop(key, None)
+
+            if entry is not None and entry[0] > now:
+                # Move to the back of the ordered dict so the least
+                # recently used entries are evicted first.
+
+                self._cache[key] = entry
+
+                internal_count_metric("Supportability/Python/ExplainPlan/Cache/Hit", 1)
+
+                return entry[1]
+
+            internal_count_metric("Supportability/Python/ExplainPlan/Cache/Miss", 1)
+
+            request = self._pending.get(key)
+
+            if request is None:
+                if self._shutdown or len(self._pending) >= self._max_pending:
+                    internal_count_metric("Supportability/Python/ExplainPlan/Dropped", 1)
+                    return None
+
+                request = _ExplainPlanRequest(
+                    key, sql_statement, connect_params, cursor_params, sql_parameters, execute_params
+                )
+
+                self._pending[key] = request
+                self._queue.append(request)
+
+                self._start_thread()
+
+        self._ready.set()
+
+        if not request.event.wait(timeout):
+            internal_count_metric("Supportability/Python/ExplainPlan/Timeout", 1)
+            return None
+
+        return request.details
+
+    def _run(self):
+        queue = self._queue
+
+        while True:
+            self._ready.wait()
+
+            # The event is cleared before the queue is emptied, so anything
+            # queued from this point on either is explained below or sets
+            # the event again.
+
+            self._ready.clear()
+
+            while not self._shutdown:
+                try:
+                    request = queue.popleft()
+                except IndexError:
+                    break
+
+                details = _explain_plan(
+                    self._connections,
+                    request.sql_statement.sql,
+                    request.sql_statement.database,
+                    request.connect_params,
+                    request.cursor_params,
+                    request.sql_parameters,
+                    request.execute_params,
+                )
+
+                with self._lock:
+                    self._cache[request.key] = (time.time() + self._cache_ttl, details)
+
+                    while len(self._cache) > self._cache_size:
+                        self._cache.popitem(last=False)
+
+                    self._pending.pop(request.key, None)
+
+                request.details = details
+                request.event.set()
+
+            if self._shutdown:
+                break
+
+        # Database connections can only be safely closed from the thread
+        # which has been using them.
+
+        try:
+            self._connections.cleanup()
+        except Exception:
+            _logger.debug("Failed to close database connections used for explain plans.", exc_info=True)
+
+    def shutdown(self, timeout=None):
+        """Stops the background thread, abandoning any queued explain plans,
+        and waits up to the timeout for it to close its database
+        connections.
+
+        """
+
+        with self._lock:
+            self._shutdown = True
+            thread = self._thread
+
+            self._queue.clear()
+
+            for request in self._pending.values():
+                request.event.set()
+
+            self._pending = {}
+
+        self._ready.set()
+
+        if thread is not None:
+            thread.join(timeout)
+
+
+class ExplainPlanSession(object):
+    """Used in place of a SQLConnections cache for a single harvest. Explain
+    plans are requested from the executor, waiting no longer than what
+    remains of the time budget for the harvest.
+
+    """
+
+    def __init__(self, executor, time_budget):
+        self.executor = executor
+        self.deadline = time.time() + time_budget
+
+    def explain(self, sql_statement, connect_params, cursor_params, sql_parameters, execute_params):
+        timeout = max(0.0, self.deadline - time.time())
+
+        return self.executor.explain(
+            sql_statement, connect_params, cursor_params, sql_parameters, execute_params, timeout=timeout
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc, value, tb):
+        pass
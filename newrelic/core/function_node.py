@@ -27,11 +27,47 @@ _FunctionNode = namedtuple('_FunctionNode',
         'guid', 'agent_attributes', 'user_attributes'])
 
 
+def function_time_stats(group, name, rollup, stats, root):
+    """Return a generator yielding the metric keys and accumulated stats
+    for function traces which were aggregated in place of creating function
+    nodes. The metrics are the same as those generated by time_metrics()
+    of the function nodes, except that rollup metrics have an exclusive
+    time the same as their duration.
+
+    """
+
+    name = '%s/%s' % (group, name)
+
+    yield (name, ''), stats
+    yield (name, root.path), stats
+
+    if rollup:
+        if isinstance(rollup, six.string_types):
+            rollups = [rollup]
+        else:
+            rollups = rollup
+
+        for rollup in rollups:
+            if rollup.endswith('/all'):
+                yield (rollup, ''), stats
+
+                if root.type == 'WebTransaction':
+                    yield (rollup + 'Web', ''), stats
+                else:
+                    yield (rollup + 'Other', ''), stats
+
+            else:
+                yield (rollup, root.type), stats
+
+
 class FunctionNode(_FunctionNode, GenericNodeMixin):
 
+    time_metrics_include_children = True
+
     def time_metrics(self, stats, root, parent):
         """Return a generator yielding the timed metrics for this
-        function node as well as all the child nodes.
+        function node. The metrics for the child nodes are generated by
+        walk_time_metrics().
 
         """
 
@@ -81,12 +117,6 @@ class FunctionNode(_FunctionNode, GenericNodeMixin):
                     yield TimeMetric(name=rollup, scope=root.type,
                             duration=self.duration, exclusive=None)
 
-        # Now for the children.
-
-        for child in self.children:
-            for metric in child.time_metrics(stats, root, self):
-                yield metric
-
     def trace_node(self, stats, root, connections):
 
         name = '%s/%s' % (self.group, self.name)
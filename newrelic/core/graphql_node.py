@@ -30,6 +30,9 @@ _GraphQLResolverNode = namedtuple('_GraphQLNode',
     'exclusive', 'guid', 'agent_attributes', 'user_attributes', 'product'])
 
 class GraphQLNodeMixin(GenericNodeMixin):
+
+    time_metrics_include_children = True
+
     def trace_node(self, stats, root, connections):
         name = root.string_table.cache(self.name)
 
@@ -66,7 +69,8 @@ class GraphQLResolverNode(_GraphQLResolverNode, GraphQLNodeMixin):
 
     def time_metrics(self, stats, root, parent):
         """Return a generator yielding the timed metrics for this
-        database node as well as all the child nodes.
+        resolver node. The metrics for the child nodes are generated by
+        walk_time_metrics().
         """
 
         field_name = self.field_name or "<unknown>"
@@ -82,12 +86,6 @@ class GraphQLResolverNode(_GraphQLResolverNode, GraphQLNodeMixin):
         yield TimeMetric(name=field_resolver_metric_name, scope='', duration=self.duration,
                          exclusive=self.exclusive)
 
-        # Now for the children
-
-        for child in self.children:
-            for metric in child.time_metrics(stats, root, self):
-                yield metric
-
 
 class GraphQLOperationNode(_GraphQLOperationNode, GraphQLNodeMixin):
     @property
@@ -104,7 +102,8 @@ class GraphQLOperationNode(_GraphQLOperationNode, GraphQLNodeMixin):
 
     def time_metrics(self, stats, root, parent):
         """Return a generator yielding the timed metrics for this
-        database node as well as all the child nodes.
+        operation node. The metrics for the child nodes are generated by
+        walk_time_metrics().
 
         """
 
@@ -148,9 +147,3 @@ class GraphQLOperationNode(_GraphQLOperationNode, GraphQLNodeMixin):
 
         yield TimeMetric(name=operation_metric_name, scope='',
                 duration=self.duration, exclusive=self.exclusive)
-
-        # Now for the children
-
-        for child in self.children:
-            for metric in child.time_metrics(stats, root, self):
-                yield metric
\ No newline at end of file
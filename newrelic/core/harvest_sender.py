@@ -0,0 +1,245 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module implements the background sending of harvest payloads. The
+harvest thread queues the requests for a harvest cycle and a small pool of
+worker threads delivers them to the data collector, so the time taken to
+take the next snapshot is not bound to the latency of the collector.
+
+"""
+
+import collections
+import logging
+import threading
+import time
+
+from newrelic.common.object_names import callable_name
+from newrelic.core.internal_metrics import (
+    InternalTrace,
+    InternalTraceContext,
+    internal_count_metric,
+    internal_metric,
+)
+from newrelic.core.stats_engine import CustomMetrics
+from newrelic.network.exceptions import (
+    DiscardDataForRequest,
+    ForceAgentDisconnect,
+    ForceAgentRestart,
+    RetryDataForRequest,
+)
+
+_logger = logging.getLogger(__name__)
+
+
+class HarvestSender(object):
+    """Bounded queue of data collector requests serviced by a pool of
+    worker threads.
+
+    Requests which fail with RetryDataForRequest are retried with an
+    exponential backoff tracked per endpoint, so an endpoint which keeps
+    failing backs off further on each harvest until it recovers. Requests
+    submitted while the queue is full are dropped and counted. Requests
+    asking for the agent to restart or disconnect are held until the next
+    harvest, which raises them on the harvest thread through
+    raise_deferred_exception().
+
+    """
+
+    MAX_RETRY_BACKOFF = 30.0
+
+    def __init__(self, max_workers=4, max_queue_size=32, max_retries=2, retry_backoff=1.0):
+        self._queue = collections.deque()
+        self._notify = threading.Condition()
+        self._max_workers = max_workers
+        self._max_queue_size = max_queue_size
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+
+        self._workers = []
+        self._pending = 0
+        self._shutdown = False
+        self._stopped = threading.Event()
+
+        self._backoff = {}
+        self._metrics = []
+        self._deferred_exception = None
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def idle(self):
+        return not self._pending
+
+    def _start_workers(self):
+        while len(self._workers) < self._max_workers:
+            thread = threading.Thread(
+                target=self._run,
+                name="NR-Harvest-Sender-%d" % len(self._workers),
+            )
+            thread.daemon = True
+            thread.start()
+            self._workers.append(thread)
+
+    def submit(self, endpoint, send, *args):
+        """Queues a call of send(*args) for the given endpoint. Returns
+        False if the request was dropped as the queue was full or the
+        sender has been shutdown.
+
+        """
+
+        with self._notify:
+            if not self._shutdown and len(self._queue) < self._max_queue_size:
+                self._start_workers()
+                self._queue.append((endpoint, send, args))
+                self._pending += 1
+                self._notify.notify()
+                return True
+
+        _logger.debug("Harvest sender queue is full, dropping %r payload.", endpoint)
+
+        internal_count_metric("Supportability/Python/Harvest/Sender/Dropped", 1)
+        internal_count_metric("Supportability/Python/Harvest/Sender/Dropped/%s" % endpoint, 1)
+
+        return False
+
+    def _run(self):
+        while True:
+            with self._notify:
+                while not self._queue and not self._shutdown:
+                    self._notify.wait()
+
+                if not self._queue:
+                    return
+
+                endpoint, send, args = self._queue.popleft()
+
+            metrics = CustomMetrics()
+
+            try:
+                with InternalTraceContext(metrics):
+                    self._send(endpoint, send, args)
+            finally:
+                with self._notify:
+                    self._metrics.append(metrics)
+                    self._pending -= 1
+                    if not self._pending:
+                        self._notify.notify_all()
+
+    def _send(self, endpoint, send, args):
+        attempts = 0
+
+        while True:
+            try:
+                with InternalTrace("Supportability/Python/Harvest/Sender/%s" % endpoint):
+                    send(*args)
+
+            except RetryDataForRequest:
+                attempts += 1
+
+                with self._notify:
+                    backoff = self._backoff.get(endpoint, self._retry_backoff)
+                    self._backoff[endpoint] = min(2 * backoff, self.MAX_RETRY_BACKOFF)
+
+                if attempts > self._max_retries or self._stopped.wait(backoff):
+                    _logger.debug("Abandoning %r payload after %d attempts.", endpoint, attempts)
+                    internal_count_metric("Supportability/Python/Harvest/Sender/Abandoned/%s" % endpoint, 1)
+                    return
+
+                internal_count_metric("Supportability/Python/Harvest/Sender/Retry/%s" % endpoint, 1)
+
+            except DiscardDataForRequest:
+                internal_metric("Supportability/Python/Harvest/Exception/%s" % callable_name(DiscardDataForRequest), 1)
+                return
+
+            except (ForceAgentRestart, ForceAgentDisconnect) as exc:
+                with self._notify:
+                    if self._deferred_exception is None:
+                        self._deferred_exception = exc
+                return
+
+            except Exception:
+                _logger.exception(
+                    "Unexpected exception when attempting to send the %r "
+                    "harvest data to the data collector. Please report this "
+                    "problem to New Relic support for further investigation.",
+                    endpoint,
+                )
+                return
+
+            else:
+                with self._notify:
+                    self._backoff.pop(endpoint, None)
+                return
+
+    def raise_deferred_exception(self):
+        """Raises any request from the data collector for the agent to
+        restart or disconnect which was received by a worker thread.
+
+        """
+
+        with self._notify:
+            exc, self._deferred_exception = self._deferred_exception, None
+
+        if exc is not None:
+            raise exc
+
+    def harvest_metrics(self):
+        """Returns the internal metrics recorded by the worker threads since
+        the last call, as a list of CustomMetrics.
+
+        """
+
+        with self._notify:
+            metrics, self._metrics = self._metrics, []
+
+        return metrics
+
+    def flush(self, timeout=None):
+        """Waits for all queued requests to complete. Returns False if the
+        timeout expired first.
+
+        """
+
+        deadline = timeout is not None and time.time() + timeout
+
+        with self._notify:
+            while self._pending:
+                remaining = None if timeout is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._notify.wait(remaining)
+            return not self._pending
+
+    def shutdown(self, timeout=None):
+        """Waits up to the timeout for queued requests to be sent, then
+        stops the worker threads, abandoning anything still queued.
+
+        """
+
+        flushed = self.flush(timeout)
+
+        with self._notify:
+            self._shutdown = True
+            abandoned = len(self._queue)
+            self._pending -= abandoned
+            self._queue.clear()
+            self._notify.notify_all()
+
+        self._stopped.set()
+
+        if abandoned:
+            _logger.debug("Abandoned %d queued harvest payloads on shutdown.", abandoned)
+
+        return flushed
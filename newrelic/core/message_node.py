@@ -28,6 +28,8 @@ _MessageNode = namedtuple('_MessageNode',
 
 class MessageNode(_MessageNode, GenericNodeMixin):
 
+    time_metrics_include_children = True
+
     @property
     def name(self):
         name = 'MessageBroker/%s/%s/%s/Named/%s' % (self.library,
@@ -36,7 +38,8 @@ class MessageNode(_MessageNode, GenericNodeMixin):
 
     def time_metrics(self, stats, root, parent):
         """Return a generator yielding the timed metrics for this
-        messagebroker node as well as all the child nodes.
+        messagebroker node. The metrics for the child nodes are generated
+        by walk_time_metrics().
 
         """
         name = self.name
@@ -51,12 +54,6 @@ class MessageNode(_MessageNode, GenericNodeMixin):
         yield TimeMetric(name=name, scope=root.path,
                 duration=self.duration, exclusive=self.exclusive)
 
-        # Now for the children, if the trace is not terminal.
-
-        for child in self.children:
-            for metric in child.time_metrics(stats, root, self):
-                yield metric
-
     def trace_node(self, stats, root, connections):
         name = root.string_table.cache(self.name)
 
@@ -19,6 +19,12 @@ from newrelic.core.attribute_filter import (DST_SPAN_EVENTS,
 
 
 class GenericNodeMixin(object):
+    # Whether time metrics are generated for the children of the node.
+    # Nodes for calls out of the process, such as to a datastore or an
+    # external service, do not report metrics for any children.
+
+    time_metrics_include_children = False
+
     @property
     def processed_user_attributes(self):
         if hasattr(self, '_processed_user_attributes'):
@@ -83,19 +89,48 @@ class GenericNodeMixin(object):
     def span_events(self,
             settings, base_attrs=None, parent_guid=None, attr_class=dict):
 
-        yield self.span_event(
-                settings,
-                base_attrs=base_attrs,
-                parent_guid=parent_guid,
-                attr_class=attr_class)
+        # The tree of nodes is walked using an explicit stack rather than
+        # by recursing into a generator for each child. Deeply nested
+        # traces would otherwise pass every event up through a generator
+        # frame for each level and could exceed the recursion limit.
 
-        for child in self.children:
-            for event in child.span_events(
+        stack = [(self, parent_guid)]
+
+        while stack:
+            node, parent_guid = stack.pop()
+
+            yield node.span_event(
                     settings,
                     base_attrs=base_attrs,
-                    parent_guid=self.guid,
-                    attr_class=attr_class):
-                yield event
+                    parent_guid=parent_guid,
+                    attr_class=attr_class)
+
+            children = node.children
+            if children:
+                guid = node.guid
+                stack.extend([(child, guid) for child in reversed(children)])
+
+
+def walk_time_metrics(stats, root, parent, nodes):
+    """Return a generator yielding the timed metrics for the nodes along
+    with their children, for those nodes which report time metrics for
+    their children. The nodes are visited in the same order as a depth
+    first recursive walk, but using an explicit stack.
+
+    """
+
+    stack = [(node, parent) for node in reversed(nodes)]
+
+    while stack:
+        node, parent = stack.pop()
+
+        for metric in node.time_metrics(stats, root, parent):
+            yield metric
+
+        if node.time_metrics_include_children:
+            children = node.children
+            if children:
+                stack.extend([(child, node) for child in reversed(children)])
 
 
 class DatastoreNodeMixin(GenericNodeMixin):
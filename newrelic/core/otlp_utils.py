@@ -20,10 +20,12 @@ back to JSON when encoutering exceptions unless the content type is explicitly s
 """
 
 import logging
+import struct
 
+import newrelic.packages.six as six
 from newrelic.common.encoding_utils import json_encode
 from newrelic.core.config import global_settings
-from newrelic.core.stats_engine import CountStats, TimeStats
+from newrelic.core.stats_engine import CountStats, DistributionStats, TimeStats
 
 _logger = logging.getLogger(__name__)
 
@@ -39,6 +41,8 @@ if not otlp_content_setting or otlp_content_setting == "protobuf":
         )
         from newrelic.packages.opentelemetry_proto.metrics_pb2 import (
             AggregationTemporality,
+            ExponentialHistogram,
+            ExponentialHistogramDataPoint,
             Metric,
             MetricsData,
             NumberDataPoint,
@@ -51,6 +55,7 @@ if not otlp_content_setting or otlp_content_setting == "protobuf":
         from newrelic.packages.opentelemetry_proto.resource_pb2 import Resource
 
         ValueAtQuantile = SummaryDataPoint.ValueAtQuantile
+        Buckets = ExponentialHistogramDataPoint.Buckets
         AGGREGATION_TEMPORALITY_DELTA = AggregationTemporality.AGGREGATION_TEMPORALITY_DELTA
         OTLP_CONTENT_TYPE = "application/x-protobuf"
 
@@ -64,6 +69,9 @@ if not otlp_content_setting or otlp_content_setting == "protobuf":
 
 if otlp_content_setting == "json":
     AnyValue = dict
+    Buckets = dict
+    ExponentialHistogram = dict
+    ExponentialHistogramDataPoint = dict
     KeyValue = dict
     Metric = dict
     MetricsData = dict
@@ -83,11 +91,17 @@ if otlp_content_setting == "json":
     OTLP_CONTENT_TYPE = "application/json"
 
 
+_JSON_FALLBACK_WARNING = (
+    "Using OTLP integration while protobuf is not installed. This may result in larger payload sizes and data loss."
+)
+
+
 def otlp_encode(payload):
+    if isinstance(payload, bytes):
+        # Payloads written directly in the wire format are already encoded.
+        return payload
     if type(payload) is dict:  # pylint: disable=C0123
-        _logger.warning(
-            "Using OTLP integration while protobuf is not installed. This may result in larger payload sizes and data loss."
-        )
+        _logger.warning(_JSON_FALLBACK_WARNING)
         return json_encode(payload).encode("utf-8")
     return payload.SerializeToString()
 
@@ -154,9 +168,38 @@ def CountStats_to_otlp_data_point(self, start_time, end_time, attributes=None):
     return data
 
 
+def _buckets_to_otlp(buckets):
+    if not buckets:
+        return Buckets(offset=0, bucket_counts=[])
+
+    offset = min(buckets)
+    return Buckets(
+        offset=offset,
+        bucket_counts=[buckets.get(index, 0) for index in range(offset, max(buckets) + 1)],
+    )
+
+
+def DistributionStats_to_otlp_data_point(self, start_time, end_time, attributes=None):
+    data = ExponentialHistogramDataPoint(
+        time_unix_nano=int(end_time * 1e9),  # Time of current harvest
+        start_time_unix_nano=int(start_time * 1e9),  # Time of last harvest
+        attributes=attributes,
+        count=int(self[0]),
+        sum=float(self[1]),
+        min=float(self[2]),
+        max=float(self[3]),
+        zero_count=int(self[4]),
+        scale=int(self[5]),
+        positive=_buckets_to_otlp(self[6]),
+        negative=_buckets_to_otlp(self[7]),
+    )
+    return data
+
+
 def stats_to_otlp_metrics(metric_data, start_time, end_time):
     """
-    Generator producing protos for Summary and Sum metrics, for CountStats and TimeStats respectively.
+    Generator producing protos for Summary, Sum and ExponentialHistogram metrics, for TimeStats, CountStats
+    and DistributionStats respectively.
 
     Individual Metric protos must be entirely one type of metric data point. For mixed metric types we have to
     separate the types and report multiple metrics, one for each type.
@@ -200,23 +243,350 @@ def stats_to_otlp_metrics(metric_data, start_time, end_time):
                     ]
                 ),
             )
+        if any(type(metric) is DistributionStats for metric in metric_container.values()):  # pylint: disable=C0123
+            # Metric contains ExponentialHistogram metric data points.
+            yield Metric(
+                name=name,
+                exponential_histogram=ExponentialHistogram(
+                    aggregation_temporality=AGGREGATION_TEMPORALITY_DELTA,
+                    data_points=[
+                        DistributionStats_to_otlp_data_point(
+                            value,
+                            start_time=start_time,
+                            end_time=end_time,
+                            attributes=create_key_values_from_iterable(tags),
+                        )
+                        for tags, value in metric_container.items()
+                        if type(value) is DistributionStats  # pylint: disable=C0123
+                    ],
+                ),
+            )
 
 
-def encode_metric_data(metric_data, start_time, end_time, resource=None, scope=None):
-    resource = resource or create_resource()
-    return MetricsData(
-        resource_metrics=[
-            ResourceMetrics(
-                resource=resource,
-                scope_metrics=[
-                    ScopeMetrics(
-                        scope=scope,
-                        metrics=list(stats_to_otlp_metrics(metric_data, start_time, end_time)),
+# Metric data is written directly in the protobuf wire format, or as JSON
+# where protobuf is not available, rather than building the message tree
+# with the classes above and then serializing it. With thousands of series
+# the intermediate messages and attribute lists would otherwise be held in
+# memory alongside the encoded payload. The fields written below match the
+# OTLP metrics.proto definitions, with any field holding its default value
+# omitted, except where the field tracks presence, as protobuf does.
+
+_pack_fixed64 = struct.Struct("<Q").pack
+_pack_sfixed64 = struct.Struct("<q").pack
+_pack_double = struct.Struct("<d").pack
+
+_QUANTILE_MAX = b"\x09" + _pack_double(1.0)
+
+_SMALL_VARINTS = [bytes(bytearray((value,))) for value in range(128)]
+
+
+def _varint(value):
+    if 0 <= value < 128:
+        return _SMALL_VARINTS[value]
+
+    # Negative values are written as their 64 bit two's complement.
+    value &= 0xFFFFFFFFFFFFFFFF
+    encoded = bytearray()
+    while value > 0x7F:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _zigzag(value):
+    return _varint((value << 1) ^ (value >> 63))
+
+
+def _field(tag, payload):
+    return tag + _varint(len(payload)) + payload
+
+
+def _utf8(value):
+    if isinstance(value, six.text_type):
+        return value.encode("utf-8")
+    return value
+
+
+def _key_value_to_protobuf(key, value):
+    if isinstance(value, bool):
+        encoded = b"\x10\x01" if value else b"\x10\x00"
+    elif isinstance(value, int):
+        encoded = b"\x18" + _varint(value)
+    elif isinstance(value, float):
+        encoded = b"\x21" + _pack_double(value)
+    elif isinstance(value, str):
+        encoded = _field(b"\x0a", _utf8(value))
+    else:
+        _logger.warning("Unsupported attribute value type %s: %s." % (key, value))
+        return None
+
+    key = _utf8(key)
+    return (_field(b"\x0a", key) if key else b"") + _field(b"\x12", encoded)
+
+
+def _key_value_to_json(key, value):
+    if isinstance(value, bool):
+        encoded = '{"bool_value":%s}' % ("true" if value else "false")
+    elif isinstance(value, int):
+        encoded = '{"int_value":%d}' % value
+    elif isinstance(value, float):
+        encoded = '{"double_value":%s}' % json_encode(value)
+    elif isinstance(value, str):
+        encoded = '{"string_value":%s}' % json_encode(value)
+    else:
+        _logger.warning("Unsupported attribute value type %s: %s." % (key, value))
+        return None
+
+    return '{"key":%s,"value":%s}' % (json_encode(key), encoded)
+
+
+class _ProtobufAttributes(dict):
+    """Encoded attributes field for each set of tags, as written into a
+    data point where the attributes have the given field tag. Each set of
+    tags is only encoded once no matter how many data points share it.
+
+    """
+
+    def __init__(self, tag):
+        super(_ProtobufAttributes, self).__init__()
+        self.tag = tag
+
+    def __missing__(self, tags):
+        encoded = []
+        for key, value in tags or ():
+            key_value = _key_value_to_protobuf(key, value)
+            if key_value is not None:
+                encoded.append(_field(self.tag, key_value))
+
+        encoded = self[tags] = b"".join(encoded)
+        return encoded
+
+
+class _JsonAttributes(dict):
+    """Encoded JSON array of attributes for each set of tags."""
+
+    def __missing__(self, tags):
+        if not tags:
+            encoded = "null"
+        else:
+            key_values = (_key_value_to_json(key, value) for key, value in tags)
+            encoded = "[%s]" % ",".join(key_value for key_value in key_values if key_value is not None)
+
+        self[tags] = encoded
+        return encoded
+
+
+def _buckets_to_protobuf(buckets):
+    if not buckets:
+        return b""
+
+    offset = min(buckets)
+    counts = b"".join(_varint(buckets.get(index, 0)) for index in range(offset, max(buckets) + 1))
+    return (b"\x08" + _zigzag(offset) if offset else b"") + _field(b"\x12", counts)
+
+
+def _buckets_to_json(buckets):
+    if not buckets:
+        return '{"offset":0,"bucket_counts":[]}'
+
+    offset = min(buckets)
+    counts = ",".join("%d" % buckets.get(index, 0) for index in range(offset, max(buckets) + 1))
+    return '{"offset":%d,"bucket_counts":[%s]}' % (offset, counts)
+
+
+def _metric_chunks(name, tag, chunks):
+    # The encoded data points are kept as separate chunks, with the header
+    # for the metric data field placed before them, so that each is only
+    # copied once when the whole payload is finally joined together.
+    chunks.insert(0, name + tag + _varint(sum(len(chunk) for chunk in chunks)))
+    return chunks
+
+
+def _stats_to_protobuf_metrics(metric_data, start_time, end_time):
+    """
+    Generator producing each encoded Metric message for the metric data,
+    being the protobuf wire format equivalent of stats_to_otlp_metrics().
+    Each Metric message is produced as a list of chunks to be joined.
+    """
+    times = b""
+    if int(start_time * 1e9):
+        times += b"\x11" + _pack_fixed64(int(start_time * 1e9))
+    if int(end_time * 1e9):
+        times += b"\x19" + _pack_fixed64(int(end_time * 1e9))
+
+    # SummaryDataPoint and NumberDataPoint carry attributes in field 7, and
+    # ExponentialHistogramDataPoint in field 1.
+
+    attributes = _ProtobufAttributes(b"\x3a")
+    histogram_attributes = _ProtobufAttributes(b"\x0a")
+
+    for name, metric_container in metric_data:
+        name = _utf8(name)
+        name = _field(b"\x0a", name) if name else b""
+
+        counts = []
+        summaries = []
+        histograms = []
+
+        # Types are checked here using type() instead of isinstance, as CountStats is a subclass of TimeStats.
+        for tags, value in metric_container.items():
+            kind = type(value)
+            if kind is CountStats:
+                data_point = attributes[tags] + times + b"\x31" + _pack_sfixed64(int(value[0]))
+                counts.append(_field(b"\x0a", data_point))
+            elif kind is TimeStats:
+                count = int(value[0])
+                total = float(value[1])
+                minimum = float(value[3])
+                maximum = float(value[4])
+                data_point = b"".join(
+                    (
+                        attributes[tags],
+                        times,
+                        b"\x21" + _pack_fixed64(count) if count else b"",
+                        b"\x29" + _pack_double(total) if total else b"",
+                        # Min and max values as the 0.0 and 1.0 quantiles.
+                        _field(b"\x32", b"\x11" + _pack_double(minimum) if minimum else b""),
+                        _field(b"\x32", _QUANTILE_MAX + (b"\x11" + _pack_double(maximum) if maximum else b"")),
+                    )
+                )
+                summaries.append(_field(b"\x0a", data_point))
+            elif kind is DistributionStats:
+                count = int(value[0])
+                total = float(value[1])
+                scale = int(value[5])
+                zero_count = int(value[4])
+                data_point = b"".join(
+                    (
+                        histogram_attributes[tags],
+                        times,
+                        b"\x21" + _pack_fixed64(count) if count else b"",
+                        b"\x29" + _pack_double(total) if total else b"",
+                        b"\x30" + _zigzag(scale) if scale else b"",
+                        b"\x39" + _pack_fixed64(zero_count) if zero_count else b"",
+                        _field(b"\x42", _buckets_to_protobuf(value[6])),
+                        _field(b"\x4a", _buckets_to_protobuf(value[7])),
+                        b"\x61" + _pack_double(float(value[2])),
+                        b"\x69" + _pack_double(float(value[3])),
                     )
-                ],
+                )
+                histograms.append(_field(b"\x0a", data_point))
+
+        # Individual Metric messages must be entirely one type of data point,
+        # so mixed metric types are reported as one metric for each type.
+
+        if counts:
+            # Sum with delta aggregation temporality that is monotonic.
+            counts.append(b"\x10" + _varint(AGGREGATION_TEMPORALITY_DELTA) + b"\x18\x01")
+            yield _metric_chunks(name, b"\x3a", counts)
+        if summaries:
+            yield _metric_chunks(name, b"\x5a", summaries)
+        if histograms:
+            histograms.append(b"\x10" + _varint(AGGREGATION_TEMPORALITY_DELTA))
+            yield _metric_chunks(name, b"\x52", histograms)
+
+
+def _stats_to_json_metrics(metric_data, start_time, end_time):
+    """
+    Generator producing each Metric object for the metric data as JSON,
+    being the JSON equivalent of stats_to_otlp_metrics().
+    """
+    times = '"time_unix_nano":%d,"start_time_unix_nano":%d' % (int(end_time * 1e9), int(start_time * 1e9))
+    attributes = _JsonAttributes()
+
+    for name, metric_container in metric_data:
+        name = json_encode(name)
+
+        counts = []
+        summaries = []
+        histograms = []
+
+        for tags, value in metric_container.items():
+            kind = type(value)
+            if kind is CountStats:
+                counts.append('{%s,"attributes":%s,"as_int":%d}' % (times, attributes[tags], int(value[0])))
+            elif kind is TimeStats:
+                summaries.append(
+                    '{%s,"attributes":%s,"count":%d,"sum":%s,"quantile_values":'
+                    '[{"quantile":0.0,"value":%s},{"quantile":1.0,"value":%s}]}'
+                    % (
+                        times,
+                        attributes[tags],
+                        int(value[0]),
+                        json_encode(float(value[1])),
+                        json_encode(float(value[3])),
+                        json_encode(float(value[4])),
+                    )
+                )
+            elif kind is DistributionStats:
+                histograms.append(
+                    '{%s,"attributes":%s,"count":%d,"sum":%s,"min":%s,"max":%s,'
+                    '"zero_count":%d,"scale":%d,"positive":%s,"negative":%s}'
+                    % (
+                        times,
+                        attributes[tags],
+                        int(value[0]),
+                        json_encode(float(value[1])),
+                        json_encode(float(value[2])),
+                        json_encode(float(value[3])),
+                        int(value[4]),
+                        int(value[5]),
+                        _buckets_to_json(value[6]),
+                        _buckets_to_json(value[7]),
+                    )
+                )
+
+        if counts:
+            yield '{"name":%s,"sum":{"aggregation_temporality":%d,"is_monotonic":true,"data_points":[%s]}}' % (
+                name,
+                AGGREGATION_TEMPORALITY_DELTA,
+                ",".join(counts),
             )
-        ]
-    )
+        if summaries:
+            yield '{"name":%s,"summary":{"data_points":[%s]}}' % (name, ",".join(summaries))
+        if histograms:
+            yield '{"name":%s,"exponential_histogram":{"aggregation_temporality":%d,"data_points":[%s]}}' % (
+                name,
+                AGGREGATION_TEMPORALITY_DELTA,
+                ",".join(histograms),
+            )
+
+
+def encode_metric_data(metric_data, start_time, end_time, resource=None, scope=None):
+    """
+    Encodes the metric data as an OTLP MetricsData payload, which shares
+    its encoding with an ExportMetricsServiceRequest. The payload is
+    returned already encoded, as protobuf or else as JSON.
+    """
+    resource = resource or create_resource()
+
+    if otlp_content_setting == "json":
+        _logger.warning(_JSON_FALLBACK_WARNING)
+        payload = '{"resource_metrics":[{"resource":%s,"scope_metrics":[{"scope":%s,"metrics":[%s]}]}]}' % (
+            json_encode(resource),
+            json_encode(scope),
+            ",".join(_stats_to_json_metrics(metric_data, start_time, end_time)),
+        )
+        return payload.encode("utf-8")
+
+    # The lengths of the enclosing messages are worked out from the encoded
+    # metrics so the payload can be joined together in a single pass.
+
+    chunks = [b"", b"", _field(b"\x0a", resource.SerializeToString()), b""]
+    if scope is not None:
+        chunks.append(_field(b"\x0a", scope.SerializeToString()))
+
+    for metric in _stats_to_protobuf_metrics(metric_data, start_time, end_time):
+        chunks.append(b"\x12" + _varint(sum(len(chunk) for chunk in metric)))
+        chunks.extend(metric)
+
+    # Fill in the headers of the ResourceMetrics and ScopeMetrics messages.
+    chunks[3] = b"\x12" + _varint(sum(len(chunk) for chunk in chunks[4:]))
+    chunks[0] = b"\x0a"
+    chunks[1] = _varint(sum(len(chunk) for chunk in chunks[2:]))
+
+    return b"".join(chunks)
 
 
 def encode_ml_event_data(custom_event_data, agent_run_id):
@@ -15,6 +15,11 @@
 import re
 from collections import namedtuple
 
+try:
+    from functools import lru_cache
+except ImportError:
+    lru_cache = None
+
 _NormalizationRule = namedtuple(
     "_NormalizationRule",
     ["match_expression", "replacement", "ignore", "eval_order", "terminate_chain", "each_segment", "replace_all"],
@@ -54,8 +59,14 @@ class NormalizationRule(_NormalizationRule):
         return self.match_expression_re.subn(self.replacement, string, count)
 
 
+# Patterns which refer to their own groups can't be combined into a
+# single alternation without changing what the group numbers refer to.
+
+_GROUP_REFERENCE_RE = re.compile(r"\\[1-9]|\(\?P=")
+
+
 class RulesEngine(object):
-    def __init__(self, rules):
+    def __init__(self, rules, cache_size=0):
         self.__rules = []
 
         for rule in rules:
@@ -67,11 +78,68 @@ class RulesEngine(object):
 
         self.__rules = sorted(self.__rules, key=lambda rule: rule.eval_order)
 
+        self.__prefilter = self._compile_prefilter(self.__rules)
+
+        # Results are memoised in a bounded LRU cache as the same names
+        # are normalized over and over again. The cache is not available
+        # on Python 2, where every name is normalized in full.
+
+        if self.__rules and cache_size and lru_cache is not None:
+            self.__cache = lru_cache(maxsize=cache_size)(self._normalize)
+        else:
+            self.__cache = None
+
+        self.__reported_hits = 0
+        self.__reported_misses = 0
+
+    @staticmethod
+    def _compile_prefilter(rules):
+        # Combines all the match expressions into a single pattern which
+        # is searched for before applying the rules one by one. If none
+        # of the expressions match the name, no rule can change the name
+        # and so none of the later rules could match either. Rules which
+        # are applied to each segment of the name can't be prefiltered,
+        # as anchors in their expressions apply to each segment.
+
+        if not rules or any(rule.each_segment for rule in rules):
+            return None
+
+        expressions = [rule.match_expression for rule in rules]
+        if any(_GROUP_REFERENCE_RE.search(expression) for expression in expressions):
+            return None
+
+        try:
+            return re.compile("|".join("(?:%s)" % expression for expression in expressions), re.IGNORECASE)
+        except Exception:
+            return None
+
     @property
     def rules(self):
         return self.__rules
 
+    def cache_stats(self):
+        """Returns the number of cache hits and misses since the last call
+        to this method.
+
+        """
+
+        if self.__cache is None:
+            return 0, 0
+
+        info = self.__cache.cache_info()
+        hits = info.hits - self.__reported_hits
+        misses = info.misses - self.__reported_misses
+        self.__reported_hits = info.hits
+        self.__reported_misses = info.misses
+
+        return hits, misses
+
     def normalize(self, string):
+        if self.__cache is not None:
+            return self.__cache(string)
+        return self._normalize(string)
+
+    def _normalize(self, string):
         # URLs are supposed to be ASCII but can get a
         # URL with illegal non ASCII characters. As the
         # rule patterns and replacements are Unicode
@@ -84,6 +152,9 @@ class RulesEngine(object):
         if isinstance(string, bytes):
             string = string.decode("Latin-1")
 
+        if self.__prefilter is not None and not self.__prefilter.search(string):
+            return (string, False)
+
         final_string = string
         ignore = False
         for rule in self.__rules:
@@ -22,6 +22,7 @@ data whereby it is sent to the core application.
 import base64
 import copy
 import logging
+import math
 import operator
 import random
 import sys
@@ -29,12 +30,14 @@ import time
 import traceback
 import warnings
 import zlib
+from array import array
 from heapq import heapify, heapreplace
 
 import newrelic.packages.six as six
 from newrelic.api.settings import STRIP_EXCEPTION_MESSAGE
 from newrelic.api.time_trace import get_linking_metadata
 from newrelic.common.encoding_utils import json_encode
+from newrelic.common.hyperloglog import HyperLogLog
 from newrelic.common.metric_utils import create_metric_identity
 from newrelic.common.object_names import parse_exc_info
 from newrelic.common.streaming_utils import StreamBuffer
@@ -195,6 +198,465 @@ class CountStats(TimeStats):
         pass
 
 
+class DistributionStats(list):
+
+    """Bucket for accumulating the distribution of a value metric as a
+    base-2 exponential histogram, as defined for OTLP exponential
+    histograms. Values are counted in buckets whose boundaries grow by a
+    factor of 2**(2**-scale), and the scale is reduced whenever the
+    recorded values would need more than MAX_SIZE buckets, so the memory
+    used per series is fixed while the relative error of the estimated
+    quantiles is bounded by the range of the values recorded.
+
+    """
+
+    # Is based on a list so that it can be handled in the same way as the
+    # other stats objects. Positive and negative values are counted in
+    # separate dictionaries mapping bucket index to count.
+
+    MAX_SIZE = 160
+    MAX_SCALE = 20
+
+    def __init__(self):
+        super(DistributionStats, self).__init__([0, 0.0, 0.0, 0.0, 0, self.MAX_SCALE, {}, {}])
+
+    count = property(operator.itemgetter(0))
+    sum = property(operator.itemgetter(1))
+    min = property(operator.itemgetter(2))
+    max = property(operator.itemgetter(3))
+    zero_count = property(operator.itemgetter(4))
+    scale = property(operator.itemgetter(5))
+    positive = property(operator.itemgetter(6))
+    negative = property(operator.itemgetter(7))
+
+    def __copy__(self):
+        result = DistributionStats()
+        result[:6] = self[:6]
+        result[6] = dict(self[6])
+        result[7] = dict(self[7])
+        return result
+
+    @staticmethod
+    def bucket_index(value, scale):
+        """Returns the index of the bucket at the given scale holding a
+        positive value. Bucket i holds values in (base**i, base**(i+1)].
+
+        """
+
+        mantissa, exponent = math.frexp(value)
+
+        # Exact powers of two are the inclusive upper boundary of a
+        # bucket and are mapped exactly rather than via the logarithm.
+
+        if mantissa == 0.5:
+            if scale > 0:
+                return ((exponent - 1) << scale) - 1
+            return (exponent - 2) >> -scale
+
+        if scale > 0:
+            return int(math.floor(math.log(value) * (2**scale / math.log(2))))
+        return (exponent - 1) >> -scale
+
+    @staticmethod
+    def bucket_lower_boundary(index, scale):
+        return 2.0 ** (index * 2.0**-scale)
+
+    def record(self, value):
+        """Merge a single value."""
+
+        if self[0]:
+            self[2] = min(self[2], value)
+            self[3] = max(self[3], value)
+        else:
+            self[2] = self[3] = value
+
+        self[0] += 1
+        self[1] += value
+
+        if value == 0:
+            self[4] += 1
+            return
+
+        buckets = self[6] if value > 0 else self[7]
+        index = self.bucket_index(abs(value), self[5])
+        count = buckets.get(index)
+        if count is not None:
+            buckets[index] = count + 1
+            return
+
+        buckets[index] = 1
+        self._downscale(self._scale_change(buckets))
+
+    def merge_stats(self, other):
+        """Merge data from another instance of this object."""
+
+        if not other[0]:
+            return
+
+        if self[0]:
+            self[2] = min(self[2], other[2])
+            self[3] = max(self[3], other[3])
+        else:
+            self[2] = other[2]
+            self[3] = other[3]
+
+        self[0] += other[0]
+        self[1] += other[1]
+        self[4] += other[4]
+
+        # Both sets of buckets are brought to the lower of the two scales
+        # before adding the counts, and then reduced further if the
+        # combined buckets no longer fit.
+
+        scale = min(self[5], other[5])
+        self._downscale(self[5] - scale)
+        change = other[5] - scale
+
+        for buckets, other_buckets in ((self[6], other[6]), (self[7], other[7])):
+            for index, count in six.iteritems(other_buckets):
+                index >>= change
+                buckets[index] = buckets.get(index, 0) + count
+
+        self._downscale(max(self._scale_change(self[6]), self._scale_change(self[7])))
+
+    def _scale_change(self, buckets):
+        if len(buckets) < 2:
+            return 0
+
+        low = min(buckets)
+        high = max(buckets)
+        change = 0
+        while (high >> change) - (low >> change) >= self.MAX_SIZE:
+            change += 1
+        return change
+
+    def _downscale(self, change):
+        if change <= 0:
+            return
+
+        self[5] -= change
+
+        for position in (6, 7):
+            buckets = {}
+            for index, count in six.iteritems(self[position]):
+                index >>= change
+                buckets[index] = buckets.get(index, 0) + count
+            self[position] = buckets
+
+    def quantile(self, q):
+        """Returns an estimate of the value at quantile q, where q is in
+        the range 0.0 to 1.0.
+
+        """
+
+        if not self[0]:
+            return 0.0
+        if q <= 0.0:
+            return self[2]
+        if q >= 1.0:
+            return self[3]
+
+        rank = q * (self[0] - 1)
+        scale = self[5]
+        base = 2.0 ** (2.0**-scale)
+
+        # Visit the buckets in order of increasing value. The estimate for
+        # a bucket is the point which equalises the relative error to its
+        # lower and upper boundaries.
+
+        # Negative values are held in buckets indexed by their magnitude, so
+        # are visited in order of decreasing index.
+
+        buckets = [(index, -1.0, self[7][index]) for index in sorted(self[7], reverse=True)]
+        buckets.append((None, 0.0, self[4]))
+        buckets.extend((index, 1.0, self[6][index]) for index in sorted(self[6]))
+
+        seen = 0
+        for index, sign, count in buckets:
+            seen += count
+            if seen > rank:
+                if index is None:
+                    return 0.0
+                lower = self.bucket_lower_boundary(index, scale)
+                value = sign * 2.0 * lower * base / (1.0 + base)
+                return min(max(value, self[2]), self[3])
+
+        return self[3]
+
+
+class StatsTable(dict):
+
+    """Table mapping metric (name, scope) keys to the stats objects
+    accumulating the data for each metric.
+
+    """
+
+    def merge_stats(self, key, other):
+        """Merge in a stats object for a single metric. Where there is no
+        prior data for the metric the stats object is adopted directly.
+
+        """
+
+        stats = self.get(key)
+        if stats is None:
+            self[key] = other
+        else:
+            stats.merge_stats(other)
+
+    def merge_time_metric(self, key, metric):
+        """Merge data from a time metric object."""
+
+        stats = self.get(key)
+        if stats is None:
+            self[key] = TimeStats(
+                call_count=1,
+                total_call_time=metric.duration,
+                total_exclusive_call_time=metric.exclusive,
+                min_call_time=metric.duration,
+                max_call_time=metric.duration,
+                sum_of_squares=metric.duration**2,
+            )
+        else:
+            stats.merge_time_metric(metric)
+
+    def merge_apdex_metric(self, key, metric):
+        """Merge data from an apdex metric object."""
+
+        stats = self.get(key)
+        if stats is None:
+            stats = ApdexStats(apdex_t=metric.apdex_t)
+            self[key] = stats
+        stats.merge_apdex_metric(metric)
+
+    def merge_table(self, other):
+        """Merge in all metrics from another stats table."""
+
+        for key, stats in six.iteritems(other):
+            self.merge_stats(key, stats)
+
+
+_TIME_STATS = 0
+_COUNT_STATS = 1
+_APDEX_STATS = 2
+
+
+class CompactStatsTable(object):
+
+    """Stats table which interns each metric (name, scope) key to an integer
+    slot and stores the accumulated data for all metrics in six contiguous
+    array columns, rather than as a stats object per metric. Stats objects
+    returned when reading from the table are copies built from the columns,
+    so all updates must go through the merge methods of the table.
+
+    """
+
+    def __init__(self):
+        self._slots = {}
+        self._keys = []
+        self._types = array("b")
+        self._columns = tuple(array("d") for _ in range(6))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._slots
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __getitem__(self, key):
+        return self._stats(self._slots[key])
+
+    def __setitem__(self, key, stats):
+        slot = self._slots.get(key)
+        if slot is None:
+            self._insert(key, stats)
+        else:
+            self._types[slot] = self._stats_type(stats)
+            for column, value in zip(self._columns, stats):
+                column[slot] = value
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, dict(self.items()))
+
+    def get(self, key, default=None):
+        slot = self._slots.get(key)
+        if slot is None:
+            return default
+        return self._stats(slot)
+
+    def keys(self):
+        return list(self._keys)
+
+    def values(self):
+        return [stats for _, stats in self.iteritems()]
+
+    def items(self):
+        return list(self.iteritems())
+
+    def iteritems(self):
+        rows = zip(self._keys, self._types, *self._columns)
+        for key, stats_type, count, total, exclusive, minimum, maximum, sum_of_squares in rows:
+            yield key, self._create_stats(stats_type, count, total, exclusive, minimum, maximum, sum_of_squares)
+
+    @staticmethod
+    def _stats_type(stats):
+        if isinstance(stats, CountStats):
+            return _COUNT_STATS
+        if isinstance(stats, ApdexStats):
+            return _APDEX_STATS
+        return _TIME_STATS
+
+    @staticmethod
+    def _create_stats(stats_type, count, total, exclusive, minimum, maximum, sum_of_squares):
+        if stats_type == _TIME_STATS:
+            return TimeStats(int(count), total, exclusive, minimum, maximum, sum_of_squares)
+
+        if stats_type == _COUNT_STATS:
+            return CountStats(call_count=int(count))
+
+        stats = ApdexStats(int(count), int(total), int(exclusive))
+        stats[3] = minimum
+        stats[4] = maximum
+        return stats
+
+    def _stats(self, slot):
+        return self._create_stats(self._types[slot], *[column[slot] for column in self._columns])
+
+    def _insert(self, key, values, stats_type=None):
+        if stats_type is None:
+            stats_type = self._stats_type(values)
+
+        slot = len(self._keys)
+        self._slots[key] = slot
+        self._keys.append(key)
+        self._types.append(stats_type)
+
+        for column, value in zip(self._columns, values):
+            column.append(value)
+
+        return slot
+
+    def _merge_row(self, slot, other):
+        # Merge a row of values in the layout of the stats objects into
+        # an existing slot, following the merge_stats() semantics of the
+        # stats type the slot was created with.
+
+        count, total, exclusive, minimum, maximum, sum_of_squares = self._columns
+        stats_type = self._types[slot]
+
+        if stats_type == _COUNT_STATS:
+            count[slot] += other[0]
+
+        elif stats_type == _APDEX_STATS:
+            count[slot] += other[0]
+            total[slot] += other[1]
+            exclusive[slot] += other[2]
+
+            minimum[slot] = (count[slot] or total[slot] or exclusive[slot]) and min(minimum[slot], other[3]) or other[3]
+            maximum[slot] = max(maximum[slot], other[3])
+
+        else:
+            total[slot] += other[1]
+            exclusive[slot] += other[2]
+            minimum[slot] = count[slot] and min(minimum[slot], other[3]) or other[3]
+            maximum[slot] = max(maximum[slot], other[4])
+            sum_of_squares[slot] += other[5]
+
+            # Must update the call count last as update of the
+            # minimum call time is dependent on initial value.
+
+            count[slot] += other[0]
+
+    def merge_stats(self, key, other):
+        """Merge in a stats object for a single metric."""
+
+        slot = self._slots.get(key)
+        if slot is None:
+            self._insert(key, other)
+        else:
+            self._merge_row(slot, other)
+
+    def merge_time_metric(self, key, metric):
+        """Merge data from a time metric object."""
+
+        duration = metric.duration
+        exclusive = metric.exclusive
+        if exclusive is None:
+            exclusive = duration
+
+        slot = self._slots.get(key)
+        if slot is None:
+            self._insert(key, (1, duration, exclusive, duration, duration, duration**2), _TIME_STATS)
+        else:
+            self._merge_row(slot, (1, duration, exclusive, duration, duration, duration**2))
+
+    def merge_apdex_metric(self, key, metric):
+        """Merge data from an apdex metric object."""
+
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._insert(key, (0, 0, 0, metric.apdex_t, metric.apdex_t, 0), _APDEX_STATS)
+        self._merge_row(slot, (metric.satisfying, metric.tolerating, metric.frustrating, metric.apdex_t))
+
+    def merge_table(self, other):
+        """Merge in all metrics from another stats table. When the other
+        table is also compact, metrics not yet present are appended to
+        each column in a single bulk extend and the remainder are merged
+        slot by slot without creating any intermediate stats objects.
+
+        """
+
+        if not isinstance(other, CompactStatsTable):
+            for key, stats in six.iteritems(other):
+                self.merge_stats(key, stats)
+            return
+
+        slots = self._slots
+        added = []
+        merged = []
+
+        for other_slot, key in enumerate(other._keys):
+            slot = slots.get(key)
+            if slot is None:
+                added.append(other_slot)
+            else:
+                merged.append((slot, other_slot))
+
+        if added:
+            base = len(self._keys)
+            for offset, other_slot in enumerate(added):
+                key = other._keys[other_slot]
+                slots[key] = base + offset
+                self._keys.append(key)
+
+            self._types.extend(array("b", (other._types[other_slot] for other_slot in added)))
+
+            for column, other_column in zip(self._columns, other._columns):
+                column.extend(array("d", (other_column[other_slot] for other_slot in added)))
+
+        # Time metrics make up the bulk of any table and are merged inline
+        # with the columns bound to locals. Other types are rare enough to
+        # go through the generic row merge.
+
+        types = self._types
+        count, total, exclusive, minimum, maximum, sum_of_squares = self._columns
+        o_count, o_total, o_exclusive, o_minimum, o_maximum, o_sum_of_squares = other._columns
+
+        for slot, other_slot in merged:
+            if types[slot] != _TIME_STATS:
+                self._merge_row(slot, [column[other_slot] for column in other._columns])
+                continue
+
+            total[slot] += o_total[other_slot]
+            exclusive[slot] += o_exclusive[other_slot]
+            minimum[slot] = count[slot] and min(minimum[slot], o_minimum[other_slot]) or o_minimum[other_slot]
+            maximum[slot] = max(maximum[slot], o_maximum[other_slot])
+            sum_of_squares[slot] += o_sum_of_squares[other_slot]
+            count[slot] += o_count[other_slot]
+
+
 class CustomMetrics(object):
 
     """Table for collection a set of value metrics."""
@@ -243,10 +705,30 @@ class CustomMetrics(object):
 
 class DimensionalMetrics(object):
 
-    """Nested dictionary table for collecting a set of metrics broken down by tags."""
+    """Nested dictionary table for collecting a set of metrics broken down by tags.
 
-    def __init__(self):
+    The number of series, being distinct sets of tags, can be limited per
+    metric name and across the whole table. Once a limit is reached, data
+    for any new set of tags is instead merged into an overflow series for
+    the metric name, tagged as otel.metric.overflow as for OpenTelemetry
+    metrics, and an estimate of the number of distinct sets of tags that
+    were folded into the overflow series is kept for each metric name.
+
+    """
+
+    OVERFLOW_TAGS = frozenset({("otel.metric.overflow", True)})
+
+    def __init__(self, settings=None):
         self.__stats_table = {}
+        self.__series_count = 0
+        self.__overflow = {}
+
+        if settings is not None:
+            self.max_series_per_metric = settings.dimensional_metrics.max_series_per_metric
+            self.max_series = settings.dimensional_metrics.max_series
+        else:
+            self.max_series_per_metric = 0
+            self.max_series = 0
 
     def __contains__(self, key):
         if isinstance(key, tuple):
@@ -263,6 +745,39 @@ class DimensionalMetrics(object):
             # Only look for metric name
             return key in self.__stats_table
 
+    def _merge_series(self, name, tags, stats):
+        """Adopts the stats object as the series for the name and tags if
+        there is no existing series, returning None, or otherwise returns
+        the existing stats object the data should be merged into. Where a
+        limit on the number of series has been reached, the overflow series
+        for the name is used in place of a new series.
+        """
+
+        stats_container = self.__stats_table.get(name)
+        if stats_container is None:
+            stats_container = self.__stats_table[name] = {}
+        else:
+            existing = stats_container.get(tags)
+            if existing is not None:
+                return existing
+
+        if (self.max_series_per_metric and len(stats_container) >= self.max_series_per_metric) or (
+            self.max_series and self.__series_count >= self.max_series
+        ):
+            if tags != self.OVERFLOW_TAGS:
+                overflow = self.__overflow.get(name)
+                if overflow is None:
+                    overflow = self.__overflow[name] = HyperLogLog()
+                overflow.add(tags)
+
+                tags = self.OVERFLOW_TAGS
+                existing = stats_container.get(tags)
+                if existing is not None:
+                    return existing
+
+        stats_container[tags] = stats
+        self.__series_count += 1
+
     def record_dimensional_metric(self, name, value, tags=None):
         """Record a single value metric, merging the data with any data
         from prior value metrics with the same name and tags.
@@ -277,22 +792,84 @@ class DimensionalMetrics(object):
         else:
             new_stats = TimeStats(1, value, value, value, value, value**2)
 
-        stats_container = self.__stats_table.get(name)
-        if stats_container is None:
-            # No existing metrics with this name. Set up new stats container.
-            self.__stats_table[name] = {tags: new_stats}
+        stats = self._merge_series(name, tags, new_stats)
+        if stats is None:
+            # No data points for this set of tags. New data was added.
+            pass
+        elif type(stats) is DistributionStats:  # pylint: disable=C0123
+            _logger.debug(
+                "Unable to record %r with tags %r as a value or count metric as it has already been "
+                "recorded as a distribution metric.",
+                name,
+                tags,
+            )
         else:
-            # Existing metric container found.
-            stats = stats_container.get(tags)
-            if stats is None:
-                # No data points for this set of tags. Add new data.
-                stats_container[tags] = new_stats
-            else:
-                # Existing data points found, merge stats.
-                stats.merge_stats(new_stats)
+            # Existing data points found, merge stats.
+            stats.merge_stats(new_stats)
+
+        return (name, tags)
+
+    def record_dimensional_distribution(self, name, value, tags=None):
+        """Record a value, or an iterable of values, into the distribution
+        metric with the same name and tags. Unlike value metrics the
+        distribution of the values is retained, so quantiles can be
+        reported for the accumulated data.
+        """
+        name, tags = create_metric_identity(name, tags)
+
+        stats = DistributionStats()
+        existing = self._merge_series(name, tags, stats)
+        if existing is not None:
+            if type(existing) is not DistributionStats:  # pylint: disable=C0123
+                _logger.debug(
+                    "Unable to record %r with tags %r as a distribution metric as it has already been "
+                    "recorded as a value or count metric.",
+                    name,
+                    tags,
+                )
+                return (name, tags)
+            stats = existing
+
+        if hasattr(value, "__iter__"):
+            for item in value:
+                stats.record(item)
+        else:
+            stats.record(value)
 
         return (name, tags)
 
+    def merge_metrics(self, metrics):
+        """Merges in a set of dimensional metrics, applying the limits on
+        the number of series. The metrics can either be another instance
+        of this object, in which case the estimates of the series folded
+        into its overflow series are also merged, or an iterable of tuples
+        of the metric name and a dictionary mapping tags to stats objects.
+        """
+
+        if isinstance(metrics, DimensionalMetrics):
+            for name, overflow in metrics.overflow():
+                existing = self.__overflow.get(name)
+                if existing is None:
+                    existing = self.__overflow[name] = HyperLogLog()
+                existing.merge(overflow)
+
+            metrics = metrics.metrics()
+
+        for name, other in metrics:
+            for tags, other_value in other.items():
+                stats = self._merge_series(name, tags, other_value)
+                if stats is None:
+                    continue
+
+                # Distributions can only be merged with other distributions,
+                # so data recorded for the same name and tags as a different
+                # type is dropped.
+
+                if (type(stats) is DistributionStats) is (  # pylint: disable=C0123
+                    type(other_value) is DistributionStats  # pylint: disable=C0123
+                ):
+                    stats.merge_stats(other_value)
+
     def metrics(self):
         """Returns an iterator over the set of value metrics.
         The items returned are a dictionary of tags for each metric value.
@@ -307,18 +884,32 @@ class DimensionalMetrics(object):
         recorded for apdex, time and value metrics.
         """
 
-        return sum(len(metric) for metric in self.__stats_table.values())
+        return self.__series_count
+
+    def overflow(self):
+        """Returns an iterator over the metric names which have had data
+        folded into their overflow series, along with the estimator of the
+        number of distinct sets of tags that were folded into it.
+        """
+
+        return six.iteritems(self.__overflow)
 
     def reset_metric_stats(self):
         """Resets the accumulated statistics back to initial state for
         metric data.
         """
         self.__stats_table = {}
+        self.__series_count = 0
+        self.__overflow = {}
 
     def get(self, key, default=None):
         return self.__stats_table.get(key, default)
 
     def __setitem__(self, key, value):
+        previous = self.__stats_table.get(key)
+        if previous is not None:
+            self.__series_count -= len(previous)
+        self.__series_count += len(value)
         self.__stats_table[key] = value
 
     def __getitem__(self, key):
@@ -501,6 +1092,41 @@ class LimitedDataSet(list):
         self.num_seen += other_data_set.num_seen - other_data_set.num_samples
 
 
+def create_log_event(settings, message, level=None, timestamp=None, attributes=None):
+    """Returns the log event node for a log message, or None where log
+    forwarding is disabled in the settings or the message is empty. The
+    linking metadata for the current trace is used as the attributes of the
+    event unless attributes are supplied, allowing a caller which already
+    holds the linking metadata to avoid looking it up again.
+
+    """
+
+    if not (
+        settings
+        and settings.application_logging
+        and settings.application_logging.enabled
+        and settings.application_logging.forwarding
+        and settings.application_logging.forwarding.enabled
+    ):
+        return None
+
+    timestamp = timestamp if timestamp is not None else time.time()
+    level = str(level) if level is not None else "UNKNOWN"
+
+    if not message or message.isspace():
+        _logger.debug("record_log_event called where message was missing. No log event will be sent.")
+        return None
+
+    message = truncate(message, MAX_LOG_MESSAGE_LENGTH)
+
+    return LogEventNode(
+        timestamp=timestamp,
+        level=level,
+        message=message,
+        attributes=attributes if attributes is not None else get_linking_metadata(),
+    )
+
+
 class StatsEngine(object):
 
     """The stats engine object holds the accumulated transactions metrics,
@@ -531,7 +1157,7 @@ class StatsEngine(object):
 
     def __init__(self):
         self.__settings = None
-        self.__stats_table = {}
+        self.__stats_table = StatsTable()
         self.__dimensional_stats_table = DimensionalMetrics()
         self._transaction_events = SampledDataSet()
         self._error_events = SampledDataSet()
@@ -621,11 +1247,7 @@ class StatsEngine(object):
         # as an empty string anyway.
 
         key = (metric.name, "")
-        stats = self.__stats_table.get(key)
-        if stats is None:
-            stats = ApdexStats(apdex_t=metric.apdex_t)
-            self.__stats_table[key] = stats
-        stats.merge_apdex_metric(metric)
+        self.__stats_table.merge_apdex_metric(key, metric)
 
         return key
 
@@ -655,19 +1277,7 @@ class StatsEngine(object):
         # scope of None is reserved for apdex metrics.
 
         key = (metric.name, metric.scope or "")
-        stats = self.__stats_table.get(key)
-        if stats is None:
-            stats = TimeStats(
-                call_count=1,
-                total_call_time=metric.duration,
-                total_exclusive_call_time=metric.exclusive,
-                min_call_time=metric.duration,
-                max_call_time=metric.duration,
-                sum_of_squares=metric.duration**2,
-            )
-            self.__stats_table[key] = stats
-        else:
-            stats.merge_time_metric(metric)
+        self.__stats_table.merge_time_metric(key, metric)
 
         return key
 
@@ -684,6 +1294,20 @@ class StatsEngine(object):
         for metric in metrics:
             self.record_time_metric(metric)
 
+    def merge_time_stats(self, metrics):
+        """Merge in the accumulated stats for a set of time metrics. The
+        metrics should be provided as an iterable where each item is a
+        tuple of the metric key and the stats for the metric. The stats
+        are copied as the same stats may be supplied for several metrics.
+
+        """
+
+        if not self.__settings:
+            return
+
+        for key, stats in metrics:
+            self.__stats_table.merge_stats(key, TimeStats(*stats))
+
     def record_exception(self, exc=None, value=None, tb=None, params=None, ignore_errors=None):
         # Deprecation Warning
         warnings.warn(
@@ -970,11 +1594,7 @@ class StatsEngine(object):
         else:
             new_stats = TimeStats(1, value, value, value, value, value**2)
 
-        stats = self.__stats_table.get(key)
-        if stats is None:
-            self.__stats_table[key] = new_stats
-        else:
-            stats.merge_stats(new_stats)
+        self.__stats_table.merge_stats(key, new_stats)
 
         return key
 
@@ -997,6 +1617,13 @@ class StatsEngine(object):
         """
         return self.__dimensional_stats_table.record_dimensional_metric(name, value, tags)
 
+    def record_dimensional_distribution(self, name, value, tags=None):
+        """Record a value, or an iterable of values, into a distribution
+        metric, merging the data with any prior values recorded for the
+        same name and tags.
+        """
+        return self.__dimensional_stats_table.record_dimensional_distribution(name, value, tags)
+
     def record_dimensional_metrics(self, metrics):
         """Record the value metrics supplied by the iterable, merging
         the data with any data from prior value metrics with the same
@@ -1123,10 +1750,13 @@ class StatsEngine(object):
 
         self.merge_custom_metrics(transaction.custom_metrics.metrics())
 
-        self.merge_dimensional_metrics(transaction.dimensional_metrics.metrics())
+        self.merge_dimensional_metrics(transaction.dimensional_metrics)
 
         self.record_time_metrics(transaction.time_metrics(self))
 
+        if transaction.function_stats:
+            self.merge_time_stats(transaction.function_time_stats())
+
         # Capture any errors if error collection is enabled.
         # Only retain maximum number allowed per harvest.
 
@@ -1157,11 +1787,18 @@ class StatsEngine(object):
         # any existing transaction seen for this period and in
         # the historical snapshot of slow transactions, plus
         # recording of transaction trace for this transaction
-        # has not been suppressed.
+        # has not been suppressed. A transaction for which traces
+        # were aggregated in place of creating nodes is never
+        # recorded, as the transaction trace would lack segments.
 
         transaction_tracer = settings.transaction_tracer
 
-        if not transaction.suppress_transaction_trace and transaction_tracer.enabled and settings.collect_traces:
+        if (
+            not transaction.suppress_transaction_trace
+            and not transaction.function_stats
+            and transaction_tracer.enabled
+            and settings.collect_traces
+        ):
             # Transactions saved for Synthetics transactions
             # do not depend on the transaction threshold.
 
@@ -1201,8 +1838,7 @@ class StatsEngine(object):
 
         if settings.distributed_tracing.enabled and settings.span_events.enabled and settings.collect_span_events:
             if settings.infinite_tracing.enabled:
-                for event in transaction.span_protos(settings):
-                    self._span_stream.put(event)
+                self._span_stream.put_many(transaction.span_protos(settings), priority=transaction.priority)
             elif transaction.sampled:
                 for event in transaction.span_events(self.__settings):
                     self._span_events.add(event, priority=transaction.priority)
@@ -1219,32 +1855,11 @@ class StatsEngine(object):
             self._log_events.merge(transaction.log_events, priority=transaction.priority)
 
     def record_log_event(self, message, level=None, timestamp=None, priority=None):
-        settings = self.__settings
-        if not (
-            settings
-            and settings.application_logging
-            and settings.application_logging.enabled
-            and settings.application_logging.forwarding
-            and settings.application_logging.forwarding.enabled
-        ):
-            return
-
-        timestamp = timestamp if timestamp is not None else time.time()
-        level = str(level) if level is not None else "UNKNOWN"
+        event = create_log_event(self.__settings, message, level, timestamp)
 
-        if not message or message.isspace():
-            _logger.debug("record_log_event called where message was missing. No log event will be sent.")
+        if event is None:
             return
 
-        message = truncate(message, MAX_LOG_MESSAGE_LENGTH)
-
-        event = LogEventNode(
-            timestamp=timestamp,
-            level=level,
-            message=message,
-            attributes=get_linking_metadata(),
-        )
-
         if priority is None:
             # Base priority for log events outside transactions is below those inside transactions
             priority = random.random() - 1  # nosec
@@ -1253,6 +1868,20 @@ class StatsEngine(object):
 
         return event
 
+    def record_log_events(self, events):
+        """Adds a batch of log events created with create_log_event(). The
+        events are given as (event, priority) tuples, where a priority of
+        None is replaced by the base priority for log events recorded
+        outside of transactions.
+
+        """
+
+        for event, priority in events:
+            if priority is None:
+                priority = random.random() - 1  # nosec
+
+            self._log_events.add(event, priority=priority)
+
     def metric_data(self, normalizer=None):
         """Returns a list containing the low level metric data for
         sending to the core application pertaining to the reporting
@@ -1673,7 +2302,9 @@ class StatsEngine(object):
         # streams are never reset after instantiation
         if reset_stream:
             self._span_stream = StreamBuffer(
-                settings.infinite_tracing.span_queue_size, batching=settings.infinite_tracing.batching
+                settings.infinite_tracing.span_queue_size,
+                batching=settings.infinite_tracing.batching,
+                drop_policy=settings.infinite_tracing.span_queue_drop_policy,
             )
 
     def reset_metric_stats(self):
@@ -1682,8 +2313,27 @@ class StatsEngine(object):
 
         """
 
-        self.__stats_table = {}
-        self.__dimensional_stats_table.reset_metric_stats()
+        self.__stats_table = self._create_stats_table()
+        self.__dimensional_stats_table = self._create_dimensional_stats_table()
+
+    def _create_stats_table(self):
+        """Returns a new empty table for apdex, time and value metrics,
+        being a compact array backed table if enabled by settings.
+
+        """
+
+        if self.__settings is not None and self.__settings.compact_stats.enabled:
+            return CompactStatsTable()
+
+        return StatsTable()
+
+    def _create_dimensional_stats_table(self):
+        """Returns a new empty table for dimensional metrics, applying the
+        limits on the number of series from the settings.
+
+        """
+
+        return DimensionalMetrics(self.__settings)
 
     def reset_transaction_events(self):
         """Resets the accumulated statistics back to initial state for
@@ -1774,7 +2424,8 @@ class StatsEngine(object):
         self.__slow_transaction = None
         self.__synthetics_transactions = []
         self.__sql_stats_table = {}
-        self.__stats_table = {}
+        self.__stats_table = self._create_stats_table()
+        self.__dimensional_stats_table = self._create_dimensional_stats_table()
         self.__transaction_errors = []
 
     def harvest_snapshot(self, flexible=False):
@@ -1855,6 +2506,29 @@ class StatsEngine(object):
         self._merge_sql(snapshot)
         self._merge_traces(snapshot)
 
+    def merge_shard(self, shard):
+        """Merges data from a long lived stats engine shard. Shard is an
+        instance of StatsEngine which has accumulated stats for any number
+        of transactions recorded by a single thread since the last harvest.
+        Unlike merge(), all sampled transaction events held by the shard
+        are merged in.
+        """
+
+        if not self.__settings:
+            return
+
+        self.merge_metric_stats(shard)
+        self._merge_transaction_events(shard, rollback=True)
+        self._merge_synthetics_events(shard)
+        self._merge_error_events(shard)
+        self._merge_error_traces(shard)
+        self._merge_custom_events(shard)
+        self._merge_ml_events(shard)
+        self._merge_span_events(shard)
+        self._merge_log_events(shard)
+        self._merge_sql(shard)
+        self._merge_traces(shard)
+
     def rollback(self, snapshot):
         """Performs a "rollback" merge after a failed harvest. Snapshot is a
         copy of the main StatsEngine data that we attempted to harvest, but
@@ -1870,7 +2544,7 @@ class StatsEngine(object):
             "will be preserved and rolled into next harvest"
         )
 
-        self.merge_metric_stats(snapshot)
+        self.merge_metric_stats(snapshot, rollback=True)
         self._merge_transaction_events(snapshot, rollback=True)
         self._merge_synthetics_events(snapshot, rollback=True)
         self._merge_error_events(snapshot)
@@ -1879,22 +2553,24 @@ class StatsEngine(object):
         self._merge_span_events(snapshot, rollback=True)
         self._merge_log_events(snapshot, rollback=True)
 
-    def merge_metric_stats(self, snapshot):
+    def merge_metric_stats(self, snapshot, rollback=False):
         """Merges metric data from a snapshot. This is used both when merging
         data from a single transaction into the main stats engine, and for
         performing a rollback merge. In either case, the merge is done the
-        exact same way.
+        exact same way, except that on a rollback the estimates of the
+        dimensional metric series dropped into overflow series are not
+        merged, as they were already reported with the failed harvest.
         """
 
         if not self.__settings:
             return
 
-        for key, other in six.iteritems(snapshot.__stats_table):
-            stats = self.__stats_table.get(key)
-            if not stats:
-                self.__stats_table[key] = other
-            else:
-                stats.merge_stats(other)
+        self.__stats_table.merge_table(snapshot.__stats_table)
+
+        if rollback:
+            self.merge_dimensional_metrics(snapshot.__dimensional_stats_table.metrics())
+        else:
+            self.merge_dimensional_metrics(snapshot.__dimensional_stats_table)
 
     def _merge_transaction_events(self, snapshot, rollback=False):
         # Merge in transaction events. In the normal case snapshot is a
@@ -2013,35 +2689,22 @@ class StatsEngine(object):
             return
 
         for name, other in metrics:
-            key = (name, "")
-            stats = self.__stats_table.get(key)
-            if not stats:
-                self.__stats_table[key] = other
-            else:
-                stats.merge_stats(other)
+            self.__stats_table.merge_stats((name, ""), other)
 
     def merge_dimensional_metrics(self, metrics):
         """
-        Merges in a set of dimensional metrics. The metrics should be
-        provide as an iterable where each item is a tuple of the metric
-        key and the accumulated stats for the metric. The metric key should
-        also be a tuple, containing a name and attribute filtered frozenset of tags.
+        Merges in a set of dimensional metrics. The metrics should either be
+        a DimensionalMetrics table or be provided as an iterable where each
+        item is a tuple of the metric key and the accumulated stats for the
+        metric. The metric key should also be a tuple, containing a name and
+        attribute filtered frozenset of tags. Limits on the number of series
+        from the settings are applied as the metrics are merged.
         """
 
         if not self.__settings:
             return
 
-        for key, other in metrics:
-            stats_container = self.__dimensional_stats_table.get(key)
-            if not stats_container:
-                self.__dimensional_stats_table[key] = other
-            else:
-                for tags, other_value in other.items():
-                    stats = stats_container.get(tags)
-                    if not stats:
-                        stats_container[tags] = other_value
-                    else:
-                        stats.merge_stats(other_value)
+        self.__dimensional_stats_table.merge_metrics(metrics)
 
     def _snapshot(self):
         copy = object.__new__(StatsEngineSnapshot)
@@ -33,6 +33,11 @@ try:
 except ImportError:
     from collections import MutableMapping
 
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
 from newrelic.core.config import global_settings
 from newrelic.core.loop_node import LoopNode
 
@@ -104,6 +109,15 @@ class TraceCache(MutableMapping):
     def __init__(self):
         self._cache = weakref.WeakValueDictionary()
 
+        # An index of the traces in the cache which are running in an
+        # asyncio task, by the ID of the event loop of the task. This
+        # avoids having to scan every trace in the cache when the event
+        # loop is found to have been blocked. Entries are held by weak
+        # reference and may be stale, so are validated against the cache
+        # when used.
+
+        self._loop_traces = {}
+
     def __repr__(self):
         return "<%s object at 0x%x %s>" % (self.__class__.__name__, id(self), str(dict(self.items())))
 
@@ -137,6 +151,56 @@ class TraceCache(MutableMapping):
 
         return thread.get_ident()
 
+    def _index_trace(self, key, trace):
+        """Adds the trace saved in the cache under the given key to the
+        index of traces by event loop, if it is running in a task.
+
+        """
+
+        task = getattr(trace, "_task", None)
+        if task is None:
+            return
+
+        loop_id = id(get_event_loop(task))
+        traces = self._loop_traces.get(loop_id)
+        if traces is None:
+            # Applications may create a new event loop for each call of
+            # asyncio.run(), so the entries of loops no longer running
+            # any traces in the cache are dropped whenever a new loop is
+            # seen.
+
+            for other_id, other_traces in list(self._loop_traces.items()):
+                if not any(self._cache.get(other_key) is other for other_key, other in list(other_traces.items())):
+                    self._loop_traces.pop(other_id, None)
+
+            traces = self._loop_traces.setdefault(loop_id, weakref.WeakValueDictionary())
+
+        traces[key] = trace
+
+    def loop_traces(self, loop):
+        """Returns a list of the traces in the cache which are running in
+        a task on the given event loop. Stale entries found in the index
+        for the loop are dropped.
+
+        """
+
+        loop_id = id(loop)
+        traces = self._loop_traces.get(loop_id)
+        if not traces:
+            self._loop_traces.pop(loop_id, None)
+            return []
+
+        result = []
+
+        for key, trace in list(traces.items()):
+            task = getattr(trace, "_task", None)
+            if self._cache.get(key) is not trace or task is None or get_event_loop(task) is not loop:
+                traces.pop(key, None)
+            else:
+                result.append(trace)
+
+        return result
+
     def task_start(self, task):
         trace = self.current_trace()
         if trace:
@@ -280,6 +344,8 @@ class TraceCache(MutableMapping):
                     task = current_task(self.asyncio)
                     trace._task = task
 
+        self._index_trace(thread_id, trace)
+
     def pop_current(self, trace):
         """Restore the trace's parent under the thread ID of the current
         executing thread."""
@@ -364,17 +430,16 @@ class TraceCache(MutableMapping):
         task = getattr(transaction.root_span, "_task", None)
         loop = get_event_loop(task)
 
-        for trace in self.values():
+        # Only the traces running in tasks on the same event loop can have
+        # been blocked, so these are looked up in the index by event loop
+        # rather than scanning every trace in the cache.
+
+        for trace in self.loop_traces(loop):
             if trace in seen:
                 continue
 
-            # If the trace is on a different transaction and it's asyncio
-            if (
-                trace.transaction is not transaction
-                and getattr(trace, "_task", None) is not None
-                and get_event_loop(trace._task) is loop
-                and trace._is_leaf()
-            ):
+            # If the trace is on a different transaction
+            if trace.transaction is not transaction and trace._is_leaf():
                 trace.exclusive -= duration
                 roots.add(trace.root)
                 seen.add(trace)
@@ -438,6 +503,7 @@ class TraceCache(MutableMapping):
 
     def __setitem__(self, key, value):
         self._cache.__setitem__(key, value)
+        self._index_trace(key, value)
 
     def __delitem__(self, key):
         self._cache.__delitem__(key)
@@ -452,6 +518,117 @@ class TraceCache(MutableMapping):
         return bool(self._cache.__len__())
 
 
+class ContextVarTraceCache(TraceCache):
+    """A trace cache which tracks the current trace with a context variable,
+    so that looking up the current trace doesn't require working out the
+    ID of the current greenlet, task or thread. The traces are still saved
+    away by thread ID, so that the traces for other threads and tasks can
+    be enumerated, and so that the cache can still be used as a mapping
+    when propagating context.
+
+    As asyncio tasks are created with a copy of the context of the caller,
+    a task will see the current trace of the code which created it even
+    when the loop's create_task() has not been instrumented. Greenlets
+    only have their own context from greenlet 0.4.17.
+
+    """
+
+    def __init__(self):
+        super(ContextVarTraceCache, self).__init__()
+        self._current = contextvars.ContextVar("newrelic.current_trace.%x" % id(self), default=None)
+
+    def _set_current(self, trace):
+        # Traces are held by weak reference, as they are in the mapping,
+        # so a transaction which is never exited doesn't live on in the
+        # context of the thread or task where it was started.
+
+        self._current.set(None if trace is None else weakref.ref(trace))
+
+    def current_trace(self):
+        trace = self._current.get()
+        trace = trace and trace()
+
+        # Where a trace was exited from another thread or task, the
+        # context of the thread or task it was started in could not be
+        # updated, so fall back to the trace saved away by thread ID.
+
+        if trace is not None and trace.exited:
+            return self.get(self.current_thread_id())
+
+        return trace
+
+    def current_transaction(self):
+        trace = self.current_trace()
+        return trace and trace.transaction
+
+    def save_trace(self, trace):
+        thread_id = trace.thread_id
+
+        current = self._current.get()
+        current = current and current()
+        if current is not None:
+            cache_root = current.root
+            if cache_root and cache_root is not trace.root and not cache_root.exited:
+                # Cached trace exists and has a valid root still
+                _logger.error(
+                    "Runtime instrumentation error. Attempt to "
+                    "save a trace from an inactive transaction. "
+                    "Report this issue to New Relic support.\n%s",
+                    "".join(traceback.format_stack()[:-1]),
+                )
+
+                raise TraceCacheActiveTraceError("transaction already active")
+
+        self._cache[thread_id] = trace
+        self._set_current(trace)
+
+        # The thread ID is only that of the thread itself when we aren't
+        # running in a greenlet or a task.
+
+        trace._greenlet = None
+
+        if thread_id != thread.get_ident():
+            if self.greenlet:
+                trace._greenlet = weakref.ref(self.greenlet.getcurrent())
+
+            if self.asyncio and not hasattr(trace, "_task"):
+                parent_task = getattr(trace.parent, "_task", None)
+                if parent_task is not None and id(parent_task) == thread_id:
+                    trace._task = parent_task
+                else:
+                    trace._task = current_task(self.asyncio)
+
+        self._index_trace(thread_id, trace)
+
+    def pop_current(self, trace):
+        if hasattr(trace, "_task"):
+            delattr(trace, "_task")
+
+        parent = trace.parent
+        self._cache[trace.thread_id] = parent
+        self._index_trace(trace.thread_id, parent)
+
+        current = self._current.get()
+        if current is not None and current() is trace:
+            self._set_current(parent)
+
+    def __setitem__(self, key, value):
+        self._cache.__setitem__(key, value)
+        self._index_trace(key, value)
+        if key == self.current_thread_id():
+            self._set_current(value)
+
+    def __delitem__(self, key):
+        self._cache.__delitem__(key)
+        if key == self.current_thread_id():
+            self._set_current(None)
+
+
+TRACE_CACHE_BACKENDS = {
+    "registry": TraceCache,
+    "contextvars": ContextVarTraceCache,
+}
+
 _trace_cache = TraceCache()
 
 
@@ -459,7 +636,62 @@ def trace_cache():
     return _trace_cache
 
 
+def _greenlet_has_context(module):
+    current = module and module.getcurrent()
+    return current is None or hasattr(current, "gr_context")
+
+
+def set_trace_cache_backend(name):
+    """Replaces the trace cache with one using the named backend. This can
+    only be done while there are no active traces, which is the case when
+    the agent is initialised.
+
+    """
+
+    global _trace_cache
+
+    cache_class = TRACE_CACHE_BACKENDS.get(name)
+
+    if cache_class is None:
+        _logger.warning("Unknown trace cache backend %r. The registry trace cache will be used instead.", name)
+        return
+
+    if type(_trace_cache) is cache_class:
+        return
+
+    if cache_class is ContextVarTraceCache:
+        if contextvars is None:
+            _logger.warning("The contextvars trace cache requires Python 3.7 or later. Using the registry instead.")
+            return
+
+        if not _greenlet_has_context(sys.modules.get("greenlet")):
+            _logger.warning(
+                "The contextvars trace cache requires greenlet 0.4.17 or later. Using the registry instead."
+            )
+            return
+
+    if _trace_cache:
+        _logger.warning("The trace cache backend can't be changed while there are active traces.")
+        return
+
+    cache = cache_class()
+
+    # Carry over whether greenlet and asyncio were found to be loaded.
+
+    for module in ("asyncio", "greenlet"):
+        if module in vars(_trace_cache):
+            vars(cache)[module] = vars(_trace_cache)[module]
+
+    _trace_cache = cache
+
+
 def greenlet_loaded(module):
+    if isinstance(_trace_cache, ContextVarTraceCache) and not _greenlet_has_context(module):
+        _logger.warning(
+            "The contextvars trace cache requires greenlet 0.4.17 or later. "
+            "Traces may be reported against the wrong greenlet."
+        )
+
     _trace_cache.greenlet = module
 
 
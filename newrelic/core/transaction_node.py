@@ -29,8 +29,11 @@ from newrelic.core.attribute_filter import (
     DST_TRANSACTION_EVENTS,
     DST_TRANSACTION_TRACER,
 )
+from newrelic.core.function_node import function_time_stats
 from newrelic.core.metric import ApdexMetric, TimeMetric
+from newrelic.core.node_mixin import walk_time_metrics
 from newrelic.core.string_table import StringTable
+from newrelic.packages import six
 
 try:
     from newrelic.core.infinite_tracing_pb2 import Span
@@ -97,6 +100,7 @@ _TransactionNode = namedtuple(
         "root_span_guid",
         "trace_id",
         "loop_time",
+        "function_stats",
     ],
 )
 
@@ -252,9 +256,19 @@ class TransactionNode(_TransactionNode):
                 yield TimeMetric(name="ErrorsExpected/all", scope="", duration=0.0, exclusive=None)
 
         # Now for the children.
-        for child in self.root.children:
-            for metric in child.time_metrics(stats, self, self):
-                yield metric
+        for metric in walk_time_metrics(stats, self, self, self.root.children):
+            yield metric
+
+    def function_time_stats(self):
+        """Return a generator yielding the metric keys and accumulated
+        stats for the function traces which were aggregated in place of
+        creating nodes.
+
+        """
+
+        for (group, name, rollup), stats in six.iteritems(self.function_stats):
+            for item in function_time_stats(group, name, rollup, stats, self):
+                yield item
 
     def apdex_metrics(self, stats):
         """Return a generator yielding the apdex metrics for this node."""
@@ -0,0 +1,180 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module implements the background recording of transactions. The
+thread finishing a transaction queues its transaction node and a single
+background thread generates the metrics, events and traces from it, so
+the time a request is held up by the agent is only that of the hand off.
+
+"""
+
+import collections
+import logging
+import threading
+
+_logger = logging.getLogger(__name__)
+
+
+class _FlushMarker(object):
+    """Queued in place of a transaction node to be signalled once all the
+    transactions queued before it have been recorded.
+
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+
+
+class TransactionRecorder(object):
+    """Bounded queue of transaction nodes recorded by a background thread.
+
+    Queuing a transaction node does not acquire any lock. Appending to and
+    popping from a deque is atomic, and the recording thread is only woken
+    if it is waiting for the queue to be filled. Transactions queued while
+    the queue is full are dropped and counted.
+
+    """
+
+    def __init__(self, record, max_queue_size=1000):
+        self._record = record
+        self._max_queue_size = max_queue_size
+
+        self._queue = collections.deque()
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+        self._thread = None
+        self._shutdown = False
+        self._dropped = 0
+
+    @property
+    def pending(self):
+        return len(self._queue)
+
+    def _start_thread(self):
+        with self._lock:
+            if self._thread is None and not self._shutdown:
+                thread = threading.Thread(target=self._run, name="NR-Transaction-Recorder")
+                thread.daemon = True
+                thread.start()
+                self._thread = thread
+
+    def submit(self, data):
+        """Queues the transaction node to be recorded. Returns False if it
+        was dropped as the queue was full or the recorder has been shutdown.
+
+        """
+
+        if self._thread is None:
+            self._start_thread()
+
+        if self._shutdown or len(self._queue) >= self._max_queue_size:
+            with self._lock:
+                self._dropped += 1
+            return False
+
+        self._queue.append(data)
+
+        if not self._ready.is_set():
+            self._ready.set()
+
+        return True
+
+    def _run(self):
+        queue = self._queue
+
+        while True:
+            self._ready.wait()
+
+            # The event is cleared before the queue is emptied, so anything
+            # queued from this point on either is recorded below or sets
+            # the event again.
+
+            self._ready.clear()
+
+            while True:
+                try:
+                    data = queue.popleft()
+                except IndexError:
+                    break
+
+                if data.__class__ is _FlushMarker:
+                    data.event.set()
+                    continue
+
+                try:
+                    self._record(data)
+                except Exception:
+                    _logger.exception(
+                        "The recording of transaction data has failed. This "
+                        "would indicate some sort of internal implementation "
+                        "issue with the agent. Please report this problem to "
+                        "New Relic support for further investigation."
+                    )
+
+            if self._shutdown:
+                return
+
+    def flush(self, timeout=None):
+        """Waits for all the transactions queued so far to be recorded.
+        Returns False if the timeout expired first.
+
+        """
+
+        if self._thread is None:
+            return not self._queue
+
+        marker = _FlushMarker()
+        self._queue.append(marker)
+        self._ready.set()
+
+        return marker.event.wait(timeout)
+
+    def dropped(self):
+        """Returns the number of transactions dropped since the last call."""
+
+        with self._lock:
+            dropped, self._dropped = self._dropped, 0
+
+        return dropped
+
+    def shutdown(self, timeout=None):
+        """Waits up to the timeout for queued transactions to be recorded,
+        then stops the recording thread, abandoning anything still queued.
+
+        """
+
+        flushed = self.flush(timeout)
+
+        with self._lock:
+            self._shutdown = True
+
+        abandoned = 0
+        while True:
+            try:
+                data = self._queue.popleft()
+            except IndexError:
+                break
+
+            if data.__class__ is _FlushMarker:
+                data.event.set()
+            else:
+                abandoned += 1
+
+        self._ready.set()
+
+        if abandoned:
+            _logger.debug("Abandoned %d queued transactions on shutdown.", abandoned)
+
+        return flushed
@@ -17,6 +17,7 @@ from newrelic.api.time_trace import get_linking_metadata
 from newrelic.api.transaction import current_transaction, record_log_event
 from newrelic.common.object_wrapper import function_wrapper, wrap_function_wrapper
 from newrelic.core.config import global_settings
+from newrelic.core.stats_engine import create_log_event
 
 try:
     from urllib import quote
@@ -24,8 +25,8 @@ except ImportError:
     from urllib.parse import quote
 
 
-def add_nr_linking_metadata(message):
-    available_metadata = get_linking_metadata()
+def add_nr_linking_metadata(message, linking_metadata=None):
+    available_metadata = linking_metadata if linking_metadata is not None else get_linking_metadata()
     entity_name = quote(available_metadata.get("entity.name", ""))
     entity_guid = available_metadata.get("entity.guid", "")
     span_id = available_metadata.get("span.id", "")
@@ -42,6 +43,27 @@ def wrap_getMessage(wrapped, instance, args, kwargs):
     return add_nr_linking_metadata(message)
 
 
+def decorated_getMessage(record, message, linking_metadata):
+    """Returns a replacement for the getMessage method of a log record which
+    returns the message formatted when the record was forwarded, decorated
+    with the linking metadata already looked up for the record. Should a
+    filter or handler change the message or arguments of the record, the
+    message is formatted again from the original getMessage method.
+
+    """
+
+    original = record.getMessage
+    msg, args = record.msg, record.args
+    decorated = add_nr_linking_metadata(message, linking_metadata)
+
+    def getMessage():
+        if record.msg is msg and record.args is args:
+            return decorated
+        return add_nr_linking_metadata(original(), linking_metadata)
+
+    return getMessage
+
+
 def bind_callHandlers(record):
     return record
 
@@ -69,19 +91,53 @@ def wrap_callHandlers(wrapped, instance, args, kwargs):
             else:
                 application = application_instance(activate=False)
                 if application and application.enabled:
-                    application.record_custom_metric("Logging/lines", {"count": 1})
-                    application.record_custom_metric("Logging/lines/%s" % level_name, {"count": 1})
+                    application.record_custom_metrics(
+                        (
+                            ("Logging/lines", {"count": 1}),
+                            ("Logging/lines/%s" % level_name, {"count": 1}),
+                        )
+                    )
+
+        forwarding = settings.application_logging.forwarding and settings.application_logging.forwarding.enabled
+        decorating = (
+            settings.application_logging.local_decorating and settings.application_logging.local_decorating.enabled
+        )
+
+        # The message is formatted, and the linking metadata looked up,
+        # only once for the record and shared between log forwarding and
+        # local decorating.
 
-        if settings.application_logging.forwarding and settings.application_logging.forwarding.enabled:
+        message = linking_metadata = None
+
+        if forwarding or decorating:
             try:
                 message = record.getMessage()
-                record_log_event(message, level_name, int(record.created * 1000))
             except Exception:
                 pass
 
-        if settings.application_logging.local_decorating and settings.application_logging.local_decorating.enabled:
+        if message is not None and (decorating or transaction):
+            linking_metadata = get_linking_metadata()
+
+        if forwarding and message is not None:
+            try:
+                timestamp = int(record.created * 1000)
+                if transaction:
+                    event = create_log_event(settings, message, level_name, timestamp, linking_metadata)
+                    if event is not None:
+                        transaction._record_log_event_node(event)
+                else:
+                    record_log_event(message, level_name, timestamp)
+            except Exception:
+                pass
+
+        if decorating:
             record._nr_original_message = record.getMessage
-            record.getMessage = wrap_getMessage(record.getMessage)
+            if message is not None:
+                record.getMessage = decorated_getMessage(record, message, linking_metadata)
+            else:
+                # Leave any error formatting the message to be reported
+                # by the handlers, as it would be without the agent.
+                record.getMessage = wrap_getMessage(record.getMessage)
 
     return wrapped(*args, **kwargs)
 
@@ -55,8 +55,12 @@ def _nr_log_forwarder(message_instance):
             else:
                 application = application_instance(activate=False)
                 if application and application.enabled:
-                    application.record_custom_metric("Logging/lines", {"count": 1})
-                    application.record_custom_metric("Logging/lines/%s" % level_name, {"count": 1})
+                    application.record_custom_metrics(
+                        (
+                            ("Logging/lines", {"count": 1}),
+                            ("Logging/lines/%s" % level_name, {"count": 1}),
+                        )
+                    )
 
         if settings.application_logging.forwarding and settings.application_logging.forwarding.enabled:
             try:
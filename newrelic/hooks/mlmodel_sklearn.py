@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import logging
+import random
 import sys
 import uuid
 
@@ -36,15 +37,19 @@ PY2 = sys.version_info[0] == 2
 _logger = logging.getLogger(__name__)
 
 
-def isnumeric(column):
+def _isnumeric_column(column):
     import numpy as np
 
     try:
         column.astype(np.float64)
-        return [True] * len(column)
+        return True
     except:
         pass
-    return [False] * len(column)
+    return False
+
+
+def isnumeric(column):
+    return [_isnumeric_column(column)] * len(column)
 
 
 class PredictReturnTypeProxy(ObjectProxy):
@@ -102,27 +107,52 @@ def _wrap_method_trace(module, class_, method, name=None, group=None):
     wrap_function_wrapper(module, "%s.%s" % (class_, method), _nr_wrapper_method)
 
 
-def _calc_prediction_feature_stats(prediction_input, class_, feature_column_names, tags):
+def _numeric_features(prediction_input):
     import numpy as np
 
+    # Returns the indexes of the feature columns that can be converted to
+    # floats, along with the values of those columns as a 2D float64 array.
+    # DataFrames are checked column by column and arrays with a numeric
+    # dtype are used as they are, so the data set is only copied when the
+    # values actually need converting.
+    pd = sys.modules.get("pandas", None)
+    if pd and isinstance(prediction_input, pd.DataFrame):
+        numeric_indexes = [
+            index
+            for index, dtype in enumerate(prediction_input.dtypes)
+            if dtype.kind in "biuf" or _isnumeric_column(prediction_input.iloc[:, index])
+        ]
+        if len(numeric_indexes) < prediction_input.shape[1]:
+            prediction_input = prediction_input.iloc[:, numeric_indexes]
+        return numeric_indexes, prediction_input.to_numpy(dtype=np.float64)
+
+    x = np.asarray(prediction_input)
+    if x.dtype.kind in "biuf":
+        return list(range(x.shape[1])), x.astype(np.float64, copy=False)
+
     # Drop any feature columns that are not numeric since we can't compute stats
     # on non-numeric columns.
-    x = np.array(prediction_input)
     isnumeric_features = np.apply_along_axis(isnumeric, 0, x)
     numeric_features = x[isnumeric_features]
+    numeric_indexes = np.flatnonzero(isnumeric_features[0]).tolist()
 
-    # Drop any feature column names that are not numeric since we can't compute stats
-    # on non-numeric columns.
-    feature_column_names = feature_column_names[isnumeric_features[0]]
+    # Boolean selection of numpy array values reshapes the array to a single
+    # dimension so we have to reshape it back into a 2D array.
+    num_cols = len(numeric_indexes)
+    if num_cols > 0:
+        numeric_features = np.reshape(numeric_features, (len(numeric_features) // num_cols, num_cols))
+    return numeric_indexes, numeric_features.astype(dtype=np.float64)
+
+
+def _calc_prediction_feature_stats(prediction_input, class_, feature_column_names, tags):
+    numeric_indexes, features = _numeric_features(prediction_input)
 
     # Only compute stats for features if we have any feature columns left after dropping
     # non-numeric columns.
-    num_cols = len(feature_column_names)
-    if num_cols > 0:
-        # Boolean selection of numpy array values reshapes the array to a single
-        # dimension so we have to reshape it back into a 2D array.
-        features = np.reshape(numeric_features, (len(numeric_features) // num_cols, num_cols))
-        features = features.astype(dtype=np.float64)
+    if numeric_indexes:
+        # Drop any feature column names that are not numeric since we can't compute stats
+        # on non-numeric columns.
+        feature_column_names = feature_column_names[numeric_indexes]
 
         _record_stats(features, feature_column_names, class_, "Feature", tags)
 
@@ -130,41 +160,42 @@ def _calc_prediction_feature_stats(prediction_input, class_, feature_column_name
 def _record_stats(data, column_names, class_, column_type, tags):
     import numpy as np
 
-    mean = np.mean(data, axis=0)
-    percentile25 = np.percentile(data, q=0.25, axis=0)
-    percentile50 = np.percentile(data, q=0.50, axis=0)
-    percentile75 = np.percentile(data, q=0.75, axis=0)
-    standard_deviation = np.std(data, axis=0)
-    _min = np.min(data, axis=0)
-    _max = np.max(data, axis=0)
+    # The min, max and percentiles are computed by a single percentile call,
+    # which partitions each column once for all of them.
+    mean = np.mean(data, axis=0).tolist()
+    standard_deviation = np.std(data, axis=0).tolist()
+    _min, percentile25, percentile50, percentile75, _max = np.percentile(
+        data, q=(0, 0.25, 0.50, 0.75, 100), axis=0
+    ).tolist()
     _count = data.shape[0]
 
-    transaction = current_transaction()
-
     # Currently record_metric only supports a subset of these stats so we have
     # to upload them one at a time instead of as a dictionary of stats per
     # feature column.
+    metrics = []
     for index, col_name in enumerate(column_names):
         metric_name = "MLModel/Sklearn/Named/%s/Predict/%s/%s" % (class_, column_type, col_name)
 
-        transaction.record_dimensional_metrics(
+        metrics.extend(
             [
-                ("%s/%s" % (metric_name, "Mean"), float(mean[index]), tags),
-                ("%s/%s" % (metric_name, "Percentile25"), float(percentile25[index]), tags),
-                ("%s/%s" % (metric_name, "Percentile50"), float(percentile50[index]), tags),
-                ("%s/%s" % (metric_name, "Percentile75"), float(percentile75[index]), tags),
-                ("%s/%s" % (metric_name, "StandardDeviation"), float(standard_deviation[index]), tags),
-                ("%s/%s" % (metric_name, "Min"), float(_min[index]), tags),
-                ("%s/%s" % (metric_name, "Max"), float(_max[index]), tags),
+                ("%s/%s" % (metric_name, "Mean"), mean[index], tags),
+                ("%s/%s" % (metric_name, "Percentile25"), percentile25[index], tags),
+                ("%s/%s" % (metric_name, "Percentile50"), percentile50[index], tags),
+                ("%s/%s" % (metric_name, "Percentile75"), percentile75[index], tags),
+                ("%s/%s" % (metric_name, "StandardDeviation"), standard_deviation[index], tags),
+                ("%s/%s" % (metric_name, "Min"), _min[index], tags),
+                ("%s/%s" % (metric_name, "Max"), _max[index], tags),
                 ("%s/%s" % (metric_name, "Count"), _count, tags),
             ]
         )
 
+    current_transaction().record_dimensional_metrics(metrics)
+
 
 def _calc_prediction_label_stats(labels, class_, label_column_names, tags):
     import numpy as np
 
-    labels = np.array(labels, dtype=np.float64)
+    labels = np.asarray(labels, dtype=np.float64)
     _record_stats(labels, label_column_names, class_, "Label", tags)
 
 
@@ -210,7 +241,7 @@ def categorize_data_type(python_type):
 def _get_feature_column_names(user_provided_feature_names, features):
     import numpy as np
 
-    num_feature_columns = np.array(features).shape[1]
+    num_feature_columns = np.shape(features)[1]
 
     # If the user provided feature names are the correct size, return the user provided feature
     # names.
@@ -236,6 +267,23 @@ def bind_predict(X, *args, **kwargs):
     return X
 
 
+def _prediction_rows(data_set, row_indexes=None):
+    import numpy as np
+
+    # Returns the rows of the data set as a numpy array, converting only the
+    # selected rows when a sample of them is being reported.
+    pd = sys.modules.get("pandas", None)
+    if pd and isinstance(data_set, pd.DataFrame):
+        if row_indexes is not None:
+            data_set = data_set.iloc[row_indexes]
+        return data_set.to_numpy()
+
+    rows = np.asarray(data_set)
+    if row_indexes is not None:
+        rows = rows[row_indexes]
+    return rows
+
+
 def create_prediction_event(transaction, class_, instance, args, kwargs, return_val):
     import numpy as np
 
@@ -248,70 +296,64 @@ def create_prediction_event(transaction, class_, instance, args, kwargs, return_
     settings = transaction.settings if transaction.settings is not None else global_settings()
 
     prediction_id = uuid.uuid4()
+    tags = {
+        "prediction_id": prediction_id,
+        "model_version": model_version,
+        # The following are used for entity synthesis.
+        "modelName": model_name,
+    }
 
     labels = []
     if return_val is not None:
         if not hasattr(return_val, "__iter__"):
             labels = np.array([return_val])
         else:
-            labels = np.array(return_val)
+            labels = np.asarray(return_val)
         if len(labels.shape) == 1:
             labels = np.reshape(labels, (len(labels) // 1, 1))
 
         label_names_list = _get_label_names(label_names, labels)
-        _calc_prediction_label_stats(
-            labels,
-            class_,
-            label_names_list,
-            tags={
-                "prediction_id": prediction_id,
-                "model_version": model_version,
-                # The following are used for entity synthesis.
-                "modelName": model_name,
-            },
-        )
+        _calc_prediction_label_stats(labels, class_, label_names_list, tags=tags)
 
     final_feature_names = _get_feature_column_names(user_provided_feature_names, data_set)
-    np_casted_data_set = np.array(data_set)
-    _calc_prediction_feature_stats(
-        data_set,
-        class_,
-        final_feature_names,
-        tags={
-            "prediction_id": prediction_id,
-            "model_version": model_version,
-            # The following are used for entity synthesis.
-            "modelName": model_name,
-        },
-    )
-    features, predictions = np_casted_data_set.shape
-    for prediction_index, prediction in enumerate(np_casted_data_set):
-        inference_id = uuid.uuid4()
-
-        event = {
-            "inference_id": inference_id,
-            "prediction_id": prediction_id,
-            "model_version": model_version,
-            "new_relic_data_schema_version": 2,
-            # The following are used for entity synthesis.
-            "modelName": model_name,
-        }
-        if metadata and isinstance(metadata, dict):
-            event.update(metadata)
-        # Don't include the raw value when inference_event_value is disabled.
-        if settings and settings.machine_learning and settings.machine_learning.inference_events_value.enabled:
-            event.update(
-                {
-                    "feature.%s" % str(final_feature_names[feature_col_index]): value
-                    for feature_col_index, value in enumerate(prediction)
-                }
-            )
-            event.update(
-                {
-                    "label.%s" % str(label_names_list[index]): str(value)
-                    for index, value in enumerate(labels[prediction_index])
-                }
-            )
+    _calc_prediction_feature_stats(data_set, class_, final_feature_names, tags=tags)
+
+    # The events would be dropped by record_ml_event() so don't build them.
+    if not settings or not settings.ml_insights_events.enabled:
+        return
+
+    # When a sample size is configured, large batches only report that many
+    # rows as InferenceData events, chosen uniformly at random. The stats
+    # metrics above are still computed over every row in the batch.
+    num_rows = len(data_set)
+    row_indexes = None
+    sample_size = settings.machine_learning.inference_events_sample_size
+    if sample_size and sample_size > 0 and num_rows > sample_size:
+        row_indexes = sorted(random.sample(range(num_rows), sample_size))
+
+    template = {
+        "prediction_id": prediction_id,
+        "model_version": model_version,
+        "new_relic_data_schema_version": 2,
+        # The following are used for entity synthesis.
+        "modelName": model_name,
+    }
+    if metadata and isinstance(metadata, dict):
+        template.update(metadata)
+
+    # Don't include the raw value when inference_event_value is disabled.
+    include_values = settings.machine_learning and settings.machine_learning.inference_events_value.enabled
+    if include_values:
+        feature_keys = ["feature.%s" % str(name) for name in final_feature_names]
+        label_keys = ["label.%s" % str(name) for name in label_names_list]
+        rows = _prediction_rows(data_set, row_indexes)
+
+    for position, prediction_index in enumerate(range(num_rows) if row_indexes is None else row_indexes):
+        event = {"inference_id": uuid.uuid4()}
+        event.update(template)
+        if include_values:
+            event.update(zip(feature_keys, rows[position]))
+            event.update(zip(label_keys, (str(value) for value in labels[prediction_index])))
         transaction.record_ml_event("InferenceData", event)
 
 
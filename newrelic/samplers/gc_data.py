@@ -15,6 +15,7 @@
 import gc
 import os
 import platform
+import random
 import time
 from collections import Counter
 
@@ -24,6 +25,23 @@ from newrelic.core.stats_engine import CustomMetrics
 from newrelic.samplers.decorators import data_source_factory
 
 
+# The number of objects counted between checks of the time budget when
+# taking an incremental census of the objects tracked by the garbage
+# collector.
+
+CENSUS_CHUNK_SIZE = 10000
+
+
+def _get_objects(generation):
+    # Objects can only be listed by generation from Python 3.8. Before
+    # that, all objects are treated as being in the oldest generation.
+
+    try:
+        return gc.get_objects(generation)
+    except TypeError:
+        return gc.get_objects() if generation == 2 else []
+
+
 @data_source_factory(name="Garbage Collector Metrics")
 class _GCDataSource(object):
     def __init__(self, settings, environ):
@@ -32,6 +50,12 @@ class _GCDataSource(object):
         self.previous_stats = {}
         self.pid = os.getpid()
 
+        # State of an incremental census carried across harvests.
+        self.census_generation = 0
+        self.census_position = 0
+        self.census_counts = Counter()
+        self.census_result = None
+
     @property
     def enabled(self):
         settings = global_settings()
@@ -45,6 +69,101 @@ class _GCDataSource(object):
         settings = global_settings()
         return settings.gc_runtime_metrics.top_object_count_limit
 
+    def full_census(self):
+        return Counter(map(type, gc.get_objects()))
+
+    def sampled_census(self, sample_rate):
+        """Counts the types of a fixed fraction of the objects tracked by
+        the garbage collector, scaling up the counts to estimate those of
+        all the objects. The objects are sampled at a fixed stride from a
+        random offset.
+
+        Only the counting is reduced by sampling. All the objects must
+        still be listed to sample from them, which takes a fraction of the
+        time of a full census but grows with the size of the heap.
+
+        """
+
+        if sample_rate <= 0.0 or sample_rate >= 1.0:
+            return self.full_census()
+
+        stride = int(round(1.0 / sample_rate))
+        objects = gc.get_objects()
+        sample = objects[random.randrange(stride) :: stride]
+        del objects
+
+        counts = Counter(map(type, sample))
+        for obj_type in counts:
+            counts[obj_type] *= stride
+
+        return counts
+
+    def incremental_census(self, time_budget):
+        """Counts the types of the objects tracked by the garbage collector
+        in chunks, a generation at a time, until the time budget is used
+        up. The census resumes from the same position at the next harvest.
+        The counts of the last complete census are returned, which is None
+        until the first has completed.
+
+        The objects of a generation are listed afresh at each harvest and
+        released again before returning, so no record of the objects is
+        kept between harvests. Listing a generation can not be split up,
+        so a harvest which lists the oldest generation of a very large
+        heap stalls for longer than the time budget.
+
+        As objects are created and collected between harvests, the objects
+        at a given position change, so the counts are an approximation
+        where a census spans more than one harvest.
+
+        """
+
+        deadline = time.time() + time_budget
+
+        while True:
+            objects = _get_objects(self.census_generation)
+            count = len(objects)
+
+            # At least one chunk is counted, so that the census progresses
+            # even where the time budget is already used up.
+
+            while self.census_position < count:
+                end = self.census_position + CENSUS_CHUNK_SIZE
+                self.census_counts.update(map(type, objects[self.census_position : end]))
+                self.census_position = end
+
+                if time.time() >= deadline:
+                    break
+
+            del objects
+
+            if self.census_position < count:
+                break
+
+            self.census_position = 0
+            self.census_generation += 1
+
+            if self.census_generation > 2:
+                self.census_result = self.census_counts
+                self.census_counts = Counter()
+                self.census_generation = 0
+                break
+
+            if time.time() >= deadline:
+                break
+
+        return self.census_result
+
+    def object_census(self):
+        settings = global_settings().gc_runtime_metrics
+        census_mode = settings.census_mode
+
+        if census_mode == "incremental":
+            return self.incremental_census(settings.census_time_budget)
+        elif census_mode == "sampled":
+            return self.sampled_census(settings.census_sample_rate)
+        else:
+            return self.full_census()
+
     def record_gc(self, phase, info):
         if not self.enabled:
             return
@@ -91,10 +210,24 @@ class _GCDataSource(object):
                 )
 
         # Record object count for top five types with highest count
-        if hasattr(gc, "get_objects"):
-            object_types = map(type, gc.get_objects())
-            if self.top_object_count_limit > 0:
-                highest_types = Counter(object_types).most_common(self.top_object_count_limit)
+        if hasattr(gc, "get_objects") and self.top_object_count_limit > 0:
+            start = time.time()
+            object_counts = self.object_census()
+            duration = time.time() - start
+
+            yield (
+                "Supportability/Python/GC/ObjectCensus",
+                {
+                    "count": 1,
+                    "total": duration,
+                    "min": duration,
+                    "max": duration,
+                    "sum_of_squares": duration**2,
+                },
+            )
+
+            if object_counts:
+                highest_types = object_counts.most_common(self.top_object_count_limit)
                 for obj_type, count in highest_types:
                     yield (
                         "GC/objects/%d/type/%s" % (self.pid, callable_name(obj_type)),
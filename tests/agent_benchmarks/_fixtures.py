@@ -0,0 +1,199 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Shared helpers for the agent benchmark suites. These build agent objects
+directly rather than through the instrumentation so that each benchmark
+measures only the code path it is named for.
+
+"""
+
+from newrelic.core.application import Application
+from newrelic.core.config import apply_config_setting, finalize_application_settings, global_settings
+from newrelic.core.function_node import FunctionNode
+from newrelic.core.root_node import RootNode
+from newrelic.core.stats_engine import CustomMetrics, DimensionalMetrics, SampledDataSet
+from newrelic.core.transaction_node import TransactionNode
+
+_default_settings = {
+    "developer_mode": True,
+    "license_key": "**NOT A LICENSE KEY**",
+    "feature_flag": set(),
+    "audit_log_file": None,
+}
+
+
+class override_settings(object):
+    """Context manager applying overrides to the global settings for the
+    duration of a benchmark, restoring the original values on exit.
+
+    """
+
+    def __init__(self, overrides=None):
+        self.overrides = dict(_default_settings)
+        self.overrides.update(overrides or {})
+        self.original = None
+
+    def __enter__(self):
+        settings = global_settings()
+        self.original = {}
+        for name, value in self.overrides.items():
+            target = settings
+            for part in name.split(".")[:-1]:
+                target = getattr(target, part)
+            self.original[name] = getattr(target, name.split(".")[-1], None)
+            apply_config_setting(settings, name, value)
+        return settings
+
+    def __exit__(self, exc, value, tb):
+        settings = global_settings()
+        for name, value in self.original.items():
+            apply_config_setting(settings, name, value)
+
+
+def connected_application(name="Python Agent Benchmarks"):
+    """Returns an application connected to the data collector using the
+    developer mode client, which accepts and discards all payloads.
+
+    """
+
+    application = Application(name)
+    application.connect_to_data_collector(None)
+    return application
+
+
+def _function_node(index, children, start_time, duration):
+    return FunctionNode(
+        group="Function",
+        name="segment_%d" % index,
+        children=children,
+        start_time=start_time,
+        end_time=start_time + duration,
+        duration=duration,
+        exclusive=duration / 2.0,
+        label=None,
+        params=None,
+        rollup=None,
+        guid="%016x" % index,
+        agent_attributes={},
+        user_attributes={},
+    )
+
+
+def segment_tree(segments, depth=1, start_time=0.0):
+    """Returns a tuple of root children holding the given number of
+    function nodes, arranged as chains nested to the given depth.
+
+    """
+
+    children = []
+    index = 0
+
+    while index < segments:
+        chain = ()
+        length = min(depth, segments - index)
+        for level in range(length):
+            chain = (_function_node(index, chain, start_time + level * 0.0001, (length - level) * 0.001),)
+            index += 1
+        children.extend(chain)
+
+    return tuple(children)
+
+
+def transaction_node(settings=None, segments=10, depth=1, sampled=True, priority=1.0):
+    """Returns a transaction node for a background task whose trace holds
+    the requested number of function segments.
+
+    """
+
+    if settings is None:
+        settings = finalize_application_settings({"agent_run_id": "1234567"})
+
+    start_time = 1524764430.0
+    children = segment_tree(segments, depth, start_time)
+
+    root = RootNode(
+        name="Function/main",
+        children=children,
+        start_time=start_time,
+        end_time=start_time + 0.1,
+        duration=0.1,
+        exclusive=0.1,
+        guid="4485b89db608aece",
+        agent_attributes={},
+        user_attributes={},
+        path="OtherTransaction/Function/main",
+        trusted_parent_span=None,
+        tracing_vendors=None,
+    )
+
+    return TransactionNode(
+        settings=settings,
+        path="OtherTransaction/Function/main",
+        type="OtherTransaction",
+        group="Function",
+        base_name="main",
+        name_for_metric="Function/main",
+        port=None,
+        request_uri=None,
+        queue_start=0.0,
+        start_time=start_time,
+        end_time=start_time + 0.1,
+        last_byte_time=0.0,
+        total_time=0.1,
+        response_time=0.1,
+        duration=0.1,
+        exclusive=0.1,
+        root=root,
+        errors=(),
+        slow_sql=(),
+        custom_events=SampledDataSet(),
+        ml_events=SampledDataSet(),
+        log_events=SampledDataSet(),
+        apdex_t=0.5,
+        suppress_apdex=False,
+        custom_metrics=CustomMetrics(),
+        dimensional_metrics=DimensionalMetrics(),
+        guid="4485b89db608aece",
+        cpu_time=0.0,
+        suppress_transaction_trace=False,
+        client_cross_process_id=None,
+        referring_transaction_guid=None,
+        record_tt=False,
+        synthetics_resource_id=None,
+        synthetics_job_id=None,
+        synthetics_monitor_id=None,
+        synthetics_header=None,
+        is_part_of_cat=False,
+        trip_id="4485b89db608aece",
+        path_hash=None,
+        referring_path_hash=None,
+        alternate_path_hashes=[],
+        trace_intrinsics={},
+        distributed_trace_intrinsics={},
+        agent_attributes=[],
+        user_attributes=[],
+        priority=priority,
+        parent_transport_duration=None,
+        parent_span=None,
+        parent_type=None,
+        parent_account=None,
+        parent_app=None,
+        parent_tx=None,
+        parent_transport_type=None,
+        sampled=sampled,
+        root_span_guid=None,
+        trace_id="4485b89db608aece",
+        loop_time=0.0,
+        function_stats={},
+    )
@@ -0,0 +1,60 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for deciding the destinations of attributes with the
+attribute filter, for high cardinality attribute names which mostly miss
+the decision cache, with varying numbers of include and exclude rules.
+
+"""
+
+from newrelic.core.attribute_filter import DST_ALL, AttributeFilter
+
+SETTINGS = {
+    "attributes.enabled": True,
+    "transaction_events.attributes.enabled": True,
+    "transaction_tracer.attributes.enabled": True,
+    "error_collector.attributes.enabled": True,
+    "browser_monitoring.attributes.enabled": False,
+    "span_events.attributes.enabled": True,
+    "transaction_segments.attributes.enabled": True,
+}
+
+
+def _settings(rules, cache_size):
+    settings = dict(SETTINGS)
+    settings["agent_limits.attribute_filter_cache_size"] = cache_size
+    settings["attributes.include"] = ["request.parameters.keep_%d" % index for index in range(rules // 2)]
+    settings["attributes.exclude"] = ["request.parameters.*"] + [
+        "custom.drop_%d*" % index for index in range(rules - rules // 2 - 1)
+    ]
+    return settings
+
+
+class TimeAttributeFilter(object):
+    params = ([5, 50, 500], [0, 1000])
+    param_names = ["rules", "cache_size"]
+
+    def setup(self, rules, cache_size):
+        self.attribute_filter = AttributeFilter(_settings(rules, cache_size))
+
+        # Request scoped attribute names, each seen a few times.
+
+        self.names = [
+            name % (index // 4) for index in range(4000) for name in ("request.parameters.id_%d", "custom.key_%d")
+        ]
+
+    def time_apply(self, rules, cache_size):
+        apply = self.attribute_filter.apply
+        for name in self.names:
+            apply(name, DST_ALL)
@@ -0,0 +1,72 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks for recording dimensional metrics with a large number of
+distinct sets of tags, comparing the time taken and the peak memory of
+the metrics table with and without the limits on the number of series.
+
+"""
+
+import tracemalloc
+
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.stats_engine import DimensionalMetrics
+
+LIMITS = ("unlimited", "limited")
+
+
+def _settings(limits):
+    settings = finalize_application_settings()
+    if limits == "unlimited":
+        settings.dimensional_metrics.max_series_per_metric = 0
+        settings.dimensional_metrics.max_series = 0
+    return settings
+
+
+def _record(settings, tag_sets):
+    metrics = DimensionalMetrics(settings)
+    for value in range(tag_sets):
+        metrics.record_dimensional_metric("Requests", 1, {"user.id": value, "route": "/api"})
+    return metrics
+
+
+class TimeRecordCardinality(object):
+    params = (list(LIMITS), [10000, 1000000])
+    param_names = ["limits", "tag_sets"]
+    timeout = 300
+
+    def setup(self, limits, tag_sets):
+        self.settings = _settings(limits)
+
+    def time_record(self, limits, tag_sets):
+        _record(self.settings, tag_sets)
+
+
+class TrackCardinalityMemory(object):
+    params = (list(LIMITS), [10000, 1000000])
+    param_names = ["limits", "tag_sets"]
+    timeout = 300
+
+    def setup(self, limits, tag_sets):
+        self.settings = _settings(limits)
+
+    def track_peak_memory(self, limits, tag_sets):
+        tracemalloc.start()
+        try:
+            _record(self.settings, tag_sets)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak
+
+    track_peak_memory.unit = "bytes"
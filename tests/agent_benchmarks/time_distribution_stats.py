@@ -0,0 +1,88 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for distribution metrics, recording values into the
+exponential histogram and merging per transaction histograms into the
+harvest, compared with recording the same values as value metrics.
+
+"""
+
+import random
+import tracemalloc
+
+from newrelic.core.stats_engine import DimensionalMetrics, DistributionStats
+
+KINDS = ("value", "distribution")
+
+
+def _values(count):
+    generator = random.Random(0)
+    return [generator.lognormvariate(-3.0, 1.0) for _ in range(count)]
+
+
+def _record(kind, values):
+    metrics = DimensionalMetrics()
+    if kind == "distribution":
+        for value in values:
+            metrics.record_dimensional_distribution("Latency", value, {"route": "/api"})
+    else:
+        for value in values:
+            metrics.record_dimensional_metric("Latency", value, {"route": "/api"})
+    return metrics
+
+
+class TimeRecordDistribution(object):
+    params = (list(KINDS), [1000, 100000])
+    param_names = ["kind", "values"]
+
+    def setup(self, kind, values):
+        self.values = _values(values)
+
+    def time_record(self, kind, values):
+        _record(kind, self.values)
+
+
+class TimeMergeDistribution(object):
+    params = [100, 10000]
+    param_names = ["workareas"]
+
+    def setup(self, workareas):
+        values = _values(workareas * 10)
+        self.workareas = [_record("distribution", values[index::workareas]) for index in range(workareas)]
+
+    def time_merge(self, workareas):
+        stats = DistributionStats()
+        for workarea in self.workareas:
+            for _, container in workarea.metrics():
+                for other in container.values():
+                    stats.merge_stats(other)
+
+
+class TrackDistributionMemory(object):
+    params = [1000, 100000]
+    param_names = ["values"]
+
+    def setup(self, values):
+        self.values = _values(values)
+
+    def track_peak_memory(self, values):
+        tracemalloc.start()
+        try:
+            _record("distribution", self.values)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak
+
+    track_peak_memory.unit = "bytes"
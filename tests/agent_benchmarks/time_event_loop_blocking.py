@@ -0,0 +1,119 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for attributing a blocked event loop to the traces of the
+transactions running in other tasks on the same event loop. A transaction
+records a blocking wait while a small number of transactions are waiting
+in tasks on the same event loop, and a large number are waiting in tasks
+on an event loop running in another thread.
+
+"""
+
+import asyncio
+import threading
+
+from newrelic.api.application import application_instance
+from newrelic.api.background_task import BackgroundTask
+from newrelic.api.function_trace import FunctionTrace
+from newrelic.core.trace_cache import trace_cache
+
+from ._fixtures import override_settings
+
+SAME_LOOP_TASKS = 10
+BLOCKING_EVENTS = 100
+
+
+async def waiting_transaction(application, index, started, release):
+    with BackgroundTask(application, "waiting-%d" % index):
+        with FunctionTrace("wait"):
+            started()
+            await release.wait()
+
+
+async def start_waiting_transactions(application, count):
+    release = asyncio.Event()
+    remaining = [count]
+    all_started = asyncio.Event()
+
+    def started():
+        remaining[0] -= 1
+        if not remaining[0]:
+            all_started.set()
+
+    tasks = [asyncio.ensure_future(waiting_transaction(application, index, started, release)) for index in range(count)]
+    if count:
+        await all_started.wait()
+
+    return release, tasks
+
+
+async def stop_waiting_transactions(release, tasks):
+    release.set()
+    if tasks:
+        await asyncio.wait(tasks)
+
+
+class TimeEventLoopBlocking(object):
+    params = [0, 10000]
+    param_names = ["other_loop_tasks"]
+    timeout = 300
+
+    def setup(self, other_loop_tasks):
+        self.settings = override_settings(
+            {
+                "enabled": True,
+                "app_name": "Python Agent Benchmarks",
+                "startup_timeout": 10.0,
+                "event_loop_visibility.enabled": True,
+                "event_loop_visibility.blocking_threshold": 0.1,
+            }
+        )
+        self.settings.__enter__()
+
+        self.application = application_instance("Python Agent Benchmarks")
+        self.application.activate(timeout=10.0)
+
+        # The tasks on the other event loop run in a separate thread for
+        # the duration of the benchmark.
+
+        self.other_loop = asyncio.new_event_loop()
+        self.other_thread = threading.Thread(target=self.other_loop.run_forever)
+        self.other_thread.start()
+
+        self.other_waiting = asyncio.run_coroutine_threadsafe(
+            start_waiting_transactions(self.application, other_loop_tasks), self.other_loop
+        ).result()
+
+        self.loop = asyncio.new_event_loop()
+        self.waiting = self.loop.run_until_complete(start_waiting_transactions(self.application, SAME_LOOP_TASKS))
+
+    def teardown(self, other_loop_tasks):
+        self.loop.run_until_complete(stop_waiting_transactions(*self.waiting))
+        self.loop.close()
+
+        asyncio.run_coroutine_threadsafe(stop_waiting_transactions(*self.other_waiting), self.other_loop).result()
+        self.other_loop.call_soon_threadsafe(self.other_loop.stop)
+        self.other_thread.join()
+        self.other_loop.close()
+
+        self.settings.__exit__(None, None, None)
+
+    async def _blocking_transaction(self):
+        with BackgroundTask(self.application, "blocking"):
+            cache = trace_cache()
+            for _ in range(BLOCKING_EVENTS):
+                cache.record_event_loop_wait(0.0, 1.0)
+
+    def time_record_event_loop_wait(self, other_loop_tasks):
+        self.loop.run_until_complete(self._blocking_transaction())
@@ -0,0 +1,83 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for generating the explain plans of the slow SQL reported in
+a harvest, inline through a SQLConnections cache created for the harvest
+as before, and through the background explain plan executor. The same
+statements are slow every harvest, so after the first harvest the executor
+serves explain plans from its cache.
+
+"""
+
+import sqlite3
+
+from newrelic.core.database_utils import SQLConnections, SQLDatabase, SQLStatement, explain_plan
+from newrelic.core.explain_plan_executor import ExplainPlanExecutor
+
+from ._fixtures import override_settings
+
+STATEMENTS = 20
+CONNECT_PARAMS = (("file:benchmark?mode=memory&cache=shared",), {"uri": True})
+
+
+class SQLiteModule(object):
+    __name__ = "sqlite3"
+
+    _nr_database_product = "SQLite"
+    _nr_explain_query = "EXPLAIN QUERY PLAN"
+    _nr_explain_stmts = ("select",)
+
+    NotSupportedError = sqlite3.NotSupportedError
+
+    @staticmethod
+    def connect(*args, **kwargs):
+        connection = sqlite3.connect(*args, check_same_thread=False, **kwargs)
+        connection.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, name TEXT, age INTEGER)")
+        return connection
+
+
+class TimeExplainPlans(object):
+    params = ["inline", "executor"]
+    param_names = ["mode"]
+
+    def setup(self, mode):
+        self.settings = override_settings()
+        self.settings.__enter__()
+
+        database = SQLDatabase(SQLiteModule())
+        # Statements differing only in literals share the same explain plan
+        # so the columns selected are varied instead.
+
+        self.statements = [
+            SQLStatement("SELECT %s FROM users WHERE age > 1" % ", ".join(["name"] * (index + 1)), database)
+            for index in range(STATEMENTS)
+        ]
+
+        self.executor = ExplainPlanExecutor()
+        self._harvest(self.executor.session(10.0))
+
+    def teardown(self, mode):
+        self.executor.shutdown(timeout=1.0)
+        self.settings.__exit__(None, None, None)
+
+    def _harvest(self, connections):
+        with connections:
+            for statement in self.statements:
+                explain_plan(connections, statement, CONNECT_PARAMS, None, None, None, "obfuscated")
+
+    def time_harvest_explain_plans(self, mode):
+        if mode == "executor":
+            self._harvest(self.executor.session(1.0))
+        else:
+            self._harvest(SQLConnections())
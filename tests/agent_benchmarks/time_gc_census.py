@@ -0,0 +1,61 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for a harvest of the garbage collector data sampler with
+each of the object census modes, for heaps of different sizes. A full
+census counts the types of all objects in a single harvest, where an
+incremental census limits counting to its time budget in each harvest and
+a sampled census only counts a fraction of the objects. Both still list
+the objects, an incremental census once per generation in each harvest.
+
+"""
+
+from newrelic.samplers.gc_data import garbage_collector_data_source
+
+from ._fixtures import override_settings
+
+
+class Allocated(object):
+    pass
+
+
+class TimeGCCensus(object):
+    params = (["full", "incremental", "sampled"], [10000, 1000000])
+    param_names = ["census_mode", "objects"]
+
+    def setup(self, census_mode, objects):
+        self.objects = [Allocated() for _ in range(objects)]
+
+        self.settings = override_settings(
+            {
+                "gc_runtime_metrics.enabled": True,
+                "gc_runtime_metrics.top_object_count_limit": 5,
+                "gc_runtime_metrics.census_mode": census_mode,
+                "gc_runtime_metrics.census_time_budget": 0.01,
+                "gc_runtime_metrics.census_sample_rate": 0.01,
+            }
+        )
+        self.settings.__enter__()
+
+        self.sampler = garbage_collector_data_source(settings=())["factory"](environ=())
+        self.sampler.start()
+
+    def teardown(self, census_mode, objects):
+        self.sampler.stop()
+        self.settings.__exit__(None, None, None)
+        self.objects = None
+
+    def time_harvest(self, census_mode, objects):
+        for _ in self.sampler():
+            pass
@@ -0,0 +1,61 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Harvest duration benchmark with a slow data collector, comparing sending
+each payload from the harvest thread with handing the payloads off to the
+harvest sender threads. The harvest duration is the time the harvest
+thread is blocked before it can take the next snapshot.
+
+"""
+
+import time
+
+from ._fixtures import connected_application, override_settings, transaction_node
+
+
+def _slow_send_request(client, latency):
+    send_request = client.send_request
+
+    def _send_request(*args, **kwargs):
+        time.sleep(latency)
+        return send_request(*args, **kwargs)
+
+    client.send_request = _send_request
+
+
+class TimeHarvest(object):
+    params = ([False, True], [0.0, 0.05, 0.25])
+    param_names = ["harvest_sender", "latency"]
+    number = 1
+    repeat = 5
+
+    def setup(self, harvest_sender, latency):
+        self.settings = override_settings({"harvest_sender.enabled": harvest_sender})
+        self.settings.__enter__()
+
+        self.application = connected_application()
+        _slow_send_request(self.application._active_session._protocol.client, latency)
+
+        node = transaction_node(self.application.configuration, segments=20)
+        for index in range(100):
+            self.application.record_transaction(node)
+            self.application.record_custom_event("Benchmark", {"index": index})
+
+    def teardown(self, harvest_sender, latency):
+        if self.application._harvest_sender is not None:
+            self.application._harvest_sender.shutdown(timeout=10.0)
+        self.settings.__exit__(None, None, None)
+
+    def time_harvest(self, harvest_sender, latency):
+        self.application.harvest()
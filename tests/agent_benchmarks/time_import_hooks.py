@@ -0,0 +1,98 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for cold importing a synthetic package with thousands of
+modules, comparing an interpreter without the agent's import hook finder,
+one where the finder is installed with import hooks pending for modules
+which are never imported, and one where every imported module has an
+import hook which fires.
+
+"""
+
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+
+import newrelic.api.import_hook as import_hook
+
+PACKAGE = "nr_benchmark_package"
+PENDING = 400
+
+
+def create_package(directory, modules):
+    package = os.path.join(directory, PACKAGE)
+    os.mkdir(package)
+
+    with open(os.path.join(package, "__init__.py"), "w") as init:
+        init.write("")
+
+    for index in range(modules):
+        with open(os.path.join(package, "module_%d.py" % index), "w") as module:
+            module.write("VALUE = %d\n\ndef function():\n    return VALUE\n" % index)
+
+
+def hook(module):
+    pass
+
+
+class TimeColdImport(object):
+    params = (["absent", "pending", "hooked"], [1000, 5000])
+    param_names = ["finder", "modules"]
+
+    def setup(self, finder, modules):
+        self.directory = tempfile.mkdtemp()
+        create_package(self.directory, modules)
+
+        self.names = ["%s.module_%d" % (PACKAGE, index) for index in range(modules)]
+
+        self.meta_path = sys.meta_path
+        self.sys_path = sys.path
+        sys.path = [self.directory] + sys.path
+        importlib.invalidate_caches()
+
+        if finder == "absent":
+            import_hook.remove_import_hook_finder()
+        else:
+            for index in range(PENDING):
+                import_hook.register_import_hook("nr_benchmark_missing_%d" % index, hook)
+
+        if finder == "hooked":
+            for name in self.names:
+                import_hook.register_import_hook(name, hook)
+
+        # Import once to populate the bytecode cache so only the import
+        # machinery itself is measured.
+
+        self.time_import(finder, modules)
+        self.unload()
+
+        if finder == "hooked":
+            for name in self.names:
+                import_hook.register_import_hook(name, hook)
+
+    def teardown(self, finder, modules):
+        self.unload()
+        sys.meta_path = self.meta_path
+        sys.path = self.sys_path
+        shutil.rmtree(self.directory)
+
+    def unload(self):
+        for name in [PACKAGE] + self.names:
+            sys.modules.pop(name, None)
+
+    def time_import(self, finder, modules):
+        for name in self.names:
+            importlib.import_module(name)
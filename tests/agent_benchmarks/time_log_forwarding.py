@@ -0,0 +1,84 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for logging through the standard library logging module with
+the agent's log forwarding, local decorating and log line metrics enabled,
+both within a transaction and outside of one. The handler formats each
+record, as a stream or file handler would, but discards the result.
+
+"""
+
+import logging
+
+from newrelic.api.application import application_instance
+from newrelic.api.background_task import BackgroundTask
+from newrelic.hooks.logger_logging import instrument_logging
+
+from ._fixtures import override_settings
+
+LOG_LINES = 2000
+
+if not hasattr(logging.Logger.callHandlers, "__wrapped__"):
+    instrument_logging(logging)
+
+
+class DiscardingHandler(logging.Handler):
+    def emit(self, record):
+        self.format(record)
+
+
+class TimeLogForwarding(object):
+    params = ([False, True], [0, 100])
+    param_names = ["in_transaction", "buffer_size"]
+
+    def setup(self, in_transaction, buffer_size):
+        self.settings = override_settings(
+            {
+                "enabled": True,
+                "app_name": "Python Agent Benchmarks",
+                "startup_timeout": 10.0,
+                "application_logging.enabled": True,
+                "application_logging.forwarding.enabled": True,
+                "application_logging.forwarding.buffer_size": buffer_size,
+                "application_logging.local_decorating.enabled": True,
+                "application_logging.metrics.enabled": True,
+            }
+        )
+        self.settings.__enter__()
+
+        self.application = application_instance("Python Agent Benchmarks")
+        self.application.activate(timeout=10.0)
+
+        self.logger = logging.getLogger("nr_benchmark_logger")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.handler = DiscardingHandler()
+        self.handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        self.logger.addHandler(self.handler)
+
+    def teardown(self, in_transaction, buffer_size):
+        self.logger.removeHandler(self.handler)
+        self.settings.__exit__(None, None, None)
+
+    def _log(self):
+        logger = self.logger
+        for index in range(LOG_LINES):
+            logger.info("Processed request %d for user %s in %.3f seconds", index, "nr_user", 0.25)
+
+    def time_log_lines(self, in_transaction, buffer_size):
+        if in_transaction:
+            with BackgroundTask(self.application, "main"):
+                self._log()
+        else:
+            self._log()
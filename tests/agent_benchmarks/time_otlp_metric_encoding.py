@@ -0,0 +1,84 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks for encoding dimensional metric data as an OTLP payload,
+comparing the time taken and peak memory of writing the payload directly
+from the stats table with building and serializing the message tree. Peak
+memory is measured as the peak resident set size of the process, as the
+protobuf message classes allocate outside of the Python memory allocator.
+
+"""
+
+from newrelic.core.otlp_utils import (
+    MetricsData,
+    ResourceMetrics,
+    ScopeMetrics,
+    create_resource,
+    encode_metric_data,
+    otlp_encode,
+    stats_to_otlp_metrics,
+)
+from newrelic.core.stats_engine import DimensionalMetrics
+
+ENCODERS = ("message_tree", "direct")
+
+
+def _metric_data(series):
+    metrics = DimensionalMetrics()
+    for index in range(series):
+        tags = {"route": "/api/%d" % (index % 100), "status": 200 + index % 5, "user.id": index // 100}
+        metrics.record_dimensional_metric("Latency", index * 0.001, tags)
+        metrics.record_dimensional_metric("Requests", {"count": 1}, tags)
+    return list(metrics.metrics())
+
+
+def _encode_message_tree(metric_data, start_time, end_time):
+    payload = MetricsData(
+        resource_metrics=[
+            ResourceMetrics(
+                resource=create_resource(),
+                scope_metrics=[ScopeMetrics(metrics=list(stats_to_otlp_metrics(metric_data, start_time, end_time)))],
+            )
+        ]
+    )
+    return otlp_encode(payload)
+
+
+def _encode(encoder, metric_data):
+    if encoder == "direct":
+        return otlp_encode(encode_metric_data(metric_data, 1000.0, 1060.0))
+    return _encode_message_tree(metric_data, 1000.0, 1060.0)
+
+
+class TimeEncodeMetricData(object):
+    params = (list(ENCODERS), [1000, 10000, 100000])
+    param_names = ["encoder", "series"]
+    timeout = 300
+
+    def setup(self, encoder, series):
+        self.metric_data = _metric_data(series)
+
+    def time_encode(self, encoder, series):
+        _encode(encoder, self.metric_data)
+
+
+class PeakMemEncodeMetricData(object):
+    params = (list(ENCODERS), [1000, 10000, 100000])
+    param_names = ["encoder", "series"]
+    timeout = 300
+
+    def setup(self, encoder, series):
+        self.metric_data = _metric_data(series)
+
+    def peakmem_encode(self, encoder, series):
+        _encode(encoder, self.metric_data)
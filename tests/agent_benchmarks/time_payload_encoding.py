@@ -0,0 +1,122 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Harvest payload benchmarks comparing a single json_encode() of the whole
+payload with streaming the encoded chunks into the compressor, sending to a
+local fake collector which reads and discards the request body.
+
+"""
+
+import threading
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from newrelic.common.agent_http import InsecureHttpClient
+from newrelic.core.agent_protocol import AgentProtocol
+from newrelic.core.config import finalize_application_settings
+
+from ._fixtures import override_settings
+
+MODES = {"buffered": False, "streaming": True}
+
+
+class _FakeCollectorHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Length", "22")
+        self.end_headers()
+        self.wfile.write(b'{"return_value":null}\n')
+
+    def log_message(self, *args):
+        pass
+
+
+class fake_collector(object):
+    """Context manager running a local HTTP collector on an ephemeral port."""
+
+    def __init__(self):
+        self.httpd = HTTPServer(("localhost", 0), _FakeCollectorHandler)
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc, value, tb):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+
+def _span_events(count):
+    return [
+        [
+            {
+                "type": "Span",
+                "traceId": "%032x" % index,
+                "guid": "%016x" % index,
+                "parentId": "%016x" % (index - 1),
+                "transactionId": "%016x" % (index // 10),
+                "sampled": True,
+                "priority": 1.5,
+                "timestamp": 1600000000000 + index,
+                "duration": 0.0125,
+                "name": "Function/module:handler_%d" % (index % 100),
+                "category": "generic",
+                "nr.entryPoint": index % 10 == 0,
+            },
+            {},
+            {"code.function": "handler_%d" % (index % 100), "code.lineno": index % 500},
+        ]
+        for index in range(count)
+    ]
+
+
+class _PayloadBenchmark(object):
+    params = (list(MODES), [1000, 10000, 50000])
+    param_names = ["mode", "events"]
+
+    def setup(self, mode, events):
+        self.collector = fake_collector().__enter__()
+        with override_settings({"streaming_payloads.enabled": MODES[mode]}):
+            settings = finalize_application_settings(
+                {"agent_run_id": "RUN_ID", "port": self.collector.port, "max_payload_size_in_bytes": 100000000}
+            )
+        self.protocol = AgentProtocol(settings, host="localhost", client_cls=InsecureHttpClient)
+        self.payload = ("RUN_ID", {"reservoir_size": events, "events_seen": events}, _span_events(events))
+
+    def teardown(self, mode, events):
+        self.protocol.close_connection()
+        self.collector.__exit__(None, None, None)
+
+
+class TimeSendPayload(_PayloadBenchmark):
+    def time_span_event_data(self, mode, events):
+        self.protocol.send("span_event_data", self.payload)
+
+
+class TrackPayloadMemory(_PayloadBenchmark):
+    def track_peak_memory(self, mode, events):
+        tracemalloc.start()
+        try:
+            self.protocol.send("span_event_data", self.payload)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak
+
+    track_peak_memory.unit = "bytes"
@@ -0,0 +1,78 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Contention benchmark for recording custom metrics against the
+application outside of a transaction, as done for each log line by the
+logging instrumentation. A fixed number of log line metrics is recorded
+split evenly across a pool of threads, with and without thread local
+metrics, to show the per call cost as the number of threads contending
+for the custom metrics stats lock grows.
+
+"""
+
+import threading
+import time
+
+from ._fixtures import connected_application, override_settings
+
+LOG_LINES = 20000
+
+
+class TimeRecordCustomMetric(object):
+    params = ([1, 4, 16], [False, True])
+    param_names = ["threads", "thread_local_metrics"]
+    timeout = 300
+
+    def setup(self, threads, thread_local_metrics):
+        self.settings = override_settings({"thread_local_metrics.enabled": thread_local_metrics})
+        self.settings.__enter__()
+
+        self.application = connected_application()
+
+    def teardown(self, threads, thread_local_metrics):
+        self.settings.__exit__(None, None, None)
+
+    def _record(self, threads):
+        start = threading.Event()
+        per_thread = LOG_LINES // threads
+
+        def worker():
+            start.wait()
+            for _ in range(per_thread):
+                self.application.record_custom_metric("Logging/lines", {"count": 1})
+                self.application.record_custom_metric("Logging/lines/INFO", {"count": 1})
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+
+        started = time.time()
+        start.set()
+
+        for thread in workers:
+            thread.join()
+
+        return (time.time() - started) / (per_thread * threads)
+
+    def time_record_custom_metric(self, threads, thread_local_metrics):
+        self._record(threads)
+
+    def track_record_custom_metric_cost(self, threads, thread_local_metrics):
+        return self._record(threads) * 1e6
+
+    track_record_custom_metric_cost.unit = "us"
+
+    def time_harvest_after_record(self, threads, thread_local_metrics):
+        self._record(threads)
+        self.application.harvest()
@@ -0,0 +1,82 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Contention benchmark for Application.record_transaction. A fixed number
+of transactions is recorded split evenly across a pool of threads, with and
+without sharded stats, to show the per transaction record cost as the
+number of threads contending for the application stats lock grows.
+
+"""
+
+import threading
+import time
+
+from ._fixtures import connected_application, override_settings, transaction_node
+
+TRANSACTIONS = 8000
+
+
+class TimeRecordTransaction(object):
+    params = ([1, 4, 16, 32], [False, True])
+    param_names = ["threads", "sharded_stats"]
+    timeout = 300
+
+    def setup(self, threads, sharded_stats):
+        self.settings = override_settings(
+            {
+                "sharded_stats.enabled": sharded_stats,
+                "collect_custom_events": False,
+                "application_logging.forwarding.enabled": False,
+            }
+        )
+        self.settings.__enter__()
+
+        self.application = connected_application()
+        self.node = transaction_node(self.application.configuration, segments=20)
+
+    def teardown(self, threads, sharded_stats):
+        self.settings.__exit__(None, None, None)
+
+    def _record(self, threads):
+        start = threading.Event()
+        per_thread = TRANSACTIONS // threads
+
+        def worker():
+            start.wait()
+            for _ in range(per_thread):
+                self.application.record_transaction(self.node)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+
+        started = time.time()
+        start.set()
+
+        for thread in workers:
+            thread.join()
+
+        return (time.time() - started) / (per_thread * threads)
+
+    def time_record_transaction(self, threads, sharded_stats):
+        self._record(threads)
+
+    def track_record_transaction_cost(self, threads, sharded_stats):
+        return self._record(threads) * 1e6
+
+    track_record_transaction_cost.unit = "us"
+
+    def time_harvest_after_record(self, threads, sharded_stats):
+        self._record(threads)
+        self.application.harvest()
@@ -0,0 +1,101 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for the normalization of names by the rules engine, with
+and without the result cache, for a small set of URL shapes repeated
+many times as produced by a typical REST API.
+
+"""
+
+from newrelic.core.rules_engine import RulesEngine
+
+# Rules of the form sent by the data collector for URL normalization.
+
+URL_RULES = [
+    {
+        "match_expression": r".*\.(css|gif|ico|jpe?g|js|png|swf)$",
+        "replacement": r"/*.\1",
+        "ignore": False,
+        "eval_order": 1000,
+        "terminate_chain": True,
+        "each_segment": False,
+        "replace_all": False,
+    },
+    {
+        "match_expression": r"^[0-9][0-9a-f_,.-]*$",
+        "replacement": "*",
+        "ignore": False,
+        "eval_order": 1001,
+        "terminate_chain": False,
+        "each_segment": True,
+        "replace_all": False,
+    },
+    {
+        "match_expression": r"^(.*)/[0-9][0-9a-f_,-]*\.([0-9a-z][0-9a-z]*)$",
+        "replacement": r"\1/.*\2",
+        "ignore": False,
+        "eval_order": 1002,
+        "terminate_chain": False,
+        "each_segment": False,
+        "replace_all": False,
+    },
+]
+
+# Rules of the form configured for transaction names, none of which apply
+# to each segment so the combined prefilter can be used.
+
+TRANSACTION_RULES = [
+    {
+        "match_expression": "^WebTransaction/Uri/internal/",
+        "replacement": "WebTransaction/Uri/internal/*",
+        "eval_order": 0,
+    },
+    {"match_expression": "/[0-9a-f]{32}", "replacement": "/*", "eval_order": 1, "replace_all": True},
+    {"match_expression": "/healthz?$", "replacement": "", "eval_order": 2, "ignore": True},
+]
+
+RULES = {"url": URL_RULES, "transaction": TRANSACTION_RULES}
+
+SHAPES = [
+    "/api/v1/users/%d",
+    "/api/v1/users/%d/orders",
+    "/api/v1/orders/%d/items/%d",
+    "/api/v2/search",
+    "/static/app.%d.js",
+]
+
+
+def _names(rule_type, count, distinct):
+    names = []
+    for index in range(count):
+        shape = SHAPES[index % len(SHAPES)]
+        name = shape.replace("%d", str(index % distinct))
+        if rule_type == "transaction":
+            name = "WebTransaction/Uri" + name
+        names.append(name)
+    return names
+
+
+class TimeNormalize(object):
+    params = (list(RULES), [0, 1000], [50, 100000])
+    param_names = ["rule_type", "cache_size", "distinct"]
+
+    def setup(self, rule_type, cache_size, distinct):
+        self.rules_engine = RulesEngine(RULES[rule_type], cache_size)
+        self.names = _names(rule_type, 10000, distinct)
+
+    def time_normalize(self, rule_type, cache_size, distinct):
+        normalize = self.rules_engine.normalize
+        for name in self.names:
+            normalize(name)
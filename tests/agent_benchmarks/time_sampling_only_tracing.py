@@ -0,0 +1,79 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for a background task transaction with 500 function traces
+which is neither sampled for span events nor a transaction trace
+candidate, with and without sampling only tracing. Sampling only tracing
+aggregates the time metrics of the function traces in place of creating
+function nodes. Both the time taken and the memory allocated by the
+transaction are measured, including recording it into the stats engine.
+
+"""
+
+import tracemalloc
+
+from newrelic.api.application import application_instance
+from newrelic.api.background_task import BackgroundTask
+from newrelic.api.function_trace import FunctionTrace
+
+from ._fixtures import override_settings
+
+SEGMENTS = 500
+
+
+class TimeSamplingOnlyTracing(object):
+    params = [False, True]
+    param_names = ["sampling_only"]
+
+    def setup(self, sampling_only):
+        self.settings = override_settings(
+            {
+                "enabled": True,
+                "app_name": "Python Agent Benchmarks",
+                "startup_timeout": 10.0,
+                "sampling_only_tracing.enabled": sampling_only,
+                "distributed_tracing.enabled": True,
+                "span_events.enabled": True,
+            }
+        )
+        self.settings.__enter__()
+
+        self.application = application_instance("Python Agent Benchmarks")
+        self.application.activate(timeout=10.0)
+
+    def teardown(self, sampling_only):
+        self.settings.__exit__(None, None, None)
+
+    def _transaction(self):
+        with BackgroundTask(self.application, "main") as transaction:
+            transaction._sampled = False
+
+            for index in range(SEGMENTS // 10):
+                with FunctionTrace("segment_%d" % index):
+                    for _ in range(9):
+                        with FunctionTrace("leaf"):
+                            pass
+
+    def time_transaction(self, sampling_only):
+        self._transaction()
+
+    def track_transaction_allocated(self, sampling_only):
+        tracemalloc.start()
+        try:
+            self._transaction()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    track_transaction_allocated.unit = "bytes"
@@ -0,0 +1,64 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Serverless mode benchmarks for the work done at the end of a Lambda
+invocation: sending each harvest payload to the serverless client and
+finalizing them into the NR_LAMBDA_MONITORING envelope written to stdout.
+
+"""
+
+import os
+import sys
+
+from newrelic.core.agent_protocol import ServerlessModeProtocol
+from newrelic.core.config import finalize_application_settings
+
+from .time_payload_encoding import _span_events
+
+INVOCATIONS = {"typical": (50, 20), "large": (2000, 5000)}
+
+
+def _metric_data(count):
+    return [
+        [
+            {"name": "Function/module:handler_%d" % index, "scope": "WebTransaction/Function/handler"},
+            [1, 0.5, 0.5, 0.5, 0.5, 0.25],
+        ]
+        for index in range(count)
+    ]
+
+
+class TimeServerlessFinalize(object):
+    params = list(INVOCATIONS)
+    param_names = ["invocation"]
+
+    def setup(self, invocation):
+        metrics, spans = INVOCATIONS[invocation]
+        self.protocol = ServerlessModeProtocol(finalize_application_settings({"aws_lambda_metadata": {"arn": "ARN"}}))
+        self.payloads = (
+            ("metric_data", ("RUN_ID", 1600000000.0, 1600000060.0, _metric_data(metrics))),
+            ("span_event_data", ("RUN_ID", {"reservoir_size": spans, "events_seen": spans}, _span_events(spans))),
+            ("analytic_event_data", ("RUN_ID", {"reservoir_size": 1, "events_seen": 1}, _span_events(1))),
+        )
+        self.stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+
+    def teardown(self, invocation):
+        sys.stdout.close()
+        sys.stdout = self.stdout
+
+    def time_finalize(self, invocation):
+        for method, payload in self.payloads:
+            self.protocol.send(method, payload)
+        self.protocol.finalize()
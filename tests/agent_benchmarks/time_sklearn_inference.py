@@ -0,0 +1,74 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for the telemetry recorded by the scikit-learn instrumentation
+after a batch predict(): the feature and label stats metrics and the
+InferenceData events, for synthetic DataFrame batches with and without
+sampling of the events.
+
+"""
+
+from newrelic.api.application import application_instance
+from newrelic.api.background_task import BackgroundTask
+from newrelic.hooks.mlmodel_sklearn import create_prediction_event
+
+from ._fixtures import override_settings
+
+FEATURES = 8
+
+
+class _Model(object):
+    pass
+
+
+class TimeSklearnPredictionTelemetry(object):
+    params = ([10000, 100000, 1000000], [0, 100])
+    param_names = ["rows", "sample_size"]
+    timeout = 600
+
+    def setup(self, rows, sample_size):
+        try:
+            import numpy as np
+            import pandas as pd
+        except ImportError:
+            raise NotImplementedError
+
+        self.settings = override_settings(
+            {
+                "enabled": True,
+                "app_name": "Python Agent Benchmarks",
+                "startup_timeout": 10.0,
+                "machine_learning.enabled": True,
+                "machine_learning.inference_events_value.enabled": True,
+                "machine_learning.inference_events_sample_size": sample_size,
+                "ml_insights_events.enabled": True,
+            }
+        )
+        self.settings.__enter__()
+
+        self.application = application_instance("Python Agent Benchmarks")
+        self.application.activate(timeout=10.0)
+
+        random_state = np.random.RandomState(0)
+        self.features = pd.DataFrame(
+            random_state.normal(size=(rows, FEATURES)), columns=["feature_%d" % index for index in range(FEATURES)]
+        )
+        self.labels = random_state.randint(0, 2, size=rows)
+
+    def teardown(self, rows, sample_size):
+        self.settings.__exit__(None, None, None)
+
+    def time_predict_telemetry(self, rows, sample_size):
+        with BackgroundTask(self.application, "predict") as transaction:
+            create_prediction_event(transaction, "Model", _Model(), (self.features,), {}, self.labels)
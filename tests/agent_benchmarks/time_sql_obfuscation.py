@@ -0,0 +1,115 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for the obfuscation and parsing of SQL statements, comparing
+the regex and tokenizer obfuscation engines over the cross agent SQL
+obfuscation fixtures, and the statement cache for a small set of ORM
+generated statements repeated many times.
+
+"""
+
+import json
+import os
+
+from newrelic.core.database_utils import SQLStatement, _obfuscate
+
+from ._fixtures import override_settings
+
+FIXTURES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+    "cross_agent",
+    "fixtures",
+    "sql_obfuscation",
+    "sql_obfuscation.json",
+)
+
+QUOTING_STYLES = {
+    "sqlite": "single",
+    "mysql": "single+double",
+    "postgres": "single+dollar",
+    "oracle": "single+oracle",
+    "cassandra": "single",
+}
+
+# Statements of the form generated by the Django ORM. Only the values
+# differ between executions of the same query, but as these are bound
+# as parameters the SQL itself is identical.
+
+ORM_STATEMENTS = [
+    'SELECT "auth_user"."id", "auth_user"."password", "auth_user"."last_login", '
+    '"auth_user"."is_superuser", "auth_user"."username" FROM "auth_user" '
+    'WHERE "auth_user"."id" = %s LIMIT 21',
+    'SELECT "django_session"."session_key", "django_session"."session_data", '
+    '"django_session"."expire_date" FROM "django_session" WHERE '
+    '("django_session"."expire_date" > %s AND "django_session"."session_key" = %s) LIMIT 21',
+    'INSERT INTO "shop_order" ("customer_id", "created", "total") VALUES (%s, %s, %s) RETURNING "shop_order"."id"',
+    'UPDATE "shop_stock" SET "quantity" = ("shop_stock"."quantity" - %s) WHERE "shop_stock"."id" = %s',
+    'SELECT COUNT(*) AS "__count" FROM "shop_order" WHERE "shop_order"."customer_id" = 42',
+]
+
+
+class DummyDB(object):
+    def __init__(self, quoting_style):
+        self.quoting_style = quoting_style
+
+
+def _fixture_statements():
+    with open(FIXTURES) as fh:
+        tests = json.load(fh)
+
+    statements = []
+    for test in tests:
+        for dialect in test["dialects"]:
+            statements.append((test["sql"], QUOTING_STYLES[dialect]))
+    return statements
+
+
+class TimeObfuscateFixtures(object):
+    params = ["regex", "tokenizer"]
+    param_names = ["engine"]
+
+    def setup(self, engine):
+        self.statements = _fixture_statements()
+
+    def time_obfuscate(self, engine):
+        for sql, quoting_style in self.statements:
+            _obfuscate(sql, quoting_style, engine)
+
+
+class TimeStatementDetails(object):
+    params = (["regex", "tokenizer"], [0, 1000])
+    param_names = ["engine", "cache_size"]
+
+    def setup(self, engine, cache_size):
+        self.database = DummyDB("single+dollar")
+        self.statements = ORM_STATEMENTS * 2000
+        self.settings = override_settings(
+            {"sql_obfuscation.engine": engine, "agent_limits.sql_statement_cache_size": cache_size}
+        )
+        self.settings.__enter__()
+
+    def teardown(self, engine, cache_size):
+        self.settings.__exit__(None, None, None)
+
+    def time_statement_details(self, engine, cache_size):
+        # A new statement object is created for each database trace, with
+        # the details required for the metrics, span and slow SQL.
+
+        database = self.database
+        for sql in self.statements:
+            statement = SQLStatement(sql, database)
+            statement.operation
+            statement.target
+            statement.obfuscated
+            statement.identifier
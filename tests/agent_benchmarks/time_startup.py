@@ -0,0 +1,79 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for agent startup, measuring the wall time of importing the
+agent and calling newrelic.agent.initialize() and the number of modules
+this imports. Each measurement runs in a fresh interpreter, so the cost of
+first time imports such as entry point discovery is included.
+
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+STARTUP_SCRIPT = """
+import json
+import sys
+import time
+
+modules = len(sys.modules)
+start = time.time()
+
+import newrelic.agent
+
+newrelic.agent.initialize()
+
+print(json.dumps({"seconds": time.time() - start, "modules": len(sys.modules) - modules}))
+"""
+
+
+def run_startup(entry_points_cache, cache_directory):
+    environ = dict(os.environ)
+    environ["NEW_RELIC_ENTRY_POINTS_CACHE_ENABLED"] = "true" if entry_points_cache else "false"
+    environ["NEW_RELIC_ENTRY_POINTS_CACHE_DIRECTORY"] = cache_directory
+
+    output = subprocess.check_output([sys.executable, "-c", STARTUP_SCRIPT], env=environ)
+
+    return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+
+class TimeAgentStartup(object):
+    params = [False, True]
+    param_names = ["entry_points_cache"]
+
+    def setup(self, entry_points_cache):
+        self.cache_directory = tempfile.mkdtemp()
+
+        # Populate the entry points cache so the measured runs reflect a
+        # worker started after the first one on the same host.
+
+        run_startup(entry_points_cache, self.cache_directory)
+
+    def teardown(self, entry_points_cache):
+        for name in os.listdir(self.cache_directory):
+            os.unlink(os.path.join(self.cache_directory, name))
+        os.rmdir(self.cache_directory)
+
+    def track_initialize_time(self, entry_points_cache):
+        return run_startup(entry_points_cache, self.cache_directory)["seconds"]
+
+    track_initialize_time.unit = "seconds"
+
+    def track_initialize_imports(self, entry_points_cache):
+        return run_startup(entry_points_cache, self.cache_directory)["modules"]
+
+    track_initialize_imports.unit = "modules"
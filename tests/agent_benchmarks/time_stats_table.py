@@ -0,0 +1,98 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Memory and merge benchmarks comparing the default dict of stats objects
+with the compact array backed stats table, for applications with large
+numbers of unique scoped metrics.
+
+"""
+
+import tracemalloc
+
+from newrelic.core.metric import TimeMetric
+from newrelic.core.stats_engine import CompactStatsTable, StatsTable
+
+TABLES = {"dict": StatsTable, "compact": CompactStatsTable}
+
+
+def _time_metrics(count, scopes=10):
+    return [
+        TimeMetric(
+            name="Function/module:handler_%d" % index,
+            scope="WebTransaction/Uri/%d" % (index % scopes),
+            duration=0.01 + index * 1e-6,
+            exclusive=0.005,
+        )
+        for index in range(count)
+    ]
+
+
+def _populate(table_type, metrics):
+    # Each metric is recorded twice so the accumulated values are distinct
+    # objects owned by the table, as they would be after a harvest period.
+
+    table = table_type()
+    for _ in range(2):
+        for metric in metrics:
+            table.merge_time_metric((metric.name, metric.scope), metric)
+    return table
+
+
+class TimeMergeStatsTable(object):
+    params = (list(TABLES), [1000, 10000, 50000])
+    param_names = ["table", "metrics"]
+
+    def setup(self, table, metrics):
+        self.metrics = _time_metrics(metrics)
+
+        # The main table has seen every metric, a workarea for a single
+        # transaction holds a small subset of them.
+
+        self.main = _populate(TABLES[table], self.metrics)
+        self.workarea = _populate(TABLES[table], self.metrics[:: max(1, metrics // 50)])
+        self.snapshot = _populate(TABLES[table], self.metrics)
+
+    def time_merge_workarea(self, table, metrics):
+        self.main.merge_table(self.workarea)
+
+    def time_merge_snapshot(self, table, metrics):
+        self.main.merge_table(self.snapshot)
+
+    def time_record_time_metrics(self, table, metrics):
+        _populate(TABLES[table], self.metrics)
+
+    def time_metric_data(self, table, metrics):
+        [(dict(name=key[0], scope=key[1]), value) for key, value in self.main.items()]
+
+
+class TrackStatsTableMemory(object):
+    params = (list(TABLES), [1000, 10000, 50000])
+    param_names = ["table", "metrics"]
+
+    def setup(self, table, metrics):
+        # Metric names are created up front as they are shared with the
+        # transaction nodes and are not owned by the table.
+
+        self.metrics = _time_metrics(metrics)
+
+    def track_table_memory(self, table, metrics):
+        tracemalloc.start()
+        try:
+            table = _populate(TABLES[table], self.metrics)
+            size, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return size
+
+    track_table_memory.unit = "bytes"
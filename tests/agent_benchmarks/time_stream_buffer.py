@@ -0,0 +1,43 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for adding the span protos of a transaction to the Infinite
+Tracing stream buffer, one span at a time and as a batch, for each of the
+drop policies applied when the buffer is full.
+
+"""
+
+from newrelic.common.streaming_utils import StreamBuffer
+from newrelic.core.infinite_tracing_pb2 import Span
+
+TRANSACTIONS = 1000
+
+
+class TimeStreamBuffer(object):
+    params = ([10, 100], ["oldest", "newest", "priority"])
+    param_names = ["spans", "drop_policy"]
+
+    def setup(self, spans, drop_policy):
+        self.spans = [Span(intrinsics={}, agent_attributes={}, user_attributes={}) for _ in range(spans)]
+
+    def time_put(self, spans, drop_policy):
+        stream_buffer = StreamBuffer(10000, drop_policy=drop_policy)
+        for index in range(TRANSACTIONS):
+            for span in self.spans:
+                stream_buffer.put(span, priority=index % 7)
+
+    def time_put_many(self, spans, drop_policy):
+        stream_buffer = StreamBuffer(10000, drop_policy=drop_policy)
+        for index in range(TRANSACTIONS):
+            stream_buffer.put_many(self.spans, priority=index % 7)
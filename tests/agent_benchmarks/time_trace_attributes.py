@@ -0,0 +1,71 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for running a transaction through the instrumentation API,
+sampled and unsampled, with function traces whose source code context is
+reported as code level metrics attributes. For unsampled transactions no
+span events or transaction trace are generated, so the attributes of the
+trace segments are never resolved.
+
+"""
+
+from newrelic.api.application import application_instance
+from newrelic.api.background_task import BackgroundTask
+from newrelic.api.function_trace import FunctionTrace
+
+from ._fixtures import override_settings
+
+
+class _Callable(object):
+    def __call__(self):
+        pass
+
+
+def _function():
+    pass
+
+
+_SOURCES = (_function, _Callable(), len, _Callable.__call__)
+
+
+class TimeTraceAttributes(object):
+    params = ([False, True], [False, True])
+    param_names = ["sampled", "code_level_metrics"]
+
+    def setup(self, sampled, code_level_metrics):
+        self.settings = override_settings(
+            {
+                "enabled": True,
+                "app_name": "Python Agent Benchmarks",
+                "startup_timeout": 10.0,
+                "distributed_tracing.enabled": True,
+                "span_events.enabled": True,
+                "code_level_metrics.enabled": code_level_metrics,
+            }
+        )
+        self.settings.__enter__()
+
+        self.application = application_instance("Python Agent Benchmarks")
+        self.application.activate(timeout=10.0)
+
+    def teardown(self, sampled, code_level_metrics):
+        self.settings.__exit__(None, None, None)
+
+    def time_transaction(self, sampled, code_level_metrics):
+        with BackgroundTask(self.application, "main") as transaction:
+            transaction._sampled = sampled
+            transaction._priority = 1.0
+            for index in range(50):
+                with FunctionTrace("segment_%d" % index, source=_SOURCES[index % 4]):
+                    pass
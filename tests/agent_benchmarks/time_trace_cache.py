@@ -0,0 +1,86 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for entering and exiting function traces with each of the
+trace cache backends, in a thread and in an asyncio task. Every function
+trace looks up the current trace when created, and saves and restores
+the current trace on entry and exit. The transaction is started before
+timing begins so that only the function traces are measured.
+
+"""
+
+import asyncio
+
+from newrelic.api.application import application_instance
+from newrelic.api.background_task import BackgroundTask
+from newrelic.api.function_trace import FunctionTrace
+from newrelic.core import trace_cache
+from newrelic.core.context import ContextOf
+
+from ._fixtures import override_settings
+
+TRACES = 1000
+
+
+def _function_traces():
+    for _ in range(TRACES):
+        with FunctionTrace("segment"):
+            pass
+
+
+class TimeTraceCache(object):
+    params = (["registry", "contextvars"], ["thread", "asyncio"])
+    param_names = ["backend", "concurrency"]
+
+    def setup(self, backend, concurrency):
+        self.original_backend = type(trace_cache.trace_cache())
+        trace_cache.set_trace_cache_backend(backend)
+
+        self.settings = override_settings(
+            {
+                "enabled": True,
+                "app_name": "Python Agent Benchmarks",
+                "startup_timeout": 10.0,
+            }
+        )
+        self.settings.__enter__()
+
+        application = application_instance("Python Agent Benchmarks")
+        application.activate(timeout=10.0)
+
+        self.loop = asyncio.new_event_loop()
+        self.transaction = BackgroundTask(application, "main")
+        self.transaction.__enter__()
+
+    def teardown(self, backend, concurrency):
+        self.transaction.__exit__(None, None, None)
+        self.loop.close()
+        self.settings.__exit__(None, None, None)
+
+        for name, cache_class in trace_cache.TRACE_CACHE_BACKENDS.items():
+            if cache_class is self.original_backend:
+                trace_cache.set_trace_cache_backend(name)
+
+    async def _task(self):
+        # The create_task() of the event loop is not instrumented here,
+        # so the transaction is propagated to the task explicitly.
+
+        with ContextOf(trace=self.transaction.root_span):
+            _function_traces()
+
+    def time_function_traces(self, backend, concurrency):
+        if concurrency == "asyncio":
+            self.loop.run_until_complete(self._task())
+        else:
+            _function_traces()
@@ -0,0 +1,43 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for generating the time metrics and span events of a
+transaction, for traces of 1k and 10k segments nested to varying depths.
+Deeply nested traces are those from recursive calls such as ORM relation
+loading or GraphQL resolvers.
+
+"""
+
+from newrelic.core.config import finalize_application_settings
+
+from ._fixtures import transaction_node
+
+
+class TimeTraceTraversal(object):
+    params = ([1000, 10000], [1, 10, 100, 900])
+    param_names = ["segments", "depth"]
+
+    def setup(self, segments, depth):
+        settings = finalize_application_settings(
+            {"agent_run_id": "1234567", "distributed_tracing.enabled": True, "span_events.enabled": True}
+        )
+        self.node = transaction_node(settings, segments=segments, depth=depth)
+
+    def time_time_metrics(self, segments, depth):
+        for _ in self.node.time_metrics(None):
+            pass
+
+    def time_span_events(self, segments, depth):
+        for _ in self.node.span_events(self.node.settings):
+            pass
@@ -0,0 +1,90 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Latency benchmark for the time a finished transaction holds up the
+request thread, when recorded inline and when handed off to the
+transaction recorder. Each simulated request does a fixed amount of work
+before finishing a transaction of 50 segments, and the median and 99th
+percentile time taken by record_transaction() are reported. The work
+done by each request leaves enough time for the recorder to keep up, so
+no transactions should be dropped.
+
+"""
+
+import time
+
+from ._fixtures import connected_application, override_settings, transaction_node
+
+REQUESTS = 1000
+REQUEST_WORK = 0.002
+
+
+def _request_work():
+    deadline = time.time() + REQUEST_WORK
+    while time.time() < deadline:
+        pass
+
+
+class TrackTransactionRecorder(object):
+    params = [False, True]
+    param_names = ["transaction_recorder"]
+    timeout = 120
+
+    def setup(self, transaction_recorder):
+        self.settings = override_settings(
+            {
+                "transaction_recorder.enabled": transaction_recorder,
+                "collect_custom_events": False,
+                "application_logging.forwarding.enabled": False,
+            }
+        )
+        self.settings.__enter__()
+
+        self.application = connected_application()
+        self.node = transaction_node(self.application.configuration, segments=50)
+
+        self.overheads = []
+        for _ in range(REQUESTS):
+            _request_work()
+
+            start = time.time()
+            self.application.record_transaction(self.node)
+            self.overheads.append(time.time() - start)
+
+        if self.application._transaction_recorder is not None:
+            self.application._transaction_recorder.shutdown(timeout=10.0)
+
+        self.dropped = REQUESTS - self.application._transaction_count
+        self.overheads.sort()
+
+    def teardown(self, transaction_recorder):
+        self.settings.__exit__(None, None, None)
+
+    def _percentile(self, percentile):
+        return self.overheads[int(len(self.overheads) * percentile / 100.0)] * 1e6
+
+    def track_p50_overhead(self, transaction_recorder):
+        return self._percentile(50)
+
+    track_p50_overhead.unit = "us"
+
+    def track_p99_overhead(self, transaction_recorder):
+        return self._percentile(99)
+
+    track_p99_overhead.unit = "us"
+
+    def track_dropped_transactions(self, transaction_recorder):
+        return self.dropped
+
+    track_dropped_transactions.unit = "transactions"
@@ -35,6 +35,8 @@ from newrelic.core.attribute import (
     MAX_64_BIT_INT,
     Attribute,
     CastingFailureException,
+    DeferredAttributes,
+    resolve_agent_attributes,
     sanitize,
     truncate,
 )
@@ -521,3 +523,49 @@ class AttributeErrorString(object):
 def test_str_raises_attribute_error():
     with pytest.raises(CastingFailureException):
         sanitize(AttributeErrorString())
+
+
+# Test DeferredAttributes
+
+
+def test_deferred_attributes_not_resolved_until_requested():
+    calls = []
+
+    def add_attributes(add_attr_function):
+        calls.append(True)
+        add_attr_function("deferred", 1)
+
+    attributes = DeferredAttributes({"direct": 0})
+    attributes.defer(add_attributes)
+
+    assert not calls
+    assert attributes == {"direct": 0}
+
+    attributes.resolve()
+    attributes.resolve()
+
+    assert calls == [True]
+    assert attributes == {"direct": 0, "deferred": 1}
+
+
+def test_deferred_attributes_do_not_replace_direct_attributes():
+    attributes = DeferredAttributes()
+    attributes.defer(lambda add_attr_function: add_attr_function("key", "deferred"))
+    attributes["key"] = "direct"
+
+    attributes.resolve()
+
+    assert attributes == {"key": "direct"}
+
+
+def test_resolve_agent_attributes_resolves_deferred_attributes():
+    class AttributeFilter(object):
+        def apply(self, name, default_destinations):
+            return default_destinations
+
+    attributes = DeferredAttributes()
+    attributes.defer(lambda add_attr_function: add_attr_function("code.function", "main"))
+
+    resolved = resolve_agent_attributes(attributes, AttributeFilter(), _DESTINATIONS_WITH_EVENTS)
+
+    assert resolved == {"code.function": "main"}
@@ -38,6 +38,7 @@ from testing_support.validators.validate_span_events import validate_span_events
 import newrelic.packages.six as six
 from newrelic.api.background_task import background_task
 from newrelic.api.function_trace import FunctionTrace
+from newrelic.api.transaction import current_transaction
 
 is_pypy = hasattr(sys, "pypy_version_info")
 
@@ -370,3 +371,24 @@ def test_code_level_metrics_objects(obj, agents, extract):
         extract(obj)
 
     _test()
+
+
+def test_code_level_metrics_not_extracted_when_not_sampled():
+    @override_application_settings(
+        {
+            "code_level_metrics.enabled": True,
+        }
+    )
+    @dt_enabled
+    @background_task()
+    def _test():
+        transaction = current_transaction()
+        transaction._sampled = False
+
+        with FunctionTrace("_test", source=exercise_function) as trace:
+            pass
+
+        assert trace.agent_attributes == {}
+        assert len(trace.agent_attributes.deferred) == 1
+
+    _test()
@@ -28,6 +28,7 @@ import newrelic.core.otlp_utils
 from newrelic.api.application import application_instance
 from newrelic.api.background_task import background_task
 from newrelic.api.transaction import (
+    record_dimensional_distribution,
     record_dimensional_metric,
     record_dimensional_metrics,
 )
@@ -222,3 +223,49 @@ def test_dimensional_metrics_no_duplicate_encodings():
     app = application_instance()
     core_app = app._agent.application(app.name)
     core_app.harvest()
+
+
+@reset_core_stats_engine()
+@validate_dimensional_metric_payload(
+    summary_metrics=[
+        ("Metric.Summary", None, 1),
+        ("Metric.Distribution", None, None),  # Should NOT be present
+    ],
+    distribution_metrics=[
+        ("Metric.Distribution", {"tag": 1}, 102),
+        ("Metric.Distribution", None, 3),
+        ("Metric.Summary", None, None),  # Should NOT be present
+    ],
+)
+def test_dimensional_distribution_payload():
+    @background_task(name="test_dimensional_distribution_payload")
+    def _test():
+        record_dimensional_distribution("Metric.Distribution", range(100), {"tag": 1})
+        record_dimensional_distribution("Metric.Distribution", 0.5, {"tag": 1})
+        record_dimensional_distribution("Metric.Distribution", (-1.0, 2.0, 4.0))
+        record_dimensional_metric("Metric.Summary", 1)
+
+    _test()
+    app = application_instance()
+    record_dimensional_distribution("Metric.Distribution", 1000, {"tag": 1}, application=app)
+
+    core_app = app._agent.application(app.name)
+    core_app.harvest()
+
+
+@reset_core_stats_engine()
+@validate_dimensional_metric_payload(
+    summary_metrics=[("Metric.Mixed", None, None)],  # Should NOT be present
+    distribution_metrics=[("Metric.Mixed", None, 2)],
+)
+def test_dimensional_distribution_mixed_with_value_metric():
+    @background_task(name="test_dimensional_distribution_mixed_with_value_metric")
+    def _test():
+        record_dimensional_distribution("Metric.Mixed", (1, 2))
+        # Recording the same series as a value metric is ignored.
+        record_dimensional_metric("Metric.Mixed", 3)
+
+    _test()
+    app = application_instance()
+    core_app = app._agent.application(app.name)
+    core_app.harvest()
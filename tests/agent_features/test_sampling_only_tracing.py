@@ -0,0 +1,252 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+import pytest
+from testing_support.fixtures import override_application_settings
+from testing_support.validators.validate_span_events import validate_span_events
+from testing_support.validators.validate_transaction_metrics import (
+    validate_transaction_metrics,
+)
+
+from newrelic.api.background_task import background_task
+from newrelic.api.datastore_trace import DatastoreTrace
+from newrelic.api.function_trace import FunctionTrace
+from newrelic.api.transaction import current_transaction
+from newrelic.common.object_wrapper import transient_function_wrapper
+
+_sampling_only_settings = {
+    "sampling_only_tracing.enabled": True,
+    "distributed_tracing.enabled": True,
+    "span_events.enabled": True,
+    "transaction_tracer.transaction_threshold": 10.0,
+}
+
+_scoped_metrics = [
+    ("Function/parent", 1),
+    ("Function/leaf", 3),
+]
+
+_rollup_metrics = [
+    ("Function/parent", 1),
+    ("Function/leaf", 3),
+    ("Custom/all", 3),
+    ("Custom/allOther", 3),
+]
+
+
+def record_transaction_nodes(nodes):
+    @transient_function_wrapper("newrelic.core.stats_engine", "StatsEngine.record_transaction")
+    def _record_transaction_nodes(wrapped, instance, args, kwargs):
+        nodes.append(args[0])
+        return wrapped(*args, **kwargs)
+
+    return _record_transaction_nodes
+
+
+def record_slow_transactions(nodes):
+    @transient_function_wrapper("newrelic.core.stats_engine", "StatsEngine._update_slow_transaction")
+    def _record_slow_transactions(wrapped, instance, args, kwargs):
+        nodes.append(args[0])
+        return wrapped(*args, **kwargs)
+
+    return _record_slow_transactions
+
+
+def run_traces(sampled):
+    transaction = current_transaction()
+    transaction._sampled = sampled
+
+    with FunctionTrace("parent"):
+        for _ in range(3):
+            with FunctionTrace("leaf", terminal=True, rollup="Custom/all"):
+                pass
+
+
+def node_names(node):
+    return [child.name for child in node.root.children]
+
+
+@override_application_settings(_sampling_only_settings)
+@validate_span_events(count=0)
+def test_unsampled_transaction_aggregates_traces():
+    nodes = []
+
+    @record_transaction_nodes(nodes)
+    @validate_transaction_metrics(
+        "test_unsampled_transaction_aggregates_traces",
+        scoped_metrics=_scoped_metrics,
+        rollup_metrics=_rollup_metrics,
+        background_task=True,
+    )
+    @background_task(name="test_unsampled_transaction_aggregates_traces")
+    def _test():
+        run_traces(sampled=False)
+
+    _test()
+
+    node = nodes[0]
+    assert node.root.children == ()
+    assert sorted(node.function_stats) == [("Function", "leaf", "Custom/all"), ("Function", "parent", None)]
+
+    # Time spent in the aggregated traces still counts to the total time.
+    stats = node.function_stats[("Function", "parent", None)]
+    assert node.total_time == pytest.approx(stats.total_call_time + node.root.exclusive)
+
+
+@override_application_settings(_sampling_only_settings)
+@validate_span_events(count=5)
+def test_sampled_transaction_creates_nodes():
+    nodes = []
+
+    @record_transaction_nodes(nodes)
+    @validate_transaction_metrics(
+        "test_sampled_transaction_creates_nodes",
+        scoped_metrics=_scoped_metrics,
+        rollup_metrics=_rollup_metrics,
+        background_task=True,
+    )
+    @background_task(name="test_sampled_transaction_creates_nodes")
+    def _test():
+        run_traces(sampled=True)
+
+    _test()
+
+    assert node_names(nodes[0]) == ["parent"]
+    assert not nodes[0].function_stats
+
+
+@override_application_settings(dict(_sampling_only_settings, **{"transaction_tracer.transaction_threshold": 0.0}))
+def test_transaction_trace_candidate_creates_nodes():
+    nodes = []
+
+    @record_transaction_nodes(nodes)
+    @background_task(name="test_transaction_trace_candidate_creates_nodes")
+    def _test():
+        run_traces(sampled=False)
+
+    _test()
+
+    assert node_names(nodes[0]) == ["parent"]
+    assert not nodes[0].function_stats
+
+
+@override_application_settings(_sampling_only_settings)
+def test_child_node_prevents_aggregation():
+    nodes = []
+
+    @record_transaction_nodes(nodes)
+    @validate_transaction_metrics(
+        "test_child_node_prevents_aggregation",
+        scoped_metrics=[("Function/parent", 1), ("Function/leaf", 1), ("Datastore/operation/Redis/get", 1)],
+        background_task=True,
+    )
+    @background_task(name="test_child_node_prevents_aggregation")
+    def _test():
+        current_transaction()._sampled = False
+
+        with FunctionTrace("parent"):
+            with DatastoreTrace("Redis", None, "get"):
+                pass
+
+        with FunctionTrace("leaf"):
+            pass
+
+    _test()
+
+    # The datastore trace always creates a node, and so its parent must
+    # create one too, whereas its sibling function trace is aggregated.
+
+    assert node_names(nodes[0]) == ["parent"]
+    assert [child.name for child in nodes[0].root.children[0].children] == ["Datastore/operation/Redis/get"]
+    assert sorted(nodes[0].function_stats) == [("Function", "leaf", None)]
+
+
+@override_application_settings(dict(_sampling_only_settings, **{"sampling_only_tracing.enabled": False}))
+def test_sampling_only_tracing_disabled():
+    nodes = []
+
+    @record_transaction_nodes(nodes)
+    @background_task(name="test_sampling_only_tracing_disabled")
+    def _test():
+        run_traces(sampled=False)
+
+    _test()
+
+    assert node_names(nodes[0]) == ["parent"]
+    assert not nodes[0].function_stats
+
+
+@override_application_settings(dict(_sampling_only_settings, **{"transaction_tracer.transaction_threshold": 0.05}))
+def test_late_transaction_trace_candidate_not_recorded():
+    nodes = []
+    slow_transactions = []
+
+    @record_transaction_nodes(nodes)
+    @record_slow_transactions(slow_transactions)
+    @background_task(name="test_late_transaction_trace_candidate_not_recorded")
+    def _test():
+        run_traces(sampled=False)
+
+        time.sleep(0.1)
+
+        with FunctionTrace("late"):
+            pass
+
+    _test()
+
+    # The transaction crossed the threshold after traces were aggregated,
+    # so is not recorded as a transaction trace with segments missing.
+
+    assert nodes[0].duration >= 0.05
+    assert node_names(nodes[0]) == []
+    assert ("Function", "late", None) in nodes[0].function_stats
+    assert not slow_transactions
+
+
+_inbound_settings = dict(_sampling_only_settings, **{"account_id": "1", "trusted_account_key": "1"})
+
+
+@override_application_settings(_inbound_settings)
+def test_undecided_sampling_creates_nodes_until_accepted():
+    nodes = []
+
+    @record_transaction_nodes(nodes)
+    @background_task(name="test_undecided_sampling_creates_nodes_until_accepted")
+    def _test():
+        transaction = current_transaction()
+
+        with FunctionTrace("before"):
+            pass
+
+        # An inbound distributed trace can still be accepted, and so
+        # decide whether the transaction is sampled.
+
+        assert transaction._sampled is None
+        assert transaction.accept_distributed_trace_headers(
+            {
+                "traceparent": "00-0af7651916cd43dd8448eb211c80319c-00f067aa0ba902b7-00",
+                "tracestate": "1@nr=0-0-1-2827902-00f067aa0ba902b7-e8b91a159289ff74-0-0.123456-1518469636035",
+            }
+        )
+        assert transaction._sampled is False
+
+        with FunctionTrace("after"):
+            pass
+
+    _test()
+
+    assert node_names(nodes[0]) == ["before"]
+    assert sorted(nodes[0].function_stats) == [("Function", "after", None)]
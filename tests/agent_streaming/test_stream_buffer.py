@@ -15,7 +15,11 @@
 import pytest
 from conftest import CONDITION_CLS
 
-from newrelic.common.streaming_utils import StreamBuffer, StreamBufferIterator
+from newrelic.common.streaming_utils import (
+    SpanProtoAttrs,
+    StreamBuffer,
+    StreamBufferIterator,
+)
 from newrelic.core.infinite_tracing_pb2 import Span, SpanBatch
 
 
@@ -85,3 +89,114 @@ def test_stream_buffer_queue_size():
     assert len(stream_buffer) == 1
     assert stream_buffer._dropped == 1
     assert stream_buffer._seen == 2
+
+
+def make_spans(count, name=""):
+    intrinsics = {"name": SpanProtoAttrs.get_attribute_value(name)}
+    return [Span(intrinsics=intrinsics, agent_attributes={}, user_attributes={}) for _ in range(count)]
+
+
+def span_names(stream_buffer):
+    return [span.intrinsics["name"].string_value for span in list(stream_buffer)]
+
+
+class CountNotifications(CONDITION_CLS):
+    notifications = 0
+
+    def notify_all(self):
+        CountNotifications.notifications += 1
+        return super(CountNotifications, self).notify_all()
+
+    def wait(self, *args, **kwargs):
+        raise StopIteration()
+
+
+def test_stream_buffer_put_many_notifies_once(monkeypatch):
+    monkeypatch.setattr(CountNotifications, "notifications", 0)
+    monkeypatch.setattr(StreamBuffer, "condition", staticmethod(CountNotifications))
+
+    stream_buffer = StreamBuffer(100)
+
+    stream_buffer.put_many(make_spans(10))
+    assert CountNotifications.notifications == 1
+
+    # The consumer only waits on an empty buffer, so no further
+    # notifications are needed until the buffer has been drained.
+    stream_buffer.put_many(make_spans(10))
+    stream_buffer.put(make_spans(1)[0])
+    assert CountNotifications.notifications == 1
+
+    assert len(list(stream_buffer)) == 21
+    stream_buffer.put_many(make_spans(10))
+    assert CountNotifications.notifications == 2
+
+
+def test_stream_buffer_put_many_generator():
+    stream_buffer = StreamBuffer(10)
+    stream_buffer.put_many(span for span in make_spans(3))
+    stream_buffer.put_many(span for span in ())
+
+    assert len(stream_buffer) == 3
+    assert stream_buffer.stats() == (3, 0)
+
+
+def test_stream_buffer_drop_oldest(stop_iteration_on_wait):
+    stream_buffer = StreamBuffer(4, drop_policy="oldest")
+    stream_buffer.put_many(make_spans(3, "first"))
+    stream_buffer.put_many(make_spans(3, "second"))
+
+    assert stream_buffer.stats() == (6, 2)
+    assert span_names(stream_buffer) == ["first", "second", "second", "second"]
+
+
+def test_stream_buffer_drop_newest(stop_iteration_on_wait):
+    stream_buffer = StreamBuffer(4, drop_policy="newest")
+    stream_buffer.put_many(make_spans(3, "first"))
+    stream_buffer.put_many(make_spans(3, "second"))
+
+    assert stream_buffer.stats() == (6, 2)
+    assert span_names(stream_buffer) == ["first", "first", "first", "second"]
+
+
+@pytest.mark.parametrize("batching", (True, False))
+def test_stream_buffer_drop_priority(stop_iteration_on_wait, batching):
+    stream_buffer = StreamBuffer(6, batching=batching, drop_policy="priority")
+    stream_buffer.put_many(make_spans(2, "low"), priority=0.5)
+    stream_buffer.put_many(make_spans(2, "high"), priority=1.5)
+    stream_buffer.put_many(make_spans(2, "medium"), priority=1.0)
+
+    # Displaces the spans of the lowest priority transaction first.
+    stream_buffer.put_many(make_spans(3, "higher"), priority=1.6)
+    assert len(stream_buffer) == 6
+
+    # Spans with a lower priority than all those queued are dropped.
+    stream_buffer.put_many(make_spans(2, "lowest"), priority=0.1)
+    assert len(stream_buffer) == 6
+
+    assert stream_buffer.stats() == (11, 5)
+
+    if batching:
+        spans = [span for batch in list(stream_buffer) for span in batch.spans]
+        names = [span.intrinsics["name"].string_value for span in spans]
+    else:
+        names = span_names(stream_buffer)
+
+    assert names == ["high", "high", "medium", "higher", "higher", "higher"]
+    assert not stream_buffer
+
+
+def test_stream_buffer_drop_priority_after_sending(stop_iteration_on_wait):
+    stream_buffer = StreamBuffer(4, drop_policy="priority")
+    stream_buffer.put_many(make_spans(4, "sent"), priority=0.1)
+    assert len(list(stream_buffer)) == 4
+
+    stream_buffer.put_many(make_spans(4, "queued"), priority=1.0)
+    stream_buffer.put_many(make_spans(2, "dropped"), priority=0.5)
+
+    assert span_names(stream_buffer) == ["queued"] * 4
+    assert stream_buffer.stats() == (10, 2)
+
+
+def test_stream_buffer_unknown_drop_policy():
+    stream_buffer = StreamBuffer(4, drop_policy="unknown")
+    assert stream_buffer.drop_policy == "oldest"
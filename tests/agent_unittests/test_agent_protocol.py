@@ -22,7 +22,11 @@ import pytest
 
 from newrelic.common import certs, system_info
 from newrelic.common.agent_http import DeveloperModeClient
-from newrelic.common.encoding_utils import json_decode, serverless_payload_decode
+from newrelic.common.encoding_utils import (
+    json_decode,
+    json_encode,
+    serverless_payload_decode,
+)
 from newrelic.common.utilization import CommonUtilization
 from newrelic.core.agent_protocol import AgentProtocol, ServerlessModeProtocol
 from newrelic.core.config import finalize_application_settings, global_settings
@@ -205,6 +209,21 @@ def test_send(status_code):
     assert protocol.finalize() is None
 
 
+def test_send_streaming_payload():
+    HttpClientRecorder.STATUS_CODE = 202
+    settings = finalize_application_settings({"streaming_payloads.enabled": True})
+    protocol = AgentProtocol(settings, client_cls=HttpClientRecorder)
+    events = [{"name": "event", "value": i} for i in range(10)]
+    payload = ("RUN_TOKEN", {"events_seen": 10}, (event for event in events))
+    protocol.send("analytic_event_data", payload)
+
+    request = HttpClientRecorder.SENT[0]
+    assert not isinstance(request.payload, bytes)
+
+    expected = json_encode(("RUN_TOKEN", {"events_seen": 10}, events)).encode("utf-8")
+    assert b"".join(request.payload) == expected
+
+
 @pytest.mark.parametrize(
     "status_code,expected_exc,log_level",
     (
@@ -539,6 +558,34 @@ def test_serverless_protocol_finalize(capsys):
     assert data["metadata"]["agent_version"] != "x"
 
 
+@pytest.mark.parametrize("streaming_payloads", (False, True))
+def test_serverless_protocol_finalize_multiple_methods(capsys, streaming_payloads):
+    protocol = ServerlessModeProtocol(
+        finalize_application_settings({"streaming_payloads.enabled": streaming_payloads})
+    )
+    expected = {
+        "metric_data": [1, [[{"name": "Foo"}, [1, 2.5, 2.5, 2.5, 2.5, 6.25]]]],
+        "analytic_event_data": [1, {"events_seen": 2}, [[{"name": u"\u2603"}, {}, {}]] * 2],
+        "error_data": [1, []],
+    }
+    for method, payload in expected.items():
+        protocol.send(method, payload)
+
+    payload = protocol.finalize()
+    assert capsys.readouterr().out.rstrip("\n") == payload
+
+    payload = json_decode(payload)
+    assert payload[:2] == [1, "NR_LAMBDA_MONITORING"]
+
+    data = serverless_payload_decode(payload[2])
+    assert set(data) == {"metadata", "data"}
+    assert data["data"] == expected
+
+    # The payloads captured by the client are cleared on finalize
+    data = serverless_payload_decode(json_decode(protocol.finalize())[2])
+    assert data["data"] == {}
+
+
 def test_audit_logging():
     with tempfile.NamedTemporaryFile(delete=False) as f:
         f.write(b"*\n")
@@ -583,3 +630,12 @@ def test_max_payload_size_limit():
     protocol = AgentProtocol(settings, host="localhost")
     with pytest.raises(DiscardDataForRequest):
         protocol.send("metric_data")
+
+
+def test_max_payload_size_limit_streaming():
+    settings = finalize_application_settings(
+        {"max_payload_size_in_bytes": 0, "port": -1, "streaming_payloads.enabled": True}
+    )
+    protocol = AgentProtocol(settings, host="localhost")
+    with pytest.raises(DiscardDataForRequest):
+        protocol.send("metric_data", [[{"name": "metric"}, [1, 2.0, 2.0, 2.0, 2.0, 4.0]]] * 10)
@@ -0,0 +1,109 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+import random
+
+import pytest
+
+from newrelic.core.attribute_filter import (
+    DST_ALL,
+    DST_ERROR_COLLECTOR,
+    DST_SPAN_EVENTS,
+    DST_TRANSACTION_EVENTS,
+    AttributeFilter,
+)
+
+SETTINGS = {
+    "attributes.enabled": True,
+    "transaction_events.attributes.enabled": True,
+    "transaction_tracer.attributes.enabled": True,
+    "error_collector.attributes.enabled": True,
+    "browser_monitoring.attributes.enabled": False,
+    "span_events.attributes.enabled": True,
+    "transaction_segments.attributes.enabled": True,
+}
+
+SETTING_NAMES = (
+    "attributes.include",
+    "attributes.exclude",
+    "transaction_events.attributes.include",
+    "transaction_events.attributes.exclude",
+    "error_collector.attributes.exclude",
+    "span_events.attributes.include",
+)
+
+
+def _linear_apply(attribute_filter, name, default_destinations):
+    # The filtering algorithm applying every sorted rule in turn.
+
+    destinations = attribute_filter.enabled_destinations & default_destinations
+    for rule in attribute_filter.rules:
+        if rule.name_match(name):
+            if rule.is_include:
+                destinations |= rule.destinations & attribute_filter.enabled_destinations
+            else:
+                destinations &= ~rule.destinations
+    return destinations
+
+
+def _filter(rules, **settings):
+    flattened = dict(SETTINGS)
+    flattened.update(rules)
+    flattened.update(settings)
+    return AttributeFilter(flattened)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_trie_matches_linear_rules(seed):
+    rng = random.Random(seed)
+    alphabet = "abc."
+
+    def random_name():
+        return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 4)))
+
+    rules = {}
+    for setting_name in SETTING_NAMES:
+        rules[setting_name] = [random_name() + rng.choice(("", "*")) for _ in range(rng.randint(0, 6))]
+
+    attribute_filter = _filter(rules)
+
+    names = ["".join(name) for length in range(5) for name in itertools.product(alphabet, repeat=length)]
+    for name in names:
+        for default_destinations in (DST_ALL, DST_TRANSACTION_EVENTS | DST_SPAN_EVENTS, DST_ERROR_COLLECTOR):
+            expected = _linear_apply(attribute_filter, name, default_destinations)
+            assert attribute_filter.apply(name, default_destinations) == expected, (name, attribute_filter)
+
+
+def test_cache_is_bounded():
+    attribute_filter = _filter(
+        {"attributes.exclude": ["request.*"]}, **{"agent_limits.attribute_filter_cache_size": 10}
+    )
+
+    for index in range(25):
+        assert attribute_filter.apply("request.id_%d" % index, DST_ALL) == 0
+
+    assert attribute_filter.apply("request.id_24", DST_ALL) == 0
+
+    assert attribute_filter.cache_stats() == (1, 25, 15)
+    assert attribute_filter._cached_apply.cache_info().currsize == 10
+
+    # Only activity since the last call is reported
+    attribute_filter.apply("request.id_24", DST_ALL)
+    assert attribute_filter.cache_stats() == (1, 0, 0)
+
+
+def test_default_cache_size():
+    attribute_filter = _filter({})
+    assert attribute_filter.cache_size == AttributeFilter.DEFAULT_CACHE_SIZE
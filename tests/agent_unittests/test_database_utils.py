@@ -0,0 +1,113 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from newrelic.core import database_utils
+from newrelic.core.database_utils import (
+    _MAXIMUM_CACHED_SQL_LENGTH,
+    SQLStatement,
+    SQLStatementCache,
+    _obfuscate_sql_regex,
+    _obfuscate_sql_tokenizer,
+    lru_cache,
+)
+
+QUOTING_STYLES = ("single", "single+double", "single+dollar", "single+oracle")
+
+STATEMENTS = [
+    'SELECT "auth_user"."id", "auth_user"."username" FROM "auth_user" WHERE "auth_user"."id" = 42 LIMIT 21',
+    "INSERT INTO orders (id, total, note) VALUES (7, -1.5e3, 'it''s here')",
+    "UPDATE accounts SET active = true, token = 0xdeadbeef WHERE uuid = '{0123-4567}' /* comment */",
+    "DELETE FROM sessions WHERE expires < 1700000000 -- expired\n AND user_id IN (1, 2, 3)",
+    "select * from t1 where col2 = :1 and col3 = %(name)s and col4 = null",
+    "SELECT $tag$quoted$tag$, q'[oracle]', \"double\" FROM dual WHERE x=0123456789abcdef0123456789abcdef",
+    "  CALL do_work(12, 'abc')  ",
+    "SELECT * FROM t WHERE a='unterminated",
+]
+
+
+class DummyDB(object):
+    def __init__(self, quoting_style):
+        self.quoting_style = quoting_style
+
+
+@pytest.mark.parametrize("quoting_style", QUOTING_STYLES)
+@pytest.mark.parametrize("sql", STATEMENTS)
+def test_tokenizer_matches_regex_engine(sql, quoting_style):
+    assert _obfuscate_sql_tokenizer(sql, quoting_style) == _obfuscate_sql_regex(sql, quoting_style)
+
+
+@pytest.mark.skipif(lru_cache is None, reason="Statement cache requires functools.lru_cache")
+@pytest.mark.parametrize("engine", ("regex", "tokenizer"))
+@pytest.mark.parametrize("quoting_style", QUOTING_STYLES)
+def test_cached_details_match_statement(quoting_style, engine):
+    cache = SQLStatementCache(100)
+
+    for sql in STATEMENTS:
+        statement = SQLStatement(sql, DummyDB(quoting_style))
+        parsed = cache.parsed(sql)
+        obfuscated = cache.obfuscated(sql, quoting_style, engine)
+
+        assert parsed.operation == statement.operation
+        assert parsed.target == statement.target
+        assert obfuscated.obfuscated == statement.obfuscated
+        assert obfuscated.normalized == statement.normalized
+        assert obfuscated.identifier == statement.identifier
+
+
+@pytest.mark.skipif(lru_cache is None, reason="Statement cache requires functools.lru_cache")
+def test_operation_and_target_do_not_obfuscate(monkeypatch):
+    def _obfuscate(*args, **kwargs):
+        raise AssertionError("Statement should not be obfuscated.")
+
+    monkeypatch.setattr(database_utils, "_obfuscate", _obfuscate)
+
+    for sql in STATEMENTS:
+        statement = SQLStatement(sql, DummyDB("single"))
+        assert statement.operation == database_utils._parse_operation(statement.uncommented)
+        assert statement.target == database_utils._parse_target(statement.uncommented, statement.operation)
+
+
+@pytest.mark.skipif(lru_cache is None, reason="Statement cache requires functools.lru_cache")
+def test_cache_stats():
+    cache = SQLStatementCache(100)
+
+    for _ in range(4):
+        cache.obfuscated(STATEMENTS[0], "single", "regex")
+    cache.obfuscated(STATEMENTS[0], "single+double", "regex")
+
+    assert cache.cache_stats() == (3, 2)
+
+    # Only activity since the last call is reported
+    cache.obfuscated(STATEMENTS[0], "single+double", "regex")
+    assert cache.cache_stats() == (1, 0)
+
+
+@pytest.mark.skipif(lru_cache is None, reason="Statement cache requires functools.lru_cache")
+def test_long_statements_not_cached():
+    cache = SQLStatementCache(100)
+    sql = "INSERT INTO t VALUES " + ", ".join(["(1)"] * _MAXIMUM_CACHED_SQL_LENGTH)
+
+    assert cache.parsed(sql) is None
+    assert cache.obfuscated(sql, "single", "regex") is None
+    assert cache.cache_stats() == (0, 0)
+
+
+def test_undecodable_statement():
+    statement = SQLStatement(b"SELECT '\xff'", DummyDB("single"))
+
+    assert statement.operation == ""
+    assert statement.obfuscated == ""
+    assert statement.identifier == hash("")
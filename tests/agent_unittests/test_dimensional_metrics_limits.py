@@ -0,0 +1,134 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+
+from newrelic.common.hyperloglog import HyperLogLog
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.stats_engine import DimensionalMetrics, StatsEngine
+
+OVERFLOW_TAGS = DimensionalMetrics.OVERFLOW_TAGS
+
+
+def limited_settings(max_series_per_metric=0, max_series=0):
+    settings = finalize_application_settings()
+    settings.dimensional_metrics.max_series_per_metric = max_series_per_metric
+    settings.dimensional_metrics.max_series = max_series
+    return settings
+
+
+@pytest.mark.parametrize("count", (10, 1000, 100000))
+def test_hyperloglog_estimate(count):
+    estimator = HyperLogLog()
+    for value in range(count):
+        estimator.add(frozenset({("id", value)}))
+        estimator.add(frozenset({("id", value)}))
+
+    assert abs(estimator.estimate() - count) <= max(1, 0.1 * count)
+
+
+def test_hyperloglog_merge():
+    first = HyperLogLog()
+    second = HyperLogLog()
+    for value in range(3000):
+        first.add(value)
+    for value in range(2000, 5000):
+        second.add(value)
+
+    first.merge(second)
+    assert abs(first.estimate() - 5000) <= 500
+
+
+def test_series_per_metric_overflow():
+    metrics = DimensionalMetrics(limited_settings(max_series_per_metric=3))
+
+    for value in range(10):
+        metrics.record_dimensional_metric("Metric", 1, {"id": value})
+    metrics.record_dimensional_metric("Metric", 1, {"id": 0})
+    metrics.record_dimensional_metric("Other", 1, {"id": 0})
+
+    container = metrics.get("Metric")
+    assert len(container) == 4
+    assert container[frozenset({("id", 0)})].call_count == 2
+    assert container[OVERFLOW_TAGS].call_count == 7
+    assert metrics.metrics_count() == 5
+
+    ((name, overflow),) = metrics.overflow()
+    assert name == "Metric"
+    assert overflow.estimate() == 7
+
+
+def test_total_series_overflow():
+    metrics = DimensionalMetrics(limited_settings(max_series=2))
+
+    metrics.record_dimensional_metric("A", 1, {"id": 1})
+    metrics.record_dimensional_metric("B", 1, {"id": 1})
+    metrics.record_dimensional_distribution("C", [1.0, 2.0], {"id": 1})
+    metrics.record_dimensional_distribution("C", 3.0, {"id": 2})
+
+    ((tags, stats),) = metrics.get("C").items()
+    assert tags == OVERFLOW_TAGS
+    assert stats.count == 3
+    assert dict((name, overflow.estimate()) for name, overflow in metrics.overflow()) == {"C": 2}
+
+
+def test_unlimited_without_settings():
+    metrics = DimensionalMetrics()
+
+    for value in range(5000):
+        metrics.record_dimensional_metric("Metric", 1, {"id": value})
+
+    assert metrics.metrics_count() == 5000
+    assert not list(metrics.overflow())
+
+
+def test_stats_engine_merge_applies_limits():
+    engine = StatsEngine()
+    engine.reset_stats(limited_settings(max_series_per_metric=5))
+
+    for offset in range(3):
+        workarea = DimensionalMetrics(limited_settings(max_series_per_metric=4))
+        for value in range(offset * 3, offset * 3 + 6):
+            workarea.record_dimensional_metric("Metric", 1, {"id": value})
+        engine.merge_dimensional_metrics(workarea)
+
+    container = engine.dimensional_stats_table.get("Metric")
+    assert len(container) == 5
+    assert sum(stats.call_count for stats in container.values()) == 18
+
+    ((name, overflow),) = engine.dimensional_stats_table.overflow()
+    assert name == "Metric"
+    assert overflow.estimate() == 8
+
+    engine.reset_metric_stats()
+    assert engine.dimensional_metric_data_count() == 0
+    assert not list(engine.dimensional_stats_table.overflow())
+
+
+def test_stats_engine_rollback_skips_dropped_series_estimates():
+    engine = StatsEngine()
+    engine.reset_stats(limited_settings(max_series_per_metric=2))
+
+    for value in range(5):
+        engine.record_dimensional_metric("Metric", 1, {"id": value})
+
+    snapshot = engine.harvest_snapshot()
+    assert [name for name, _ in snapshot.dimensional_stats_table.overflow()] == ["Metric"]
+
+    # The dropped series were reported with the failed harvest, so only the
+    # metric data is rolled into the next harvest.
+    engine.rollback(snapshot)
+
+    container = engine.dimensional_stats_table.get("Metric")
+    assert sum(stats.call_count for stats in container.values()) == 5
+    assert not list(engine.dimensional_stats_table.overflow())
@@ -0,0 +1,173 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import random
+
+import pytest
+
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.stats_engine import (
+    DimensionalMetrics,
+    DistributionStats,
+    StatsEngine,
+    TimeStats,
+)
+
+
+def distribution(values):
+    stats = DistributionStats()
+    for value in values:
+        stats.record(value)
+    return stats
+
+
+def lognormal_values(count, seed=0):
+    generator = random.Random(seed)
+    return [generator.lognormvariate(0.0, 1.5) for _ in range(count)]
+
+
+def relative_error_bound(stats):
+    base = 2.0 ** (2.0**-stats.scale)
+    return (base - 1.0) / (base + 1.0)
+
+
+@pytest.mark.parametrize("scale", (20, 4, 1, 0, -1, -3))
+@pytest.mark.parametrize("value", (1.0, 2.0, 3.0, 0.5, 0.001, 1024.0, 1234.5, 1e12))
+def test_bucket_index_boundaries(scale, value):
+    index = DistributionStats.bucket_index(value, scale)
+    lower = DistributionStats.bucket_lower_boundary(index, scale)
+    upper = DistributionStats.bucket_lower_boundary(index + 1, scale)
+    assert lower * (1 - 1e-9) < value <= upper * (1 + 1e-9)
+
+
+def test_distribution_summary_values():
+    stats = distribution([3.0, -1.0, 0.0, 2.0, 0.0])
+    assert stats.count == 5
+    assert stats.sum == 4.0
+    assert stats.min == -1.0
+    assert stats.max == 3.0
+    assert stats.zero_count == 2
+    assert sum(stats.positive.values()) == 2
+    assert sum(stats.negative.values()) == 1
+    assert stats.quantile(0.0) == -1.0
+    assert stats.quantile(0.5) == 0.0
+    assert stats.quantile(1.0) == 3.0
+
+
+def test_distribution_fixed_size():
+    stats = distribution([10.0**exponent for exponent in range(-100, 100)])
+    assert len(stats.positive) <= DistributionStats.MAX_SIZE
+    assert max(stats.positive) - min(stats.positive) < DistributionStats.MAX_SIZE
+    assert stats.count == 200
+
+
+@pytest.mark.parametrize("q", (0.5, 0.9, 0.99))
+def test_distribution_quantile_accuracy(q):
+    values = lognormal_values(20000)
+    stats = distribution(values)
+
+    expected = sorted(values)[int(q * (len(values) - 1))]
+    assert abs(stats.quantile(q) - expected) / expected <= relative_error_bound(stats)
+
+
+@pytest.mark.parametrize(
+    "values",
+    (
+        [0.1, 0.2, 0.3, 0.4, 0.5],
+        [-0.1, -0.2, -0.3],
+        [-30.0, -2.0, -0.5, -0.01, 0.01, 0.5, 2.0, 30.0],
+        [value * 0.001 for value in lognormal_values(5000)],
+        [-value for value in lognormal_values(5000)],
+    ),
+    ids=("below_one", "negative_below_one", "mixed_sign", "small", "negative"),
+)
+@pytest.mark.parametrize("q", (0.1, 0.25, 0.5, 0.75, 0.9))
+def test_distribution_quantile_accuracy_signed(values, q):
+    stats = distribution(values)
+
+    expected = sorted(values)[int(q * (len(values) - 1))]
+    # Values on a bucket boundary are estimated with exactly the bound on
+    # the relative error, so allow for rounding.
+    assert abs(stats.quantile(q) - expected) <= abs(expected) * relative_error_bound(stats) * (1 + 1e-9)
+
+
+def test_distribution_merge_matches_single_distribution():
+    values = lognormal_values(10000)
+
+    # The second half covers a much wider range, so is recorded at a lower
+    # scale than the first half and must be rescaled when merged.
+    first = distribution(values[:5000])
+    second = distribution([value**4 for value in values[5000:]])
+    assert first.scale != second.scale
+
+    merged = copy.copy(first)
+    merged.merge_stats(second)
+    expected = distribution(values[:5000] + [value**4 for value in values[5000:]])
+
+    assert merged.count == expected.count
+    assert merged.min == expected.min
+    assert merged.max == expected.max
+    assert merged.scale == expected.scale
+    assert merged.positive == expected.positive
+
+    # Merging into a copy leaves the original untouched.
+    assert first.count == 5000
+    assert sum(first.positive.values()) == 5000
+
+
+def test_distribution_merge_empty():
+    stats = distribution([1.0, 2.0])
+    stats.merge_stats(DistributionStats())
+    assert stats.count == 2
+
+    empty = DistributionStats()
+    empty.merge_stats(stats)
+    assert empty.count == 2
+    assert empty.min == 1.0
+    assert empty.positive == stats.positive
+
+
+def test_dimensional_distribution_iterable_and_types():
+    metrics = DimensionalMetrics()
+    metrics.record_dimensional_distribution("Latency", [1.0, 2.0, 3.0], {"route": "/a"})
+    metrics.record_dimensional_distribution("Latency", 4.0, {"route": "/a"})
+
+    # Value metrics and distributions can not be mixed for the same series.
+    metrics.record_dimensional_metric("Latency", 5.0, {"route": "/a"})
+    metrics.record_dimensional_metric("Value", 1.0)
+    metrics.record_dimensional_distribution("Value", 2.0)
+
+    stats = metrics.get("Latency")[frozenset({("route", "/a")})]
+    assert type(stats) is DistributionStats
+    assert stats.count == 4
+
+    assert type(metrics.get("Value")[None]) is TimeStats
+
+
+def test_stats_engine_merge_dimensional_distributions():
+    engine = StatsEngine()
+    engine.reset_stats(finalize_application_settings())
+
+    values = lognormal_values(3000)
+    for offset in range(3):
+        workarea = DimensionalMetrics()
+        workarea.record_dimensional_distribution("Latency", values[offset::3])
+        engine.merge_dimensional_metrics(workarea.metrics())
+
+    ((key, container),) = engine.dimensional_metric_data()
+    stats = container[None]
+    assert key == "Latency"
+    assert stats.count == 3000
+    assert stats.positive == distribution(values).positive
@@ -0,0 +1,163 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import pytest
+
+import newrelic.common.entry_points as entry_points_module
+from newrelic.common.entry_points import entry_points, sys_path_key
+
+DISCOVERED = {
+    "newrelic.hooks": [("sample", "sample_hooks", "instrument_sample")],
+    "newrelic.extension": [("sample", "sample_extension", "")],
+}
+
+
+@pytest.fixture(scope="function")
+def discovery(monkeypatch):
+    calls = []
+
+    def _discover(groups):
+        calls.append(groups)
+        return dict((group, list(DISCOVERED[group])) for group in groups)
+
+    monkeypatch.setattr(entry_points_module, "_entry_points", None)
+    monkeypatch.setattr(entry_points_module, "_discover", _discover)
+
+    return calls
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    (
+        ("package.module", ("package.module", "")),
+        ("package.module:instrument", ("package.module", "instrument")),
+        ("package.module:Class.method", ("package.module", "Class.method")),
+        ("package.module:instrument [extra]", ("package.module", "instrument")),
+        (" package.module : instrument ", ("package.module", "instrument")),
+    ),
+)
+def test_parse_entry_point_value(value, expected):
+    assert entry_points_module._parse_entry_point_value(value) == expected
+
+
+def test_entry_points_discovered_once(discovery):
+    assert entry_points("newrelic.hooks") == DISCOVERED["newrelic.hooks"]
+    assert entry_points("newrelic.extension") == DISCOVERED["newrelic.extension"]
+    assert entry_points("unknown.group") == []
+
+    assert len(discovery) == 1
+
+
+def test_entry_points_cache_reused(discovery, tmpdir):
+    directory = str(tmpdir)
+
+    first = entry_points("newrelic.hooks", cache_enabled=True, cache_directory=directory)
+    assert len(discovery) == 1
+    assert len(os.listdir(directory)) == 1
+
+    # A new process with the same sys.path reads the cache file rather
+    # than scanning the installed distributions again.
+
+    entry_points_module._reset_entry_points()
+
+    second = entry_points("newrelic.hooks", cache_enabled=True, cache_directory=directory)
+    assert len(discovery) == 1
+    assert second == first
+
+
+def test_entry_points_cache_invalid(discovery, tmpdir):
+    directory = str(tmpdir)
+
+    filename = entry_points_module._cache_file(directory, sys_path_key(exclude=directory))
+
+    with open(filename, "w") as cache:
+        cache.write("{not json")
+
+    assert entry_points("newrelic.hooks", cache_enabled=True, cache_directory=directory) == DISCOVERED["newrelic.hooks"]
+    assert len(discovery) == 1
+
+    # The unreadable file is replaced with the result of discovery.
+
+    entry_points_module._reset_entry_points()
+
+    entry_points("newrelic.hooks", cache_enabled=True, cache_directory=directory)
+    assert len(discovery) == 1
+
+
+def test_entry_points_cache_writable_by_others_ignored(discovery, tmpdir):
+    directory = str(tmpdir)
+
+    entry_points("newrelic.hooks", cache_enabled=True, cache_directory=directory)
+    assert len(discovery) == 1
+
+    # A cache file another user could have written is not trusted, as the
+    # modules it lists are imported.
+
+    (filename,) = [os.path.join(directory, name) for name in os.listdir(directory)]
+    os.chmod(filename, 0o666)
+    entry_points_module._reset_entry_points()
+
+    entry_points("newrelic.hooks", cache_enabled=True, cache_directory=directory)
+    assert len(discovery) == 2
+
+
+def test_entry_points_cache_default_directory(discovery, monkeypatch, tmpdir):
+    monkeypatch.setattr(entry_points_module.tempfile, "gettempdir", lambda: str(tmpdir))
+
+    entry_points("newrelic.hooks", cache_enabled=True)
+
+    (directory,) = [os.path.join(str(tmpdir), name) for name in os.listdir(str(tmpdir))]
+    assert os.stat(directory).st_mode & 0o777 == 0o700
+    assert len(os.listdir(directory)) == 1
+
+    entry_points_module._reset_entry_points()
+
+    entry_points("newrelic.hooks", cache_enabled=True)
+    assert len(discovery) == 1
+
+
+def test_entry_points_cache_default_directory_not_private(discovery, monkeypatch, tmpdir):
+    monkeypatch.setattr(entry_points_module.tempfile, "gettempdir", lambda: str(tmpdir))
+
+    # The default directory was created by someone else with permissions
+    # allowing any user to add files, so no cache is used at all.
+
+    directory = entry_points_module._default_cache_directory()
+    os.chmod(directory, 0o777)
+
+    assert entry_points_module._default_cache_directory() is None
+    assert entry_points("newrelic.hooks", cache_enabled=True) == DISCOVERED["newrelic.hooks"]
+    assert os.listdir(directory) == []
+
+
+def test_sys_path_key_tracks_modification_time(tmpdir):
+    site_packages = str(tmpdir.mkdir("site-packages"))
+    cache_directory = str(tmpdir.mkdir("cache"))
+    path = [site_packages, cache_directory]
+
+    key = sys_path_key(path, exclude=cache_directory)
+    assert sys_path_key(path, exclude=cache_directory) == key
+
+    # Changes to the cache directory itself do not invalidate the key.
+
+    os.utime(cache_directory, (0, 0))
+    assert sys_path_key(path, exclude=cache_directory) == key
+
+    # Installing a distribution changes the modification time of the
+    # directory it is installed into.
+
+    os.utime(site_packages, (0, 0))
+    assert sys_path_key(path, exclude=cache_directory) != key
@@ -0,0 +1,185 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from newrelic.core.database_utils import (
+    SQLConnections,
+    SQLDatabase,
+    SQLStatement,
+    explain_plan,
+    sql_connection_key,
+)
+from newrelic.core.explain_plan_executor import ExplainPlanExecutor
+
+
+class CountingCursor(sqlite3.Cursor):
+    delay = 0.0
+    executed = []
+
+    def execute(self, sql, *args, **kwargs):
+        CountingCursor.executed.append((sql, threading.current_thread().name))
+        time.sleep(CountingCursor.delay)
+        return super(CountingCursor, self).execute(sql, *args, **kwargs)
+
+
+class CountingConnection(sqlite3.Connection):
+    closed = []
+
+    def cursor(self, *args, **kwargs):
+        return super(CountingConnection, self).cursor(CountingCursor)
+
+    def close(self):
+        CountingConnection.closed.append(self)
+        return super(CountingConnection, self).close()
+
+
+class SQLiteModule(object):
+    """Stands in for the sqlite3 module with explain plans enabled."""
+
+    __name__ = "sqlite3"
+
+    _nr_database_product = "SQLite"
+    _nr_quoting_style = "single"
+    _nr_explain_query = "EXPLAIN QUERY PLAN"
+    _nr_explain_stmts = ("select",)
+
+    NotSupportedError = sqlite3.NotSupportedError
+
+    @staticmethod
+    def connect(*args, **kwargs):
+        return sqlite3.connect(*args, factory=CountingConnection, check_same_thread=False, **kwargs)
+
+
+DATABASE = SQLDatabase(SQLiteModule())
+CONNECT_PARAMS = ((":memory:",), {})
+
+
+@pytest.fixture(autouse=True)
+def reset_counters():
+    CountingCursor.delay = 0.0
+    CountingCursor.executed = []
+    CountingConnection.closed = []
+
+
+@pytest.fixture
+def executor():
+    executor = ExplainPlanExecutor(max_connections=2, cache_size=2, cache_ttl=3600.0, max_pending=4)
+    yield executor
+    executor.shutdown(timeout=1.0)
+
+
+def statement(sql):
+    return SQLStatement(sql, DATABASE)
+
+
+def test_sql_connections_lru():
+    with SQLConnections(maximum=2) as connections:
+        first = connections.connection(DATABASE, (":memory:",), {})
+        second = connections.connection(DATABASE, ("file:second?mode=memory",), {"uri": True})
+
+        # Using the first connection makes the second the least recently
+        # used, so it is dropped when a third connection is created.
+
+        assert connections.connection(DATABASE, (":memory:",), {}) is first
+        connections.connection(DATABASE, ("file:third?mode=memory",), {"uri": True})
+
+        assert list(connections.connections.values())[0] is first
+        assert CountingConnection.closed == [second.connection]
+
+    assert len(CountingConnection.closed) == 3
+
+
+def test_sql_connection_key_unhashable_params():
+    key = sql_connection_key(DATABASE, ("dbname",), {"options": {"sslmode": "require"}})
+
+    assert hash(key) == hash(sql_connection_key(DATABASE, ("dbname",), {"options": {"sslmode": "require"}}))
+    assert key != sql_connection_key(DATABASE, ("dbname",), {"options": {"sslmode": "disable"}})
+
+
+def test_explain_plan_on_background_thread(executor):
+    details = executor.explain(statement("SELECT 1"), CONNECT_PARAMS, None, None, None, timeout=5.0)
+
+    columns, rows = details
+    assert "detail" in columns
+    assert rows
+
+    assert CountingCursor.executed == [("EXPLAIN QUERY PLAN SELECT 1", "NR-Explain-Plan-Executor")]
+
+
+def test_explain_plan_cached_by_normalized_sql(executor):
+    first = executor.explain(statement("SELECT 1"), CONNECT_PARAMS, None, None, None, timeout=5.0)
+
+    # The literal is normalized away, so the same explain plan is used.
+    second = executor.explain(statement("SELECT  2"), CONNECT_PARAMS, None, None, None, timeout=5.0)
+
+    assert second == first
+    assert len(CountingCursor.executed) == 1
+
+
+def test_explain_plan_cache_expires(executor):
+    executor._cache_ttl = 0.0
+
+    executor.explain(statement("SELECT 1"), CONNECT_PARAMS, None, None, None, timeout=5.0)
+    executor.explain(statement("SELECT 1"), CONNECT_PARAMS, None, None, None, timeout=5.0)
+
+    assert len(CountingCursor.executed) == 2
+
+
+def test_explain_plan_cache_evicts_least_recently_used(executor):
+    for sql in ("SELECT 1", "SELECT 1 + 1", "SELECT 1", "SELECT 1 + 1 + 1", "SELECT 1"):
+        executor.explain(statement(sql), CONNECT_PARAMS, None, None, None, timeout=5.0)
+
+    assert len(CountingCursor.executed) == 3
+
+    executor.explain(statement("SELECT 1 + 1"), CONNECT_PARAMS, None, None, None, timeout=5.0)
+    assert len(CountingCursor.executed) == 4
+
+
+def test_explain_plan_session_time_budget(executor):
+    CountingCursor.delay = 0.5
+
+    session = executor.session(time_budget=0.05)
+
+    start = time.time()
+    details = explain_plan(session, statement("SELECT 1"), CONNECT_PARAMS, None, None, None, "obfuscated")
+    assert details is None
+
+    # Once the time budget is used up, explain plans are only queued.
+    assert explain_plan(session, statement("SELECT 1 + 1"), CONNECT_PARAMS, None, None, None, "obfuscated") is None
+    assert time.time() - start < 0.4
+
+    # The explain plans completed after the time budget was used up are
+    # cached for the following harvest.
+
+    CountingCursor.delay = 0.0
+    session = executor.session(time_budget=5.0)
+    explain_plan(session, statement("SELECT 1 + 1"), CONNECT_PARAMS, None, None, None, "obfuscated")
+
+    session = executor.session(time_budget=0.0)
+    assert explain_plan(session, statement("SELECT 1"), CONNECT_PARAMS, None, None, None, "obfuscated")
+    assert explain_plan(session, statement("SELECT 1 + 1"), CONNECT_PARAMS, None, None, None, "obfuscated")
+    assert len(CountingCursor.executed) == 2
+
+
+def test_explain_plan_shutdown_closes_connections(executor):
+    executor.explain(statement("SELECT 1"), CONNECT_PARAMS, None, None, None, timeout=5.0)
+    executor.shutdown(timeout=5.0)
+
+    assert len(CountingConnection.closed) == 1
+    assert executor.explain(statement("SELECT 2 + 2"), CONNECT_PARAMS, None, None, None, timeout=5.0) is None
@@ -14,6 +14,7 @@
 
 import random
 import tempfile
+import threading
 import time
 
 import pytest
@@ -23,6 +24,7 @@ from testing_support.fixtures import (
     override_generic_settings,
 )
 
+import newrelic.api.import_hook as import_hook
 from newrelic.common.agent_http import DeveloperModeClient
 from newrelic.common.object_wrapper import function_wrapper, transient_function_wrapper
 from newrelic.core.application import Application
@@ -34,7 +36,7 @@ from newrelic.core.log_event_node import LogEventNode
 from newrelic.core.root_node import RootNode
 from newrelic.core.stats_engine import CustomMetrics, SampledDataSet, DimensionalMetrics
 from newrelic.core.transaction_node import TransactionNode
-from newrelic.network.exceptions import RetryDataForRequest
+from newrelic.network.exceptions import ForceAgentDisconnect, RetryDataForRequest
 
 settings = global_settings()
 
@@ -164,6 +166,7 @@ def transaction_node(request):
         root_span_guid=None,
         trace_id="4485b89db608aece",
         loop_time=0.0,
+        function_stats={},
     )
     return node
 
@@ -292,6 +295,53 @@ def test_application_harvest():
         assert f.read()
 
 
+@validate_metric_payload(metrics=[("Supportability/Python/ImportHook/_test_harvest_import_hook", 1)])
+@override_generic_settings(
+    settings,
+    {
+        "developer_mode": True,
+        "license_key": "**NOT A LICENSE KEY**",
+        "feature_flag": set(),
+    },
+)
+def test_import_hook_timing_metrics():
+    import_hook._fire_import_hooks("_test_harvest_import_hook", None, [lambda module: None])
+
+    app = Application("Python Agent Test (Harvest Loop)")
+    app.connect_to_data_collector(None)
+    app.harvest()
+
+    # The timings are only reported in a single harvest.
+    assert import_hook.import_hook_timings() == []
+
+
+@validate_metric_payload(
+    metrics=[
+        ("Supportability/Python/DimensionalMetrics/DroppedSeries/Limited", 1),
+        ("Supportability/Python/DimensionalMetrics/DroppedSeries", 1),
+        ("Supportability/Python/DimensionalMetrics/DroppedSeries/Unlimited", None),
+    ]
+)
+@override_generic_settings(
+    settings,
+    {
+        "developer_mode": True,
+        "license_key": "**NOT A LICENSE KEY**",
+        "feature_flag": set(),
+        "dimensional_metrics.max_series_per_metric": 2,
+    },
+)
+def test_dimensional_metrics_dropped_series_metrics():
+    app = Application("Python Agent Test (Harvest Loop)")
+    app.connect_to_data_collector(None)
+
+    for value in range(5):
+        app.record_dimensional_metric("Limited", 1, {"id": value})
+    app.record_dimensional_metric("Unlimited", 1, {"id": 0})
+
+    app.harvest()
+
+
 @override_generic_settings(
     settings,
     {
@@ -479,6 +529,385 @@ def test_transaction_count(transaction_node):
     assert app._transaction_count == 0
 
 
+@override_generic_settings(
+    settings,
+    {
+        "developer_mode": True,
+        "license_key": "**NOT A LICENSE KEY**",
+        "feature_flag": set(),
+        "collect_custom_events": False,
+        "application_logging.forwarding.enabled": False,
+        "sharded_stats.enabled": True,
+    },
+)
+def test_sharded_stats_harvest(transaction_node):
+    app = Application("Python Agent Test (Harvest Loop)")
+    app.connect_to_data_collector(None)
+
+    def record_transactions():
+        for _ in range(3):
+            app.record_transaction(transaction_node)
+
+    threads = [threading.Thread(target=record_transactions) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Transactions are held in the per thread shards until harvest
+    assert len(app._stats_shards) == 4
+    assert app._transaction_count == 0
+    assert app._stats_engine.transaction_events.num_seen == 0
+
+    app._merge_stats_shards()
+
+    assert app._transaction_count == 12
+    assert app._stats_engine.transaction_events.num_seen == 12
+    assert app._stats_engine.transaction_events.num_samples == 12
+
+    app.harvest()
+
+    # Shards of threads which have exited are dropped once harvested
+    assert not app._stats_shards
+    assert app._transaction_count == 0
+
+
+@override_generic_settings(
+    settings,
+    {
+        "developer_mode": True,
+        "license_key": "**NOT A LICENSE KEY**",
+        "feature_flag": set(),
+        "sharded_stats.enabled": True,
+    },
+)
+def test_sharded_stats_reset_on_reconnect(transaction_node):
+    app = Application("Python Agent Test (Harvest Loop)")
+    app.connect_to_data_collector(None)
+
+    app.record_transaction(transaction_node)
+    shard = app._stats_shards.current(create=False)
+    assert shard.transaction_count == 1
+
+    # Reconnecting resets the stats engine and so discards stale shards
+    app._active_session = None
+    app.connect_to_data_collector(None)
+    assert not app._stats_shards
+
+    app.record_transaction(transaction_node)
+    assert app._stats_shards.current(create=False) is not shard
+    assert app._stats_shards.current(create=False).transaction_count == 1
+
+
+@override_generic_settings(
+    settings,
+    {
+        "developer_mode": True,
+        "license_key": "**NOT A LICENSE KEY**",
+        "feature_flag": set(),
+        "thread_local_metrics.enabled": True,
+    },
+)
+def test_thread_local_metrics_harvest():
+    app = Application("Python Agent Test (Harvest Loop)")
+    app.connect_to_data_collector(None)
+
+    def record_metrics():
+        for _ in range(3):
+            app.record_custom_metric("CustomMetric/Count", {"count": 1})
+            app.record_custom_metrics([("CustomMetric/Value", 2)])
+            app.record_dimensional_metric("DimensionalMetric/Value", 1, tags={"tag": "value"})
+
+    threads = [threading.Thread(target=record_metrics) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Metrics are held in the per thread buffers until harvest
+    assert len(app._metrics_buffers) == 4
+    assert ("CustomMetric/Count", "") not in app._stats_custom_engine.stats_table
+    assert "DimensionalMetric/Value" not in app._stats_engine.dimensional_stats_table
+
+    app._merge_metrics_buffers()
+
+    assert app._stats_custom_engine.stats_table[("CustomMetric/Count", "")][0] == 12
+    assert app._stats_custom_engine.stats_table[("CustomMetric/Value", "")][0] == 12
+    assert app._stats_custom_engine.stats_table[("CustomMetric/Value", "")][1] == 24
+    dimensional_stats = app._stats_engine.dimensional_stats_table.get("DimensionalMetric/Value")
+    assert dimensional_stats[frozenset({("tag", "value")})][0] == 12
+    assert app._global_events_account == 36
+
+    app.harvest()
+
+    # Buffers of threads which have exited are dropped once harvested
+    assert not app._metrics_buffers
+    assert ("CustomMetric/Count", "") not in app._stats_custom_engine.stats_table
+
+
+@override_generic_settings(
+    settings,
+    {
+        "developer_mode": True,
+        "license_key": "**NOT A LICENSE KEY**",
+        "feature_flag": set(),
+        "thread_local_metrics.enabled": True,
+    },
+)
+def test_thread_local_metrics_reset_on_reconnect():
+    app = Application("Python Agent Test (Harvest Loop)")
+    app.connect_to_data_collector(None)
+
+    app.record_custom_metric("CustomMetric/Count", {"count": 1})
+    buffer = app._metrics_buffers.current(create=False)
+    assert "CustomMetric/Count" in buffer.custom_metrics
+
+    # Reconnecting resets the stats engine and so discards stale buffers
+    app._active_session = None
+    app.connect_to_data_collector(None)
+    assert not app._metrics_buffers
+
+    app.record_custom_metric("CustomMetric/Count", {"count": 1})
+    assert app._metrics_buffers.current(create=False) is not buffer
+    assert "CustomMetric/Count" in app._metrics_buffers.current(create=False).custom_metrics
+
+
+@override_generic_settings(
+    settings,
+    {
+        "developer_mode": True,
+        "license_key": "**NOT A LICENSE KEY**",
+        "feature_flag": set(),
+        "application_logging.enabled": True,
+        "application_logging.forwarding.enabled": True,
+        "application_logging.forwarding.buffer_size": 4,
+    },
+)
+def test_log_event_buffer_harvest():
+    app = Application("Python Agent Test (Harvest Loop)")
+    app.connect_to_data_collector(None)
+
+    for index in range(6):
+        app.record_log_event("message %d" % index, "INFO")
+
+    # Log events are added to the stats engine once a buffer is full
+    buffer = app._metrics_buffers.current(create=False)
+    assert len(buffer.log_events) == 2
+    assert app._stats_engine.log_events.num_seen == 4
+    assert app._global_events_account == 4
+
+    app._merge_metrics_buffers()
+
+    assert not buffer.log_events
+    assert sorted(event.message for event in app._stats_engine.log_events) == ["message %d" % i for i in range(6)]
+    assert app._global_events_account == 6
+
+    app.harvest()
+
+    assert app._stats_engine.log_events.num_seen == 0
+
+
+def record_sending_threads(endpoints):
+    @transient_function_wrapper("newrelic.core.agent_protocol", "AgentProtocol.send")
+    def send_wrapper(wrapped, instance, args, kwargs):
+        def _bind_params(method, *args, **kwargs):
+            return method
+
+        endpoints.append((_bind_params(*args, **kwargs), threading.current_thread().name))
+        return wrapped(*args, **kwargs)
+
+    return send_wrapper
+
+
+def record_closing_threads(threads):
+    @transient_function_wrapper("newrelic.core.agent_protocol", "AgentProtocol.close_connection")
+    def close_connection_wrapper(wrapped, instance, args, kwargs):
+        threads.append(threading.current_thread().name)
+        return wrapped(*args, **kwargs)
+
+    return close_connection_wrapper
+
+
+@override_generic_settings(
+    settings,
+    {
+        "developer_mode": True,
+        "license_key": "**NOT A LICENSE KEY**",
+        "feature_flag": set(),
+        "collect_custom_events": False,
+        "application_logging.forwarding.enabled": False,
+        "harvest_sender.enabled": True,
+    },
+)
+def test_harvest_sender_harvest(transaction_node):
+    endpoints = []
+    closed_by = []
+
+    @record_sending_threads(endpoints)
+    @record_closing_threads(closed_by)
+    def _test():
+        app = Application("Python Agent Test (Harvest Loop)")
+        app.connect_to_data_collector(None)
+        app.record_transaction(transaction_node)
+        app.harvest()
+        assert app._harvest_sender.flush(timeout=5.0)
+
+    _test()
+
+    sent_by = dict(endpoints)
+
+    # Metric data is sent by the harvest thread, as a failure to send it
+    # rolls the data back into the next harvest.
+    assert sent_by["metric_data"] == threading.current_thread().name
+
+    for endpoint in ("analytic_event_data", "error_event_data", "error_data"):
+        assert sent_by[endpoint].startswith("NR-Harvest-Sender-")
+
+    # The connection is shared with the requests sent by the harvest
+    # thread, so must never be closed by a sender thread.
+    assert closed_by
+    assert set(closed_by) == {threading.current_thread().name}
+
+
+@override_generic_settings(
+    settings,
+    {
+        "developer_mode": True,
+        "license_key": "**NOT A LICENSE KEY**",
+        "feature_flag": set(),
+        "collect_custom_events": False,
+        "application_logging.forwarding.enabled": False,
+        "transaction_recorder.enabled": True,
+    },
+)
+def test_transaction_recorder_harvest(transaction_node):
+    recording_threads = []
+
+    @transient_function_wrapper("newrelic.core.stats_engine", "StatsEngine.record_transaction")
+    def record_recording_thread(wrapped, instance, args, kwargs):
+        recording_threads.append(threading.current_thread().name)
+        return wrapped(*args, **kwargs)
+
+    @record_recording_thread
+    def _test():
+        app = Application("Python Agent Test (Harvest Loop)")
+        app.connect_to_data_collector(None)
+
+        app.record_transaction(transaction_node)
+        assert app._transaction_recorder.flush(timeout=5.0)
+        assert app._transaction_count == 1
+
+        # Transactions still queued are recorded before the final harvest.
+        app.record_transaction(transaction_node)
+        app.harvest(shutdown=True)
+        assert app._transaction_count == 0
+
+        return app
+
+    app = _test()
+
+    assert recording_threads == ["NR-Transaction-Recorder"] * 2
+
+    # The recorder is stopped along with the agent session.
+    assert app._transaction_recorder is None
+
+
+@override_generic_settings(
+    settings,
+    {
+        "developer_mode": True,
+        "license_key": "**NOT A LICENSE KEY**",
+        "feature_flag": set(),
+        "explain_plan_executor.enabled": True,
+    },
+)
+def test_explain_plan_executor_harvest():
+    harvest_connections = []
+
+    @transient_function_wrapper("newrelic.core.stats_engine", "StatsEngine.transaction_trace_data")
+    def record_connections(wrapped, instance, args, kwargs):
+        harvest_connections.append(args[0])
+        return wrapped(*args, **kwargs)
+
+    @record_connections
+    def _test():
+        app = Application("Python Agent Test (Harvest Loop)")
+        app.connect_to_data_collector(None)
+        executor = app._explain_plan_executor
+
+        app.harvest()
+
+        # The executor is kept, with its cached explain plans, on reconnect.
+        app._active_session = None
+        app.connect_to_data_collector(None)
+        assert app._explain_plan_executor is executor
+
+        app.harvest(shutdown=True)
+
+        return app, executor
+
+    app, executor = _test()
+
+    assert [connections.executor for connections in harvest_connections] == [executor, executor]
+
+    # The executor is stopped along with the agent session.
+    assert app._explain_plan_executor is None
+
+
+@failing_endpoint("analytic_event_data")
+@override_generic_settings(
+    settings,
+    {
+        "developer_mode": True,
+        "license_key": "**NOT A LICENSE KEY**",
+        "feature_flag": set(),
+        "harvest_sender.enabled": True,
+        "harvest_sender.retry_backoff": 0.0,
+    },
+)
+def test_harvest_sender_retry(transaction_node):
+    endpoints = []
+
+    @record_sending_threads(endpoints)
+    def _test():
+        app = Application("Python Agent Test (Harvest Loop)")
+        app.connect_to_data_collector(None)
+        app.record_transaction(transaction_node)
+        app.harvest()
+        assert app._harvest_sender.flush(timeout=5.0)
+        return app
+
+    app = _test()
+
+    # The failed request is retried by the sender rather than rolled back
+    assert [endpoint for endpoint, _ in endpoints].count("analytic_event_data") == 2
+    assert app._stats_engine.transaction_events.num_seen == 0
+
+
+@failing_endpoint("error_data", raises=ForceAgentDisconnect)
+@override_generic_settings(
+    settings,
+    {
+        "developer_mode": True,
+        "license_key": "**NOT A LICENSE KEY**",
+        "feature_flag": set(),
+        "harvest_sender.enabled": True,
+    },
+)
+def test_harvest_sender_deferred_disconnect(transaction_node):
+    app = Application("Python Agent Test (Harvest Loop)")
+    app.connect_to_data_collector(None)
+    app.record_transaction(transaction_node)
+    app.harvest()
+    assert app._harvest_sender.flush(timeout=5.0)
+    assert not app._agent_shutdown
+
+    # The disconnect is raised on the harvest thread at the next harvest
+    app.harvest()
+    assert app._agent_shutdown
+    assert app._harvest_sender is None
+
+
 @override_generic_settings(
     settings,
     {
@@ -0,0 +1,182 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+import pytest
+
+from newrelic.core.harvest_sender import HarvestSender
+from newrelic.core.internal_metrics import InternalTraceContext
+from newrelic.core.stats_engine import CustomMetrics
+from newrelic.network.exceptions import (
+    DiscardDataForRequest,
+    ForceAgentRestart,
+    RetryDataForRequest,
+)
+
+
+def sender_metrics(sender):
+    metrics = {}
+    for custom_metrics in sender.harvest_metrics():
+        for name, stats in custom_metrics.metrics():
+            metrics[name] = metrics.get(name, 0) + stats.call_count
+    return metrics
+
+
+@pytest.fixture
+def sender():
+    sender = HarvestSender(max_workers=2, max_queue_size=2, max_retries=2, retry_backoff=0.0)
+    yield sender
+    sender.shutdown(timeout=1.0)
+
+
+def test_sends_from_worker_threads(sender):
+    sent = []
+
+    def send(payload):
+        sent.append((payload, threading.current_thread().name))
+
+    for payload in range(2):
+        assert sender.submit("metric_data", send, payload)
+
+    assert sender.flush(timeout=1.0)
+    assert sender.idle()
+    assert sorted(payload for payload, _ in sent) == [0, 1]
+    assert all(name.startswith("NR-Harvest-Sender-") for _, name in sent)
+    assert sender_metrics(sender)["Supportability/Python/Harvest/Sender/metric_data"] == 2
+
+
+def test_full_queue_drops_payload(sender):
+    release = threading.Event()
+    sent = []
+
+    def send(payload):
+        release.wait(1.0)
+        sent.append(payload)
+
+    internal_metrics = CustomMetrics()
+    with InternalTraceContext(internal_metrics):
+        results = [sender.submit("span_event_data", send, payload) for payload in range(10)]
+    release.set()
+
+    assert sender.flush(timeout=1.0)
+
+    # Only as many payloads as fit in the queue are accepted
+    assert results.count(True) <= 4
+    assert len(sent) == results.count(True)
+
+    internal_metrics = dict(internal_metrics.metrics())
+    dropped = results.count(False)
+    assert internal_metrics["Supportability/Python/Harvest/Sender/Dropped"][0] == dropped
+    assert internal_metrics["Supportability/Python/Harvest/Sender/Dropped/span_event_data"][0] == dropped
+
+
+def test_retry_with_backoff(sender):
+    calls = []
+
+    def send():
+        calls.append(True)
+        if len(calls) < 3:
+            raise RetryDataForRequest()
+
+    sender.submit("error_data", send)
+    assert sender.flush(timeout=1.0)
+
+    assert len(calls) == 3
+    assert sender_metrics(sender)["Supportability/Python/Harvest/Sender/Retry/error_data"] == 2
+
+    # A successful send resets the backoff for the endpoint
+    assert "error_data" not in sender._backoff
+
+
+def test_retries_exhausted(sender):
+    calls = []
+
+    def send():
+        calls.append(True)
+        raise RetryDataForRequest()
+
+    sender.submit("sql_trace_data", send)
+    assert sender.flush(timeout=1.0)
+
+    assert len(calls) == 3
+    assert sender_metrics(sender)["Supportability/Python/Harvest/Sender/Abandoned/sql_trace_data"] == 1
+
+    # The endpoint keeps backing off for subsequent payloads
+    assert sender._backoff["sql_trace_data"] == 0.0
+
+
+def test_backoff_grows_per_endpoint():
+    sender = HarvestSender(max_workers=1, max_retries=0, retry_backoff=0.5)
+
+    def send():
+        raise RetryDataForRequest()
+
+    try:
+        for _ in range(8):
+            sender.submit("custom_event_data", send)
+            assert sender.flush(timeout=1.0)
+
+        assert sender._backoff == {"custom_event_data": HarvestSender.MAX_RETRY_BACKOFF}
+    finally:
+        sender.shutdown(timeout=0.0)
+
+
+def test_discard_is_not_retried(sender):
+    calls = []
+
+    def send():
+        calls.append(True)
+        raise DiscardDataForRequest()
+
+    sender.submit("log_event_data", send)
+    assert sender.flush(timeout=1.0)
+
+    assert len(calls) == 1
+    metric_name = "Supportability/Python/Harvest/Exception/newrelic.network.exceptions:DiscardDataForRequest"
+    assert sender_metrics(sender)[metric_name] == 1
+
+
+def test_deferred_exception(sender):
+    def send():
+        raise ForceAgentRestart()
+
+    sender.submit("analytic_event_data", send)
+    assert sender.flush(timeout=1.0)
+
+    with pytest.raises(ForceAgentRestart):
+        sender.raise_deferred_exception()
+
+    # The exception is only raised once
+    sender.raise_deferred_exception()
+
+
+def test_shutdown_abandons_queued_payloads():
+    sender = HarvestSender(max_workers=1, max_queue_size=4)
+    release = threading.Event()
+    sent = []
+
+    def send(payload):
+        release.wait(1.0)
+        sent.append(payload)
+
+    for payload in range(4):
+        sender.submit("error_event_data", send, payload)
+
+    assert not sender.shutdown(timeout=0.0)
+    release.set()
+
+    assert sender.flush(timeout=1.0)
+    assert len(sent) <= 1
+    assert not sender.submit("error_event_data", send, 5)
@@ -32,7 +32,7 @@ from newrelic.common.agent_http import (
     InsecureHttpClient,
     ServerlessModeClient,
 )
-from newrelic.common.encoding_utils import ensure_str
+from newrelic.common.encoding_utils import ensure_str, json_encode, json_encode_chunks
 from newrelic.common.object_names import callable_name
 from newrelic.core.internal_metrics import InternalTraceContext
 from newrelic.core.stats_engine import CustomMetrics
@@ -357,6 +357,40 @@ def test_http_payload_compression(server, client_cls, method, threshold):
     assert sent_payload == payload
 
 
+@pytest.mark.parametrize("method", ("gzip", "deflate"))
+@pytest.mark.parametrize("threshold", (0, 1000000))
+def test_http_streamed_payload_compression(server, method, threshold):
+    data = [1, {"reservoir_size": 10}, [{"event": i, "name": "x" * 100} for i in range(1000)]]
+    payload = json_encode(data).encode("utf-8")
+    chunks = (chunk.encode("utf-8") for chunk in json_encode_chunks(data))
+
+    internal_metrics = CustomMetrics()
+
+    with ApplicationModeClient(
+        "localhost",
+        server.port,
+        disable_certificate_validation=True,
+        compression_method=method,
+        compression_threshold=threshold,
+    ) as client:
+        with InternalTraceContext(internal_metrics):
+            status, response = client.send_request(payload=chunks, params={"method": "method1"})
+
+    assert status == 200
+    headers = dict(line.split(b": ", 1) for line in response.split(b"\n")[1:] if b": " in line)
+    sent_payload = response[-int(headers[b"content-length"]) :]
+    internal_metrics = dict(internal_metrics.metrics())
+    assert internal_metrics["Supportability/Python/Collector/method1/Output/Bytes"][:2] == [1, len(payload)]
+
+    if threshold:
+        assert "Supportability/Python/Collector/method1/ZLIB/Bytes" not in internal_metrics
+    else:
+        assert internal_metrics["Supportability/Python/Collector/method1/ZLIB/Bytes"][:2] == [1, len(sent_payload)]
+        sent_payload = zlib.decompressobj(31 if method == "gzip" else 15).decompress(sent_payload)
+
+    assert sent_payload == payload
+
+
 def test_cert_path(server):
     with HttpClient("localhost", server.port, ca_bundle_path=SERVER_CERT) as client:
         status, data = client.send_request()
@@ -510,6 +544,25 @@ def test_max_payload_does_not_send(insecure_server):
     assert not data
 
 
+@pytest.mark.parametrize("threshold", (0, 100000))
+def test_max_payload_streamed_fails_fast(insecure_server, threshold):
+    consumed = []
+
+    def chunks():
+        for i in range(10000):
+            consumed.append(i)
+            yield os.urandom(64)
+
+    with InsecureHttpClient(
+        "localhost", insecure_server.port, compression_threshold=threshold, max_payload_size_in_bytes=1000
+    ) as client:
+        status, data = client.send_request(payload=chunks())
+
+    assert status == 413
+    assert not data
+    assert len(consumed) < 10000
+
+
 @pytest.mark.parametrize(
     "method",
     (
@@ -579,7 +632,8 @@ def test_serverless_mode_client():
     payloads = client.finalize()
     assert len(payloads) == len(methods)
     for method in methods:
-        assert payloads[method] == {"method": method}
+        # Payloads are retained as the encoded JSON that was sent
+        assert json.loads(payloads[method].decode("utf-8")) == {"method": method}
 
 
 @pytest.mark.parametrize(
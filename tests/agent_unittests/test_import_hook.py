@@ -12,13 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import importlib
 import sys
 
 import newrelic.api.import_hook as import_hook
+import newrelic.config as config
 import newrelic.packages.six as six
 import pytest
 
-from newrelic.config import _module_function_glob
+from newrelic.config import _module_function_glob, _process_module_definitions
 
 # a dummy hook just to be able to register hooks for modules
 def hook(*args, **kwargs):
@@ -79,3 +81,73 @@ def test_module_function_globbing(input, expected):
     
     result = set(_module_function_glob(module, input))
     assert result == expected, (result, expected)
+
+
+def test_process_module_definitions(monkeypatch):
+    """
+    This asserts that a batch of module definitions is registered in a
+    single pass while honouring any import-hook sections in the agent
+    configuration file.
+    """
+    config_object = six.moves.configparser.RawConfigParser()
+    config_object.add_section("import-hook:nr_test_disabled")
+    config_object.set("import-hook:nr_test_disabled", "enabled", "false")
+    config_object.add_section("import-hook:nr_test_executed")
+    config_object.set("import-hook:nr_test_executed", "execute", "nr_test_hooks:instrument_executed")
+
+    monkeypatch.setattr(config, "_config_object", config_object)
+    monkeypatch.setattr(config, "_module_import_hook_registry", {"nr_test_registered": ("nr_test_hooks", "instrument")})
+    monkeypatch.setattr(config, "_module_import_hook_results", {})
+    monkeypatch.setattr(import_hook, "_import_hooks", {})
+
+    _process_module_definitions(
+        (
+            ("nr_test_enabled", "nr_test_hooks", "instrument_enabled"),
+            ("nr_test_disabled", "nr_test_hooks", "instrument_disabled"),
+            ("nr_test_executed", "nr_test_hooks", "instrument_executed"),
+            ("nr_test_registered", "nr_test_hooks", "instrument_registered"),
+            ("nr_test_enabled", "nr_test_hooks", "instrument_duplicate"),
+        )
+    )
+
+    assert config._module_import_hook_registry == {
+        "nr_test_registered": ("nr_test_hooks", "instrument"),
+        "nr_test_enabled": ("nr_test_hooks", "instrument_enabled"),
+    }
+    assert list(import_hook._import_hooks) == ["nr_test_enabled"]
+    assert len(import_hook._import_hooks["nr_test_enabled"]) == 1
+
+
+def test_import_hook_finder_removed_when_hooks_fired(monkeypatch):
+    """
+    This asserts that the import hook finder is only present in
+    sys.meta_path while there are import hooks which have not yet fired,
+    and that the time taken to fire the hooks is recorded.
+    """
+    finder = import_hook._import_hook_finder
+
+    monkeypatch.setattr(sys, "meta_path", [f for f in sys.meta_path if f is not finder])
+    monkeypatch.setattr(import_hook, "_import_hooks", {})
+    monkeypatch.setattr(import_hook, "_pending_import_hooks", set())
+    monkeypatch.setattr(import_hook, "_import_hook_timings", [])
+    monkeypatch.delitem(sys.modules, "_test_import_hook", raising=False)
+
+    fired = []
+
+    import_hook.register_import_hook("_test_import_hook", fired.append)
+    assert finder in sys.meta_path
+
+    module = importlib.import_module("_test_import_hook")
+    assert fired == [module]
+    assert finder not in sys.meta_path
+
+    timings = import_hook.import_hook_timings()
+    assert [name for name, _ in timings] == ["_test_import_hook"]
+    assert import_hook.import_hook_timings() == []
+
+    # Hooks for a module which has already been imported fire immediately
+    # and do not require the finder to be installed again.
+
+    import_hook.register_import_hook("_test_import_hook", fired.append)
+    assert fired == [module, module]
+    assert finder not in sys.meta_path
@@ -0,0 +1,154 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.external_node import ExternalNode
+from newrelic.core.function_node import FunctionNode
+from newrelic.core.graphql_node import GraphQLOperationNode, GraphQLResolverNode
+from newrelic.core.node_mixin import walk_time_metrics
+
+
+class Root(object):
+    path = "OtherTransaction/Function/main"
+    type = "OtherTransaction"
+
+
+def function_node(name, children=()):
+    return FunctionNode(
+        group="Function",
+        name=name,
+        children=tuple(children),
+        start_time=1.0,
+        end_time=2.0,
+        duration=1.0,
+        exclusive=0.5,
+        label=None,
+        params=None,
+        rollup=None,
+        guid=name,
+        agent_attributes={},
+        user_attributes={},
+    )
+
+
+def external_node(name, children=()):
+    return ExternalNode(
+        library="requests",
+        url="http://%s/" % name,
+        method="GET",
+        children=tuple(children),
+        start_time=1.0,
+        end_time=2.0,
+        duration=1.0,
+        exclusive=1.0,
+        params={},
+        guid=name,
+        agent_attributes={},
+        user_attributes={},
+    )
+
+
+def graphql_operation_node(children=()):
+    return GraphQLOperationNode(
+        operation_type="query",
+        operation_name="<anonymous>",
+        deepest_path="hello",
+        graphql="{ hello }",
+        children=tuple(children),
+        start_time=1.0,
+        end_time=2.0,
+        duration=1.0,
+        exclusive=0.5,
+        guid="operation",
+        agent_attributes={},
+        user_attributes={},
+        product="GraphQL",
+    )
+
+
+def graphql_resolver_node(field_name, children=()):
+    return GraphQLResolverNode(
+        field_name=field_name,
+        children=tuple(children),
+        start_time=1.0,
+        end_time=2.0,
+        duration=1.0,
+        exclusive=0.5,
+        guid=field_name,
+        agent_attributes={},
+        user_attributes={},
+        product="GraphQL",
+    )
+
+
+def chain(depth):
+    node = function_node("leaf")
+    for level in range(depth):
+        node = function_node("level-%d" % level, [node])
+    return node
+
+
+def test_time_metrics_order():
+    nodes = [
+        function_node("a", [function_node("b"), function_node("c", [function_node("d")])]),
+        function_node("e"),
+    ]
+
+    names = [metric.name for metric in walk_time_metrics(None, Root(), None, nodes) if metric.scope]
+
+    assert names == ["Function/a", "Function/b", "Function/c", "Function/d", "Function/e"]
+
+
+def test_time_metrics_external_children_not_reported():
+    nodes = [function_node("a", [external_node("b", [function_node("c")])])]
+
+    names = [metric.name for metric in walk_time_metrics(None, Root(), None, nodes) if metric.scope]
+
+    assert names == ["Function/a", "External/b/requests/GET"]
+
+
+def test_time_metrics_graphql_children_reported_once():
+    nodes = [graphql_operation_node([graphql_resolver_node("hello", [function_node("child")])])]
+
+    names = [metric.name for metric in walk_time_metrics(None, Root(), None, nodes)]
+
+    assert names.count("GraphQL/operation/GraphQL/query/<anonymous>/hello") == 2
+    assert names.count("GraphQL/resolve/GraphQL/hello") == 2
+    assert names.count("Function/child") == 2
+
+
+def test_span_events_order():
+    settings = finalize_application_settings()
+    root = function_node("a", [function_node("b", [function_node("c")]), external_node("d", [function_node("e")])])
+
+    events = [
+        (i_attrs["guid"], i_attrs.get("parentId")) for i_attrs, _, _ in root.span_events(settings, parent_guid="p")
+    ]
+
+    assert events == [("a", "p"), ("b", "a"), ("c", "b"), ("d", "a"), ("e", "d")]
+
+
+def test_deep_trace():
+    depth = sys.getrecursionlimit() * 2
+    settings = finalize_application_settings()
+    root = chain(depth)
+
+    metrics = [metric for metric in walk_time_metrics(None, Root(), None, [root]) if metric.scope]
+    events = list(root.span_events(settings))
+
+    assert len(metrics) == depth + 1
+    assert len(events) == depth + 1
+    assert events[-1][0]["parentId"] == "level-0"
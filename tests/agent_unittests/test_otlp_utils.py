@@ -0,0 +1,97 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import json
+
+import pytest
+
+from newrelic.core import otlp_utils
+from newrelic.core.stats_engine import DimensionalMetrics
+
+pytestmark = pytest.mark.skipif(
+    otlp_utils.otlp_content_setting != "protobuf", reason="Comparison requires the protobuf message classes."
+)
+
+
+@pytest.fixture(scope="module")
+def metric_data():
+    metrics = DimensionalMetrics()
+    for index in range(50):
+        tags = {"int": index % 7, "str": "value-%d" % (index % 5), "bool": bool(index % 2), "float": index * 0.5}
+        metrics.record_dimensional_metric("Summary", index * 1.5 - 20.0, tags)
+        metrics.record_dimensional_metric("Summary", {"count": index}, tags if index % 3 else None)
+        metrics.record_dimensional_metric("Count", {"count": index - 3}, {"unicode": "ü", "negative": -index})
+        metrics.record_dimensional_distribution("Distribution", [(index - 25) * 0.75] * (index % 4), {"id": index % 11})
+    metrics.record_dimensional_distribution("Distribution", 0.0, None)
+    return list(metrics.metrics())
+
+
+def message_tree(metric_data, start_time, end_time):
+    return otlp_utils.MetricsData(
+        resource_metrics=[
+            otlp_utils.ResourceMetrics(
+                resource=otlp_utils.create_resource(),
+                scope_metrics=[
+                    otlp_utils.ScopeMetrics(
+                        metrics=list(otlp_utils.stats_to_otlp_metrics(metric_data, start_time, end_time))
+                    )
+                ],
+            )
+        ]
+    )
+
+
+def test_encode_metric_data_matches_message_tree(metric_data):
+    payload = otlp_utils.encode_metric_data(metric_data, 1000.5, 1060.25)
+
+    assert isinstance(payload, bytes)
+    assert otlp_utils.otlp_encode(payload) is payload
+    assert otlp_utils.MetricsData.FromString(payload) == message_tree(metric_data, 1000.5, 1060.25)
+
+
+def test_encode_metric_data_empty():
+    payload = otlp_utils.encode_metric_data([], 1000.5, 1060.25)
+    assert otlp_utils.MetricsData.FromString(payload) == message_tree([], 1000.5, 1060.25)
+
+
+def test_json_metrics_match_message_tree(metric_data):
+    from google.protobuf.json_format import MessageToDict
+
+    expected = [
+        MessageToDict(metric, preserving_proto_field_name=True, use_integers_for_enums=True)
+        for metric in otlp_utils.stats_to_otlp_metrics(metric_data, 1000.5, 1060.25)
+    ]
+    encoded = [json.loads(metric) for metric in otlp_utils._stats_to_json_metrics(metric_data, 1000.5, 1060.25)]
+
+    # The JSON encoding keeps fields holding default values, which are
+    # omitted from MessageToDict, and 64 bit integers are not quoted.
+
+    def normalize(value):
+        if isinstance(value, dict):
+            return {key: normalize(item) for key, item in value.items() if item not in (None, 0, 0.0, False, [], "0")}
+        elif isinstance(value, list):
+            return [normalize(item) for item in value]
+        elif isinstance(value, str) and value.lstrip("-").isdigit():
+            return int(value)
+        return value
+
+    assert normalize(encoded) == normalize(expected)
+
+
+def test_attributes_encoded_once_per_tag_set():
+    tags = frozenset({("route", "/a"), ("status", 200)})
+    attributes = otlp_utils._ProtobufAttributes(b"\x3a")
+
+    encoded = attributes[tags]
+    assert attributes[frozenset(tags)] is encoded
+    assert attributes[None] == b""
@@ -0,0 +1,88 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from newrelic.core.rules_engine import RulesEngine
+
+RULES = [
+    {"match_expression": "^/api/v[0-9]+", "replacement": "/api/*", "eval_order": 0},
+    {"match_expression": "[0-9a-f]{32}", "replacement": "*", "eval_order": 1, "replace_all": True},
+    {"match_expression": r"\.(css|js)$", "replacement": "", "eval_order": 2, "ignore": True},
+]
+
+NAMES = [
+    ("/api/v2/users", ("/api/*/users", False)),
+    ("/session/" + "a" * 32, ("/session/*", False)),
+    ("/static/site.css", ("/static/site", True)),
+    ("/health", ("/health", False)),
+    (b"/api/v1/\xe9", ("/api/*/\xe9", False)),
+]
+
+
+@pytest.mark.parametrize("cache_size", (0, 2, 100))
+def test_normalize(cache_size):
+    rules_engine = RulesEngine(RULES, cache_size)
+
+    for _ in range(3):
+        for name, expected in NAMES:
+            assert rules_engine.normalize(name) == expected
+
+
+def test_cache_stats():
+    rules_engine = RulesEngine(RULES, cache_size=100)
+
+    for _ in range(4):
+        rules_engine.normalize("/api/v2/users")
+    rules_engine.normalize("/health")
+
+    assert rules_engine.cache_stats() == (3, 2)
+
+    # Only activity since the last call is reported
+    rules_engine.normalize("/health")
+    assert rules_engine.cache_stats() == (1, 0)
+
+
+def test_cache_disabled():
+    rules_engine = RulesEngine(RULES)
+    rules_engine.normalize("/health")
+    assert rules_engine.cache_stats() == (0, 0)
+
+
+@pytest.mark.parametrize(
+    "rules,name,expected",
+    (
+        # Each segment rules are never prefiltered as anchors apply to
+        # each segment rather than the whole name.
+        ([{"match_expression": "^[0-9]+$", "replacement": "*", "each_segment": True}], "/orders/42", "/orders/*"),
+        # Patterns with back references can't be combined.
+        (
+            [{"match_expression": r"(a)\1", "replacement": "x"}, {"match_expression": "b", "replacement": "y"}],
+            "aab",
+            "xy",
+        ),
+        # Later rules match the output of earlier rules.
+        (
+            [
+                {"match_expression": "foo", "replacement": "bar", "eval_order": 0},
+                {"match_expression": "^/bar$", "replacement": "/baz", "eval_order": 1},
+            ],
+            "/foo",
+            "/baz",
+        ),
+    ),
+)
+def test_prefilter(rules, name, expected):
+    rules_engine = RulesEngine(rules, cache_size=10)
+    assert rules_engine.normalize(name) == (expected, False)
@@ -22,7 +22,7 @@ from testing_support.fixtures import override_generic_settings
 from newrelic.core.config import global_settings
 from newrelic.packages import six
 from newrelic.samplers.cpu_usage import cpu_usage_data_source
-from newrelic.samplers.gc_data import garbage_collector_data_source
+from newrelic.samplers.gc_data import CENSUS_CHUNK_SIZE, garbage_collector_data_source
 from newrelic.samplers.memory_usage import memory_usage_data_source
 
 settings = global_settings()
@@ -120,6 +120,72 @@ def test_gc_metrics_collection(gc_data_source, top_object_count_limit):
     _test()
 
 
+class CensusObject(object):
+    pass
+
+
+@pytest.mark.skipif(
+    platform.python_implementation() == "PyPy",
+    reason="GC Metrics are always disabled on PyPy",
+)
+@pytest.mark.parametrize("census_mode", ("full", "incremental", "sampled"))
+def test_gc_object_census(gc_data_source, census_mode):
+    census_objects = [CensusObject() for _ in range(100000)]  # noqa: F841
+
+    @override_generic_settings(
+        settings,
+        {
+            "gc_runtime_metrics.enabled": True,
+            "gc_runtime_metrics.top_object_count_limit": 1,
+            "gc_runtime_metrics.census_mode": census_mode,
+            "gc_runtime_metrics.census_time_budget": 0.001,
+            "gc_runtime_metrics.census_sample_rate": 0.1,
+        },
+    )
+    def _test():
+        # An incremental census with a small time budget is spread over a
+        # number of harvests, with the type counts only reported once the
+        # census has completed.
+        for _ in range(1000):
+            metrics = dict(gc_data_source())
+            assert metrics["Supportability/Python/GC/ObjectCensus"]["count"] == 1
+
+            type_metrics = [name for name in metrics if name.startswith("GC/objects/%d/type/" % PID)]
+            if type_metrics:
+                break
+
+            assert census_mode == "incremental"
+
+        metric = "GC/objects/%d/type/%s:CensusObject" % (PID, __name__)
+        assert type_metrics == [metric]
+        assert abs(metrics[metric]["count"] - 100000) <= 5000
+
+    _test()
+
+
+@pytest.mark.skipif(
+    platform.python_implementation() == "PyPy",
+    reason="GC Metrics are always disabled on PyPy",
+)
+def test_gc_incremental_census_keeps_no_objects(gc_data_source):
+    # A census spread over several harvests must not hold on to a record
+    # of the objects between harvests, as this grows with the heap.
+
+    census_objects = [CensusObject() for _ in range(50000)]  # noqa: F841
+    gc.collect()
+
+    result = None
+    for _ in range(1000):
+        result = gc_data_source.incremental_census(0.0)
+        if result is not None:
+            break
+
+        for value in vars(gc_data_source).values():
+            assert not isinstance(value, (list, tuple)) or len(value) < CENSUS_CHUNK_SIZE
+
+    assert abs(result[CensusObject] - 50000) <= 5000
+
+
 @pytest.mark.skipif(
     platform.python_implementation() == "PyPy",
     reason="GC Metrics are always disabled on PyPy",
@@ -0,0 +1,81 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from newrelic.core.metric import ApdexMetric, TimeMetric
+from newrelic.core.stats_engine import (
+    CompactStatsTable,
+    CountStats,
+    StatsTable,
+    TimeStats,
+)
+
+
+def populate(table):
+    table.merge_time_metric(("Function/a", ""), TimeMetric("Function/a", "", 2.0, 1.0))
+    table.merge_time_metric(("Function/a", ""), TimeMetric("Function/a", "", 1.0, None))
+    table.merge_time_metric(("Function/a", "WebTransaction/x"), TimeMetric("Function/a", "WebTransaction/x", 3.0, 3.0))
+    table.merge_apdex_metric(("Apdex", ""), ApdexMetric("Apdex", 1, 0, 0, 0.5))
+    table.merge_apdex_metric(("Apdex", ""), ApdexMetric("Apdex", 0, 1, 0, 0.25))
+    table.merge_stats(("Custom/count", ""), CountStats(call_count=3))
+    table.merge_stats(("Custom/count", ""), CountStats(call_count=4))
+    table.merge_stats(("Custom/value", ""), TimeStats(1, -5.0, -5.0, -5.0, -5.0, 25.0))
+    return table
+
+
+def as_dict(table):
+    return {key: list(stats) for key, stats in table.items()}
+
+
+@pytest.mark.parametrize("table_type", (StatsTable, CompactStatsTable))
+def test_stats_table_merges(table_type):
+    table = populate(table_type())
+
+    assert as_dict(table) == {
+        ("Function/a", ""): [2, 3.0, 2.0, 1.0, 2.0, 5.0],
+        ("Function/a", "WebTransaction/x"): [1, 3.0, 3.0, 3.0, 3.0, 9.0],
+        ("Apdex", ""): [1, 1, 0, 0.25, 0.5, 0],
+        ("Custom/count", ""): [7, 0.0, 0.0, 0.0, 0.0, 0.0],
+        ("Custom/value", ""): [1, -5.0, -5.0, -5.0, -5.0, 25.0],
+    }
+
+    assert len(table) == 5
+    assert ("Apdex", "") in table
+    assert table[("Function/a", "")].call_count == 2
+    assert table.get(("Missing", "")) is None
+
+
+@pytest.mark.parametrize("other_type", (StatsTable, CompactStatsTable))
+def test_compact_stats_table_merge_table(other_type):
+    expected = populate(StatsTable())
+    expected.merge_table(populate(StatsTable()))
+    expected.merge_stats(("Function/b", ""), TimeStats(1, 1.0, 1.0, 1.0, 1.0, 1.0))
+
+    table = populate(CompactStatsTable())
+    other = populate(other_type())
+    other.merge_stats(("Function/b", ""), TimeStats(1, 1.0, 1.0, 1.0, 1.0, 1.0))
+    table.merge_table(other)
+
+    assert as_dict(table) == as_dict(expected)
+
+
+def test_compact_stats_table_returns_copies():
+    table = populate(CompactStatsTable())
+
+    stats = table[("Function/a", "")]
+    stats.merge_stats(stats)
+
+    assert table[("Function/a", "")].call_count == 2
+    assert type(table[("Custom/count", "")]) is CountStats
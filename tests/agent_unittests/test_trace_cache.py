@@ -12,11 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import threading
 
 import pytest
 
-from newrelic.core.trace_cache import TraceCache
+from newrelic.core import trace_cache as trace_cache_module
+from newrelic.core.trace_cache import ContextVarTraceCache, TraceCache
 
 _TEST_CONCURRENT_ITERATION_TC_SIZE = 20
 
@@ -25,9 +27,22 @@ class DummyTrace(object):
     pass
 
 
-@pytest.fixture(scope="function")
-def trace_cache():
-    return TraceCache()
+class FakeTransaction(object):
+    background_task = True
+
+
+class FakeTrace(object):
+    def __init__(self, cache, parent=None):
+        self.parent = parent
+        self.root = parent.root if parent else self
+        self.transaction = parent.transaction if parent else FakeTransaction()
+        self.thread_id = cache.current_thread_id()
+        self.exited = False
+
+
+@pytest.fixture(scope="function", params=[TraceCache, ContextVarTraceCache])
+def trace_cache(request):
+    return request.param()
 
 
 def test_trace_cache_methods(trace_cache):
@@ -127,3 +142,189 @@ def test_concurrent_iteration(iterate_trace_cache, change_weakref_dict_size):
     t2.join(timeout=1)
     assert not t1.is_alive(), "Thread failed to exit."
     assert not t2.is_alive(), "Thread failed to exit."
+
+
+def test_trace_cache_save_and_pop(trace_cache):
+    root = FakeTrace(trace_cache)
+    trace_cache.save_trace(root)
+    assert trace_cache.current_trace() is root
+    assert trace_cache.current_transaction() is root.transaction
+
+    child = FakeTrace(trace_cache, parent=root)
+    trace_cache.save_trace(child)
+    assert trace_cache.current_trace() is child
+
+    trace_cache.pop_current(child)
+    assert trace_cache.current_trace() is root
+
+    trace_cache.complete_root(root)
+    assert trace_cache.current_trace() is None
+    assert not trace_cache
+
+
+def test_trace_cache_isolated_between_threads(trace_cache):
+    root = FakeTrace(trace_cache)
+    trace_cache.save_trace(root)
+
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(trace_cache.current_trace()))
+    thread.start()
+    thread.join()
+
+    assert seen == [None]
+    assert trace_cache.current_trace() is root
+
+    # The trace is still found by thread ID, for the profiler.
+    assert [transaction for transaction, _, _, _ in trace_cache.active_threads() if transaction] == [root.transaction]
+
+    trace_cache.complete_root(root)
+
+
+def test_trace_cache_set_item(trace_cache):
+    trace = FakeTrace(trace_cache)
+    other = FakeTrace(trace_cache)
+
+    # Saving a trace under another ID does not change the current trace.
+    trace_cache[0] = other
+    assert trace_cache.current_trace() is None
+
+    trace_cache[trace_cache.current_thread_id()] = trace
+    assert trace_cache.current_trace() is trace
+
+    trace_cache.pop(trace_cache.current_thread_id())
+    assert trace_cache.current_trace() is None
+
+
+def test_trace_cache_loop_traces(trace_cache):
+    trace_cache.asyncio = asyncio
+    trace_cache.greenlet = None
+
+    other_loop = asyncio.new_event_loop()
+
+    async def task():
+        loop = asyncio.get_event_loop()
+
+        root = FakeTrace(trace_cache)
+        trace_cache.save_trace(root)
+        assert trace_cache.loop_traces(loop) == [root]
+
+        child = FakeTrace(trace_cache, parent=root)
+        trace_cache.save_trace(child)
+        assert trace_cache.loop_traces(loop) == [child]
+        assert trace_cache.loop_traces(other_loop) == []
+
+        trace_cache.pop_current(child)
+        assert trace_cache.loop_traces(loop) == [root]
+
+        del trace_cache[root.thread_id]
+        assert trace_cache.loop_traces(loop) == []
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(task())
+    finally:
+        loop.close()
+        other_loop.close()
+
+
+def test_trace_cache_loop_traces_dropped_for_finished_loops(trace_cache):
+    trace_cache.asyncio = asyncio
+    trace_cache.greenlet = None
+
+    async def task():
+        root = FakeTrace(trace_cache)
+        trace_cache.save_trace(root)
+        del trace_cache[root.thread_id]
+
+    # As with repeated calls of asyncio.run(), each loop is only used once.
+    for _ in range(5):
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(task())
+        finally:
+            loop.close()
+
+    assert len(trace_cache._loop_traces) == 1
+
+
+def test_context_var_trace_cache_tasks():
+    trace_cache = ContextVarTraceCache()
+    trace_cache.asyncio = asyncio
+    trace_cache.greenlet = None
+
+    root = FakeTrace(trace_cache)
+    trace_cache.save_trace(root)
+
+    async def task():
+        # The task inherits the current trace of the code creating it.
+        assert trace_cache.current_trace() is root
+
+        child = FakeTrace(trace_cache, parent=root)
+        trace_cache.save_trace(child)
+        assert child.thread_id == id(asyncio.current_task())
+        assert child._task is asyncio.current_task()
+        assert trace_cache.current_trace() is child
+
+        trace_cache.pop_current(child)
+        assert trace_cache.current_trace() is root
+
+        return child
+
+    loop = asyncio.new_event_loop()
+    try:
+        child = loop.run_until_complete(task())
+    finally:
+        loop.close()
+
+    assert trace_cache.current_trace() is root
+    assert child.thread_id not in trace_cache or trace_cache[child.thread_id] is root
+
+    trace_cache.complete_root(root)
+
+
+def test_context_var_trace_cache_exited_elsewhere():
+    trace_cache = ContextVarTraceCache()
+
+    root = FakeTrace(trace_cache)
+    trace_cache.save_trace(root)
+    child = FakeTrace(trace_cache, parent=root)
+    trace_cache.save_trace(child)
+
+    # Exiting the trace from another thread can't update the context of
+    # this one, so the trace saved by thread ID is used instead.
+    thread = threading.Thread(target=trace_cache.pop_current, args=(child,))
+    thread.start()
+    thread.join()
+    child.exited = True
+
+    assert trace_cache.current_trace() is root
+
+    trace_cache.complete_root(root)
+
+
+@pytest.fixture(scope="function")
+def restore_trace_cache():
+    original = trace_cache_module._trace_cache
+    yield
+    trace_cache_module._trace_cache = original
+
+
+def test_set_trace_cache_backend(restore_trace_cache):
+    original = trace_cache_module.trace_cache()
+
+    trace_cache_module.set_trace_cache_backend("unknown")
+    assert trace_cache_module.trace_cache() is original
+
+    trace_cache_module.set_trace_cache_backend("contextvars")
+    cache = trace_cache_module.trace_cache()
+    assert type(cache) is ContextVarTraceCache
+
+    # The backend can't be replaced while there are active traces.
+    trace = FakeTrace(cache)
+    cache[0] = trace
+    trace_cache_module.set_trace_cache_backend("registry")
+    assert trace_cache_module.trace_cache() is cache
+
+    del cache[0]
+    trace_cache_module.set_trace_cache_backend("registry")
+    assert type(trace_cache_module.trace_cache()) is TraceCache
@@ -0,0 +1,107 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+import pytest
+
+from newrelic.core.transaction_recorder import TransactionRecorder
+
+
+@pytest.fixture
+def recorded():
+    return []
+
+
+@pytest.fixture
+def recorder(recorded):
+    def record(data):
+        recorded.append((data, threading.current_thread().name))
+
+    recorder = TransactionRecorder(record, max_queue_size=4)
+    yield recorder
+    recorder.shutdown(timeout=1.0)
+
+
+def test_records_from_background_thread(recorder, recorded):
+    for data in range(4):
+        assert recorder.submit(data)
+
+    assert recorder.flush(timeout=1.0)
+    assert [data for data, _ in recorded] == [0, 1, 2, 3]
+    assert all(name == "NR-Transaction-Recorder" for _, name in recorded)
+    assert recorder.pending == 0
+
+
+def test_full_queue_drops_transaction(recorded):
+    release = threading.Event()
+
+    def record(data):
+        release.wait(1.0)
+        recorded.append(data)
+
+    recorder = TransactionRecorder(record, max_queue_size=2)
+
+    try:
+        results = [recorder.submit(data) for data in range(10)]
+        release.set()
+        assert recorder.flush(timeout=1.0)
+    finally:
+        recorder.shutdown(timeout=1.0)
+
+    # At most one transaction is being recorded while the queue fills.
+    assert results.count(True) <= 3
+    assert recorded == [data for data, result in zip(range(10), results) if result]
+    assert recorder.dropped() == results.count(False)
+    assert recorder.dropped() == 0
+
+
+def test_record_failure_does_not_stop_recording(recorded):
+    def record(data):
+        recorded.append(1 // data)
+
+    recorder = TransactionRecorder(record)
+
+    try:
+        assert recorder.submit(0)
+        assert recorder.submit(1)
+        assert recorder.flush(timeout=1.0)
+    finally:
+        recorder.shutdown(timeout=1.0)
+
+    assert recorded == [1]
+
+
+def test_flush_without_transactions(recorder):
+    assert recorder.flush(timeout=1.0)
+
+
+def test_shutdown_abandons_queued_transactions(recorded):
+    release = threading.Event()
+
+    def record(data):
+        release.wait(1.0)
+        recorded.append(data)
+
+    recorder = TransactionRecorder(record, max_queue_size=10)
+
+    for data in range(5):
+        recorder.submit(data)
+
+    assert not recorder.shutdown(timeout=0.0)
+    release.set()
+
+    assert not recorder.submit(5)
+    assert recorder.pending == 0
+    assert len(recorded) <= 1
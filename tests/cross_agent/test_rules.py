@@ -43,16 +43,18 @@ def _make_case_insensitive(rules):
     return rules
 
 
+@pytest.mark.parametrize('cache_size', (0, 100))
 @pytest.mark.parametrize('test_group', _load_tests())
-def test_rules_engine(test_group):
+def test_rules_engine(test_group, cache_size):
 
     # FIXME: The test fixture assumes that matching is case insensitive when it
     # is not. To avoid errors, just lowercase all rules, inputs, and expected
     # values.
     test_rules = _make_case_insensitive(test_group['rules'])
-    rules_engine = RulesEngine(test_rules)
+    rules_engine = RulesEngine(test_rules, cache_size)
 
-    for test in test_group['tests']:
+    # Each input is normalized twice so cached results are checked too.
+    for test in test_group['tests'] * 2:
 
         # lowercase each value
         input_str = test['input'].lower()
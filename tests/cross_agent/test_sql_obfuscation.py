@@ -16,6 +16,9 @@ import json
 import os
 import pytest
 
+from testing_support.fixtures import override_generic_settings
+
+from newrelic.core.config import global_settings
 from newrelic.core.database_utils import SQLStatement
 
 
@@ -58,16 +61,31 @@ class DummyDB(object):
         self.quoting_style = quoting_style
 
 
+@pytest.mark.parametrize('cache_size', (0, 100))
+@pytest.mark.parametrize('engine', ('regex', 'tokenizer'))
 @pytest.mark.parametrize(_parameters, load_tests())
-def test_sql_obfuscation(obfuscated, dialects, sql, pathological):
+def test_sql_obfuscation(obfuscated, dialects, sql, pathological, engine,
+        cache_size):
 
     if pathological:
         pytest.skip()
 
     quoting_styles = get_quoting_styles(dialects)
 
-    for quoting_style in quoting_styles:
-        database = DummyDB(quoting_style)
-        statement = SQLStatement(sql, database)
-        actual_obfuscated = statement.obfuscated
-        assert actual_obfuscated in obfuscated
+    @override_generic_settings(global_settings(), {
+        'sql_obfuscation.engine': engine,
+        'agent_limits.sql_statement_cache_size': cache_size,
+    })
+    def _test():
+        for quoting_style in quoting_styles:
+            database = DummyDB(quoting_style)
+
+            # Obfuscate each statement twice so that where the statement
+            # cache is enabled the cached result is checked as well.
+
+            for _ in range(2):
+                statement = SQLStatement(sql, database)
+                actual_obfuscated = statement.obfuscated
+                assert actual_obfuscated in obfuscated
+
+    _test()
@@ -82,3 +82,47 @@ def test_local_log_decoration_outside_transaction(logger):
         assert logger.caplog.records[0] == get_metadata_string("C", False)
 
     test()
+
+
+class CountingMessage(object):
+    def __init__(self, message):
+        self.message = message
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return self.message
+
+
+@reset_core_stats_engine()
+def test_local_log_decoration_formats_message_once(logger):
+    @validate_log_event_count(1)
+    @background_task()
+    def test():
+        message = CountingMessage("C")
+        set_trace_ids()
+        logger.warning(message)
+        assert logger.caplog.records[0] == get_metadata_string("C", True)
+        assert message.formatted == 1
+
+    test()
+
+
+@reset_core_stats_engine()
+def test_local_log_decoration_after_filter_changes_message(logger):
+    def redact(record):
+        record.msg = "redacted"
+        return True
+
+    @validate_log_event_count(1)
+    @background_task()
+    def test():
+        set_trace_ids()
+        logger.caplog.addFilter(redact)
+        try:
+            logger.warning("C")
+        finally:
+            logger.caplog.removeFilter(redact)
+        assert logger.caplog.records[0] == get_metadata_string("redacted", True)
+
+    test()
@@ -427,3 +427,31 @@ def test_custom_event_count_multilabel_output():
         clf.predict([x_train[-1]])
 
     _test()
+
+
+sampled_inference_events_settings = {
+    "machine_learning.enabled": True,
+    "machine_learning.inference_events_value.enabled": True,
+    "machine_learning.inference_events_sample_size": 2,
+    "ml_insights_events.enabled": True,
+}
+
+
+@override_application_settings(sampled_inference_events_settings)
+@reset_core_stats_engine()
+def test_inference_events_sampled_from_batch():
+    @validate_ml_event_count(count=2)
+    @background_task()
+    def _test():
+        import sklearn.tree
+
+        clf = getattr(sklearn.tree, "DecisionTreeRegressor")(random_state=0)
+        model = clf.fit(
+            pandas.DataFrame({"col1": [2.0, 24.0], "col2": [4.0, 25.0]}),
+            pandas.DataFrame({"label": [27.0, 28.0]}),
+        )
+
+        labels = model.predict(pandas.DataFrame({"col1": [2.0] * 6, "col2": [4.0] * 6}))
+        return model
+
+    _test()
@@ -12,6 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
+
+import newrelic.core.otlp_utils
 from newrelic.common.object_wrapper import function_wrapper, transient_function_wrapper
 from newrelic.core.otlp_utils import otlp_content_setting
 
@@ -46,6 +49,14 @@ def attribute_to_value(attribute):
 
 
 def payload_to_metrics(payload):
+    if isinstance(payload, bytes):
+        # Metric data payloads are sent already encoded, as protobuf or JSON
+        # depending on the content encoding when the payload was created.
+        if newrelic.core.otlp_utils.otlp_content_setting == "protobuf":
+            payload = newrelic.core.otlp_utils.MetricsData.FromString(payload)
+        else:
+            payload = json.loads(payload.decode("utf-8"))
+
     if type(payload) is not dict:
         message = MessageToDict(payload, use_integers_for_enums=True, preserving_proto_field_name=True)
     else:
@@ -70,23 +81,27 @@ def payload_to_metrics(payload):
 
     sent_summary_metrics = {}
     sent_count_metrics = {}
+    sent_distribution_metrics = {}
     for metric in metrics:
         metric_name = metric["name"]
         if metric.get("sum"):
             sent_count_metrics[metric_name] = metric
         elif metric.get("summary"):
             sent_summary_metrics[metric_name] = metric
+        elif metric.get("exponential_histogram"):
+            sent_distribution_metrics[metric_name] = metric
         else:
             raise TypeError("Unknown metrics type for metric: %s" % metric)
 
-    return sent_summary_metrics, sent_count_metrics
+    return sent_summary_metrics, sent_count_metrics, sent_distribution_metrics
 
 
-def validate_dimensional_metric_payload(summary_metrics=None, count_metrics=None):
+def validate_dimensional_metric_payload(summary_metrics=None, count_metrics=None, distribution_metrics=None):
     # Validates OTLP metrics as they are sent to the collector.
 
     summary_metrics = summary_metrics or []
     count_metrics = count_metrics or []
+    distribution_metrics = distribution_metrics or []
 
     @function_wrapper
     def _validate_wrapper(wrapped, instance, args, kwargs):
@@ -109,7 +124,7 @@ def validate_dimensional_metric_payload(summary_metrics=None, count_metrics=None
         assert recorded_metrics
 
         decoded_payloads = [payload_to_metrics(payload) for payload in recorded_metrics]
-        for sent_summary_metrics, sent_count_metrics in decoded_payloads:
+        for sent_summary_metrics, sent_count_metrics, sent_distribution_metrics in decoded_payloads:
             for metric, tags, count in summary_metrics:
                 if isinstance(tags, dict):
                     tags = frozenset(tags.items())
@@ -182,6 +197,54 @@ def validate_dimensional_metric_payload(summary_metrics=None, count_metrics=None
                             metric_container["count"],
                         )
 
+            for metric, tags, count in distribution_metrics:
+                if isinstance(tags, dict):
+                    tags = frozenset(tags.items())
+
+                if not count:
+                    if metric in sent_distribution_metrics:
+                        data_points = data_points_to_dict(
+                            sent_distribution_metrics[metric]["exponential_histogram"]["data_points"]
+                        )
+                        assert tags not in data_points, "(%s, %s) Unexpected but found." % (metric, tags and dict(tags))
+                else:
+                    assert metric in sent_distribution_metrics, "%s Not Found. Got: %s" % (
+                        metric,
+                        list(sent_distribution_metrics.keys()),
+                    )
+                    data_points = data_points_to_dict(
+                        sent_distribution_metrics[metric]["exponential_histogram"]["data_points"]
+                    )
+                    assert tags in data_points, "(%s, %s) Not Found. Got: %s" % (
+                        metric,
+                        tags and dict(tags),
+                        list(data_points.keys()),
+                    )
+
+                    # Validate metric format
+                    histogram = sent_distribution_metrics[metric]["exponential_histogram"]
+                    assert histogram.get("aggregation_temporality") == 1
+                    metric_container = data_points[tags]
+                    for key in ("start_time_unix_nano", "time_unix_nano", "count", "sum", "min", "max", "positive"):
+                        assert key in metric_container, "Invalid metric format. Missing key: %s" % key
+                    bucket_counts = [
+                        int(bucket_count)
+                        for buckets in ("positive", "negative")
+                        for bucket_count in (metric_container.get(buckets) or {}).get("bucket_counts", [])
+                    ]
+                    assert sum(bucket_counts) + int(metric_container.get("zero_count", 0)) == int(
+                        metric_container["count"]
+                    )
+
+                    # Validate metric count
+                    if count != "present":
+                        assert int(metric_container["count"]) == count, "(%s, %s): Expected: %s Got: %s" % (
+                            metric,
+                            tags and dict(tags),
+                            count,
+                            metric_container["count"],
+                        )
+
         return val
 
     return _validate_wrapper
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 
+from newrelic.common.encoding_utils import json_decode
 from newrelic.common.object_wrapper import (
         transient_function_wrapper,
         function_wrapper)
@@ -41,8 +42,11 @@ def validate_serverless_data(
                 for method in expected_methods:
                     assert method in payload
 
-                    # Verify the method is not a byte string
-                    assert isinstance(payload[method], (dict, list))
+                    # Verify the method payload is encoded JSON which
+                    # decodes to the expected structure
+                    assert isinstance(payload[method], bytes)
+                    data = json_decode(payload[method].decode('utf-8'))
+                    assert isinstance(data, (dict, list))
 
                 for method in forgone_methods:
                     assert method not in payload
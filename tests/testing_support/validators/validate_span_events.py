@@ -57,11 +57,11 @@ def validate_span_events(
         def capture_span_events(wrapped, instance, args, kwargs):
             events = []
 
-            @transient_function_wrapper("newrelic.common.streaming_utils", "StreamBuffer.put")
+            @transient_function_wrapper("newrelic.common.streaming_utils", "StreamBuffer.put_many")
             def stream_capture(wrapped, instance, args, kwargs):
-                event = args[0]
-                events.append(event)
-                return wrapped(*args, **kwargs)
+                items = list(args[0])
+                events.extend(items)
+                return wrapped(items, *args[1:], **kwargs)
 
             record_transaction_called.append(True)
             try: